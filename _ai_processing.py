@@ -5,15 +5,21 @@ Supports OpenAI, Anthropic (native), Gemini, xAI, and Ollama.
 from __future__ import annotations
 
 import base64
+import functools
 import io
 import logging
+import threading
+import time
 
 from pydantic import BaseModel, Field
 from PIL import Image
 import instructor
+import openai
 from openai import OpenAI
 
-from _pdf_utils import ExtractionResult
+from _cache import ResultCache, image_digest, make_key
+from _pdf_utils import ExtractionResult, merge_ocr_pages
+from _rate_limit import get_concurrency_limiter, get_request_pacer
 
 
 PROVIDER_BASE_URLS = {
@@ -37,12 +43,8 @@ class DocumentMetadata(BaseModel):
     )
 
 
-def get_instructor_client(config: dict):
-    """Create an instructor-wrapped client for structured LLM output.
-
-    Most providers route through the OpenAI SDK via compatible endpoints.
-    Anthropic uses its native SDK (their OpenAI compat ignores structured output).
-    """
+def _resolve_provider(config: dict) -> tuple[str, str, str | None]:
+    """Validate the configured provider. Returns (provider, api_key, base_url)."""
     provider = config["ai"]["provider"]
     api_key = config["ai"].get("api_key", "")
     custom_base_url = config["ai"].get("base_url", "")
@@ -53,31 +55,97 @@ def get_instructor_client(config: dict):
     if provider != "ollama" and not api_key:
         raise ValueError(f"API key required for provider '{provider}'. Set ai.api_key in config.yaml.")
 
+    base_url = custom_base_url or PROVIDER_BASE_URLS.get(provider)
+    if provider == "ollama":
+        api_key = api_key or "ollama"
+    return provider, api_key, base_url
+
+
+def _http_client_kwargs(config: dict, sdk) -> dict:
+    """SDK client kwargs that route every HTTP response through the rate limiter.
+
+    Empty unless ``ai.adaptive_concurrency`` is on. The hooks also see the
+    429s the SDK retries internally, which never surface as exceptions, and
+    stamp each request's send time so one burst of 429s shrinks the limit once.
+    """
+    limiter = get_concurrency_limiter(config)
+    if limiter is None:
+        return {}
+
+    def _stamp(request):
+        request.extensions["autorename_sent_at"] = time.monotonic()
+
+    def _record(response):
+        sent_at = response.request.extensions.get("autorename_sent_at")
+        limiter.record_response(response.status_code, response.headers, sent_at=sent_at)
+
+    return {"http_client": sdk.DefaultHttpxClient(event_hooks={"request": [_stamp], "response": [_record]})}
+
+
+def get_instructor_client(config: dict):
+    """Create an instructor-wrapped client for structured LLM output.
+
+    Most providers route through the OpenAI SDK via compatible endpoints.
+    Anthropic uses its native SDK (their OpenAI compat ignores structured output).
+    """
+    provider, api_key, base_url = _resolve_provider(config)
+
     # Anthropic: use native SDK
     if provider == "anthropic":
-        from anthropic import Anthropic
-        raw = Anthropic(api_key=api_key)
+        import anthropic
+        raw = anthropic.Anthropic(api_key=api_key, **_http_client_kwargs(config, anthropic))
         return instructor.from_anthropic(raw)
 
     # All others: OpenAI SDK with provider-specific base_url
-    base_url = custom_base_url or PROVIDER_BASE_URLS.get(provider)
-    if provider == "ollama":
-        api_key = api_key or "ollama"
-
-    raw = OpenAI(api_key=api_key, base_url=base_url)
+    raw = OpenAI(api_key=api_key, base_url=base_url, **_http_client_kwargs(config, openai))
     # Ollama: use JSON mode for broadest model compatibility (TOOLS requires function calling support)
     mode = instructor.Mode.JSON if provider == "ollama" else instructor.Mode.TOOLS
     return instructor.from_openai(raw, mode=mode)
 
 
+# Long-lived processes (``serve``) keep one sync client per provider endpoint,
+# so every request reuses its connection pool. One-shot CLI runs build a
+# client per call. None means pooling is off.
+_CLIENT_POOL: dict | None = None
+_CLIENT_POOL_LOCK = threading.Lock()
+
+
+def enable_client_pool() -> None:
+    """Reuse sync instructor clients across calls for the rest of the process."""
+    global _CLIENT_POOL
+    with _CLIENT_POOL_LOCK:
+        if _CLIENT_POOL is None:
+            _CLIENT_POOL = {}
+
+
+def _sync_client(config: dict):
+    if _CLIENT_POOL is None:
+        return get_instructor_client(config)
+    key = _resolve_provider(config)
+    with _CLIENT_POOL_LOCK:
+        if key not in _CLIENT_POOL:
+            _CLIENT_POOL[key] = get_instructor_client(config)
+        return _CLIENT_POOL[key]
+
+
 def build_system_prompt(config: dict) -> str:
-    """Build the extraction prompt from config values."""
-    company = config.get("company", {}).get("name", "")
-    lang = config.get("output", {}).get("language", "English")
-    er = config.get("pdf", {}).get("incoming_invoice", "ER")
-    ar = config.get("pdf", {}).get("outgoing_invoice", "AR")
-    ext = config.get("prompt_extension", "")
+    """Build the extraction prompt from config values.
+
+    The prompt is built once per distinct set of values and the same string
+    returned for every document, so requests share a byte-identical prefix
+    that provider prompt caches can match.
+    """
+    return _system_prompt(
+        config.get("company", {}).get("name", ""),
+        config.get("output", {}).get("language", "English"),
+        config.get("pdf", {}).get("incoming_invoice", "ER"),
+        config.get("pdf", {}).get("outgoing_invoice", "AR"),
+        config.get("prompt_extension", ""),
+    )
+
 
+@functools.lru_cache(maxsize=16)
+def _system_prompt(company: str, lang: str, er: str, ar: str, ext: str) -> str:
     prompt = (
         "You will extract the company name, document date, and document type "
         "from the following document content. "
@@ -115,6 +183,102 @@ def build_system_prompt(config: dict) -> str:
     return prompt.strip()
 
 
+def prompt_caching_enabled(config: dict) -> bool:
+    return bool(config.get("ai", {}).get("prompt_caching", True))
+
+
+def build_system_message(config: dict) -> dict:
+    """The system message, first in every request so the static prefix is cacheable.
+
+    For Anthropic the system block carries a ``cache_control`` breakpoint
+    (everything up to it, tool schema included, is cached for 5 minutes);
+    OpenAI and compatible providers cache a repeated prefix on their own.
+    Prompts shorter than the provider's minimum (1024 tokens for most
+    models) are not cached, so this pays off with a long ``prompt_extension``.
+    """
+    prompt = build_system_prompt(config)
+    if config["ai"]["provider"] == "anthropic" and prompt_caching_enabled(config):
+        return {"role": "system", "content": [
+            {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}},
+        ]}
+    return {"role": "system", "content": prompt}
+
+
+def prompt_cache_fields(config: dict) -> dict:
+    """Request body fields that route OpenAI requests with the same prefix to the same cache.
+
+    Only sent to OpenAI itself: compatible servers behind ``ai.base_url``
+    and the other providers may reject unknown fields.
+    """
+    ai_cfg = config["ai"]
+    if ai_cfg["provider"] != "openai" or ai_cfg.get("base_url") or not prompt_caching_enabled(config):
+        return {}
+    return {"prompt_cache_key": make_key(build_system_prompt(config), ai_cfg.get("model", ""))[:32]}
+
+
+def prompt_cache_kwargs(config: dict) -> dict:
+    """prompt_cache_fields as ``create()`` kwargs.
+
+    Passed through ``extra_body``: openai releases older than the
+    ``prompt_cache_key`` parameter reject it as a keyword with TypeError.
+    """
+    fields = prompt_cache_fields(config)
+    return {"extra_body": fields} if fields else {}
+
+
+# Prompt tokens and prompt cache reads/writes per provider, summed over the
+# process like the rate-limit counters (see prompt_cache_stats)
+_PROMPT_USAGE: dict[str, dict[str, int]] = {}
+_PROMPT_USAGE_LOCK = threading.Lock()
+
+
+def _usage_field(usage, name: str) -> int:
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
+
+
+def record_usage(provider: str, usage) -> None:
+    """Add one response's token usage (SDK object or dict) to the prompt cache counters.
+
+    Anthropic reports cache reads and writes next to the uncached
+    ``input_tokens``; OpenAI-style APIs report ``prompt_tokens`` with the
+    cached share in ``prompt_tokens_details.cached_tokens``.
+    """
+    if usage is None:
+        return
+    if provider == "anthropic":
+        read = _usage_field(usage, "cache_read_input_tokens")
+        written = _usage_field(usage, "cache_creation_input_tokens")
+        total = _usage_field(usage, "input_tokens") + read + written
+    else:
+        details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(
+            usage, "prompt_tokens_details", None)
+        read = _usage_field(details, "cached_tokens") if details is not None else 0
+        written = 0
+        total = _usage_field(usage, "prompt_tokens")
+    with _PROMPT_USAGE_LOCK:
+        counts = _PROMPT_USAGE.setdefault(
+            provider, {"requests": 0, "input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0},
+        )
+        counts["requests"] += 1
+        counts["input_tokens"] += total
+        counts["cache_read_tokens"] += read
+        counts["cache_write_tokens"] += written
+
+
+def _record_response_usage(config: dict, metadata) -> None:
+    # instructor keeps the provider response on the parsed model
+    response = getattr(metadata, "_raw_response", None)
+    if response is not None:
+        record_usage(config["ai"]["provider"], getattr(response, "usage", None))
+
+
+def prompt_cache_stats() -> dict:
+    """Input tokens and prompt cache reads/writes per provider since the process started."""
+    with _PROMPT_USAGE_LOCK:
+        return {provider: dict(counts) for provider, counts in _PROMPT_USAGE.items()}
+
+
 def pil_to_base64_data_uri(image: Image.Image, fmt: str = "PNG") -> str:
     """Convert a PIL image to a base64 data URI."""
     buf = io.BytesIO()
@@ -142,58 +306,94 @@ def build_image_content(images: list, provider: str) -> list[dict]:
     ]
 
 
-def extract_metadata_from_text(text: str, config: dict) -> DocumentMetadata:
-    """Extract document metadata from text using an LLM."""
-    client = get_instructor_client(config)
-    provider = config["ai"]["provider"]
+def _build_user_content(text: str, images: list, provider: str) -> str | list[dict]:
+    """Build the user message content for text, images, or both."""
+    if not images:
+        return f"Extract the information from this text:\n\n{text}"
+    image_content = build_image_content(images, provider)
+    if text:
+        intro = f"Extract document metadata from this text and images:\n\n{text}"
+    else:
+        intro = "Extract document metadata from these page images:"
+    return [{"type": "text", "text": intro}, *image_content]
 
+
+def _build_request_kwargs(user_content: str | list[dict], config: dict) -> dict:
+    """Build the instructor create() kwargs shared by the extract_metadata_from_* functions."""
     kwargs = {
         "model": config["ai"]["model"],
         "response_model": DocumentMetadata,
         "max_retries": config["ai"].get("max_retries", 2),
         "temperature": config["ai"].get("temperature", 0.0),
+        # Static system prompt first, the document last: the prefix stays cacheable
         "messages": [
-            {"role": "system", "content": build_system_prompt(config)},
-            {"role": "user", "content": f"Extract the information from this text:\n\n{text}"}
+            build_system_message(config),
+            {"role": "user", "content": user_content},
         ],
+        **prompt_cache_kwargs(config),
     }
 
     # Anthropic uses max_tokens instead of being optional
-    if provider == "anthropic":
+    if config["ai"]["provider"] == "anthropic":
         kwargs["max_tokens"] = 1024
 
-    return client.chat.completions.create(**kwargs)
+    return kwargs
 
 
-def extract_metadata_from_images(images: list, config: dict) -> DocumentMetadata:
-    """Extract document metadata from page images using a vision-capable LLM."""
-    client = get_instructor_client(config)
-    provider = config["ai"]["provider"]
+# Pacing heuristics: ~4 characters per text token; image cost follows
+# Anthropic's width * height / 750 rule, capped at what the APIs downscale to.
+_CHARS_PER_TOKEN = 4
+_MAX_IMAGE_TOKENS = 1600
 
-    image_content = build_image_content(images, provider)
 
-    kwargs = {
-        "model": config["ai"]["model"],
-        "response_model": DocumentMetadata,
-        "max_retries": config["ai"].get("max_retries", 2),
-        "temperature": config["ai"].get("temperature", 0.0),
-        "messages": [
-            {"role": "system", "content": build_system_prompt(config)},
-            {"role": "user", "content": [
-                {"type": "text", "text": "Extract document metadata from these page images:"},
-                *image_content
-            ]}
-        ],
-    }
+def estimate_prompt_tokens(text: str, images: list, config: dict) -> int:
+    """Rough prompt token count (system prompt, text, images) for TPM pacing."""
+    tokens = (len(build_system_prompt(config)) + len(text)) // _CHARS_PER_TOKEN
+    for img in images:
+        width, height = img.size
+        tokens += min(_MAX_IMAGE_TOKENS, width * height // 750)
+    return max(1, tokens)
 
-    if provider == "anthropic":
-        kwargs["max_tokens"] = 1024
 
-    return client.chat.completions.create(**kwargs)
+def _create_with_limit(client, kwargs: dict, config: dict, estimated_tokens: int) -> DocumentMetadata:
+    """Run one completion under the configured RPM/TPM pacing and concurrency limit."""
+    pacer = get_request_pacer(config)
+    if pacer is not None:
+        pacer.wait(estimated_tokens)
+    limiter = get_concurrency_limiter(config)
+    if limiter is None:
+        metadata = client.chat.completions.create(**kwargs)
+    else:
+        with limiter.slot():
+            metadata = client.chat.completions.create(**kwargs)
+    _record_response_usage(config, metadata)
+    return metadata
+
+
+def extract_metadata_from_text(text: str, config: dict) -> DocumentMetadata:
+    """Extract document metadata from text using an LLM."""
+    client = _sync_client(config)
+    provider = config["ai"]["provider"]
+    kwargs = _build_request_kwargs(_build_user_content(text, [], provider), config)
+    return _create_with_limit(client, kwargs, config, estimate_prompt_tokens(text, [], config))
+
+
+def extract_metadata_from_images(images: list, config: dict) -> DocumentMetadata:
+    """Extract document metadata from page images using a vision-capable LLM."""
+    client = _sync_client(config)
+    provider = config["ai"]["provider"]
+    kwargs = _build_request_kwargs(_build_user_content("", images, provider), config)
+    return _create_with_limit(client, kwargs, config, estimate_prompt_tokens("", images, config))
 
 
 def _build_combined_text(extraction: ExtractionResult) -> str:
-    """Merge pdfplumber text and OCR text into a single string for the AI."""
+    """Merge pdfplumber text and OCR text into a single string for the AI.
+
+    Pages OCR'd because their text layer was missing or garbage replace
+    that text layer in page order; OCR of whole documents is appended.
+    """
+    if extraction.ocr_pages and extraction.ocr_text.strip():
+        return merge_ocr_pages(extraction)
     parts = []
     if extraction.text.strip():
         parts.append(extraction.text)
@@ -208,43 +408,58 @@ def extract_metadata_from_text_and_images(
     text: str, images: list, config: dict
 ) -> DocumentMetadata:
     """Extract metadata from combined text + page images (multimodal)."""
-    client = get_instructor_client(config)
+    client = _sync_client(config)
     provider = config["ai"]["provider"]
+    kwargs = _build_request_kwargs(_build_user_content(text, images, provider), config)
+    return _create_with_limit(client, kwargs, config, estimate_prompt_tokens(text, images, config))
 
-    image_content = build_image_content(images, provider)
 
-    kwargs = {
-        "model": config["ai"]["model"],
-        "response_model": DocumentMetadata,
-        "max_retries": config["ai"].get("max_retries", 2),
-        "temperature": config["ai"].get("temperature", 0.0),
-        "messages": [
-            {"role": "system", "content": build_system_prompt(config)},
-            {"role": "user", "content": [
-                {"type": "text", "text": f"Extract document metadata from this text and images:\n\n{text}"},
-                *image_content,
-            ]},
-        ],
-    }
+LLM_CACHE = "llm"  # ResultCache namespace
 
-    if provider == "anthropic":
-        kwargs["max_tokens"] = 1024
 
-    return client.chat.completions.create(**kwargs)
+def metadata_cache_key(text: str, images: list, config: dict) -> str:
+    """Cache key of an LLM request: system prompt, provider, model, temperature and payload."""
+    ai_cfg = config["ai"]
+    return make_key(
+        build_system_prompt(config),
+        ai_cfg["provider"],
+        ai_cfg.get("base_url", ""),
+        ai_cfg.get("model", ""),
+        ai_cfg.get("temperature", 0.0),
+        text,
+        [image_digest(img) for img in images],
+    )
+
 
+def extract_metadata(extraction: ExtractionResult, config: dict,
+                     cache: ResultCache | None = None) -> DocumentMetadata | None:
+    """Extract metadata from an ExtractionResult using the appropriate method.
 
-def extract_metadata(extraction: ExtractionResult, config: dict) -> DocumentMetadata | None:
-    """Extract metadata from an ExtractionResult using the appropriate method."""
+    With a ``cache``, a request identical to an earlier one (see
+    metadata_cache_key) returns the stored answer without calling the provider.
+    """
     combined_text = _build_combined_text(extraction)
     has_text = bool(combined_text.strip())
     has_images = bool(extraction.images)
+    if not (has_text or has_images):
+        logging.error("No text or images available for metadata extraction")
+        return None
+
+    cache_key = None
+    if cache is not None:
+        cache_key = metadata_cache_key(combined_text, extraction.images, config)
+        cached = cache.get(LLM_CACHE, cache_key)
+        if cached is not None:
+            logging.info("LLM cache hit, skipping the provider request")
+            return DocumentMetadata(**cached)
 
     if has_text and has_images:
-        return extract_metadata_from_text_and_images(combined_text, extraction.images, config)
+        metadata = extract_metadata_from_text_and_images(combined_text, extraction.images, config)
     elif has_images:
-        return extract_metadata_from_images(extraction.images, config)
-    elif has_text:
-        return extract_metadata_from_text(combined_text, config)
+        metadata = extract_metadata_from_images(extraction.images, config)
     else:
-        logging.error("No text or images available for metadata extraction")
-        return None
+        metadata = extract_metadata_from_text(combined_text, config)
+
+    if cache_key is not None and metadata is not None:
+        cache.put(LLM_CACHE, cache_key, metadata.model_dump())
+    return metadata
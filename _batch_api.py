@@ -0,0 +1,438 @@
+"""
+Provider batch APIs for large offline rename runs.
+Builds DocumentMetadata requests locally as JSONL, submits them to the OpenAI
+Batch API or Anthropic Message Batches, polls, and parses the results back.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import instructor
+from pydantic import ValidationError
+
+from _ai_processing import (
+    LLM_CACHE,
+    DocumentMetadata,
+    _build_combined_text,
+    _build_user_content,
+    _resolve_provider,
+    build_system_message,
+    metadata_cache_key,
+    prompt_cache_fields,
+    record_usage,
+)
+from _cache import ResultCache
+from _checkpoint import CheckpointJournal, restore_extraction
+from _pdf_utils import PaddleOCRBridge, extract_content
+from _pipeline import PipelineItem
+from _similarity import find_near_duplicate, remember_document
+from _templates import match_template
+
+# Providers with a native batch endpoint (OpenAI-compatible servers behind
+# ai.base_url count as "openai")
+BATCH_PROVIDERS = ("openai", "anthropic")
+
+# Provider-side states after which a batch will not make further progress
+_OPENAI_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchApiError(Exception):
+    """Submitting or collecting a provider batch failed, or it did not finish in time.
+
+    Batches submitted before the error stay in the checkpoint journal, so the
+    run can be continued with ``--resume``.
+    """
+
+
+def _provider_errors(provider: str) -> tuple[type[Exception], ...]:
+    """Base exception classes of the provider SDK (network, auth, API errors)."""
+    if provider == "anthropic":
+        import anthropic
+        return (anthropic.AnthropicError,)
+    import openai
+    return (openai.OpenAIError,)
+
+
+def get_batch_settings(config: dict) -> dict:
+    settings = dict(config.get("ai", {}).get("batch_api") or {})
+    settings["poll_interval"] = max(0.0, float(settings.get("poll_interval", 30)))
+    settings["max_requests_per_batch"] = max(1, int(settings.get("max_requests_per_batch", 10000)))
+    settings["max_batch_mb"] = max(0.001, float(settings.get("max_batch_mb", 190)))
+    settings["timeout_hours"] = float(settings.get("timeout_hours", 24))
+    return settings
+
+
+def _metadata_schema():
+    return instructor.openai_schema(DocumentMetadata)
+
+
+def build_batch_request(custom_id: str, extraction, config: dict) -> dict:
+    """One batch JSONL line asking for DocumentMetadata via a forced tool call.
+
+    Mirrors the interactive request (same system prompt and prompt cache
+    hints, user content and tool schema as instructor's TOOLS mode) in the
+    provider's batch format.
+    """
+    provider = config["ai"]["provider"]
+    text = _build_combined_text(extraction)
+    user_content = _build_user_content(text, extraction.images, provider)
+    schema = _metadata_schema()
+    temperature = config["ai"].get("temperature", 0.0)
+
+    if provider == "anthropic":
+        return {
+            "custom_id": custom_id,
+            "params": {
+                "model": config["ai"]["model"],
+                "max_tokens": 1024,
+                "temperature": temperature,
+                "system": build_system_message(config)["content"],
+                "messages": [{"role": "user", "content": user_content}],
+                "tools": [schema.anthropic_schema],
+                "tool_choice": {"type": "tool", "name": schema.openai_schema["name"]},
+            },
+        }
+
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": config["ai"]["model"],
+            "temperature": temperature,
+            "messages": [
+                build_system_message(config),
+                {"role": "user", "content": user_content},
+            ],
+            "tools": [{"type": "function", "function": schema.openai_schema}],
+            "tool_choice": {"type": "function", "function": {"name": schema.openai_schema["name"]}},
+            **prompt_cache_fields(config),
+        },
+    }
+
+
+def parse_batch_result(line: dict, provider: str) -> tuple[str, DocumentMetadata | None, str | None]:
+    """Parse one result line. Returns (custom_id, metadata, error)."""
+    custom_id = line.get("custom_id", "")
+    try:
+        if provider == "anthropic":
+            result = line.get("result") or {}
+            if result.get("type") != "succeeded":
+                error = result.get("error") or {}
+                detail = (error.get("error") or error).get("message", "") if isinstance(error, dict) else ""
+                return custom_id, None, f"Batch request {result.get('type', 'failed')}" + (f": {detail}" if detail else "")
+            for block in result["message"]["content"]:
+                if block.get("type") == "tool_use":
+                    return custom_id, DocumentMetadata.model_validate(block["input"]), None
+            return custom_id, None, "No tool call in batch response"
+
+        if line.get("error"):
+            return custom_id, None, f"Batch request failed: {line['error'].get('message', line['error'])}"
+        response = line.get("response") or {}
+        if response.get("status_code", 200) != 200:
+            message = (response.get("body") or {}).get("error", {}).get("message", "")
+            return custom_id, None, f"Batch request failed (HTTP {response.get('status_code')}): {message}"
+        message = response["body"]["choices"][0]["message"]
+        tool_calls = message.get("tool_calls") or []
+        if not tool_calls:
+            return custom_id, None, "No tool call in batch response"
+        arguments = tool_calls[0]["function"]["arguments"]
+        return custom_id, DocumentMetadata.model_validate_json(arguments), None
+    except (KeyError, IndexError, TypeError, ValidationError) as e:
+        return custom_id, None, f"Malformed batch result: {e}"
+
+
+def _result_usage(line: dict, provider: str) -> dict | None:
+    """Token usage of one result line (None for failed requests)."""
+    if provider == "anthropic":
+        return (((line.get("result") or {}).get("message")) or {}).get("usage")
+    return (((line.get("response") or {}).get("body")) or {}).get("usage")
+
+
+def _get_client(config: dict):
+    """Raw provider SDK client (batch endpoints are not wrapped by instructor)."""
+    provider, api_key, base_url = _resolve_provider(config)
+    if provider == "anthropic":
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key, base_url=base_url)
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+def _anthropic_batches(client):
+    # Message Batches moved out of beta in later SDK releases
+    batches = getattr(client.messages, "batches", None)
+    return batches if batches is not None else client.beta.messages.batches
+
+
+def submit_batch(jsonl_path: str, config: dict, client=None) -> str:
+    """Upload one JSONL request file and create the provider batch. Returns its ID."""
+    provider = config["ai"]["provider"]
+    client = client or _get_client(config)
+
+    if provider == "anthropic":
+        with open(jsonl_path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        batch = _anthropic_batches(client).create(requests=requests)
+        return batch.id
+
+    with open(jsonl_path, "rb") as f:
+        uploaded = client.files.create(file=(os.path.basename(jsonl_path), f.read()), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"source": "autorename-pdf"},
+    )
+    return batch.id
+
+
+def get_batch_status(batch_id: str, config: dict, client=None) -> tuple[bool, str, int, int]:
+    """Returns (finished, status, done_count, total_count) for a provider batch."""
+    provider = config["ai"]["provider"]
+    client = client or _get_client(config)
+
+    if provider == "anthropic":
+        batch = _anthropic_batches(client).retrieve(batch_id)
+        counts = batch.request_counts
+        done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+        return batch.processing_status == "ended", batch.processing_status, done, done + counts.processing
+
+    batch = client.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    done = (counts.completed + counts.failed) if counts else 0
+    total = counts.total if counts else 0
+    return batch.status in _OPENAI_FINAL_STATES, batch.status, done, total
+
+
+def fetch_batch_results(batch_id: str, config: dict, client=None) -> dict[str, tuple[DocumentMetadata | None, str | None]]:
+    """Download a finished batch. Returns {custom_id: (metadata, error)}."""
+    provider = config["ai"]["provider"]
+    client = client or _get_client(config)
+    results = {}
+
+    if provider == "anthropic":
+        for entry in _anthropic_batches(client).results(batch_id):
+            line = entry.model_dump()
+            custom_id, metadata, error = parse_batch_result(line, provider)
+            record_usage(provider, _result_usage(line, provider))
+            results[custom_id] = (metadata, error)
+        return results
+
+    batch = client.batches.retrieve(batch_id)
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for raw in client.files.content(file_id).text.splitlines():
+            if raw.strip():
+                line = json.loads(raw)
+                custom_id, metadata, error = parse_batch_result(line, provider)
+                record_usage(provider, _result_usage(line, provider))
+                results[custom_id] = (metadata, error)
+    if not results and batch.status != "completed":
+        logging.error(f"Batch {batch_id} ended with status '{batch.status}' and no results")
+    return results
+
+
+def wait_for_batch(
+    batch_id: str,
+    config: dict,
+    client=None,
+    on_status: Callable[[str, str, int, int], None] | None = None,
+) -> str:
+    """Poll until the batch reaches a final state. Returns that state."""
+    settings = get_batch_settings(config)
+    deadline = time.monotonic() + settings["timeout_hours"] * 3600
+    client = client or _get_client(config)
+    while True:
+        finished, status, done, total = get_batch_status(batch_id, config, client)
+        if on_status:
+            on_status(batch_id, status, done, total)
+        if finished:
+            return status
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} did not finish within {settings['timeout_hours']}h (status: {status})")
+        time.sleep(settings["poll_interval"])
+
+
+def run_batch_api(
+    pdf_files: list,
+    config: dict,
+    work_dir: str,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    jobs: int = 1,
+    on_status: Callable[[str, str, int, int], None] | None = None,
+    cache: ResultCache | None = None,
+    checkpoint: CheckpointJournal | None = None,
+) -> list[PipelineItem]:
+    """Extract every file locally, run the LLM step through the provider batch API.
+
+    Returns one PipelineItem per input file, in input order, with either
+    ``metadata`` or ``error`` set, ready for harmonizing and renaming.
+    Request JSONL files are written to ``work_dir``, split into chunks of at
+    most ``ai.batch_api.max_requests_per_batch`` requests and
+    ``ai.batch_api.max_batch_mb``. With a ``cache``, files are extracted
+    through it and requests it can answer are not submitted.
+
+    With a ``checkpoint`` journal, extractions and every provider batch are
+    recorded as soon as they exist. A resumed run reuses them: it collects
+    the results of batches submitted before instead of submitting those
+    files again, and only files without a journaled request are sent.
+
+    Raises BatchApiError when a batch cannot be submitted or collected, or
+    does not finish within ``ai.batch_api.timeout_hours``.
+    """
+    provider = config["ai"]["provider"]
+    if provider not in BATCH_PROVIDERS:
+        raise ValueError(f"Batch API not supported for provider '{provider}'. Supported: {', '.join(BATCH_PROVIDERS)}")
+    settings = get_batch_settings(config)
+    items = [PipelineItem(index=i, pdf_path=p) for i, p in enumerate(pdf_files)]
+
+    # Provider batch -> {custom_id: item}, for files already submitted by an
+    # interrupted run (a result recorded after the submission means retry)
+    attached: dict[str, dict[str, PipelineItem]] = {}
+    saved: dict[int, dict] = {}
+    if checkpoint is not None:
+        for item in items:
+            saved[item.index] = checkpoint.lookup(item.pdf_path)
+            submission = checkpoint.submission(item.pdf_path)
+            if submission and "metadata" not in saved[item.index] and "done" not in saved[item.index]:
+                attached.setdefault(submission[0], {})[submission[1]] = item
+    waiting = {item.index for requests in attached.values() for item in requests.values()}
+
+    def _extract(item: PipelineItem) -> None:
+        record = saved.get(item.index, {})
+        try:
+            if "extracted" in record:
+                # Page images only matter for requests that still have to be built
+                answered = "metadata" in record or item.index in waiting
+                item.extraction = restore_extraction(record["extracted"], item.pdf_path, config,
+                                                     with_images=not answered)
+            else:
+                item.extraction = extract_content(item.pdf_path, config, ocr_bridge=ocr_bridge, cache=cache)
+                if checkpoint is not None:
+                    checkpoint.record_extraction(item.pdf_path, item.extraction)
+        except Exception as e:
+            logging.error(f"Extraction failed for {item.pdf_path}: {e}")
+            item.error = str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        list(pool.map(_extract, items))
+
+    for item in items:
+        if item.error is None and "metadata" in saved.get(item.index, {}):
+            item.metadata = DocumentMetadata(**saved[item.index]["metadata"])
+            item.extraction.images = []
+
+    # Requests answered before (e.g. by a dry run), near-duplicates of earlier
+    # documents and documents read by a vendor template are not submitted
+    pending = [it for it in items if it.error is None and it.metadata is None and it.index not in waiting and (
+        it.extraction.text.strip() or it.extraction.ocr_text.strip() or it.extraction.images)]
+    cache_keys: dict[int, str] = {}
+    if cache is not None:
+        for item in list(pending):
+            duplicate = find_near_duplicate(cache, item.extraction, config)
+            if duplicate is not None:
+                item.metadata, note = duplicate
+                item.warnings.append(note)
+                item.extraction.images = []
+                pending.remove(item)
+                continue
+            matched = match_template(cache, item.extraction, config)
+            if matched is not None:
+                item.metadata, item.template = matched
+                item.extraction.images = []
+                pending.remove(item)
+                continue
+            key = metadata_cache_key(_build_combined_text(item.extraction), item.extraction.images, config)
+            cached = cache.get(LLM_CACHE, key)
+            if cached is not None:
+                item.metadata = DocumentMetadata(**cached)
+                item.from_llm = True
+                item.extraction.images = []
+                pending.remove(item)
+            else:
+                cache_keys[item.index] = key
+
+    # Write request chunks within both the request count and the upload size
+    # limit; page images are dropped once encoded into the JSONL
+    max_bytes = int(settings["max_batch_mb"] * 1024 * 1024)
+    chunks: list[tuple[str, dict[str, PipelineItem]]] = []
+    out = None
+    chunk_bytes = 0
+    try:
+        for item in pending:
+            line = json.dumps(build_batch_request(str(item.index), item.extraction, config), ensure_ascii=False)
+            data = (line + "\n").encode("utf-8")
+            item.extraction.images = []
+            if len(data) > max_bytes:
+                item.error = (f"Batch request of {len(data) / 1024 / 1024:.1f} MB exceeds "
+                              f"ai.batch_api.max_batch_mb ({settings['max_batch_mb']:g} MB)")
+                continue
+            if (out is None or len(chunks[-1][1]) >= settings["max_requests_per_batch"]
+                    or chunk_bytes + len(data) > max_bytes):
+                if out is not None:
+                    out.close()
+                path = os.path.join(work_dir, f"requests-{len(chunks) + 1:03d}.jsonl")
+                out = open(path, "wb")
+                chunks.append((path, {}))
+                chunk_bytes = 0
+            out.write(data)
+            chunk_bytes += len(data)
+            chunks[-1][1][str(item.index)] = item
+    finally:
+        if out is not None:
+            out.close()
+
+    if not chunks and not attached:
+        return items
+
+    try:
+        collected = _submit_and_collect(chunks, attached, config, on_status, checkpoint)
+    except TimeoutError as e:
+        raise BatchApiError(str(e)) from e
+    except _provider_errors(provider) as e:
+        raise BatchApiError(f"Provider batch API error: {e}") from e
+
+    for requests, results in collected:
+        for custom_id, item in requests.items():
+            metadata, error = results.get(custom_id, (None, "No result returned by batch"))
+            item.metadata = metadata
+            item.error = error
+            item.from_llm = metadata is not None
+            if metadata is not None and item.index in cache_keys:
+                cache.put(LLM_CACHE, cache_keys[item.index], metadata.model_dump())
+                remember_document(cache, item.extraction, metadata, item.pdf_path, config)
+    return items
+
+
+def _submit_and_collect(
+    chunks: list[tuple[str, dict[str, PipelineItem]]],
+    attached: dict[str, dict[str, PipelineItem]],
+    config: dict,
+    on_status: Callable[[str, str, int, int], None] | None,
+    checkpoint: CheckpointJournal | None,
+) -> list[tuple[dict[str, PipelineItem], dict]]:
+    """Submit the request files, then wait for every batch (including ``attached``
+    ones from an interrupted run). Returns ``(requests, results)`` per batch."""
+    client = _get_client(config)
+    batches = dict(attached)
+    for provider_batch, requests in attached.items():
+        logging.info(f"Collecting provider batch {provider_batch} ({len(requests)} requests) submitted before")
+    for path, requests in chunks:
+        provider_batch = submit_batch(path, config, client)
+        logging.info(f"Submitted {os.path.basename(path)} as provider batch {provider_batch}")
+        if checkpoint is not None:
+            checkpoint.record_submission(provider_batch, {cid: it.pdf_path for cid, it in requests.items()})
+        batches[provider_batch] = requests
+
+    collected = []
+    for provider_batch, requests in batches.items():
+        wait_for_batch(provider_batch, config, client, on_status=on_status)
+        collected.append((requests, fetch_batch_results(provider_batch, config, client)))
+    return collected
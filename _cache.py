@@ -0,0 +1,299 @@
+"""
+Persistent result cache in one SQLite file next to config.yaml.
+Entries are JSON values in namespaces ("extraction", "ocr", "llm",
+"similarity", "templates") under content-addressed keys; the file is
+capped in size with LRU eviction, which takes learned state (the
+near-duplicate index and vendor templates) last.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from importlib import metadata as importlib_metadata
+
+CACHE_FILE_NAME = ".autorename-cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    value     TEXT NOT NULL,             -- JSON
+    size      INTEGER NOT NULL,          -- bytes of value
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+"""
+
+# Eviction trims the cache to this fraction of the cap so it does not run on every put
+_EVICT_TO = 0.9
+
+# Learned state that cannot be recomputed from the files at hand (the
+# near-duplicate index and vendor templates): counted against the size cap
+# like everything else, but evicted only once no other entry is left to
+# evict, and only cleared when asked for explicitly
+LEARNED_NAMESPACES = ("similarity", "templates")
+_RECOMPUTABLE = f"namespace NOT IN ({', '.join('?' * len(LEARNED_NAMESPACES))})"
+
+
+def get_cache_settings(config: dict) -> dict:
+    settings = dict(config.get("cache") or {})
+    settings["enabled"] = bool(settings.get("enabled", True))
+    settings["path"] = settings.get("path") or ""
+    settings["max_size_mb"] = max(1, int(settings.get("max_size_mb", 200)))
+    return settings
+
+
+def library_versions(*packages: str) -> str:
+    """``name=version`` list for cache keys: a library upgrade invalidates old entries."""
+    versions = []
+    for package in packages:
+        try:
+            versions.append(f"{package}={importlib_metadata.version(package)}")
+        except importlib_metadata.PackageNotFoundError:
+            versions.append(f"{package}=?")
+    return ",".join(versions)
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_digest(image) -> str:
+    """SHA-256 of a PIL image's pixels (cheaper than hashing an encoded PNG)."""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Cache key from JSON-serializable parts (order matters)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Key/value cache of JSON values in a SQLite file, capped at ``max_bytes``.
+
+    Like LeaseQueue, each call opens a short-lived connection, so one cache
+    object can be shared by a batch's worker threads. Read errors are
+    logged and treated as misses: a broken cache never fails a rename.
+    Hits and misses of this object are counted per namespace for the
+    run summary (see counts).
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._counts: dict[str, dict[str, int]] = {}
+        self._counts_lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def count(self, namespace: str, hit: bool) -> None:
+        """Record a lookup outcome (get does this itself; for lookups built on keys)."""
+        with self._counts_lock:
+            counts = self._counts.setdefault(namespace, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """Hits and misses per namespace since this object was created."""
+        with self._counts_lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+    def get(self, namespace: str, key: str, count: bool = True) -> dict | None:
+        """The cached value, or None on a miss (a hit refreshes its LRU position).
+
+        ``count=False`` leaves the hit/miss counters alone, for lookups that
+        are only one step of a larger one (see count).
+        """
+        value = self._lookup(namespace, key)
+        if count:
+            self.count(namespace, value is not None)
+        return value
+
+    def keys(self, namespace: str) -> list[str]:
+        """All keys of a namespace (not counted as lookups, LRU order untouched)."""
+        try:
+            conn = self._connect()
+            try:
+                return [row[0] for row in conn.execute(
+                    "SELECT key FROM entries WHERE namespace = ?", (namespace,))]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Cache read failed ({namespace}): {e}")
+            return []
+
+    def items(self, namespace: str) -> list[tuple[str, dict]]:
+        """All ``(key, value)`` pairs of a namespace (not counted as lookups, LRU order untouched)."""
+        try:
+            conn = self._connect()
+            try:
+                return [(key, json.loads(value)) for key, value in conn.execute(
+                    "SELECT key, value FROM entries WHERE namespace = ?", (namespace,))]
+            finally:
+                conn.close()
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logging.warning(f"Cache read failed ({namespace}): {e}")
+            return []
+
+    def _lookup(self, namespace: str, key: str) -> dict | None:
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value FROM entries WHERE namespace = ? AND key = ?", (namespace, key),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE namespace = ? AND key = ?",
+                    (time.time(), namespace, key),
+                )
+                return json.loads(row[0])
+            finally:
+                conn.close()
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logging.warning(f"Cache read failed ({namespace}): {e}")
+            return None
+
+    def put(self, namespace: str, key: str, value: dict, max_entries: int | None = None) -> None:
+        """Store ``value``, evicting least recently used entries beyond the size cap.
+
+        With ``max_entries`` the namespace is also kept to that many entries,
+        the oldest going first.
+        """
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, data, len(data.encode("utf-8")), now, now),
+                )
+                if max_entries is not None:
+                    conn.execute(
+                        "DELETE FROM entries WHERE namespace = ? AND key IN (SELECT key FROM entries "
+                        "WHERE namespace = ? ORDER BY created DESC, key LIMIT -1 OFFSET ?)",
+                        (namespace, namespace, max(0, max_entries)),
+                    )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(conn, total, int(self.max_bytes * _EVICT_TO))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Cache write failed ({namespace}): {e}")
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection, total: int, target: int) -> int:
+        """Delete least recently used entries until ``total`` is at most ``target``,
+        LEARNED_NAMESPACES last. Returns the count."""
+        removed = 0
+        rows = conn.execute(
+            f"SELECT namespace, key, size FROM entries ORDER BY {_RECOMPUTABLE} DESC, last_used",
+            LEARNED_NAMESPACES,
+        ).fetchall()
+        for namespace, key, size in rows:
+            if total <= target:
+                break
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            namespaces = {}
+            for namespace, entries, size, hits in conn.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) "
+                "FROM entries GROUP BY namespace ORDER BY namespace"
+            ):
+                namespaces[namespace] = {"entries": entries, "bytes": size, "hits": hits}
+        finally:
+            conn.close()
+        return {
+            "path": self.path,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "max_bytes": self.max_bytes,
+            "entries": sum(n["entries"] for n in namespaces.values()),
+            "bytes": sum(n["bytes"] for n in namespaces.values()),
+            "namespaces": namespaces,
+        }
+
+    def prune(self, max_bytes: int | None = None, older_than_days: float | None = None) -> int:
+        """Drop entries unused for ``older_than_days``, then trim to ``max_bytes``
+        (default: the cap). Returns how many entries were removed."""
+        conn = self._connect()
+        try:
+            removed = 0
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                removed += conn.execute("DELETE FROM entries WHERE last_used < ?", (cutoff,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            removed += self._evict(conn, total, self.max_bytes if max_bytes is None else max_bytes)
+            conn.execute("VACUUM")
+            return removed
+        finally:
+            conn.close()
+
+    def clear(self, namespace: str | None = None, learned: bool = False) -> int:
+        """Delete every entry (of one namespace). Returns how many were removed.
+
+        Without ``namespace``, LEARNED_NAMESPACES are only cleared with ``learned``.
+        """
+        conn = self._connect()
+        try:
+            if namespace:
+                removed = conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,)).rowcount
+            elif learned:
+                removed = conn.execute("DELETE FROM entries").rowcount
+            else:
+                removed = conn.execute(f"DELETE FROM entries WHERE {_RECOMPUTABLE}", LEARNED_NAMESPACES).rowcount
+            conn.execute("VACUUM")
+            return removed
+        finally:
+            conn.close()
+
+
+def cache_path(config: dict, base_dir: str) -> str:
+    return get_cache_settings(config)["path"] or os.path.join(base_dir, CACHE_FILE_NAME)
+
+
+def open_cache(config: dict, base_dir: str) -> ResultCache | None:
+    """The run's cache per the ``cache`` config section, or None when disabled or unusable."""
+    settings = get_cache_settings(config)
+    if not settings["enabled"]:
+        learning = [name for name in ("dedup", "templates") if (config.get(name) or {}).get("enabled")]
+        if learning:
+            logging.warning(f"Cache disabled, so these are off for this run: {', '.join(learning)}")
+        return None
+    path = cache_path(config, base_dir)
+    try:
+        return ResultCache(path, settings["max_size_mb"] * 1024 * 1024)
+    except sqlite3.Error as e:
+        logging.warning(f"Cache disabled: cannot open {path}: {e}")
+        return None
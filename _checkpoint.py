@@ -0,0 +1,184 @@
+"""
+Checkpoint journal for resumable rename runs.
+Append-only JSONL per batch_id recording each file's extraction, metadata and final outcome,
+plus the provider batches a ``--batch-api`` run submitted.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import threading
+
+from _pdf_utils import ExtractionResult, render_pages_to_images
+
+CHECKPOINT_DIR_NAME = ".autorename-checkpoints"
+
+# Final statuses that need no further work on resume ("failed" is retried)
+_COMPLETED_STATUSES = {"renamed", "skipped"}
+
+
+def checkpoint_path(base_dir: str, batch_id: str) -> str:
+    return os.path.join(base_dir, CHECKPOINT_DIR_NAME, f"{batch_id}.jsonl")
+
+
+def _file_key(pdf_path: str) -> str:
+    return os.path.normcase(os.path.abspath(pdf_path))
+
+
+def restore_extraction(record: dict, pdf_path: str, config: dict,
+                       with_images: bool = True) -> ExtractionResult:
+    """Rebuild an ExtractionResult from its journal record.
+
+    Page images are not journaled; when the file was extracted for vision
+    and ``with_images`` is set they are re-rendered (cheap next to OCR).
+    """
+    extraction = ExtractionResult(
+        text=record.get("text", ""),
+        ocr_text=record.get("ocr_text", ""),
+        quality_score=record.get("quality_score", 0.0),
+        page_count=record.get("page_count", 0),
+        pages=list(record.get("pages", [])),
+        page_quality=list(record.get("page_quality", [])),
+        ocr_pages=list(record.get("ocr_pages", [])),
+        sources=list(record.get("sources", [])),
+        warnings=list(record.get("warnings", [])),
+    )
+    if with_images and "vision" in extraction.sources:
+        max_pages = config.get("pdf", {}).get("max_pages", 3)
+        extraction.images = render_pages_to_images(pdf_path, max_pages, scale=2.0,
+                                                   pages=extraction.pages or None)
+    return extraction
+
+
+def _note_submission(submitted: dict, entries: dict, provider_batch: str, requests: dict[str, str]) -> None:
+    for custom_id, pdf_path in requests.items():
+        key = _file_key(pdf_path)
+        submitted[key] = (provider_batch, custom_id)
+        # A result recorded before the file was (re)submitted is superseded
+        entries.get(key, {}).pop("done", None)
+
+
+class CheckpointJournal:
+    """Per-batch journal of stage outcomes, safe to append from worker threads.
+
+    Every record is flushed as it is written, so a run killed at any point
+    can be resumed from the last completed stage of each file.
+    """
+
+    def __init__(self, path: str, batch_id: str, files: list[str], entries: dict[str, dict],
+                 submitted: dict[str, tuple[str, str]] | None = None):
+        self.path = path
+        self.batch_id = batch_id
+        self.files = files
+        self._entries = entries
+        self._submitted = submitted or {}  # file key -> (provider batch ID, custom_id)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, base_dir: str, batch_id: str, files: list[str]) -> "CheckpointJournal":
+        path = checkpoint_path(base_dir, batch_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        journal = cls(path, batch_id, list(files), {})
+        journal._append({
+            "event": "start",
+            "batch_id": batch_id,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "files": list(files),
+        })
+        return journal
+
+    @classmethod
+    def load(cls, base_dir: str, batch_id: str) -> "CheckpointJournal":
+        """Open an existing journal. Raises FileNotFoundError if there is none."""
+        path = checkpoint_path(base_dir, batch_id)
+        files: list[str] = []
+        entries: dict[str, dict] = {}
+        submitted: dict[str, tuple[str, str]] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a truncated last line
+                    logging.warning(f"Ignoring unreadable checkpoint line {line_no} in {path}")
+                    continue
+                event = record.get("event")
+                if event == "start":
+                    files = record.get("files", [])
+                elif event in ("extracted", "metadata", "done"):
+                    entries.setdefault(_file_key(record["file"]), {})[event] = record[event]
+                elif event == "submitted":
+                    _note_submission(submitted, entries, record["provider_batch"], record["requests"])
+        return cls(path, batch_id, files, entries, submitted)
+
+    def _append(self, record: dict) -> None:
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+
+    def _record(self, pdf_path: str, event: str, payload: dict) -> None:
+        self._append({"event": event, "file": pdf_path, event: payload})
+        with self._lock:
+            self._entries.setdefault(_file_key(pdf_path), {})[event] = payload
+
+    def record_extraction(self, pdf_path: str, extraction: ExtractionResult) -> None:
+        self._record(pdf_path, "extracted", {
+            "text": extraction.text,
+            "ocr_text": extraction.ocr_text,
+            "quality_score": extraction.quality_score,
+            "page_count": extraction.page_count,
+            "pages": extraction.pages,
+            "page_quality": extraction.page_quality,
+            "ocr_pages": extraction.ocr_pages,
+            "sources": extraction.sources,
+            "warnings": extraction.warnings,
+        })
+
+    def record_metadata(self, pdf_path: str, metadata) -> None:
+        self._record(pdf_path, "metadata", metadata.model_dump())
+
+    def record_result(self, pdf_path: str, result: dict) -> None:
+        self._record(pdf_path, "done", result)
+
+    def record_submission(self, provider_batch: str, requests: dict[str, str]) -> None:
+        """Record a provider batch (``--batch-api``) as soon as it was created.
+
+        ``requests`` maps each request's custom_id to its file, so a resumed
+        run can collect the batch's results instead of paying for it again.
+        """
+        self._append({"event": "submitted", "provider_batch": provider_batch, "requests": requests})
+        with self._lock:
+            _note_submission(self._submitted, self._entries, provider_batch, requests)
+
+    def submission(self, pdf_path: str) -> tuple[str, str] | None:
+        """(provider batch ID, custom_id) of the file's latest batch request, if any."""
+        with self._lock:
+            return self._submitted.get(_file_key(pdf_path))
+
+    def has_submissions(self) -> bool:
+        with self._lock:
+            return bool(self._submitted)
+
+    def lookup(self, pdf_path: str) -> dict:
+        """Recorded stages for a file: any of "extracted", "metadata", "done"."""
+        with self._lock:
+            return dict(self._entries.get(_file_key(pdf_path), {}))
+
+    def completed_result(self, pdf_path: str) -> dict | None:
+        """The recorded result if the file needs no more work, else None."""
+        done = self.lookup(pdf_path).get("done")
+        if done and done.get("status") in _COMPLETED_STATUSES:
+            return done
+        return None
+
+    def discard(self) -> None:
+        """Delete the journal once its batch has finished without failures."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
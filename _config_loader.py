@@ -38,12 +38,30 @@ DEFAULTS = {
         "base_url": "",
         "temperature": 0.0,
         "max_retries": 2,
+        "max_concurrent_requests": 8,
+        "adaptive_concurrency": False,
+        "prompt_caching": True,
+        "rate_limit": {
+            "requests_per_minute": 0,
+            "tokens_per_minute": 0,
+        },
+        "batch_api": {
+            "poll_interval": 30,
+            "max_requests_per_batch": 10000,
+            "max_batch_mb": 190,
+            "timeout_hours": 24,
+        },
     },
     "pdf": {
         "max_pages": 3,
         "ocr": False,
         "vision": False,
         "text_quality_threshold": 0.3,
+        "text_backend": "pdfplumber",
+        "page_selection": "first",
+        "adaptive_pages": False,
+        "adaptive_quality": 0.8,
+        "regions": [],
         "outgoing_invoice": "AR",
         "incoming_invoice": "ER",
     },
@@ -55,6 +73,43 @@ DEFAULTS = {
         "det_limit_side_len": 736,
         "cpu_threads": 4,
     },
+    "performance": {
+        "pipeline": False,
+        "queue_size": 4,
+        "extract_workers": 2,
+        "render_workers": 1,
+        "ocr_workers": 1,
+        "ai_workers": 4,
+        "triage": False,
+        "slow_lane_workers": 1,
+    },
+    "timeouts": {
+        "extract": 120,
+        "render": 60,
+        "ocr": 300,
+        "ai": 300,
+    },
+    "queue": {
+        "lease_seconds": 600,
+        "max_attempts": 3,
+        "poll_interval": 5,
+    },
+    "cache": {
+        "enabled": True,
+        "path": "",
+        "max_size_mb": 200,
+    },
+    "dedup": {
+        "enabled": False,
+        "threshold": 0.85,
+        "min_words": 30,
+        "max_entries": 10000,
+    },
+    "templates": {
+        "enabled": False,
+        "min_similarity": 0.6,
+        "min_confirmations": 1,
+    },
     "company": {
         "name": "",
     },
@@ -278,6 +333,12 @@ def load_yaml_config(config_path: str) -> dict[str, Any] | None:
         return None
 
 
+# Parsed company-name mappings by path, reused while the file's mtime and
+# size are unchanged (harmonizing runs once per file, and ``serve`` keeps
+# the index warm across requests).
+_COMPANY_NAMES_CACHE: dict[str, tuple[tuple[int, int], dict]] = {}
+
+
 def load_company_names(yaml_path: str) -> dict[str, list]:
     """Load harmonized company names from YAML file."""
     if not os.path.exists(yaml_path):
@@ -285,11 +346,17 @@ def load_company_names(yaml_path: str) -> dict[str, list]:
         return {}
 
     try:
+        stat = os.stat(yaml_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _COMPANY_NAMES_CACHE.get(yaml_path)
+        if cached and cached[0] == signature:
+            return cached[1]
         with open(yaml_path, 'r', encoding='utf-8') as file:
             company_names = yaml.safe_load(file)
             if not company_names:
                 return {}
             logging.info(f'Successfully loaded {len(company_names)} company name mappings')
+            _COMPANY_NAMES_CACHE[yaml_path] = (signature, company_names)
             return company_names
     except yaml.YAMLError as e:
         logging.error(f'Error parsing YAML company names file {yaml_path}: {e}')
@@ -0,0 +1,116 @@
+"""
+Per-stage deadlines and cooperative cancellation for document processing.
+A stage (extract, render, OCR, AI) that exceeds its configured timeout fails
+the file instead of stalling the batch; a cancellation token (a
+``threading.Event``) stops a running batch within a bounded time.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+STAGES = ("extract", "render", "ocr", "ai")
+
+_STAGE_NAMES = {
+    "extract": "Text extraction",
+    "render": "Page rendering",
+    "ocr": "OCR",
+    "ai": "AI request",
+}
+
+# How often a waiting stage looks at the cancellation token
+_CANCEL_POLL_SECONDS = 0.1
+
+
+class StageTimeoutError(Exception):
+    """A processing stage ran past its deadline."""
+
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(
+            f"{_STAGE_NAMES.get(stage, stage)} timed out after {seconds:g}s "
+            f"(timeouts.{stage} in config.yaml)"
+        )
+        self.stage = stage
+        self.seconds = seconds
+
+
+class CancelledError(Exception):
+    """Processing was stopped through the cancellation token."""
+
+    def __init__(self, message: str = "Cancelled"):
+        super().__init__(message)
+
+
+def get_stage_timeouts(config: dict) -> dict[str, float | None]:
+    """Seconds allowed per stage from the ``timeouts`` config section (None = no limit)."""
+    section = config.get("timeouts") or {}
+    timeouts = {}
+    for stage in STAGES:
+        try:
+            seconds = float(section.get(stage) or 0)
+        except (TypeError, ValueError):
+            logging.warning(f"Invalid timeouts.{stage}: {section.get(stage)!r}, using no limit")
+            seconds = 0
+        timeouts[stage] = seconds if seconds > 0 else None
+    return timeouts
+
+
+def check_cancelled(cancel: threading.Event | None) -> None:
+    """Raise CancelledError if ``cancel`` has been set."""
+    if cancel is not None and cancel.is_set():
+        raise CancelledError()
+
+
+def run_stage(
+    stage: str,
+    func: Callable[..., Any],
+    *args,
+    timeout: float | None = None,
+    cancel: threading.Event | None = None,
+    **kwargs,
+) -> Any:
+    """Call ``func(*args, **kwargs)``, giving up after ``timeout`` seconds or on ``cancel``.
+
+    Without a timeout or token the call runs inline. Otherwise it runs on a
+    daemon thread that is abandoned when the deadline passes or the token is
+    set: Python cannot interrupt a thread stuck inside pdfminer or a socket
+    read, but the caller can move on to the next file. A timeout stops the
+    waiting, not the work: the abandoned call keeps its thread and CPU until
+    it finishes (or not) in the background, and its result is dropped. Work
+    that must really stop has to run in a process the caller can kill, as
+    the pipeline's extract pool does.
+    """
+    check_cancelled(cancel)
+    if timeout is None and cancel is None:
+        return func(*args, **kwargs)
+
+    finished = threading.Event()
+    outcome: dict[str, Any] = {}
+
+    def _call() -> None:
+        try:
+            outcome["value"] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            finished.set()
+
+    threading.Thread(target=_call, name=f"stage-{stage}", daemon=True).start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait = _CANCEL_POLL_SECONDS if cancel is not None else None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            wait = remaining if wait is None else min(wait, remaining)
+        if finished.wait(max(wait, 0) if wait is not None else None):
+            break
+        check_cancelled(cancel)
+        if deadline is not None and time.monotonic() >= deadline:
+            logging.warning(f"Stage '{stage}' exceeded its {timeout:g}s deadline, abandoning it")
+            raise StageTimeoutError(stage, timeout)
+
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
@@ -5,9 +5,13 @@ Uses rapidfuzz for fuzzy matching. All functions accept config dict explicitly.
 from __future__ import annotations
 
 import os
+import sys
 import json
 import logging
 import datetime
+import contextlib
+import tempfile
+import threading
 import time
 
 import dateparser
@@ -19,6 +23,46 @@ from _config_loader import load_company_names
 # Constants
 CONFIDENCE_THRESHOLD = 0.85
 
+# Threads of one process (``rename --jobs N``) serialize undo-log updates
+# here; other processes (``--queue`` workers, ``--shard`` runs) are kept out
+# by a file lock next to the log (see _undo_log_lock).
+_UNDO_LOG_LOCK = threading.Lock()
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock_file(f) -> None:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after about 10 seconds; keep waiting
+
+    def _unlock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def _undo_log_lock(log_path: str):
+    """Hold the undo log exclusively, against this process's threads and other processes."""
+    with _UNDO_LOG_LOCK, open(f"{log_path}.lock", "a+b") as lock_file:
+        _lock_file(lock_file)
+        try:
+            yield
+        finally:
+            _unlock_file(lock_file)
+
 
 def harmonize_company_name(company_name: str, yaml_path: str, config: dict | None = None) -> str:
     """Harmonize company name based on predefined mappings using rapidfuzz."""
@@ -59,11 +103,19 @@ def parse_document_date(date_str: str) -> datetime.date | None:
     return None
 
 
-def _rename_with_retry(src: str, dst: str, retries: int = 3, delay: float = 1.0) -> None:
-    """Rename with retry on PermissionError. Raises on final failure."""
+def _rename_with_retry(src: str, dst: str, retries: int = 3, delay: float = 1.0,
+                       replace: bool = False) -> None:
+    """Rename with retry on PermissionError. Raises on final failure.
+
+    ``replace`` overwrites ``dst`` on every platform (used to move a file
+    onto the placeholder that reserved its name).
+    """
     for attempt in range(retries):
         try:
-            os.rename(src, dst)
+            if replace:
+                os.replace(src, dst)
+            else:
+                os.rename(src, dst)
             return
         except PermissionError:
             if attempt < retries - 1:
@@ -126,17 +178,31 @@ def rename_invoice(
         logging.info(f'File "{new_name}" is already correctly named.')
         return None
 
-    # Handle duplicate filenames
+    # Handle duplicate filenames. A real rename reserves its name by creating
+    # an empty placeholder with O_EXCL, which fails for every thread and
+    # process but one, and then moves the PDF onto its own placeholder, so
+    # concurrent workers never overwrite each other's files.
     counter = 0
-    while os.path.exists(new_path):
+    while True:
+        if dry_run:
+            if not os.path.exists(new_path):
+                return new_path
+        else:
+            try:
+                os.close(os.open(new_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                pass
         counter += 1
         new_name = f'{base_name}_({counter}).pdf'
         new_path = os.path.join(os.path.dirname(pdf_path), new_name)
 
-    if dry_run:
-        return new_path
-
-    _rename_with_retry(pdf_path, new_path)
+    try:
+        _rename_with_retry(pdf_path, new_path, replace=True)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(new_path)
+        raise
     logging.info(f'Document renamed to: {new_name}')
 
     # Write undo log entry
@@ -197,8 +263,69 @@ def _write_undo_log_v2(log_path: str, log_data: dict) -> None:
     log_data["batches"] = pruned_batches
     log_data["version"] = 2
 
-    with open(log_path, 'w', encoding='utf-8') as f:
-        json.dump(log_data, f, indent=2, ensure_ascii=False)
+    # Write a sibling temp file and swap it in, so a crash never leaves a torn log
+    fd, tmp_path = tempfile.mkstemp(prefix=".undo-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(log_path)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(log_data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, log_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_batch(log_path: str, batch_id: str, renames: list[tuple[str, str]]) -> None:
+    """Append a whole batch of ``(old_path, new_path)`` renames to the undo log at once.
+
+    Used when renames were collected elsewhere first (``rename --queue``
+    merges the renames of every worker into one batch). Renames for a batch
+    that is already logged and not undone are added to it.
+    """
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    files = [
+        {"old_path": old_path, "new_path": new_path, "timestamp": timestamp}
+        for old_path, new_path in renames
+    ]
+    with _undo_log_lock(log_path):
+        log_data = _read_undo_log(log_path)
+        for batch in log_data["batches"]:
+            if batch["batch_id"] == batch_id and not batch.get("undone"):
+                batch["files"].extend(files)
+                break
+        else:
+            log_data["batches"].append({
+                "batch_id": batch_id,
+                "timestamp": timestamp,
+                "source": "cli",
+                "undone": False,
+                "files": files,
+            })
+        _write_undo_log_v2(log_path, log_data)
+
+
+def tag_batch(log_path: str, batch_id: str, **fields) -> None:
+    """Set extra fields on a batch, creating it (empty) if it is not logged yet.
+
+    ``rename --shard`` tags its batch up front with the shard it covers, so
+    renames logged later land in an already tagged batch.
+    """
+    with _undo_log_lock(log_path):
+        log_data = _read_undo_log(log_path)
+        for batch in log_data["batches"]:
+            if batch["batch_id"] == batch_id:
+                break
+        else:
+            batch = {
+                "batch_id": batch_id,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "source": "cli",
+                "undone": False,
+                "files": [],
+            }
+            log_data["batches"].append(batch)
+        batch.update(fields)
+        _write_undo_log_v2(log_path, log_data)
 
 
 def write_empty_batch(log_path: str, batch_id: str) -> None:
@@ -209,75 +336,95 @@ def write_empty_batch(log_path: str, batch_id: str) -> None:
     reverting an *earlier* run — the empty batch is picked up as the most
     recent non-undone batch instead.
     """
-    log_data = _read_undo_log(log_path)
-    log_data["batches"].append({
-        "batch_id": batch_id,
-        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-        "source": "cli",
-        "undone": False,
-        "files": [],
-    })
-    _write_undo_log_v2(log_path, log_data)
+    tag_batch(log_path, batch_id)
 
 
 def _write_undo_log(log_path: str, old_path: str, new_path: str, batch_id: str = None) -> None:
     """Append a rename entry to the undo log (v2 batch format)."""
-    log_data = _read_undo_log(log_path)
+    with _undo_log_lock(log_path):
+        log_data = _read_undo_log(log_path)
 
-    entry = {
-        "old_path": old_path,
-        "new_path": new_path,
-        "timestamp": datetime.datetime.now().isoformat(),
-    }
+        entry = {
+            "old_path": old_path,
+            "new_path": new_path,
+            "timestamp": datetime.datetime.now().isoformat(),
+        }
 
-    if batch_id:
-        # Find or create the batch
-        target_batch = None
-        for batch in log_data["batches"]:
-            if batch["batch_id"] == batch_id:
-                target_batch = batch
-                break
-        if target_batch is None:
-            target_batch = {
-                "batch_id": batch_id,
+        if batch_id:
+            # Find or create the batch
+            target_batch = None
+            for batch in log_data["batches"]:
+                if batch["batch_id"] == batch_id:
+                    target_batch = batch
+                    break
+            if target_batch is None:
+                target_batch = {
+                    "batch_id": batch_id,
+                    "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "source": "cli",
+                    "undone": False,
+                    "files": [],
+                }
+                log_data["batches"].append(target_batch)
+            target_batch["files"].append(entry)
+        else:
+            # Legacy mode: create a new batch per call
+            log_data["batches"].append({
+                "batch_id": generate_batch_id(),
                 "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
                 "source": "cli",
                 "undone": False,
-                "files": [],
-            }
-            log_data["batches"].append(target_batch)
-        target_batch["files"].append(entry)
-    else:
-        # Legacy mode: create a new batch per call
-        log_data["batches"].append({
-            "batch_id": generate_batch_id(),
-            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "source": "cli",
-            "undone": False,
-            "files": [entry],
-        })
+                "files": [entry],
+            })
+
+        _write_undo_log_v2(log_path, log_data)
 
-    _write_undo_log_v2(log_path, log_data)
+
+def get_batch_renames(log_path: str, batch_id: str) -> dict[str, str]:
+    """Map old_path -> new_path for every rename recorded under ``batch_id``."""
+    renames = {}
+    for batch in _read_undo_log(log_path).get("batches", []):
+        if batch["batch_id"] == batch_id:
+            for entry in batch.get("files", []):
+                renames[entry["old_path"]] = entry["new_path"]
+    return renames
 
 
 def list_undo_batches(log_path: str) -> list[dict]:
-    """Return batch summaries for listing. Each dict has batch_id, timestamp, file_count, undone."""
+    """Return batch summaries for listing. Each dict has batch_id, timestamp, file_count, undone
+    (and shard, for batches written by ``rename --shard``)."""
     log_data = _read_undo_log(log_path)
     summaries = []
     for batch in log_data.get("batches", []):
-        summaries.append({
+        summary = {
             "batch_id": batch["batch_id"],
             "timestamp": batch.get("timestamp", ""),
             "file_count": len(batch.get("files", [])),
             "undone": batch.get("undone", False),
-        })
+        }
+        if batch.get("shard"):
+            summary["shard"] = batch["shard"]
+        summaries.append(summary)
     return summaries
 
 
+def _with_sibling_shards(batches: list[dict], targets: list[dict]) -> list[dict]:
+    """Extend ``targets`` with the latest non-undone batch of every other shard in their groups."""
+    groups = {b["shard"]["group"] for b in targets if b.get("shard")}
+    latest = {}
+    for batch in batches:
+        shard = batch.get("shard")
+        if shard and shard["group"] in groups and not batch.get("undone", False):
+            latest[(shard["group"], shard["index"])] = batch
+    extra = [b for b in latest.values() if not any(b is t for t in targets)]
+    return targets + extra
+
+
 def undo_renames(
     log_path: str,
     batch_id: str = None,
     undo_all: bool = False,
+    shards: bool = False,
 ) -> tuple[int, int, list[dict]]:
     """Reverse renames from the undo log.
 
@@ -287,7 +434,15 @@ def undo_renames(
     Default: undo last non-undone batch only.
     batch_id: undo a specific batch.
     undo_all: undo all non-undone batches.
+    shards: also undo the other shards of a ``rename --shard`` run (the
+        latest non-undone batch of each shard in the same group).
     """
+    with _undo_log_lock(log_path):
+        return _undo_renames(log_path, batch_id, undo_all, shards)
+
+
+def _undo_renames(log_path: str, batch_id: str | None, undo_all: bool,
+                  shards: bool) -> tuple[int, int, list[dict]]:
     log_data = _read_undo_log(log_path)
     batches = log_data.get("batches", [])
 
@@ -311,6 +466,8 @@ def undo_renames(
     if not targets:
         logging.warning("No batches to undo.")
         return 0, 0, []
+    if shards:
+        targets = _with_sibling_shards(batches, targets)
 
     success = 0
     fail = 0
@@ -0,0 +1,347 @@
+"""
+Local HTTP job service for ``serve --http``.
+Jobs are queued by priority and run on a fixed worker pool; clients poll for
+status and per-file results. Binds to 127.0.0.1 only, checks Host and
+Origin so web pages cannot reach it through the browser, and requires a
+per-run bearer token.
+"""
+from __future__ import annotations
+
+import datetime
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import threading
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Written next to config.yaml while the service runs: {"url", "token", "pid"}
+SERVICE_FILE_NAME = ".autorename-serve.json"
+
+# Request bodies are small JSON documents (paths + options)
+_MAX_BODY_BYTES = 1024 * 1024
+
+# Finished jobs kept for status/result queries before the oldest are dropped
+_MAX_FINISHED_JOBS = 1000
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def new_token() -> str:
+    """Random bearer token for one run of the service."""
+    return secrets.token_urlsafe(32)
+
+
+def write_service_file(path: str, url: str, token: str) -> None:
+    """Publish the service URL and token for local clients (readable by the owner only)."""
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "token": token, "pid": os.getpid()}, f)
+
+
+@dataclass
+class Job:
+    """One submitted rename request and its progress."""
+    id: str
+    params: dict
+    priority: int = 0
+    status: str = "queued"  # "queued", "running", "done", "failed", "cancelled"
+    created_at: str = field(default_factory=_now)
+    started_at: str | None = None
+    finished_at: str | None = None
+    total: int | None = None
+    summary: dict | None = None
+    error: dict | None = None
+    cancelled: threading.Event = field(default_factory=threading.Event, repr=False)
+    _results: dict[int, dict] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_result(self, index: int, file_result: dict, total: int) -> None:
+        """Record one finished file (a FileResult dict) as soon as it completes."""
+        with self._lock:
+            self._results[index] = file_result
+            self.total = total
+
+    def results(self) -> list[dict]:
+        """Finished file results so far, in input order, each with its ``index``."""
+        with self._lock:
+            return [{"index": i, **self._results[i]} for i in sorted(self._results)]
+
+    def status_dict(self) -> dict:
+        with self._lock:
+            completed = len(self._results)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "completed": completed,
+            "total": self.total,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Priority queue of jobs drained by ``workers`` threads.
+
+    ``runner(job)`` does the work and returns the job's summary dict; it
+    should record per-file results with ``job.add_result`` and stop early
+    once ``job.cancelled`` is set. An exception fails the job; its ``data``
+    attribute (an ErrorResult-style dict) becomes ``job.error`` when present.
+    Higher ``priority`` runs first, equal priorities in submission order.
+    """
+
+    def __init__(self, runner: Callable[[Job], dict], workers: int = 2):
+        self._runner = runner
+        self._heap: list[tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._jobs: dict[str, Job] = {}
+        self._finished: list[str] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i + 1}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, params: dict, priority: int = 0) -> Job:
+        job = Job(id=uuid.uuid4().hex[:12], params=params, priority=priority)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is shut down")
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, next(self._seq), job.id))
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list[Job]:
+        with self._cond:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued job outright, or ask a running one to stop."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.cancelled.set()
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+        return job
+
+    def _finish(self, job: Job, status: str) -> None:
+        # Called with self._cond held
+        job.status = status
+        job.finished_at = _now()
+        self._finished.append(job.id)
+        while len(self._finished) > _MAX_FINISHED_JOBS:
+            self._jobs.pop(self._finished.pop(0), None)
+
+    def _next_job(self) -> Job | None:
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return None
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "queued":
+                    job.status = "running"
+                    job.started_at = _now()
+                    return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                summary = self._runner(job)
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                error = getattr(e, "data", None)
+                job.error = error if isinstance(error, dict) else {
+                    "success": False, "error_type": "general_error", "message": str(e), "suggestion": None,
+                }
+                status = "failed"
+            else:
+                job.summary = summary
+                status = "cancelled" if job.cancelled.is_set() else "done"
+            with self._cond:
+                self._finish(job, status)
+
+    def shutdown(self, cancel_running: bool = True) -> None:
+        """Stop accepting jobs, cancel queued ones, and wait for the workers."""
+        with self._cond:
+            self._closed = True
+            for job in list(self._jobs.values()):
+                if job.status == "queued":
+                    job.cancelled.set()
+                    self._finish(job, "cancelled")
+                elif job.status == "running" and cancel_running:
+                    job.cancelled.set()
+            self._heap.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """REST endpoints over a JobQueue (``server.jobs``).
+
+    POST /jobs, GET /jobs, GET /jobs/<id>, GET /jobs/<id>/results,
+    DELETE /jobs/<id> (cancel) and GET /health.
+
+    Every request must name the bound address in ``Host`` and must not come
+    from a foreign ``Origin`` (DNS rebinding, cross-site form posts). All
+    endpoints but /health need ``Authorization: Bearer <server.token>`` when
+    the server has a token, and POST bodies must be ``application/json``.
+    """
+
+    server_version = "autorename-pdf"
+
+    def log_message(self, format, *args):
+        logging.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=True).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, error_type: str, message: str, suggestion: str | None = None) -> None:
+        self._json({"success": False, "error_type": error_type, "message": message,
+                    "suggestion": suggestion}, status=status)
+
+    def _allowed(self, need_token: bool = True) -> bool:
+        """Check Host, Origin and token; sends the error response and returns False if one fails."""
+        port = self.server.server_address[1]
+        hosts = {f"{HOST}:{port}", f"localhost:{port}"}
+        if self.headers.get("Host", "").lower() not in hosts:
+            self._error(403, "forbidden", f"Unexpected Host header: {self.headers.get('Host')}")
+            return False
+        origin = self.headers.get("Origin")
+        if origin is not None and origin.lower() not in {f"http://{host}" for host in hosts}:
+            self._error(403, "forbidden", f"Cross-origin requests are not accepted: {origin}")
+            return False
+        token = self.server.token
+        if need_token and token:
+            sent = self.headers.get("Authorization", "").encode("utf-8")
+            if not hmac.compare_digest(sent, f"Bearer {token}".encode("utf-8")):
+                self._error(401, "unauthorized", "Missing or wrong bearer token",
+                            suggestion=f"Send 'Authorization: Bearer <token>' with the token from {SERVICE_FILE_NAME}")
+                return False
+        return True
+
+    def _job_or_404(self, job_id: str) -> Job | None:
+        job = self.server.jobs.get(job_id)
+        if job is None:
+            self._error(404, "not_found", f"Unknown job: {job_id}")
+        return job
+
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if not self._allowed(need_token=parts != ["health"]):
+            return
+        if parts == ["health"]:
+            self._json({"status": "ok", **self.server.info})
+        elif parts == ["jobs"]:
+            self._json({"jobs": [job.status_dict() for job in self.server.jobs.list_jobs()]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job:
+                self._json(job.status_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "results":
+            job = self._job_or_404(parts[1])
+            if job:
+                self._json({**job.status_dict(), "files": job.results()})
+        else:
+            self._error(404, "not_found", f"No such endpoint: {self.path}")
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            self._error(404, "not_found", f"No such endpoint: {self.path}")
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._error(415, "usage_error", "Request body must be JSON",
+                        suggestion="Send the header 'Content-Type: application/json'")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > _MAX_BODY_BYTES:
+            self._error(413 if length > 0 else 400, "usage_error", "Missing or oversized request body")
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("body must be a JSON object")
+            priority = int(params.pop("priority", 0))
+        except (ValueError, TypeError) as e:
+            self._error(400, "usage_error", f"Invalid job request: {e}")
+            return
+        if not params.get("paths"):
+            self._error(400, "usage_error", "No files or folders specified.",
+                        suggestion='POST {"paths": ["C:/scans/invoice.pdf"]}')
+            return
+        try:
+            job = self.server.jobs.submit(params, priority=priority)
+        except RuntimeError as e:
+            self._error(503, "general_error", str(e))
+            return
+        self._json(job.status_dict(), status=202)
+
+    def do_DELETE(self):
+        if not self._allowed():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._error(404, "not_found", f"No such endpoint: {self.path}")
+            return
+        job = self.server.jobs.cancel(parts[1])
+        if job is None:
+            self._error(404, "not_found", f"Unknown job: {parts[1]}")
+        else:
+            self._json(job.status_dict())
+
+
+def make_job_server(jobs: JobQueue, port: int = DEFAULT_PORT, info: dict | None = None,
+                    token: str | None = None) -> ThreadingHTTPServer:
+    """HTTP server for ``jobs`` on 127.0.0.1 (``port`` 0 picks a free port).
+
+    With ``token`` every endpoint except /health requires it as a bearer token.
+    """
+    server = ThreadingHTTPServer((HOST, port), _JobRequestHandler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    server.info = info or {}
+    server.token = token
+    return server
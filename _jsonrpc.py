@@ -0,0 +1,183 @@
+"""
+Minimal JSON-RPC 2.0 server over line-delimited stdio for ``serve --stdio``.
+One JSON message per line in each direction; requests run on a worker pool so
+``cancel`` and progress notifications work while a long request is running.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TextIO
+
+# Standard JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# Application error: ``data`` carries the CLI's ErrorResult fields
+APPLICATION_ERROR = -32000
+
+
+class RpcError(Exception):
+    """Raised by a method handler to answer with a JSON-RPC error object."""
+
+    def __init__(self, code: int, message: str, data: dict | None = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> dict:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+class RequestContext:
+    """Per-request handle passed to method handlers."""
+
+    def __init__(self, server: "JsonRpcServer", request_id):
+        self.id = request_id
+        self.cancelled = threading.Event()
+        self._server = server
+
+    def notify(self, method: str, params: dict) -> None:
+        """Send a notification tied to this request (``params["id"]`` is set)."""
+        self._server.notify(method, {"id": self.id, **params})
+
+
+Handler = Callable[[dict, RequestContext], Any]
+
+
+class JsonRpcServer:
+    """Line-delimited JSON-RPC 2.0 server.
+
+    Handlers are registered per method name and called as
+    ``handler(params, ctx)``; their return value becomes the result. Two
+    methods are built in: ``cancel`` (``{"id": <request id>}``, sets that
+    request's ``ctx.cancelled``) and ``shutdown`` (stops reading once
+    in-flight requests have answered).
+    """
+
+    def __init__(self, reader: TextIO, writer: TextIO, max_workers: int = 4):
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = threading.Lock()
+        self._handlers: dict[str, Handler] = {}
+        self._active: dict[Any, RequestContext] = {}
+        self._active_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rpc")
+        self._stopping = False
+
+    def register(self, method: str, handler: Handler) -> None:
+        self._handlers[method] = handler
+
+    # -- Output ----------------------------------------------------------
+
+    def _send(self, message: dict) -> None:
+        line = json.dumps({"jsonrpc": "2.0", **message}, ensure_ascii=True)
+        with self._write_lock:
+            self._writer.write(line + "\n")
+            self._writer.flush()
+
+    def notify(self, method: str, params: dict) -> None:
+        self._send({"method": method, "params": params})
+
+    def _reply(self, request_id, result=None, error: RpcError | None = None) -> None:
+        if request_id is None:
+            return  # notifications get no response
+        if error is not None:
+            self._send({"id": request_id, "error": error.to_dict()})
+        else:
+            self._send({"id": request_id, "result": result})
+
+    # -- Built-in methods ------------------------------------------------
+
+    def cancel(self, request_id) -> bool:
+        """Flag a running request as cancelled. Returns False if it is not running."""
+        with self._active_lock:
+            ctx = self._active.get(request_id)
+        if ctx is None:
+            return False
+        ctx.cancelled.set()
+        return True
+
+    # -- Dispatch --------------------------------------------------------
+
+    def _run(self, handler: Handler, params: dict, ctx: RequestContext) -> None:
+        try:
+            self._reply(ctx.id, handler(params, ctx))
+        except RpcError as e:
+            self._reply(ctx.id, error=e)
+        except Exception as e:
+            logging.exception(f"RPC request {ctx.id} failed")
+            self._reply(ctx.id, error=RpcError(INTERNAL_ERROR, str(e)))
+        finally:
+            with self._active_lock:
+                self._active.pop(ctx.id, None)
+
+    def handle_line(self, line: str) -> None:
+        """Parse and dispatch one incoming line."""
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._send({"id": None, "error": RpcError(PARSE_ERROR, f"Parse error: {e}").to_dict()})
+            return
+
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            request_id = message.get("id") if isinstance(message, dict) else None
+            self._send({"id": request_id, "error": RpcError(INVALID_REQUEST, "Invalid request").to_dict()})
+            return
+
+        method = message["method"]
+        request_id = message.get("id")
+        params = message.get("params") or {}
+        if not isinstance(params, dict):
+            self._reply(request_id, error=RpcError(INVALID_PARAMS, "params must be an object"))
+            return
+
+        # Built-ins are answered on the reader thread so they never queue behind work
+        if method in ("cancel", "$/cancelRequest"):
+            self._reply(request_id, {"cancelled": self.cancel(params.get("id"))})
+            return
+        if method == "shutdown":
+            self._stopping = True
+            self._reply(request_id, {"shutdown": True})
+            return
+
+        handler = self._handlers.get(method)
+        if handler is None:
+            self._reply(request_id, error=RpcError(METHOD_NOT_FOUND, f"Method not found: {method}"))
+            return
+
+        ctx = RequestContext(self, request_id)
+        if request_id is not None:
+            with self._active_lock:
+                if request_id in self._active:
+                    self._reply(request_id, error=RpcError(INVALID_REQUEST, f"Request id {request_id!r} is already running"))
+                    return
+                self._active[request_id] = ctx
+        self._pool.submit(self._run, handler, params, ctx)
+
+    def serve_forever(self) -> None:
+        """Read requests until ``shutdown`` or end of input, then drain in-flight work.
+
+        On end of input (the client went away) running requests are cancelled;
+        after ``shutdown`` they are allowed to finish.
+        """
+        try:
+            for line in iter(self._reader.readline, ""):
+                if line.strip():
+                    self.handle_line(line)
+                if self._stopping:
+                    break
+            else:
+                with self._active_lock:
+                    for ctx in self._active.values():
+                        ctx.cancelled.set()
+        finally:
+            self._pool.shutdown(wait=True)
@@ -1,32 +1,41 @@
 """
 PDF processing utilities for text extraction, image rendering, and OCR.
-Uses pdfplumber for text, pypdfium2 for page images, PaddleOCR via subprocess.
+Uses pdfplumber or pypdfium2 for text, pypdfium2 for page images, PaddleOCR via subprocess.
 """
 from __future__ import annotations
 
 import os
 import json
 import logging
+import re
 import subprocess
 import sys
 import tempfile
 import shutil
 import threading
-from dataclasses import dataclass, field
+import time
+import unicodedata
+from dataclasses import astuple, dataclass, field
 
 import pdfplumber
 import pypdfium2 as pdfium
-from PIL import Image
+from PIL import Image, ImageStat
+
+from _cache import ResultCache, file_digest, image_digest, library_versions, make_key
+from _deadlines import CancelledError, StageTimeoutError, check_cancelled, get_stage_timeouts, run_stage
 
 
 @dataclass
 class ExtractionResult:
     """Result of PDF content extraction."""
-    text: str = ""                                  # pdfplumber text (always)
+    text: str = ""                                  # text layer (always)
     ocr_text: str = ""                              # PaddleOCR text (if run)
     images: list = field(default_factory=list)      # page images (if vision)
     quality_score: float = 0.0
     page_count: int = 0
+    pages: list = field(default_factory=list)       # zero-based indices of the pages read
+    page_quality: list = field(default_factory=list)  # text-layer quality of each of those pages
+    ocr_pages: list = field(default_factory=list)   # pages OCR'd in place of a missing/garbage text layer
     sources: list = field(default_factory=list)     # e.g. ["text"], ["text","ocr"], ["text","vision"]
     warnings: list = field(default_factory=list)    # non-fatal issues (OCR failures, etc.)
 
@@ -68,9 +77,84 @@ def _maybe_fix_mojibake(text: str) -> str:
     return text
 
 
-def _extract_text_with_pdfplumber(pdf_path: str, max_pages: int, repair: bool = False) -> str:
-    """Extract text while isolating per-page parser failures."""
-    all_text = []
+PAGE_SELECTIONS = ("first", "first_last")
+
+
+@dataclass(frozen=True)
+class PageBudget:
+    """Which pages of a PDF are read, and when reading stops early."""
+    max_pages: int = 3
+    selection: str = "first"            # "first": pages 1..max_pages; "first_last": 1..max_pages-1 plus the last
+    stop_quality: float | None = None   # adaptive: stop once the text read so far scores this high
+
+    def select(self, page_count: int) -> list[int]:
+        """Zero-based indices of the pages to read, in page order."""
+        count = min(self.max_pages, page_count)
+        if self.selection == "first_last" and count > 1 and page_count > count:
+            return list(range(count - 1)) + [page_count - 1]
+        return list(range(count))
+
+    def is_enough(self, text: str) -> bool:
+        """Whether the text read so far makes further pages unnecessary."""
+        return self.stop_quality is not None and assess_text_quality(text) >= self.stop_quality
+
+
+def get_page_budget(config: dict) -> PageBudget:
+    """The page budget from ``pdf.max_pages``, ``pdf.page_selection`` and ``pdf.adaptive_pages``."""
+    pdf_cfg = config.get("pdf", {})
+    selection = pdf_cfg.get("page_selection", "first")
+    adaptive = pdf_cfg.get("adaptive_pages", False)
+    return PageBudget(
+        max_pages=pdf_cfg.get("max_pages", 3),
+        selection=selection if selection in PAGE_SELECTIONS else "first",
+        stop_quality=pdf_cfg.get("adaptive_quality", 0.8) if adaptive else None,
+    )
+
+
+def _join_pages(pages: list[tuple[int, str]]) -> str:
+    """Format (page index, text) pairs as "Page N:" blocks, leaving out empty pages."""
+    return "\n\n".join(f"Page {i + 1}:\n{text}" for i, text in pages if text.strip())
+
+
+_PAGE_HEADER = re.compile(r"(?:^|\n\n)Page (\d+):\n")
+
+
+def _split_pages(text: str) -> dict[int, str]:
+    """Invert _join_pages: page number -> text."""
+    parts = _PAGE_HEADER.split(text)
+    return {int(number): page_text for number, page_text in zip(parts[1::2], parts[2::2])}
+
+
+def merge_ocr_pages(extraction: ExtractionResult) -> str:
+    """The text layer with its OCR'd pages replaced by their OCR text, in page order."""
+    pages = _split_pages(extraction.text)
+    pages.update(_split_pages(extraction.ocr_text))
+    return _join_pages([(number - 1, page_text) for number, page_text in sorted(pages.items())])
+
+
+def _read_budget_pages(pdf_path: str, budget: PageBudget, page_count: int, read_page) -> list[tuple[int, str]]:
+    """Read the budget's pages with ``read_page(index)``, isolating per-page failures.
+
+    Returns the (page index, text) of every page read; with an adaptive
+    budget, reading stops as soon as the text so far is good enough.
+    """
+    pages = []
+    for i in budget.select(page_count):
+        try:
+            page_text = read_page(i)
+        except Exception as e:
+            logging.warning(f"Error extracting text from page {i + 1} of {pdf_path}: {e}")
+            page_text = ""
+        pages.append((i, page_text))
+        if budget.is_enough(_join_pages(pages)):
+            if len(pages) < len(budget.select(page_count)):
+                logging.info(f"Enough text after {len(pages)} page(s) of {pdf_path}, skipping the rest")
+            break
+    return pages
+
+
+def _extract_text_with_pdfplumber(pdf_path: str, budget: PageBudget, repair: bool = False) -> list[tuple[int, str]]:
+    """Extract the budget's pages with pdfplumber. Returns (page index, text) pairs."""
     with _open_pdf_stream(pdf_path) as stream:
         with pdfplumber.open(
             stream,
@@ -78,35 +162,110 @@ def _extract_text_with_pdfplumber(pdf_path: str, max_pages: int, repair: bool =
             raise_unicode_errors=False,
             repair=repair,
         ) as pdf:
-            pages_to_read = min(max_pages, len(pdf.pages))
-            for i in range(pages_to_read):
-                try:
-                    page = pdf.pages[i]
-                    page_text = page.extract_text() or ""
-                    if page_text.strip():
-                        all_text.append(f"Page {i + 1}:\n{page_text}")
-                except Exception as e:
-                    logging.warning(f"Error extracting text from page {i + 1} of {pdf_path}: {e}")
-    return "\n\n".join(all_text)
+            return _read_budget_pages(pdf_path, budget, len(pdf.pages),
+                                      lambda i: pdf.pages[i].extract_text() or "")
+
 
+# Characters pdfium emits for soft hyphens and unmapped glyphs
+_PDFIUM_NOISE = str.maketrans("", "", "\ufffe\x02\x00")
 
-def extract_text(pdf_path: str, max_pages: int = 3) -> tuple:
-    """Extract text using pdfplumber. Returns (text, quality_score)."""
+
+def _pdfium_page_text(pdf, i: int) -> str:
+    page = textpage = None
     try:
-        text = _extract_text_with_pdfplumber(pdf_path, max_pages, repair=False)
+        page = pdf[i]
+        textpage = page.get_textpage()
+        raw = textpage.get_text_range().translate(_PDFIUM_NOISE)
+        page_text = "\n".join(line.strip() for line in raw.splitlines())
+        return unicodedata.normalize("NFC", page_text).strip()
+    finally:
+        if textpage is not None:
+            textpage.close()
+        if page is not None:
+            page.close()
+
+
+def _extract_text_with_pdfium(pdf_path: str, budget: PageBudget) -> list[tuple[int, str]]:
+    """Extract the budget's pages with pdfium's text pages, in the same form as pdfplumber.
+
+    pdfium reads characters in content-stream order without pdfminer's
+    layout analysis, which makes it several times faster; on PDFs with
+    unusual layouts the line order can differ.
+    """
+    with _open_pdf_stream(pdf_path) as stream:
+        pdf = pdfium.PdfDocument(stream, autoclose=False)
+        try:
+            return _read_budget_pages(pdf_path, budget, len(pdf), lambda i: _pdfium_page_text(pdf, i))
+        finally:
+            pdf.close()
+
+
+def _pdfplumber_text(pdf_path: str, budget: PageBudget) -> list[tuple[int, str]]:
+    try:
+        return _extract_text_with_pdfplumber(pdf_path, budget, repair=False)
     except Exception as e:
         logging.warning(f"Primary text extraction failed for {pdf_path}: {e}")
+        pages = _extract_text_with_pdfplumber(pdf_path, budget, repair=True)
+        logging.info(f"Recovered text extraction via pdfplumber repair mode: {pdf_path}")
+        return pages
+
+
+TEXT_BACKENDS = ("pdfplumber", "pdfium", "auto")
+
+
+def get_text_backend(config: dict) -> str:
+    """The ``pdf.text_backend`` setting, "pdfplumber" when unset or unknown."""
+    backend = config.get("pdf", {}).get("text_backend", "pdfplumber")
+    return backend if backend in TEXT_BACKENDS else "pdfplumber"
+
+
+def _finish_text(pages: list[tuple[int, str]]) -> tuple[str, float, list[int], list[float]]:
+    pages = [(i, _maybe_fix_mojibake(page_text)) for i, page_text in pages]
+    text = _join_pages(pages)
+    return text, assess_text_quality(text), [i for i, _ in pages], [assess_text_quality(t) for _, t in pages]
+
+
+def extract_pages(pdf_path: str, budget: PageBudget, backend: str = "pdfplumber",
+                  min_quality: float = 0.3) -> tuple[str, float, list[int], list[float]]:
+    """Extract the text layer of the budget's pages with the chosen backend.
+
+    Returns (text, quality_score, indices of the pages read, quality of each
+    of those pages); later steps render and OCR the same pages. ``backend`` is "pdfplumber", "pdfium" or
+    "auto". "auto" reads with pdfium and falls back to pdfplumber when that
+    text scores below ``min_quality`` (``pdf.text_quality_threshold``),
+    keeping whichever scores higher. A pdfium error falls back to pdfplumber
+    with either pdfium setting.
+    """
+    result = None
+    if backend in ("pdfium", "auto"):
         try:
-            text = _extract_text_with_pdfplumber(pdf_path, max_pages, repair=True)
-            logging.info(f"Recovered text extraction via pdfplumber repair mode: {pdf_path}")
-        except Exception as repair_error:
-            logging.error(f"Error extracting text from {pdf_path}: {repair_error}")
-            return "", 0.0
-
-    text = _maybe_fix_mojibake(text)
-    quality = assess_text_quality(text)
-    logging.info(f"Extracted text quality: {quality:.2f}, length: {len(text)} chars")
+            result = _finish_text(_extract_text_with_pdfium(pdf_path, budget))
+        except Exception as e:
+            logging.warning(f"pdfium text extraction failed for {pdf_path}, using pdfplumber: {e}")
+    if result is None or (backend == "auto" and result[1] < min_quality):
+        try:
+            fallback = _finish_text(_pdfplumber_text(pdf_path, budget))
+        except Exception as e:
+            logging.error(f"Error extracting text from {pdf_path}: {e}")
+            fallback = ("", 0.0, [], [])
+        if result is not None:
+            logging.info(f"pdfium text quality {result[1]:.2f} is low, pdfplumber scored {fallback[1]:.2f}")
+        if result is None or fallback[1] > result[1]:
+            result = fallback
+
+    text, quality, pages, _ = result
+    logging.info(f"Extracted text quality: {quality:.2f}, length: {len(text)} chars, pages: {len(pages)}")
     logging.debug(f"Full extracted text ({len(text)} chars):\n{text}")
+    return result
+
+
+def extract_text(pdf_path: str, max_pages: int = 3, backend: str = "pdfplumber",
+                 min_quality: float = 0.3) -> tuple:
+    """Extract the text layer of the first ``max_pages`` pages. Returns (text, quality_score).
+
+    See extract_pages for the backends and for other page budgets.
+    """
+    text, quality, _, _ = extract_pages(pdf_path, PageBudget(max_pages), backend, min_quality)
     return text, quality
 
 
@@ -145,20 +304,26 @@ def assess_text_quality(text: str) -> float:
     return min(char_score + alnum_score + word_score, 1.0)
 
 
-def render_pages_to_images(pdf_path: str, max_pages: int = 3, scale: float = 2.0) -> list[Image.Image]:
-    """Render PDF pages to PIL images using pypdfium2 v5."""
+def render_pages_to_images(pdf_path: str, max_pages: int = 3, scale: float = 2.0,
+                           pages: list[int] | None = None) -> list[Image.Image]:
+    """Render PDF pages to PIL images using pypdfium2 v5.
+
+    Renders the first ``max_pages`` pages, or the zero-based ``pages`` when given.
+    """
     images = []
     pdf = None
     stream = None
     try:
         stream = _open_pdf_stream(pdf_path)
         pdf = pdfium.PdfDocument(stream, autoclose=False)
-        pages_to_render = min(max_pages, len(pdf))
-        if pages_to_render == 0:
+        if pages is None:
+            pages = range(min(max_pages, len(pdf)))
+        pages_to_render = [i for i in pages if i < len(pdf)]
+        if not pages_to_render:
             logging.warning(f"PDF has 0 pages: {pdf_path}")
             return images
 
-        for i in range(pages_to_render):
+        for i in pages_to_render:
             page = None
             bitmap = None
             try:
@@ -183,6 +348,56 @@ def render_pages_to_images(pdf_path: str, max_pages: int = 3, scale: float = 2.0
     return images
 
 
+# Named page bands for ``pdf.regions``, as (top, bottom) fractions of the page height
+REGION_PRESETS = {
+    "header": (0.0, 0.35),   # company, date and document type
+    "footer": (0.75, 1.0),   # totals and payment terms
+}
+
+
+def parse_region(region) -> tuple[float, float] | None:
+    """A ``pdf.regions`` entry (preset name or [top, bottom] fractions) as a band, None if invalid."""
+    if isinstance(region, str):
+        return REGION_PRESETS.get(region)
+    try:
+        top, bottom = (float(edge) for edge in region)
+    except (TypeError, ValueError):
+        return None
+    return (top, bottom) if 0.0 <= top < bottom <= 1.0 else None
+
+
+def get_page_regions(config: dict) -> list[tuple[float, float]]:
+    """The valid ``pdf.regions`` bands, top to bottom with overlaps merged; [] means full pages."""
+    bands = [parse_region(region) for region in config.get("pdf", {}).get("regions") or []]
+    merged = []
+    for top, bottom in sorted(band for band in bands if band is not None):
+        if merged and top <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], bottom))
+        else:
+            merged.append((top, bottom))
+    return [] if merged == [(0.0, 1.0)] else merged
+
+
+def crop_to_regions(image: Image.Image, regions: list[tuple[float, float]]) -> Image.Image:
+    """Cut the region bands out of a page image and stack them into one image."""
+    if not regions:
+        return image
+    width, height = image.size
+    bands = [image.crop((0, int(top * height), width, max(int(bottom * height), int(top * height) + 1)))
+             for top, bottom in regions]
+    cropped = Image.new(image.mode, (width, sum(band.height for band in bands)), "white")
+    offset = 0
+    for band in bands:
+        cropped.paste(band, (0, offset))
+        offset += band.height
+    return cropped
+
+
+def _is_blank(image: Image.Image) -> bool:
+    """Whether an image is (nearly) one flat colour, i.e. shows nothing to read."""
+    return ImageStat.Stat(image.convert("L")).stddev[0] < 2.0
+
+
 def _get_bridge_script_path() -> str:
     """Get path to the PaddleOCR bridge script, handling PyInstaller."""
     if getattr(sys, 'frozen', False):
@@ -220,23 +435,32 @@ def _paddleocr_available(config: dict) -> bool:
     return _get_paddleocr_python(config) is not None
 
 
-def ocr_with_paddleocr(images: list[Image.Image], config: dict) -> str:
-    """Save images as temp files, pipe paths to bridge script, collect OCR text."""
-    python = _get_paddleocr_python(config)
-    if not python:
-        logging.error("PaddleOCR python not found")
-        return ""
+class PaddleOCRBridge:
+    """Long-lived PaddleOCR bridge subprocess shared across a batch.
+
+    The process is started lazily on the first page and then reused for every
+    following page and file, so the OCR models are loaded only once per run.
+    A bridge that dies mid-batch is restarted transparently on the next page.
+    """
 
-    bridge_src = _get_bridge_script_path()
-    paddleocr_cfg = config.get("paddleocr", {})
-    lang = paddleocr_cfg.get("language", "en")
-    device = paddleocr_cfg.get("device", "auto")
-    det_model = paddleocr_cfg.get("detection_model", "")
-    det_limit = paddleocr_cfg.get("det_limit_side_len", 736)
-    cpu_threads = paddleocr_cfg.get("cpu_threads", 4)
+    def __init__(self, config: dict):
+        self._config = config
+        self._proc = None
+        self._stderr_thread = None
+        self._tmp_dir = None
+        self._page_counter = 0
+        self._lock = threading.Lock()
+
+    def _build_command(self, python: str) -> tuple[list[str], dict]:
+        """Build the bridge command line and child environment."""
+        bridge_src = _get_bridge_script_path()
+        paddleocr_cfg = self._config.get("paddleocr", {})
+        lang = paddleocr_cfg.get("language", "en")
+        device = paddleocr_cfg.get("device", "auto")
+        det_model = paddleocr_cfg.get("detection_model", "")
+        det_limit = paddleocr_cfg.get("det_limit_side_len", 736)
+        cpu_threads = paddleocr_cfg.get("cpu_threads", 4)
 
-    tmp_dir = tempfile.mkdtemp(prefix="autorename_ocr_")
-    try:
         # PyInstaller isolation: when frozen, the bridge script lives in _MEIPASS.
         # Python adds the script's directory to sys.path[0], so _MEIPASS becomes
         # sys.path[0] in the child process. The bundled socket.py/_socket.pyd then
@@ -250,7 +474,7 @@ def ocr_with_paddleocr(images: list[Image.Image], config: dict) -> str:
         env = os.environ.copy()
         if meipass:
             # Copy bridge script out of _MEIPASS to avoid polluting child sys.path
-            bridge = os.path.join(tmp_dir, os.path.basename(bridge_src))
+            bridge = os.path.join(self._tmp_dir, os.path.basename(bridge_src))
             shutil.copy2(bridge_src, bridge)
 
             # Reset DLL search order (defense-in-depth)
@@ -275,6 +499,18 @@ def ocr_with_paddleocr(images: list[Image.Image], config: dict) -> str:
             cmd.extend(["--det-model", det_model])
 
         logging.info(f"Starting PaddleOCR (lang={lang}, device={device})")
+        return cmd, env
+
+    def _start(self) -> bool:
+        """Spawn the bridge process. Returns False if PaddleOCR is unavailable."""
+        python = _get_paddleocr_python(self._config)
+        if not python:
+            logging.error("PaddleOCR python not found")
+            return False
+
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="autorename_ocr_")
+        cmd, env = self._build_command(python)
 
         proc = subprocess.Popen(
             cmd,
@@ -298,29 +534,16 @@ def ocr_with_paddleocr(images: list[Image.Image], config: dict) -> str:
                     logging.warning(f"PaddleOCR: {line}")
                 else:
                     logging.info(f"PaddleOCR: {line}")
-        stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
-        stderr_thread.start()
-
-        all_text = []
-        for i, img in enumerate(images):
-            tmp_path = os.path.join(tmp_dir, f"page_{i}.png")
-            img.save(tmp_path)
-            try:
-                proc.stdin.write(tmp_path + "\n")
-                proc.stdin.flush()
-                line = proc.stdout.readline()
-                if not line:
-                    logging.warning(f"PaddleOCR bridge returned empty line for page {i + 1}")
-                    continue
-                result = json.loads(line)
-                if result["status"] == "ok":
-                    all_text.append(f"Page {i + 1}:\n{result['text']}")
-                else:
-                    logging.warning(f"PaddleOCR error on page {i + 1}: {result.get('message', 'unknown')}")
-            except (json.JSONDecodeError, BrokenPipeError, OSError) as e:
-                logging.warning(f"PaddleOCR bridge communication error on page {i + 1}: {e}")
-                break  # Bridge is dead, no point sending more pages
+        self._stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._proc = proc
+        return True
 
+    def _stop(self) -> None:
+        """Terminate the bridge process (if any) and wait for it to exit."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
         try:
             proc.stdin.close()
             proc.wait(timeout=30)
@@ -328,11 +551,185 @@ def ocr_with_paddleocr(images: list[Image.Image], config: dict) -> str:
             logging.warning(f"PaddleOCR process cleanup: {e}")
             proc.kill()
             proc.wait(timeout=5)
+        if self._stderr_thread is not None:
+            self._stderr_thread.join(timeout=5)
+            self._stderr_thread = None
+
+    def _send(self, image_path: str, timeout: float | None = None) -> dict | None:
+        """Send one image path to the running bridge. None means the bridge died.
+
+        With a ``timeout``, a watchdog kills a bridge that has not answered in
+        time (which unblocks the pending read) and StageTimeoutError is raised.
+        """
+        proc = self._proc
+        fired = threading.Event()
+        watchdog = None
+        if timeout is not None:
+            def _kill():
+                fired.set()
+                proc.kill()
+            watchdog = threading.Timer(timeout, _kill)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            proc.stdin.write(image_path + "\n")
+            proc.stdin.flush()
+            line = proc.stdout.readline()
+        except (BrokenPipeError, OSError) as e:
+            logging.warning(f"PaddleOCR bridge communication error: {e}")
+            line = ""
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        if fired.is_set():
+            logging.warning(f"PaddleOCR bridge did not answer within {timeout:g}s, killed it")
+            self._stop()
+            raise StageTimeoutError("ocr", timeout)
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            logging.warning(f"PaddleOCR bridge communication error: {e}")
+            return None
+
+    def ocr_image(self, image: Image.Image, timeout: float | None = None) -> dict | None:
+        """OCR a single page image. Returns the bridge response dict, or None
+        if the bridge could not be (re)started or died twice on this page.
+
+        ``timeout`` bounds the whole call, including waiting for another
+        thread's page; StageTimeoutError is raised when it runs out, and a
+        bridge stuck on the page is killed (the next page restarts it).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def _remaining() -> float | None:
+            if deadline is None:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise StageTimeoutError("ocr", timeout)
+            return remaining
+
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise StageTimeoutError("ocr", timeout)
+        try:
+            if self._proc is None and not self._start():
+                return None
 
-        stderr_thread.join(timeout=5)
+            self._page_counter += 1
+            tmp_path = os.path.join(self._tmp_dir, f"page_{self._page_counter}.png")
+            image.save(tmp_path)
+            try:
+                result = self._send(tmp_path, _remaining())
+                if result is None:
+                    logging.warning("PaddleOCR bridge exited unexpectedly, restarting")
+                    self._stop()
+                    if not self._start():
+                        return None
+                    result = self._send(tmp_path, _remaining())
+                    if result is None:
+                        self._stop()
+                return result
+            finally:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        finally:
+            self._lock.release()
+
+    def warm_up(self) -> bool:
+        """Start the bridge now rather than on the first page (``serve --warm-ocr``)."""
+        with self._lock:
+            return self._proc is not None or self._start()
+
+    def close(self) -> None:
+        """Shut the bridge down and remove its temp directory."""
+        with self._lock:
+            self._stop()
+            if self._tmp_dir is not None:
+                shutil.rmtree(self._tmp_dir, ignore_errors=True)
+                self._tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+OCR_CACHE = "ocr"  # ResultCache namespace
+
+
+def ocr_page_cache_key(image: Image.Image, config: dict) -> str:
+    """Cache key of one page's OCR: the rendered bitmap plus the PaddleOCR model settings."""
+    paddle_cfg = config.get("paddleocr", {})
+    return make_key(
+        image_digest(image),
+        paddle_cfg.get("language", "en"),
+        paddle_cfg.get("detection_model", ""),
+        paddle_cfg.get("det_limit_side_len", 736),
+    )
 
-    finally:
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def ocr_with_paddleocr(images: list[Image.Image], config: dict,
+                       bridge: PaddleOCRBridge | None = None,
+                       cancel: threading.Event | None = None,
+                       cache: ResultCache | None = None,
+                       pages: list[int] | None = None) -> str:
+    """OCR page images through the PaddleOCR bridge and collect the text.
+
+    When no shared ``bridge`` is passed, a temporary one is started for
+    these images and shut down afterwards. All pages together must finish
+    within ``timeouts.ocr``; ``cancel`` is checked between pages. With a
+    ``cache``, pages recognized before (identical bitmap and OCR settings)
+    are not sent to the bridge; the bridge only starts for a page that missed.
+    ``pages`` are the zero-based page numbers of the images (default: 0, 1, ...).
+    With ``pdf.adaptive_pages``, OCR stops once the text so far is good enough.
+    """
+    if bridge is None:
+        if not _get_paddleocr_python(config):
+            logging.error("PaddleOCR python not found")
+            return ""
+        with PaddleOCRBridge(config) as own_bridge:
+            return ocr_with_paddleocr(images, config, bridge=own_bridge, cancel=cancel, cache=cache, pages=pages)
+
+    timeout = get_stage_timeouts(config)["ocr"]
+    deadline = None if timeout is None else time.monotonic() + timeout
+    budget = get_page_budget(config)
+    if pages is None or len(pages) != len(images):
+        pages = list(range(len(images)))
+    all_text = []
+    for i, img in zip(pages, images):
+        if budget.is_enough("\n\n".join(all_text)):
+            logging.info(f"Enough OCR text after {len(all_text)} page(s), skipping the rest")
+            break
+        check_cancelled(cancel)
+        cache_key = ocr_page_cache_key(img, config) if cache is not None else None
+        cached = cache.get(OCR_CACHE, cache_key) if cache is not None else None
+        if cached is not None:
+            all_text.append(f"Page {i + 1}:\n{cached['text']}")
+            continue
+        if deadline is None:
+            result = bridge.ocr_image(img)
+        else:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise StageTimeoutError("ocr", timeout)
+                result = bridge.ocr_image(img, timeout=remaining)
+            except StageTimeoutError:
+                raise StageTimeoutError("ocr", timeout) from None
+        if result is None:
+            logging.warning(f"PaddleOCR bridge unavailable on page {i + 1}")
+            break  # Bridge is dead, no point sending more pages
+        if result.get("status") == "ok":
+            all_text.append(f"Page {i + 1}:\n{result['text']}")
+            if cache_key is not None:
+                cache.put(OCR_CACHE, cache_key, {"text": result["text"]})
+        else:
+            logging.warning(f"PaddleOCR error on page {i + 1}: {result.get('message', 'unknown')}")
 
     return "\n\n".join(all_text)
 
@@ -350,70 +747,310 @@ def _should_run_step(setting, quality: float, threshold: float) -> bool:
     return quality < threshold
 
 
-def extract_content(pdf_path: str, config: dict) -> ExtractionResult:
-    """Main extraction entry point. Text always runs; OCR and vision are independent add-ons."""
+@dataclass
+class ExtractionPlan:
+    """Which optional extraction steps (OCR / vision) run for one document."""
+    run_ocr: bool = False
+    run_vision: bool = False
+    ocr_pages: list | None = None   # the pages to OCR (None: every rendered page)
+    full_page_images: list = field(default_factory=list)  # uncropped renders, for the full-page retry
+
+
+def _is_auto(setting) -> bool:
+    return bool(setting) and setting not in (True, "true", "false")
+
+
+def plan_extraction(quality: float, config: dict, pages: list[int] | None = None,
+                    page_quality: list[float] | None = None) -> ExtractionPlan:
+    """Decide from the text-layer quality whether OCR and vision should run.
+
+    Given the ``pages`` read and the ``page_quality`` of each, ``ocr: "auto"``
+    is decided per page: only pages whose own text layer scores below the
+    threshold are OCR'd, so of a text cover letter with a scanned invoice
+    attached, just the invoice pages are.
+    """
     pdf_cfg = config.get("pdf", {})
-    max_pages = pdf_cfg.get("max_pages", 3)
     threshold = pdf_cfg.get("text_quality_threshold", 0.3)
-    ocr_setting = pdf_cfg.get("ocr", False)
-    vision_setting = pdf_cfg.get("vision", False)
+    plan = ExtractionPlan(
+        run_ocr=_should_run_step(pdf_cfg.get("ocr", False), quality, threshold),
+        run_vision=_should_run_step(pdf_cfg.get("vision", False), quality, threshold),
+    )
+    if pages and page_quality and len(page_quality) == len(pages) and _is_auto(pdf_cfg.get("ocr", False)):
+        plan.ocr_pages = [i for i, page_score in zip(pages, page_quality) if page_score < threshold]
+        plan.run_ocr = bool(plan.ocr_pages)
+    return plan
 
-    sources = []
-    warnings = []
 
-    # Step 1: Always run pdfplumber text extraction
-    text, quality = extract_text(pdf_path, max_pages)
-    sources.append("text")
+@dataclass
+class TriageResult:
+    """Cheap pre-scan of a PDF, used to schedule it before the real extraction."""
+    page_count: int = 0
+    has_text_layer: bool = False
+    quality_score: float = 0.0      # assess_text_quality of page 1
+    expensive: bool = False         # OCR or vision is expected to run
 
-    # Step 2: Determine if OCR / vision should run
-    run_ocr = _should_run_step(ocr_setting, quality, threshold)
-    run_vision = _should_run_step(vision_setting, quality, threshold)
 
-    ocr_text = ""
-    images = []
+def triage_pdf(pdf_path: str, config: dict) -> TriageResult:
+    """Estimate whether a PDF will need OCR or vision, without extracting it.
 
-    # Step 3: Render images if needed for OCR or vision
+    Reads the page count and page 1's text layer with pypdfium2, which is much
+    cheaper than pdfplumber's layout analysis, and applies the same plan as
+    extract_content to page 1's quality. PDFs that cannot be opened count as
+    cheap: they fail fast in the real extraction too.
+    """
+    result = TriageResult()
+    pdf = None
+    stream = None
+    try:
+        stream = _open_pdf_stream(pdf_path)
+        pdf = pdfium.PdfDocument(stream, autoclose=False)
+        result.page_count = len(pdf)
+        if result.page_count:
+            page = pdf[0]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_bounded()
+            finally:
+                textpage.close()
+                page.close()
+            result.has_text_layer = bool(text.strip())
+            result.quality_score = assess_text_quality(text)
+    except Exception as e:
+        logging.debug(f"Triage could not read {pdf_path}: {e}")
+        return result
+    finally:
+        if pdf is not None:
+            pdf.close()
+        if stream is not None:
+            stream.close()
+
+    plan = plan_extraction(result.quality_score, config)
+    result.expensive = result.page_count > 0 and (plan.run_ocr or plan.run_vision)
+    return result
+
+
+def _pages_to_render(extraction: ExtractionResult, plan: ExtractionPlan) -> list[int] | None:
+    """The pages OCR and vision need: just the pages to OCR when vision is off,
+    else the pages the text layer was read from (None: the budget's first pages)."""
+    if plan.ocr_pages is not None and not plan.run_vision:
+        return plan.ocr_pages
+    return extraction.pages or None
+
+
+def render_extraction_images(pdf_path: str, extraction: ExtractionResult,
+                             plan: ExtractionPlan, config: dict) -> None:
+    """Render page images when OCR or vision needs them.
+
+    With ``pdf.regions``, the images are cut down to those bands and the
+    full renders are kept in ``plan.full_page_images`` for a retry when
+    the crops turn out to hold nothing usable. Disables both steps in
+    ``plan`` when no page could be rendered.
+    """
+    if not (plan.run_ocr or plan.run_vision):
+        return
+    max_pages = config.get("pdf", {}).get("max_pages", 3)
     # Use lower scale for OCR-only (detection model resizes internally anyway)
-    if run_ocr or run_vision:
-        ocr_scale = 1.5 if (run_ocr and not run_vision) else 2.0
-        images = render_pages_to_images(pdf_path, max_pages, scale=ocr_scale)
-        if not images:
-            logging.warning(f"No images rendered from {pdf_path}")
-            warnings.append("Could not render page images")
-            run_ocr = False
-            run_vision = False
+    ocr_scale = 1.5 if (plan.run_ocr and not plan.run_vision) else 2.0
+    extraction.images = render_pages_to_images(pdf_path, max_pages, scale=ocr_scale,
+                                               pages=_pages_to_render(extraction, plan))
+    if not extraction.images:
+        logging.warning(f"No images rendered from {pdf_path}")
+        extraction.warnings.append("Could not render page images")
+        plan.run_ocr = False
+        plan.run_vision = False
+        return
+    regions = get_page_regions(config)
+    if regions:
+        plan.full_page_images = extraction.images
+        extraction.images = [crop_to_regions(image, regions) for image in extraction.images]
+
+
+def _use_full_pages(extraction: ExtractionResult, plan: ExtractionPlan, reason: str) -> None:
+    """Swap cropped region images for the full page renders."""
+    logging.info(f"Page regions {reason}, retrying with full pages")
+    extraction.images = plan.full_page_images
+    plan.full_page_images = []
+
+
+def _ocr_planned_pages(extraction: ExtractionResult, plan: ExtractionPlan, config: dict,
+                       ocr_bridge: PaddleOCRBridge | None, cancel: threading.Event | None,
+                       cache: ResultCache | None) -> str:
+    images, pages = extraction.images, _pages_to_render(extraction, plan)
+    if plan.ocr_pages is not None and pages is not None and len(pages) == len(images):
+        selected = [(i, image) for i, image in zip(pages, images) if i in plan.ocr_pages]
+        pages, images = [i for i, _ in selected], [image for _, image in selected]
+        extraction.ocr_pages = pages
+    return ocr_with_paddleocr(images, config, bridge=ocr_bridge, cancel=cancel, cache=cache, pages=pages)
+
+
+def ocr_extraction_images(extraction: ExtractionResult, plan: ExtractionPlan, config: dict,
+                          ocr_bridge: PaddleOCRBridge | None = None,
+                          cancel: threading.Event | None = None,
+                          cache: ResultCache | None = None) -> None:
+    """Run PaddleOCR over the rendered images when the plan asks for it.
+
+    With per-page ``plan.ocr_pages``, only those images are OCR'd and the
+    pages are recorded in ``extraction.ocr_pages``. When the images are
+    ``pdf.regions`` crops and their OCR text scores below
+    ``text_quality_threshold``, the full pages are OCR'd instead.
+    OCR errors are downgraded to warnings, but a timeout or cancellation
+    propagates so the file fails instead of silently losing its OCR text.
+    """
+    if not plan.run_ocr:
+        return
+    if not _paddleocr_available(config):
+        logging.warning("PaddleOCR requested but not available")
+        extraction.warnings.append("PaddleOCR not installed — run setup.ps1 to install")
+        return
 
-    # Step 4: PaddleOCR
-    if run_ocr:
-        if _paddleocr_available(config):
-            try:
-                ocr_text = ocr_with_paddleocr(images, config)
-            except Exception as e:
-                logging.warning(f"PaddleOCR failed, continuing without OCR: {e}")
-                warnings.append(f"PaddleOCR failed: {e}")
-                ocr_text = ""
-            if ocr_text.strip():
-                sources.append("ocr")
-            else:
-                if not warnings:  # Don't duplicate if we already logged a failure
-                    logging.warning("PaddleOCR returned empty text")
-                    warnings.append("PaddleOCR returned no text")
-        else:
-            logging.warning("PaddleOCR requested but not available")
-            warnings.append("PaddleOCR not installed — run setup.ps1 to install")
+    try:
+        extraction.ocr_text = _ocr_planned_pages(extraction, plan, config, ocr_bridge, cancel, cache)
+        threshold = config.get("pdf", {}).get("text_quality_threshold", 0.3)
+        if plan.full_page_images and assess_text_quality(extraction.ocr_text) < threshold:
+            _use_full_pages(extraction, plan, "yielded no usable OCR text")
+            extraction.ocr_text = _ocr_planned_pages(extraction, plan, config, ocr_bridge, cancel, cache)
+    except (StageTimeoutError, CancelledError):
+        raise
+    except Exception as e:
+        logging.warning(f"PaddleOCR failed, continuing without OCR: {e}")
+        extraction.warnings.append(f"PaddleOCR failed: {e}")
+        extraction.ocr_text = ""
+    if extraction.ocr_text.strip():
+        extraction.sources.append("ocr")
+    else:
+        if not extraction.warnings:  # Don't duplicate if we already logged a failure
+            logging.warning("PaddleOCR returned empty text")
+            extraction.warnings.append("PaddleOCR returned no text")
 
-    # Step 5: Vision — keep images in result
-    if run_vision:
-        sources.append("vision")
+
+def finish_extraction(extraction: ExtractionResult, plan: ExtractionPlan) -> None:
+    """Keep page images only when vision is requested.
+
+    Region crops that came out blank are replaced by the full pages.
+    """
+    if plan.run_vision:
+        if plan.full_page_images and all(_is_blank(image) for image in extraction.images):
+            _use_full_pages(extraction, plan, "are blank")
+        extraction.sources.append("vision")
     else:
-        images = []  # Don't pass images if vision not requested
-
-    return ExtractionResult(
-        text=text,
-        ocr_text=ocr_text,
-        images=images,
-        quality_score=quality,
-        page_count=max_pages,
-        sources=sources,
-        warnings=warnings,
+        extraction.images = []  # Don't pass images if vision not requested
+    plan.full_page_images = []
+
+
+EXTRACTION_CACHE = "extraction"  # ResultCache namespace
+
+# Bump when the cached fields or their meaning change
+_EXTRACTION_CACHE_VERSION = 3
+
+
+def extraction_cache_key(pdf_path: str, config: dict) -> str:
+    """Cache key of a PDF's extraction: its content hash plus every setting that shapes the text."""
+    pdf_cfg = config.get("pdf", {})
+    paddle_cfg = config.get("paddleocr", {})
+    return make_key(
+        _EXTRACTION_CACHE_VERSION,
+        file_digest(pdf_path),
+        astuple(get_page_budget(config)),
+        pdf_cfg.get("ocr", False),
+        pdf_cfg.get("text_quality_threshold", 0.3),
+        get_text_backend(config),
+        get_page_regions(config),
+        paddle_cfg.get("language", "en"),
+        paddle_cfg.get("detection_model", ""),
+        paddle_cfg.get("det_limit_side_len", 736),
+        library_versions("pdfplumber", "pdfminer.six", "pypdfium2"),
+    )
+
+
+def load_cached_extraction(cache: ResultCache, key: str,
+                           config: dict) -> tuple[ExtractionResult, ExtractionPlan] | None:
+    """Rebuild a cached extraction and the plan for what is still left to do.
+
+    OCR text comes from the cache, so the returned plan never runs OCR;
+    vision still needs freshly rendered page images.
+    """
+    cached = cache.get(EXTRACTION_CACHE, key)
+    if cached is None:
+        return None
+    extraction = ExtractionResult(
+        text=cached["text"],
+        ocr_text=cached["ocr_text"],
+        quality_score=cached["quality_score"],
+        page_count=len(cached["pages"]),
+        pages=list(cached["pages"]),
+        page_quality=list(cached["page_quality"]),
+        ocr_pages=list(cached["ocr_pages"]),
+        sources=list(cached["sources"]),
     )
+    plan = plan_extraction(extraction.quality_score, config)
+    plan.run_ocr = False
+    return extraction, plan
+
+
+def store_cached_extraction(cache: ResultCache, key: str, extraction: ExtractionResult) -> None:
+    """Cache a finished extraction, unless a step degraded it (those are retried next time)."""
+    if extraction.warnings:
+        return
+    cache.put(EXTRACTION_CACHE, key, {
+        "text": extraction.text,
+        "ocr_text": extraction.ocr_text,
+        "quality_score": extraction.quality_score,
+        "pages": extraction.pages,
+        "page_quality": extraction.page_quality,
+        "ocr_pages": extraction.ocr_pages,
+        "sources": [s for s in extraction.sources if s != "vision"],
+    })
+
+
+def extract_content(pdf_path: str, config: dict,
+                    ocr_bridge: PaddleOCRBridge | None = None,
+                    cancel: threading.Event | None = None,
+                    cache: ResultCache | None = None) -> ExtractionResult:
+    """Main extraction entry point. Text always runs; OCR and vision are independent add-ons.
+
+    Pass a shared ``ocr_bridge`` to reuse one PaddleOCR process across files.
+    The individual steps are also exposed separately for the staged pipeline.
+    Each step is bounded by its ``timeouts`` entry (StageTimeoutError) and
+    stops early when ``cancel`` is set (CancelledError). With a ``cache``,
+    a PDF seen before skips text extraction and OCR (see extraction_cache_key),
+    and pages OCRed before in any PDF are not OCRed again.
+    """
+    timeouts = get_stage_timeouts(config)
+    cache_key = extraction_cache_key(pdf_path, config) if cache is not None else None
+    cached = load_cached_extraction(cache, cache_key, config) if cache is not None else None
+
+    if cached is not None:
+        logging.info(f"Extraction cache hit for {pdf_path}")
+        extraction, plan = cached
+    else:
+        # Step 1: Always extract the text layer
+        text, quality, pages, page_quality = run_stage("extract", extract_pages, pdf_path, get_page_budget(config),
+                                                       get_text_backend(config),
+                                                       config.get("pdf", {}).get("text_quality_threshold", 0.3),
+                                                       timeout=timeouts["extract"], cancel=cancel)
+        extraction = ExtractionResult(
+            text=text,
+            quality_score=quality,
+            page_count=len(pages),
+            pages=pages,
+            page_quality=page_quality,
+            sources=["text"],
+        )
+
+        # Step 2: Determine if OCR / vision should run (OCR per page in "auto" mode)
+        plan = plan_extraction(quality, config, pages, page_quality)
+
+    # Step 3: Render images if needed for OCR or vision
+    if plan.run_ocr or plan.run_vision:
+        run_stage("render", render_extraction_images, pdf_path, extraction, plan, config,
+                  timeout=timeouts["render"], cancel=cancel)
+
+    # Step 4: PaddleOCR
+    ocr_extraction_images(extraction, plan, config, ocr_bridge=ocr_bridge, cancel=cancel, cache=cache)
+    if cache is not None and cached is None:
+        store_cached_extraction(cache, cache_key, extraction)
+
+    # Step 5: Vision — keep images in result
+    finish_extraction(extraction, plan)
+
+    return extraction
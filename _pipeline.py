@@ -0,0 +1,283 @@
+"""
+Staged batch pipeline for large rename runs.
+Each stage has its own worker count; bounded queues between stages give backpressure.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from _ai_processing import DocumentMetadata, extract_metadata
+from _cache import ResultCache
+from _similarity import find_near_duplicate, remember_document
+from _templates import match_template
+from _deadlines import CancelledError, StageTimeoutError, get_stage_timeouts, run_stage
+from _pdf_utils import (
+    ExtractionPlan,
+    ExtractionResult,
+    PaddleOCRBridge,
+    extract_pages,
+    extraction_cache_key,
+    finish_extraction,
+    get_page_budget,
+    get_text_backend,
+    load_cached_extraction,
+    ocr_extraction_images,
+    plan_extraction,
+    render_extraction_images,
+    store_cached_extraction,
+)
+
+# Marks the end of the work stream on a stage queue
+_DONE = object()
+
+
+@dataclass
+class PipelineItem:
+    """One PDF travelling through the pipeline stages."""
+    index: int
+    pdf_path: str
+    extraction: ExtractionResult | None = None
+    plan: ExtractionPlan | None = None
+    metadata: DocumentMetadata | None = None
+    error: str | None = None
+    cache_key: str | None = None    # set while a fresh extraction still has to be cached
+    warnings: list = field(default_factory=list)    # added to the FileResult's warnings
+    template: str | None = None     # vendor template the metadata was read with
+    from_llm: bool = False          # metadata is an LLM answer (templates learn from these)
+
+
+@dataclass
+class _Stage:
+    name: str
+    func: Callable[[PipelineItem], None]
+    workers: int
+
+
+def get_performance_settings(config: dict) -> dict:
+    """Return the ``performance`` config section with every worker count >= 1."""
+    perf = dict(config.get("performance", {}))
+    for key in ("queue_size", "extract_workers", "render_workers", "ocr_workers", "ai_workers"):
+        try:
+            perf[key] = max(1, int(perf.get(key, 1)))
+        except (TypeError, ValueError):
+            logging.warning(f"Invalid performance.{key}: {perf.get(key)!r}, using 1")
+            perf[key] = 1
+    return perf
+
+
+def _make_extract_pool(workers: int) -> Executor:
+    """Process pool for CPU-bound pdfplumber parsing, threads if processes are unavailable."""
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError, ImportError) as e:
+        logging.warning(f"Process pool unavailable ({e}), extracting text in threads")
+        return ThreadPoolExecutor(max_workers=workers)
+
+
+class _ExtractPool:
+    """The extract stage's worker pool, replaced when a worker overruns its deadline.
+
+    A timed-out future that is already running cannot be cancelled, and
+    its process would keep parsing and hold its slot. Instead the pool's
+    processes are killed and a fresh pool takes over; extractions that
+    were running in the killed pool are resubmitted once.
+    """
+
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._pool = _make_extract_pool(workers)
+
+    def run(self, func: Callable, *args, timeout: float | None = None,
+            cancel: threading.Event | None = None):
+        try:
+            return self._run_once(func, args, timeout, cancel)
+        except BrokenProcessPool:
+            # Another file's timeout killed the pool this one ran in
+            return self._run_once(func, args, timeout, cancel)
+
+    def _run_once(self, func: Callable, args: tuple, timeout: float | None,
+                  cancel: threading.Event | None):
+        with self._lock:
+            pool = self._pool
+        future = pool.submit(func, *args)
+        try:
+            return run_stage("extract", future.result, timeout=timeout, cancel=cancel)
+        except StageTimeoutError:
+            if not future.cancel():
+                self._recycle(pool)
+            raise
+        except CancelledError:
+            future.cancel()
+            raise
+
+    def _recycle(self, pool: Executor) -> None:
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = _make_extract_pool(self._workers)
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        if not processes:
+            logging.warning("Extract worker threads cannot be stopped; the timed-out extraction keeps running")
+        for process in processes:
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def run_pipeline(
+    pdf_files: list,
+    config: dict,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[PipelineItem]:
+    """Run extraction, rendering, OCR and metadata extraction as concurrent stages.
+
+    Yields each PipelineItem once its AI stage is done, in completion order
+    (``item.index`` is its position in ``pdf_files``). Harmonizing and renaming
+    are left to the caller, which consumes items on a single thread.
+
+    A stage that raises (including a per-stage timeout) records the message
+    in ``item.error``; later stages skip the item but still pass it on, so
+    every input file is yielded once. Once ``cancel`` is set, items still in
+    flight fail with "Cancelled". With a ``cache``, files extracted before
+    skip the extract and OCR work, repeated LLM requests are answered from
+    the cache, near-duplicates of earlier documents can reuse their
+    metadata (see _similarity.py) and documents of known suppliers are read
+    by their vendor template (see _templates.py).
+    """
+    perf = get_performance_settings(config)
+    timeouts = get_stage_timeouts(config)
+    budget = get_page_budget(config)
+    text_backend = get_text_backend(config)
+    min_quality = config.get("pdf", {}).get("text_quality_threshold", 0.3)
+    extract_pool = _ExtractPool(perf["extract_workers"])
+
+    def _extract(item: PipelineItem) -> None:
+        if cache is not None:
+            key = extraction_cache_key(item.pdf_path, config)
+            cached = load_cached_extraction(cache, key, config)
+            if cached is not None:
+                item.extraction, item.plan = cached
+                return
+            item.cache_key = key
+        text, quality, pages, page_quality = extract_pool.run(
+            extract_pages, item.pdf_path, budget, text_backend, min_quality,
+            timeout=timeouts["extract"], cancel=cancel,
+        )
+        item.extraction = ExtractionResult(
+            text=text, quality_score=quality, page_count=len(pages), pages=pages, page_quality=page_quality,
+            sources=["text"],
+        )
+        item.plan = plan_extraction(quality, config, pages, page_quality)
+
+    def _render(item: PipelineItem) -> None:
+        if item.plan.run_ocr or item.plan.run_vision:
+            run_stage("render", render_extraction_images, item.pdf_path, item.extraction, item.plan, config,
+                      timeout=timeouts["render"], cancel=cancel)
+
+    def _ocr(item: PipelineItem) -> None:
+        ocr_extraction_images(item.extraction, item.plan, config, ocr_bridge=ocr_bridge, cancel=cancel,
+                              cache=cache)
+        if item.cache_key is not None:
+            store_cached_extraction(cache, item.cache_key, item.extraction)
+        finish_extraction(item.extraction, item.plan)
+
+    def _ai(item: PipelineItem) -> None:
+        duplicate = find_near_duplicate(cache, item.extraction, config) if cache is not None else None
+        matched = match_template(cache, item.extraction, config) if cache is not None and duplicate is None else None
+        if duplicate is not None:
+            item.metadata, note = duplicate
+            item.warnings.append(note)
+        elif matched is not None:
+            item.metadata, item.template = matched
+        elif item.extraction.text.strip() or item.extraction.ocr_text.strip() or item.extraction.images:
+            item.metadata = run_stage("ai", extract_metadata, item.extraction, config, cache=cache,
+                                      timeout=timeouts["ai"], cancel=cancel)
+            item.from_llm = item.metadata is not None
+            if cache is not None:
+                remember_document(cache, item.extraction, item.metadata, item.pdf_path, config)
+        # Page images are no longer needed once the LLM has seen them
+        item.extraction.images = []
+
+    stages = [
+        _Stage("extract", _extract, perf["extract_workers"]),
+        _Stage("render", _render, perf["render_workers"]),
+        _Stage("ocr", _ocr, perf["ocr_workers"]),
+        _Stage("ai", _ai, perf["ai_workers"]),
+    ]
+    queues = [queue.Queue(maxsize=perf["queue_size"]) for _ in stages]
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def _feed() -> None:
+        for index, pdf_path in enumerate(pdf_files):
+            if stop.is_set() or (cancel is not None and cancel.is_set()):
+                break
+            queues[0].put(PipelineItem(index=index, pdf_path=pdf_path))
+        for _ in range(stages[0].workers):
+            queues[0].put(_DONE)
+
+    def _run_stage(position: int) -> Callable[[], None]:
+        stage = stages[position]
+        inbox = queues[position]
+        is_last = position == len(stages) - 1
+        outbox = results if is_last else queues[position + 1]
+        downstream_workers = 1 if is_last else stages[position + 1].workers
+        remaining = [stage.workers]
+        remaining_lock = threading.Lock()
+
+        def _worker() -> None:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                if item.error is None and cancel is not None and cancel.is_set():
+                    item.error = str(CancelledError())
+                if item.error is None and not stop.is_set():
+                    try:
+                        stage.func(item)
+                    except Exception as e:
+                        logging.error(f"Pipeline stage '{stage.name}' failed for {item.pdf_path}: {e}")
+                        item.error = str(e)
+                outbox.put(item)
+            # The last worker of a stage to finish closes the next queue
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    for _ in range(downstream_workers):
+                        outbox.put(_DONE)
+
+        return _worker
+
+    threads = [threading.Thread(target=_feed, name="pipeline-feed", daemon=True)]
+    for position, stage in enumerate(stages):
+        worker = _run_stage(position)
+        for n in range(stage.workers):
+            threads.append(threading.Thread(target=worker, name=f"pipeline-{stage.name}-{n}", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    completed = False
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                completed = True
+                break
+            yield item
+    finally:
+        # On early exit the workers skip their stage work and drain the
+        # remaining items into the unbounded results queue by themselves.
+        stop.set()
+        extract_pool.shutdown(wait=completed, cancel_futures=True)
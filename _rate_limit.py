@@ -0,0 +1,293 @@
+"""
+Client-side rate control for LLM provider calls.
+AIMD concurrency limiting driven by provider rate-limit response headers,
+and token-bucket pacing for configured requests/tokens per minute.
+"""
+from __future__ import annotations
+
+import contextlib
+import email.utils
+import logging
+import threading
+import time
+
+# Status codes that mean "slow down": rate limited, overloaded (Anthropic 529)
+THROTTLE_STATUS_CODES = {429, 503, 529}
+
+# Remaining-quota headers sent by OpenAI (x-ratelimit-*) and Anthropic
+_REMAINING_HEADER_PREFIXES = ("x-ratelimit-remaining-", "anthropic-ratelimit-")
+
+
+def parse_retry_after(headers) -> float | None:
+    """Return the server-requested wait in seconds, or None.
+
+    Understands ``retry-after-ms``, ``retry-after`` in seconds and
+    ``retry-after`` as an HTTP date.
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def parse_remaining(headers) -> int | None:
+    """Smallest remaining request/token quota advertised in the headers, or None."""
+    remaining = []
+    for name, value in headers.items():
+        name = name.lower()
+        if not name.startswith(_REMAINING_HEADER_PREFIXES) or "remaining" not in name:
+            continue
+        try:
+            remaining.append(int(float(value)))
+        except ValueError:
+            continue
+    return min(remaining) if remaining else None
+
+
+class AdaptiveConcurrencyLimiter:
+    """Additive-increase / multiplicative-decrease cap on in-flight requests.
+
+    Every healthy response grows the limit by ``1 / limit`` (about +1 per
+    round of requests) up to ``maximum``. A throttling response multiplies it
+    by ``decrease_factor`` and pauses new requests for the Retry-After period.
+    Throttles of requests sent before the last decrease do not shrink the
+    limit again: a burst of concurrent 429s is one congestion signal.
+    When the advertised remaining quota is no larger than the requests in
+    flight, the limit holds instead of growing.
+    """
+
+    def __init__(self, maximum: int = 8, initial: int | None = None,
+                 minimum: int = 1, decrease_factor: float = 0.5):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        start = initial if initial is not None else min(4, self.maximum)
+        self._limit = float(max(self.minimum, min(start, self.maximum)))
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._decreased_at = float("-inf")
+        self._requests = 0
+        self._throttled = 0
+        self._peak_limit = int(self._limit)
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def set_maximum(self, maximum: int) -> None:
+        """Apply a changed ``max_concurrent_requests``; the current limit is clamped to it."""
+        with self._cond:
+            self.maximum = max(1, maximum)
+            self.minimum = min(self.minimum, self.maximum)
+            self._limit = min(self._limit, float(self.maximum))
+            self._cond.notify_all()
+
+    def _can_start(self) -> bool:
+        return self._in_flight < int(self._limit) and time.monotonic() >= self._resume_at
+
+    def _wait_hint(self) -> float:
+        return max(0.01, self._resume_at - time.monotonic())
+
+    def acquire(self) -> None:
+        """Block until a request slot is free and no throttle pause is active."""
+        with self._cond:
+            while not self._can_start():
+                self._cond.wait(timeout=self._wait_hint())
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_response(self, status_code: int, headers, sent_at: float | None = None) -> None:
+        """Feed one HTTP response (including SDK-internal retries) into the controller.
+
+        ``sent_at`` is the ``time.monotonic()`` at which the request was sent;
+        without it the response counts as sent after the last decrease.
+        """
+        with self._cond:
+            self._requests += 1
+            if status_code in THROTTLE_STATUS_CODES:
+                self._throttled += 1
+                retry_after = parse_retry_after(headers)
+                if retry_after:
+                    self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+                if sent_at is not None and sent_at < self._decreased_at:
+                    logging.debug(f"Provider throttled request (HTTP {status_code}) sent before the last decrease")
+                else:
+                    self._limit = max(float(self.minimum), self._limit * self._decrease_factor)
+                    self._decreased_at = time.monotonic()
+                    logging.warning(
+                        f"Provider throttled request (HTTP {status_code}); "
+                        f"concurrency limit now {self.limit}"
+                        + (f", pausing {retry_after:.1f}s" if retry_after else "")
+                    )
+            elif 200 <= status_code < 300:
+                remaining = parse_remaining(headers)
+                if remaining is None or remaining > self._in_flight:
+                    self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
+                    self._peak_limit = max(self._peak_limit, self.limit)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """Counters for the batch summary."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "peak_limit": self._peak_limit,
+                "max_limit": self.maximum,
+                "requests": self._requests,
+                "throttled": self._throttled,
+            }
+
+
+class TokenBucket:
+    """Classic token bucket: ``per_minute`` capacity, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self._rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return how long the caller must wait for them.
+
+        The balance may go negative, so concurrent callers queue up behind
+        each other instead of all waking at once. Requests larger than the
+        whole bucket are clamped to its capacity.
+        """
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+
+class RequestPacer:
+    """Proactive per-provider pacing for ``ai.rate_limit`` RPM/TPM budgets."""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self._lock = threading.Lock()
+        self._paced = 0
+        self._waited = 0.0
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        """Set the budgets; a changed budget starts with a full bucket."""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        delays = [0.0]
+        if self._requests is not None:
+            delays.append(self._requests.reserve(1))
+        if self._tokens is not None:
+            delays.append(self._tokens.reserve(max(1, estimated_tokens)))
+        delay = max(delays)
+        if delay > 0:
+            with self._lock:
+                self._paced += 1
+                self._waited += delay
+        return delay
+
+    def wait(self, estimated_tokens: int) -> None:
+        """Block until a request of ``estimated_tokens`` fits both budgets."""
+        delay = self._reserve(estimated_tokens)
+        if delay > 0:
+            logging.debug(f"Rate limit pacing: waiting {delay:.2f}s")
+            time.sleep(delay)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"paced": self._paced, "paced_seconds": round(self._waited, 2)}
+
+
+# One limiter / pacer per provider, shared by every client and thread in the process.
+# A config with other settings for the provider updates the shared object.
+_LIMITERS: dict[str, AdaptiveConcurrencyLimiter] = {}
+_PACERS: dict[str, RequestPacer] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def adaptive_concurrency_enabled(config: dict) -> bool:
+    return bool(config.get("ai", {}).get("adaptive_concurrency", False))
+
+
+def get_concurrency_limiter(config: dict) -> AdaptiveConcurrencyLimiter | None:
+    """Return the provider's shared limiter, or None when adaptive control is off."""
+    if not adaptive_concurrency_enabled(config):
+        return None
+    provider = config["ai"]["provider"]
+    maximum = int(config["ai"].get("max_concurrent_requests", 8))
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(provider)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(maximum=maximum)
+            _LIMITERS[provider] = limiter
+        elif limiter.maximum != max(1, maximum):
+            limiter.set_maximum(maximum)
+        return limiter
+
+
+def get_request_pacer(config: dict) -> RequestPacer | None:
+    """Return the provider's shared RPM/TPM pacer, or None when no budget is set."""
+    settings = config.get("ai", {}).get("rate_limit") or {}
+    rpm = int(settings.get("requests_per_minute", 0) or 0)
+    tpm = int(settings.get("tokens_per_minute", 0) or 0)
+    if rpm <= 0 and tpm <= 0:
+        return None
+    provider = config["ai"]["provider"]
+    with _LIMITERS_LOCK:
+        pacer = _PACERS.get(provider)
+        if pacer is None:
+            pacer = RequestPacer(requests_per_minute=rpm, tokens_per_minute=tpm)
+            _PACERS[provider] = pacer
+        elif (pacer.requests_per_minute, pacer.tokens_per_minute) != (rpm, tpm):
+            pacer.configure(rpm, tpm)
+        return pacer
+
+
+def rate_limit_stats() -> dict:
+    """Snapshot of every active limiter and pacer, keyed by provider."""
+    with _LIMITERS_LOCK:
+        stats: dict[str, dict] = {}
+        for provider, limiter in _LIMITERS.items():
+            stats.setdefault(provider, {}).update(limiter.snapshot())
+        for provider, pacer in _PACERS.items():
+            stats.setdefault(provider, {}).update(pacer.snapshot())
+        return stats
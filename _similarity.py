@@ -0,0 +1,144 @@
+"""
+Near-duplicate detection across runs. Each document's normalized text is
+reduced to a set of word-pair hashes and a 64-bit SimHash of that set; both
+are kept in the result cache with the metadata the LLM gave the document,
+so a second copy (an e-mailed PDF and its scan) can reuse that metadata
+instead of another LLM request.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+from _ai_processing import DocumentMetadata
+from _cache import ResultCache, make_key
+from _pdf_utils import ExtractionResult
+
+SIMILARITY_CACHE = "similarity"  # ResultCache namespace
+
+_BITS = 64
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# SimHash agreement a stored document needs to be compared exactly. SimHash
+# of invoice-length texts is too noisy to decide on its own (a copy with OCR
+# errors and next month's invoice from the same template both land near
+# 0.9), so it only narrows the candidates down.
+_CANDIDATE_SIMHASH = 0.7
+_MAX_CANDIDATES = 20
+
+
+def get_dedup_settings(config: dict) -> dict:
+    settings = dict(config.get("dedup") or {})
+    settings["enabled"] = bool(settings.get("enabled", False))
+    settings["threshold"] = min(1.0, max(0.5, float(settings.get("threshold", 0.85))))
+    settings["min_words"] = max(2, int(settings.get("min_words", 30)))
+    settings["max_entries"] = max(1, int(settings.get("max_entries", 10000)))
+    return settings
+
+
+@dataclass
+class Fingerprint:
+    simhash: int
+    shingles: set[int]      # 32-bit hashes of consecutive word pairs
+
+
+def normalize_words(text: str) -> list[str]:
+    """Lowercased word tokens; punctuation, layout and OCR spacing differences drop out."""
+    return _WORD_RE.findall(text.casefold())
+
+
+def fingerprint_words(words: list[str]) -> Fingerprint:
+    hashes = {
+        int.from_bytes(hashlib.blake2b(f"{a} {b}".encode("utf-8"), digest_size=8).digest(), "big")
+        for a, b in zip(words, words[1:])
+    }
+    weights = [0] * _BITS
+    for value in hashes:
+        for bit in range(_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    simhash = sum(1 << bit for bit in range(_BITS) if weights[bit] > 0)
+    return Fingerprint(simhash=simhash, shingles={value >> 32 for value in hashes})
+
+
+def simhash_similarity(a: int, b: int) -> float:
+    """Share of equal bits between two SimHashes (1.0 = identical)."""
+    return 1.0 - bin(a ^ b).count("1") / _BITS
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def document_fingerprint(extraction: ExtractionResult, config: dict) -> Fingerprint | None:
+    """Fingerprint of a document's text layer and OCR text, or None if it has too little text."""
+    words = normalize_words(f"{extraction.text}\n{extraction.ocr_text}")
+    if len(words) < get_dedup_settings(config)["min_words"]:
+        return None
+    return fingerprint_words(words)
+
+
+def find_near_duplicate(
+    cache: ResultCache, extraction: ExtractionResult, config: dict,
+) -> tuple[DocumentMetadata, str] | None:
+    """Metadata of the most similar earlier document at or above ``dedup.threshold``.
+
+    Similarity is the Jaccard index of the two documents' word-pair sets.
+    Returns ``(metadata, warning)`` or None. Always None unless
+    ``dedup.enabled``: recurring invoices from one template can still come
+    close, so reuse is opt-in.
+    """
+    settings = get_dedup_settings(config)
+    if not settings["enabled"]:
+        return None
+    fingerprint = document_fingerprint(extraction, config)
+    if fingerprint is None:
+        return None
+
+    candidates = []
+    for key in cache.keys(SIMILARITY_CACHE):
+        score = simhash_similarity(fingerprint.simhash, int(key.split(":", 1)[0], 16))
+        if score >= _CANDIDATE_SIMHASH:
+            candidates.append((score, key))
+    best, best_score = None, settings["threshold"]
+    for _, key in sorted(candidates, reverse=True)[:_MAX_CANDIDATES]:
+        stored = cache.get(SIMILARITY_CACHE, key, count=False)
+        if stored is None:
+            continue
+        score = jaccard(fingerprint.shingles, set(stored["shingles"]))
+        if score >= best_score:
+            best, best_score = stored, score
+    cache.count(SIMILARITY_CACHE, best is not None)
+    if best is None:
+        return None
+
+    warning = (f"Metadata reused from near-duplicate {best['file']} "
+               f"(similarity {best_score:.2f}), no AI request made")
+    logging.info(warning)
+    return DocumentMetadata(**best["metadata"]), warning
+
+
+def remember_document(
+    cache: ResultCache, extraction: ExtractionResult, metadata: DocumentMetadata | None,
+    pdf_path: str, config: dict,
+) -> None:
+    """Add a document the LLM answered for to the similarity index.
+
+    Only with ``dedup.enabled``; the index keeps the ``dedup.max_entries``
+    most recent documents, which also bounds the scan in find_near_duplicate.
+    """
+    settings = get_dedup_settings(config)
+    if metadata is None or not settings["enabled"]:
+        return
+    fingerprint = document_fingerprint(extraction, config)
+    if fingerprint is None:
+        return
+    # The SimHash leads the key so candidates are found without loading values
+    key = f"{fingerprint.simhash:016x}:{make_key(sorted(fingerprint.shingles))[:16]}"
+    cache.put(SIMILARITY_CACHE, key, {
+        "file": os.path.basename(pdf_path),
+        "metadata": metadata.model_dump(),
+        "shingles": sorted(fingerprint.shingles),
+    }, max_entries=settings["max_entries"])
@@ -0,0 +1,258 @@
+"""
+Vendor templates for recurring suppliers, learned from LLM answers.
+A template stores a supplier's layout (its word pairs with numbers masked),
+the anchor words that locate its name and the document date in the text,
+and the document type. Documents that match a confirmed template get their
+metadata locally; on any mismatch they go to the LLM as usual, and its
+answer updates the template.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+
+from _ai_processing import DocumentMetadata
+from _cache import ResultCache, make_key
+from _document_processing import parse_document_date
+from _pdf_utils import ExtractionResult
+from _similarity import jaccard, normalize_words
+
+TEMPLATE_CACHE = "templates"  # ResultCache namespace
+
+# Documents with fewer words have too little layout to recognize
+_MIN_WORDS = 20
+# Words before a date kept as its anchor ("rechnungsdatum", "invoice date")
+_ANCHOR_WORDS = 3
+
+_DATE_RE = re.compile(
+    r"\b\d{1,2}[./-]\d{1,2}[./-](?:\d{4}|\d{2})\b"       # 15.03.2024, 15/03/24
+    r"|\b\d{4}-\d{1,2}-\d{1,2}\b"                         # 2024-03-15
+    r"|\b\d{1,2}\.?\s+[^\W\d_]{3,}\.?\s+\d{4}\b"          # 15. März 2024
+    r"|\b[^\W\d_]{3,}\.?\s+\d{1,2},?\s+\d{4}\b",          # March 15, 2024
+)
+
+# Template counters are read-modify-write cycles on one cache entry
+_TEMPLATE_LOCK = threading.Lock()
+
+
+def get_template_settings(config: dict) -> dict:
+    settings = dict(config.get("templates") or {})
+    settings["enabled"] = bool(settings.get("enabled", False))
+    settings["min_similarity"] = min(1.0, max(0.3, float(settings.get("min_similarity", 0.6))))
+    settings["min_confirmations"] = max(0, int(settings.get("min_confirmations", 1)))
+    return settings
+
+
+def template_name(company: str, document_type: str) -> str:
+    return f"{company} {document_type}"
+
+
+def layout_fingerprint(words: list[str]) -> set[int]:
+    """32-bit hashes of consecutive word pairs, every word containing a digit
+    masked, so amounts, dates and invoice numbers do not count as layout."""
+    masked = ["#" if any(c.isdigit() for c in w) else w for w in words]
+    return {
+        int.from_bytes(hashlib.blake2b(f"{a} {b}".encode("utf-8"), digest_size=4).digest(), "big")
+        for a, b in zip(masked, masked[1:])
+    }
+
+
+def _anchor(text: str) -> list[str]:
+    """The words right before a value, up to the nearest word containing a digit."""
+    anchor = []
+    for word in reversed(normalize_words(text)):
+        if any(c.isdigit() for c in word) or len(anchor) == _ANCHOR_WORDS:
+            break
+        anchor.insert(0, word)
+    return anchor
+
+
+def _date_occurrences(text: str) -> list[dict]:
+    """Every date-like string in ``text`` with the rules that would locate it.
+
+    ``line`` 0 anchors a date on the words before it on its own line, ``line``
+    1 on the end of the previous non-empty line (labels above table cells);
+    ``nth`` is its position among the dates on its line.
+    """
+    occurrences = []
+    previous = ""
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        for nth, match in enumerate(_DATE_RE.finditer(line)):
+            occurrences.append({
+                "value": match.group(0),
+                "rules": [
+                    {"anchor": _anchor(line[:match.start()]), "line": 0, "nth": nth},
+                    {"anchor": _anchor(previous), "line": 1, "nth": nth},
+                ],
+            })
+        previous = line
+    return occurrences
+
+
+def _locate_date(rule: dict, occurrences: list[dict]):
+    """The date ``rule`` points at, or None if it finds none or several different ones."""
+    dates = {
+        parse_document_date(occurrence["value"])
+        for occurrence in occurrences
+        if rule in occurrence["rules"]
+    }
+    return dates.pop() if len(dates) == 1 and None not in dates else None
+
+
+def _learn_date_rule(occurrences: list[dict], target) -> dict | None:
+    """A rule that locates ``target`` in the document, and only it."""
+    for occurrence in occurrences:
+        if parse_document_date(occurrence["value"]) != target:
+            continue
+        for rule in occurrence["rules"]:
+            if rule["anchor"] and _locate_date(rule, occurrences) == target:
+                return rule
+    return None
+
+
+def _contains(words: list[str], phrase: list[str]) -> bool:
+    return bool(phrase) and f" {' '.join(phrase)} " in f" {' '.join(words)} "
+
+
+def _document_words(extraction: ExtractionResult) -> tuple[str, list[str]]:
+    text = f"{extraction.text}\n{extraction.ocr_text}"
+    return text, normalize_words(text)
+
+
+def _apply(template: dict, text: str, words: list[str]) -> DocumentMetadata | None:
+    """The metadata ``template`` reads from a document, or None on any mismatch."""
+    if not _contains(words, template["company_anchor"]):
+        return None
+    date = _locate_date(template["date_rule"], _date_occurrences(text))
+    if date is None:
+        return None
+    return DocumentMetadata(
+        company_name=template["company_name"],
+        document_date=date.strftime("%d.%m.%Y"),
+        document_type=template["document_type"],
+    )
+
+
+def _count(cache: ResultCache, key: str, field: str) -> None:
+    with _TEMPLATE_LOCK:
+        template = cache.get(TEMPLATE_CACHE, key, count=False)
+        if template is not None:
+            template[field] += 1
+            cache.put(TEMPLATE_CACHE, key, template)
+
+
+def match_template(
+    cache: ResultCache, extraction: ExtractionResult, config: dict,
+) -> tuple[DocumentMetadata, str] | None:
+    """Metadata read locally by the best matching confirmed template.
+
+    Returns ``(metadata, template name)`` or None (no template matches the
+    layout, or the matching one cannot find the supplier's name or exactly
+    one date where it expects them: a fallback). Always None unless
+    ``templates.enabled``. Hits and fallbacks are counted on the template.
+    """
+    settings = get_template_settings(config)
+    if not settings["enabled"]:
+        return None
+    text, words = _document_words(extraction)
+    if len(words) < _MIN_WORDS:
+        return None
+
+    layout = layout_fingerprint(words)
+    best_key, best, best_score = None, None, settings["min_similarity"]
+    for key, template in cache.items(TEMPLATE_CACHE):
+        if template["confirmations"] < settings["min_confirmations"]:
+            continue
+        score = jaccard(layout, set(template["layout"]))
+        if score >= best_score:
+            best_key, best, best_score = key, template, score
+    if best is None:
+        cache.count(TEMPLATE_CACHE, False)
+        return None
+
+    name = template_name(best["company"], best["document_type"])
+    metadata = _apply(best, text, words)
+    cache.count(TEMPLATE_CACHE, metadata is not None)
+    _count(cache, best_key, "hits" if metadata is not None else "fallbacks")
+    if metadata is None:
+        logging.info(f"Template {name} matched the layout (similarity {best_score:.2f}) "
+                     f"but not the fields, asking the AI")
+        return None
+    logging.info(f"Metadata read by template {name} (similarity {best_score:.2f}), no AI request made")
+    return metadata, name
+
+
+def learn_template(
+    cache: ResultCache, extraction: ExtractionResult, metadata: DocumentMetadata | None,
+    company: str, pdf_path: str, config: dict,
+) -> None:
+    """Learn or confirm the template of ``company`` (the harmonized name) from an LLM answer.
+
+    Nothing is learned unless the supplier's name and the document date can
+    be found in the text. An answer the stored template predicts confirms
+    it; any other answer replaces its rules and resets its confirmations.
+    Nothing is learned unless ``templates.enabled``.
+    """
+    if metadata is None or not company or not get_template_settings(config)["enabled"]:
+        return
+    text, words = _document_words(extraction)
+    target = parse_document_date(metadata.document_date)
+    if len(words) < _MIN_WORDS or target is None:
+        return
+    company_anchor = next(
+        (phrase for phrase in (normalize_words(metadata.company_name), normalize_words(company))
+         if _contains(words, phrase)),
+        None,
+    )
+    date_rule = _learn_date_rule(_date_occurrences(text), target)
+    name = template_name(company, metadata.document_type)
+    if company_anchor is None or date_rule is None:
+        logging.debug(f"No template learned for {name}: name or date not found in the text")
+        return
+
+    layout = layout_fingerprint(words)
+    key = make_key(company, metadata.document_type)
+    with _TEMPLATE_LOCK:
+        stored = cache.get(TEMPLATE_CACHE, key, count=False)
+        template = {
+            "company": company,
+            "company_name": metadata.company_name,
+            "document_type": metadata.document_type,
+            "company_anchor": company_anchor,
+            "date_rule": date_rule,
+            "layout": sorted(layout),
+            "confirmations": 0,
+            "hits": 0,
+            "fallbacks": 0,
+            "file": os.path.basename(pdf_path),
+        }
+        if stored is not None:
+            template["hits"], template["fallbacks"] = stored["hits"], stored["fallbacks"]
+            predicted = _apply(stored, text, words)
+            if (predicted is not None and parse_document_date(predicted.document_date) == target
+                    and jaccard(layout, set(stored["layout"])) >= get_template_settings(config)["min_similarity"]):
+                template["company_anchor"] = stored["company_anchor"]
+                template["date_rule"] = stored["date_rule"]
+                template["confirmations"] = stored["confirmations"] + 1
+        cache.put(TEMPLATE_CACHE, key, template)
+
+
+def template_stats(cache: ResultCache) -> list[dict]:
+    """Per-template hit rates: documents read locally vs. sent to the LLM after a layout match."""
+    stats = []
+    for _, template in cache.items(TEMPLATE_CACHE):
+        matched = template["hits"] + template["fallbacks"]
+        stats.append({
+            "name": template_name(template["company"], template["document_type"]),
+            "confirmations": template["confirmations"],
+            "hits": template["hits"],
+            "fallbacks": template["fallbacks"],
+            "hit_rate": round(template["hits"] / matched, 3) if matched else None,
+            "file": template["file"],
+        })
+    return sorted(stats, key=lambda s: s["name"].casefold())
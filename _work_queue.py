@@ -0,0 +1,314 @@
+"""
+Shared lease queue for ``rename --queue``: several workers, on one or more
+hosts, claim files from one SQLite file with time-limited leases.
+A worker that dies leaves its lease to expire, and the file is offered again.
+Paths are stored relative to the queue file's folder, so hosts that mount
+the shared folder at different paths still agree on the files.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from _document_processing import write_batch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id            INTEGER PRIMARY KEY,              -- 1-based, in insertion order
+    path          TEXT NOT NULL UNIQUE,             -- relative to the queue file's folder, '/'-separated
+    status        TEXT NOT NULL DEFAULT 'pending',  -- pending | leased | done
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    result        TEXT,                             -- FileResult as JSON
+    new_path      TEXT,                             -- set when the file was renamed (relative like path)
+    merged        INTEGER NOT NULL DEFAULT 0        -- 1 once the rename is in the undo log
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+def get_queue_settings(config: dict) -> dict:
+    settings = dict(config.get("queue") or {})
+    settings["lease_seconds"] = max(1.0, float(settings.get("lease_seconds", 600)))
+    settings["max_attempts"] = max(1, int(settings.get("max_attempts", 3)))
+    settings["poll_interval"] = max(0.05, float(settings.get("poll_interval", 5)))
+    return settings
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class Task:
+    id: int
+    path: str
+    attempts: int
+
+    @property
+    def index(self) -> int:
+        """0-based position in the queue (task IDs are assigned in insertion order)."""
+        return self.id - 1
+
+
+class LeaseQueue:
+    """Lease-based work queue in a SQLite file.
+
+    Each call opens its own short-lived connection, so one queue object can
+    be used from several threads, and any number of processes can share the
+    file. Claims and completions run in ``BEGIN IMMEDIATE`` transactions,
+    which makes SQLite's file lock the only coordination between workers.
+    The file has to sit on a filesystem with working locks; some network
+    shares lack them.
+
+    Files are stored relative to the queue file's folder and resolved
+    against the local folder on every worker, so the queue has to sit in
+    the folder being renamed or one of its parents.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 600, max_attempts: int = 3):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _relative(self, path: str) -> str | None:
+        """``path`` as stored in the queue, or None if it is outside the queue's folder."""
+        try:
+            relative = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:  # another drive on Windows
+            return None
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return relative.replace(os.sep, "/")
+
+    def _resolve(self, stored: str) -> str:
+        """Local absolute path of a stored path."""
+        return os.path.normpath(os.path.join(self.root, stored))
+
+    def batch_id(self, proposed: str) -> str:
+        """The queue's batch ID: the first worker's proposal wins."""
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('batch_id', ?)", (proposed,))
+            return conn.execute("SELECT value FROM meta WHERE key = 'batch_id'").fetchone()["value"]
+        finally:
+            conn.close()
+
+    def add(self, paths: list[str]) -> int:
+        """Enqueue files (already queued paths are ignored). Returns how many were new.
+
+        Raises ValueError if a file is outside the queue file's folder:
+        other hosts could not resolve it.
+        """
+        stored = []
+        for path in paths:
+            relative = self._relative(path)
+            if relative is None:
+                raise ValueError(f"{path} is outside the queue's folder {self.root}")
+            stored.append(relative)
+        conn = self._transaction(self._connect())
+        try:
+            before = conn.total_changes
+            # Not INSERT OR IGNORE: ignored rows would still leave gaps in the IDs
+            conn.executemany(
+                "INSERT INTO tasks (path) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM tasks WHERE path = ?)",
+                [(p, p) for p in stored],
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker: str) -> Task | None:
+        """Lease the next pending (or expired) file to ``worker``, or None if there is none.
+
+        Files whose lease expired ``max_attempts`` times are given up on and
+        completed as failed, so one file that crashes every worker cannot
+        stall the queue.
+        """
+        now = time.time()
+        conn = self._transaction(self._connect())
+        try:
+            for row in conn.execute(
+                "SELECT id, path, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ? "
+                "AND attempts >= ?", (now, self.max_attempts),
+            ).fetchall():
+                result = {"file": self._resolve(row["path"]), "status": "failed",
+                          "error": f"Gave up after {row['attempts']} expired leases"}
+                conn.execute(
+                    "UPDATE tasks SET status = 'done', worker = NULL, result = ? WHERE id = ?",
+                    (json.dumps(result), row["id"]),
+                )
+            row = conn.execute(
+                "SELECT id, path, attempts FROM tasks WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1", (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            path = self._resolve(row["path"])
+            if row["attempts"]:
+                logging.warning(f"Re-leasing {path} (attempt {row['attempts'] + 1})")
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, now + self.lease_seconds, row["id"]),
+            )
+            conn.execute("COMMIT")
+            return Task(id=row["id"], path=path, attempts=row["attempts"] + 1)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, worker: str) -> int:
+        """Extend every lease ``worker`` holds. Returns how many were extended."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE status = 'leased' AND worker = ?",
+                (time.time() + self.lease_seconds, worker),
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def complete(self, task: Task, worker: str, result: dict, new_path: str | None = None) -> bool:
+        """Record a finished file. Returns False if another worker's result was kept.
+
+        The first result wins, except that a rename always replaces a result
+        without one: a worker whose lease expired mid-file may still have
+        renamed it, and that rename must reach the undo batch.
+        """
+        if new_path is not None:
+            new_path = self._relative(new_path) or os.path.abspath(new_path)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', worker = NULL, lease_expires = NULL, "
+                "result = ?, new_path = ?, merged = 0 WHERE id = ? "
+                "AND (status != 'done' OR (? IS NOT NULL AND new_path IS NULL))",
+                (json.dumps(result, ensure_ascii=False), new_path, task.id, new_path),
+            )
+            if cursor.rowcount == 0:
+                logging.warning(f"{task.path} was already completed by another worker ({worker} result dropped)")
+                return False
+            return True
+        finally:
+            conn.close()
+
+    def counts(self) -> dict[str, int]:
+        conn = self._connect()
+        try:
+            counts = {"pending": 0, "leased": 0, "done": 0}
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+                counts[row["status"]] = row["n"]
+            return counts
+        finally:
+            conn.close()
+
+    def results(self) -> list[dict]:
+        """Recorded FileResult dicts of all finished files, in queue order.
+
+        Paths are resolved locally, whichever host recorded the result.
+        """
+        conn = self._connect()
+        try:
+            results = []
+            for row in conn.execute("SELECT path, new_path, result FROM tasks WHERE status = 'done' ORDER BY id"):
+                result = json.loads(row["result"])
+                result["file"] = self._resolve(row["path"])
+                if row["new_path"] is not None:
+                    result["new_path"] = self._resolve(row["new_path"])
+                results.append(result)
+            return results
+        finally:
+            conn.close()
+
+    def finalize(self, undo_log_path: str) -> bool:
+        """Write the renames of the drained queue to ``undo_log_path`` as one batch.
+
+        Only the first worker to find the queue drained writes the batch; the
+        queue's write lock keeps other workers out meanwhile. Each task is
+        merged once, so files added to the queue after an earlier merge are
+        appended to the same batch when the queue drains again. Returns True
+        if this call merged anything.
+        """
+        conn = self._transaction(self._connect())
+        try:
+            outstanding = conn.execute(
+                "SELECT COUNT(*) AS n FROM tasks WHERE status != 'done'").fetchone()["n"]
+            unmerged = conn.execute(
+                "SELECT id, path, new_path FROM tasks WHERE status = 'done' AND merged = 0 ORDER BY id").fetchall()
+            if outstanding or not unmerged:
+                conn.execute("ROLLBACK")
+                return False
+            batch_id = conn.execute("SELECT value FROM meta WHERE key = 'batch_id'").fetchone()
+            renames = [(self._resolve(row["path"]), self._resolve(row["new_path"]))
+                       for row in unmerged if row["new_path"] is not None]
+            if batch_id is not None and renames:
+                write_batch(undo_log_path, batch_id["value"], renames)
+            conn.executemany("UPDATE tasks SET merged = 1 WHERE id = ?", [(row["id"],) for row in unmerged])
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class LeaseHeartbeat:
+    """Background thread renewing a worker's leases while it processes files."""
+
+    def __init__(self, queue: LeaseQueue, worker: str):
+        self._queue = queue
+        self._worker = worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        interval = self._queue.lease_seconds / 3
+        while not self._stop.wait(interval):
+            try:
+                self._queue.renew(self._worker)
+            except sqlite3.Error as e:
+                logging.warning(f"Could not renew leases: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -7,21 +7,45 @@ Supports structured JSON output for programmatic consumption.
 """
 from __future__ import annotations
 
+import copy
+import hashlib
+import io
 import os
 import sys
 import json
 import argparse
 import logging
+import multiprocessing
+import queue as queue_mod
+import sqlite3
+import tempfile
+import threading
+import time
 import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass, field, asdict
 from logging.handlers import RotatingFileHandler
-from typing import Optional
+from typing import Iterator, Optional
 
 from rich.console import Console
 
-from _config_loader import load_yaml_config
-from _ai_processing import extract_metadata
-from _pdf_utils import extract_content
+from _config_loader import load_company_names, load_yaml_config
+from _ai_processing import extract_metadata, DocumentMetadata, enable_client_pool, prompt_cache_stats, _sync_client
+from _pdf_utils import (
+    PAGE_SELECTIONS, REGION_PRESETS, TEXT_BACKENDS, extract_content, parse_region, ExtractionResult, PaddleOCRBridge,
+    triage_pdf,
+)
+from _pipeline import run_pipeline, PipelineItem
+from _batch_api import BATCH_PROVIDERS, BatchApiError, run_batch_api
+from _checkpoint import CheckpointJournal, restore_extraction
+from _rate_limit import rate_limit_stats
+from _jsonrpc import APPLICATION_ERROR, INVALID_PARAMS, JsonRpcServer, RpcError
+from _job_service import DEFAULT_PORT, SERVICE_FILE_NAME, Job, JobQueue, make_job_server, new_token, write_service_file
+from _deadlines import CancelledError, get_stage_timeouts, run_stage
+from _cache import ResultCache, cache_path, get_cache_settings, open_cache
+from _similarity import find_near_duplicate, remember_document
+from _templates import learn_template, match_template, template_stats
+from _work_queue import LeaseHeartbeat, LeaseQueue, default_worker_id, get_queue_settings
 from _document_processing import (
     harmonize_company_name,
     parse_document_date,
@@ -30,6 +54,8 @@ from _document_processing import (
     generate_batch_id,
     list_undo_batches,
     write_empty_batch,
+    tag_batch,
+    get_batch_renames,
 )
 from _utils import ExitCode, normalize_unicode
 from _version import VERSION
@@ -73,6 +99,7 @@ class FileResult:
     doc_type: Optional[str] = None
     provider: Optional[str] = None
     model: Optional[str] = None
+    template: Optional[str] = None  # vendor template that read the metadata instead of the AI
 
     def to_dict(self) -> dict:
         return asdict(self)
@@ -89,9 +116,13 @@ class BatchResult:
     files: list[FileResult] = field(default_factory=list)
     dry_run: bool = False
     batch_id: Optional[str] = None
+    rate_limit: Optional[dict] = None
+    cache: Optional[dict] = None
+    prompt_cache: Optional[dict] = None
 
-    def to_json(self) -> str:
-        d = {
+    def summary(self) -> dict:
+        """Everything except the per-file results (the NDJSON summary record)."""
+        return {
             "success": self.success,
             "total": self.total,
             "renamed": self.renamed,
@@ -99,9 +130,18 @@ class BatchResult:
             "failed": self.failed,
             "dry_run": self.dry_run,
             "batch_id": self.batch_id,
-            "files": [f.to_dict() for f in self.files],
+            "rate_limit": self.rate_limit,
+            "cache": self.cache,
+            "prompt_cache": self.prompt_cache,
         }
-        return json.dumps(d, indent=2, ensure_ascii=True)
+
+    def to_dict(self) -> dict:
+        d = self.summary()
+        d["files"] = [f.to_dict() for f in self.files]
+        return d
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=True)
 
 
 @dataclass
@@ -143,14 +183,16 @@ class UndoResult:
     files: list[UndoFileResult] = field(default_factory=list)
     batch_id: Optional[str] = None
 
-    def to_json(self) -> str:
-        d = {
+    def to_dict(self) -> dict:
+        return {
             "success": self.success,
             "restored": self.restored,
             "failed": self.failed,
             "files": [f.to_dict() for f in self.files],
         }
-        return json.dumps(d, indent=2, ensure_ascii=True)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=True)
 
 
 @dataclass
@@ -167,7 +209,7 @@ class UndoBatchListResult:
 # ---------------------------------------------------------------------------
 
 def resolve_output_format(args: argparse.Namespace) -> str:
-    """Determine output format: 'json' or 'text'.
+    """Determine output format: 'json', 'ndjson' or 'text'.
 
     Priority:
     1. Explicit --output flag always wins
@@ -191,6 +233,11 @@ def resolve_output_format(args: argparse.Namespace) -> str:
     return "text"
 
 
+def emit_ndjson(record_type: str, payload: dict) -> None:
+    """Write one NDJSON record (``{"type": ..., **payload}``) to stdout and flush it."""
+    print(json.dumps({"type": record_type, **payload}, ensure_ascii=True), flush=True)
+
+
 # ---------------------------------------------------------------------------
 # Structured error exit
 # ---------------------------------------------------------------------------
@@ -210,6 +257,13 @@ def error_exit(
             suggestion=suggestion,
         )
         print(result.to_json())
+    elif output_format == "ndjson":
+        result = ErrorResult(
+            error_type=error_type,
+            message=message,
+            suggestion=suggestion,
+        )
+        emit_ndjson("error", asdict(result))
     else:
         console.print(f"[red]{message}[/red]")
         if suggestion:
@@ -284,16 +338,46 @@ def get_base_directory(config_path: str | None = None):
 # File collection
 # ---------------------------------------------------------------------------
 
-def collect_pdf_files(input_paths: list, recursive: bool = False) -> list:
-    """Collect all PDF files from input paths."""
-    pdf_files = []
+def shard_of(key: str, count: int) -> int:
+    """1-based shard (of ``count``) that a file belongs to.
+
+    ``key`` is the file's path relative to the folder it was found in, so
+    the assignment is the same on every machine and every run, whatever the
+    share is mounted as.
+    """
+    digest = hashlib.sha1(normalize_unicode(key).replace("\\", "/").encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def shard_group(input_paths: list, count: int, name: str | None = None) -> str:
+    """ID shared by all shards of one split run.
+
+    ``name`` (``--shard-group``) is used as is. Otherwise the ID is derived
+    from the last component of each path argument and the shard count, not
+    the full paths, so hosts that mount the share under different paths
+    (``\\\\nas\\scans\\archive``, ``/mnt/scans/archive``) agree on it.
+    """
+    if name:
+        return name
+    roots = (normalize_unicode(p.strip('"').rstrip('\\').rstrip('/')).replace("\\", "/") for p in input_paths)
+    names = sorted(root.rsplit("/", 1)[-1] for root in roots)
+    return hashlib.sha1(("\n".join(names) + f"\n{count}").encode("utf-8")).hexdigest()[:12]
+
+
+def collect_pdf_files(input_paths: list, recursive: bool = False, shard: tuple[int, int] | None = None) -> list:
+    """Collect all PDF files from input paths.
+
+    With ``shard=(i, n)`` only the files whose path hash falls into shard
+    ``i`` of ``n`` are kept (see ``shard_of``).
+    """
+    found = []  # (path, shard key)
     for input_path in input_paths:
         # Strip trailing quotes/backslashes mangled by Windows shell escaping
         # e.g. "C:\folder\" becomes C:\folder" due to \" escape
         input_path = normalize_unicode(input_path.strip('"').rstrip('\\').rstrip('/'))
         if os.path.isfile(input_path):
             if input_path.lower().endswith(PDF_EXTENSION):
-                pdf_files.append(input_path)
+                found.append((input_path, os.path.basename(input_path)))
             else:
                 logging.warning(f"Not a PDF: {input_path}")
         elif os.path.isdir(input_path):
@@ -301,15 +385,21 @@ def collect_pdf_files(input_paths: list, recursive: bool = False) -> list:
                 for root, _, files in os.walk(input_path):
                     for f in files:
                         if f.lower().endswith(PDF_EXTENSION):
-                            pdf_files.append(os.path.join(root, f))
+                            fp = os.path.join(root, f)
+                            found.append((fp, os.path.relpath(fp, input_path)))
             else:
                 for f in os.listdir(input_path):
                     fp = os.path.join(input_path, f)
                     if os.path.isfile(fp) and f.lower().endswith(PDF_EXTENSION):
-                        pdf_files.append(fp)
+                        found.append((fp, f))
         else:
             logging.error(f"Not a valid file or folder: {input_path}")
-    return pdf_files
+    if shard:
+        index, count = shard
+        kept = [path for path, key in found if shard_of(key, count) == index]
+        logging.info(f"Shard {index}/{count}: {len(kept)} of {len(found)} files")
+        return kept
+    return [path for path, _ in found]
 
 
 # ---------------------------------------------------------------------------
@@ -326,7 +416,53 @@ def _step(con: Console, icon: str, color: str, msg: str, detail: str = ""):
 # Core PDF processing
 # ---------------------------------------------------------------------------
 
-def process_pdf(
+def _new_file_result(pdf_path: str, config: dict) -> FileResult:
+    """Create the initial (failed) FileResult for a PDF."""
+    return FileResult(
+        file=normalize_unicode(os.path.abspath(pdf_path).replace("\\", "/")),
+        status="failed",
+        provider=config["ai"]["provider"],
+        model=config["ai"]["model"],
+    )
+
+
+def _report_extraction(
+    result: FileResult,
+    extraction: ExtractionResult,
+    pdf_path: str,
+    output: Console | None = None,
+) -> bool:
+    """Record extraction warnings and steps. Returns False if nothing was extracted."""
+    logging.info(f"Sources: {extraction.sources} | Quality: {extraction.quality_score:.2f}")
+
+    result.warnings = list(extraction.warnings)
+
+    if output:
+        q = f"{extraction.quality_score:.2f}"
+        _step(output, "\u2713", "green", "Text extracted", f"quality {q}")
+        if "ocr" in extraction.sources:
+            _step(output, "\u2713", "green", "PaddleOCR")
+        if "vision" in extraction.sources:
+            _step(output, "\u2713", "green", "Vision", "page images")
+        for w in extraction.warnings:
+            _step(output, "\u26a0", "yellow", w)
+
+    # "vision" in sources means page images were sent (the staged pipeline
+    # drops them after the AI stage to free memory). A scan without a text
+    # layer has only OCR text.
+    if (not extraction.text.strip() and not extraction.ocr_text.strip()
+            and not extraction.images and "vision" not in extraction.sources):
+        logging.warning(f"No content extracted from {pdf_path}")
+        if output:
+            _step(output, "\u2717", "red", "No content extracted")
+        result.error = "No content extracted"
+        return False
+    return True
+
+
+def _apply_metadata(
+    result: FileResult,
+    metadata: DocumentMetadata | None,
     pdf_path: str,
     config: dict,
     yaml_path: str,
@@ -335,110 +471,610 @@ def process_pdf(
     output: Console | None = None,
     batch_id: str = None,
 ) -> FileResult:
-    """Process a single PDF file. Returns a FileResult with status and metadata."""
-    logging.info(f"Processing {pdf_path}")
-    provider = config["ai"]["provider"]
-    model = config["ai"]["model"]
+    """Harmonize the AI metadata and rename the file, filling in ``result``."""
+    if metadata is None:
+        logging.warning(f"Could not extract metadata from {pdf_path}")
+        if output:
+            _step(output, "\u2717", "red", "AI returned no metadata")
+        result.error = "AI returned no metadata"
+        return result
 
-    result = FileResult(
-        file=normalize_unicode(os.path.abspath(pdf_path).replace("\\", "/")),
-        status="failed",
-        provider=provider,
-        model=model,
+    if output and result.template:
+        _step(output, "\u2713", "green", "Template", result.template)
+    elif output:
+        _step(output, "\u2713", "green", "AI", f"{result.provider} / {result.model}")
+
+    # Harmonize + rename
+    company_name = harmonize_company_name(metadata.company_name, yaml_path, config)
+    parsed_date = parse_document_date(metadata.document_date)
+
+    result.company = company_name
+    result.date = parsed_date.isoformat() if parsed_date else None
+    result.doc_type = metadata.document_type
+
+    rename_result = rename_invoice(
+        pdf_path, company_name, parsed_date, metadata.document_type,
+        config, undo_log_path=undo_log_path, batch_id=batch_id, dry_run=dry_run,
     )
 
+    if rename_result is None:
+        if output:
+            _step(output, "\u00b7", "dim", "Already named correctly")
+        result.status = "skipped"
+        return result
+
+    new_name = os.path.basename(rename_result)
+    result.status = "renamed"
+    result.new_name = new_name
+    result.new_path = os.path.abspath(rename_result).replace("\\", "/")
+
+    if output:
+        arrow = "~" if dry_run else "\u2192"
+        _step(output, arrow, "cyan", new_name)
+    return result
+
+
+def _request_metadata(
+    result: FileResult,
+    extraction: ExtractionResult,
+    pdf_path: str,
+    config: dict,
+    output: Console | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> tuple[DocumentMetadata | None, bool]:
+    """Ask the LLM for a file's metadata, unless a near-duplicate seen before
+    or a vendor template supplies it. Returns ``(metadata, from_llm)``.
+
+    Reused metadata is flagged in ``result.warnings``, template reads in
+    ``result.template``; answers from the LLM are added to the similarity
+    index for later files.
+    """
+    if cache is not None:
+        duplicate = find_near_duplicate(cache, extraction, config)
+        if duplicate is not None:
+            metadata, note = duplicate
+            result.warnings.append(note)
+            if output:
+                _step(output, "\u26a0", "yellow", note)
+            return metadata, False
+        matched = match_template(cache, extraction, config)
+        if matched is not None:
+            metadata, result.template = matched
+            return metadata, False
+    metadata = run_stage("ai", extract_metadata, extraction, config, cache=cache,
+                         timeout=get_stage_timeouts(config)["ai"], cancel=cancel)
+    if cache is not None:
+        remember_document(cache, extraction, metadata, pdf_path, config)
+    return metadata, metadata is not None
+
+
+def _report_failure(result: FileResult, pdf_path: str, error: Exception,
+                    output: Console | None = None) -> FileResult:
+    """Record an unexpected processing error on ``result``."""
+    logging.error(f"Error processing {pdf_path}: {error}")
+    logging.debug(traceback.format_exc())
+    if output:
+        _step(output, "\u2717", "red", str(error))
+    result.error = str(error)
+    return result
+
+
+def process_pdf(
+    pdf_path: str,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    dry_run: bool = False,
+    output: Console | None = None,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> FileResult:
+    """Process a single PDF file. Returns a FileResult with status and metadata.
+
+    With a ``checkpoint`` journal every stage outcome is recorded, and stages
+    already recorded for this file (``rename --resume``) are not repeated.
+    Each stage is bounded by its ``timeouts`` entry; setting ``cancel`` stops
+    the file at the next stage boundary (or while waiting on a stage), and
+    it fails with error "Cancelled".
+    """
+    logging.info(f"Processing {pdf_path}")
+    result = _new_file_result(pdf_path, config)
+    saved = checkpoint.lookup(pdf_path) if checkpoint else {}
+
     try:
         # Step 1: Extract content
-        extraction = extract_content(pdf_path, config)
-        logging.info(f"Sources: {extraction.sources} | Quality: {extraction.quality_score:.2f}")
+        if "extracted" in saved:
+            extraction = restore_extraction(
+                saved["extracted"], pdf_path, config, with_images="metadata" not in saved,
+            )
+        else:
+            extraction = extract_content(pdf_path, config, ocr_bridge=ocr_bridge, cancel=cancel, cache=cache)
+            if checkpoint:
+                checkpoint.record_extraction(pdf_path, extraction)
+
+        if _report_extraction(result, extraction, pdf_path, output):
+            # Step 2: AI metadata extraction
+            from_llm = False
+            if "metadata" in saved:
+                metadata = DocumentMetadata(**saved["metadata"])
+            else:
+                metadata, from_llm = _request_metadata(result, extraction, pdf_path, config,
+                                                       output=output, cancel=cancel, cache=cache)
+                if checkpoint and metadata is not None:
+                    checkpoint.record_metadata(pdf_path, metadata)
+
+            # Step 3: Harmonize + rename (not interrupted once started)
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            _apply_metadata(
+                result, metadata, pdf_path, config, yaml_path, undo_log_path,
+                dry_run=dry_run, output=output, batch_id=batch_id,
+            )
+            if from_llm and cache is not None:
+                learn_template(cache, extraction, metadata, result.company, pdf_path, config)
 
-        result.warnings = extraction.warnings
+    except Exception as e:
+        _report_failure(result, pdf_path, e, output)
 
-        if output:
-            q = f"{extraction.quality_score:.2f}"
-            _step(output, "\u2713", "green", "Text extracted", f"quality {q}")
-            if "ocr" in extraction.sources:
-                _step(output, "\u2713", "green", "PaddleOCR")
-            if "vision" in extraction.sources:
-                _step(output, "\u2713", "green", "Vision", "page images")
-            for w in extraction.warnings:
-                _step(output, "\u26a0", "yellow", w)
-
-        if not extraction.text.strip() and not extraction.images:
-            logging.warning(f"No content extracted from {pdf_path}")
-            if output:
-                _step(output, "\u2717", "red", "No content extracted")
-            result.error = "No content extracted"
-            return result
-
-        # Step 2: AI metadata extraction
-        metadata = extract_metadata(extraction, config)
-        if metadata is None:
-            logging.warning(f"Could not extract metadata from {pdf_path}")
-            if output:
-                _step(output, "\u2717", "red", "AI returned no metadata")
-            result.error = "AI returned no metadata"
-            return result
+    if checkpoint:
+        checkpoint.record_result(pdf_path, result.to_dict())
+    return result
 
-        if output:
-            _step(output, "\u2713", "green", "AI", f"{provider} / {model}")
 
-        # Step 3: Harmonize + rename
-        company_name = harmonize_company_name(metadata.company_name, yaml_path, config)
-        parsed_date = parse_document_date(metadata.document_date)
+def _finish_pipeline_item(
+    item: PipelineItem,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    dry_run: bool = False,
+    output: Console | None = None,
+    batch_id: str = None,
+    checkpoint: CheckpointJournal | None = None,
+    cache: ResultCache | None = None,
+) -> FileResult:
+    """Turn a PipelineItem that left the AI stage into a FileResult (harmonize + rename).
+
+    LLM answers then teach the supplier's vendor template (see _templates.py).
+    """
+    result = _new_file_result(item.pdf_path, config)
+    result.template = item.template
+
+    try:
+        if item.extraction is None:
+            raise RuntimeError(item.error or "Text extraction failed")
+        # Batch API runs journal extractions (and restored answers) themselves
+        saved = checkpoint.lookup(item.pdf_path) if checkpoint else {}
+        if checkpoint and "extracted" not in saved:
+            checkpoint.record_extraction(item.pdf_path, item.extraction)
+        if _report_extraction(result, item.extraction, item.pdf_path, output):
+            result.warnings.extend(item.warnings)
+            if item.error:
+                raise RuntimeError(item.error)
+            if checkpoint and item.metadata is not None and "metadata" not in saved:
+                checkpoint.record_metadata(item.pdf_path, item.metadata)
+            _apply_metadata(
+                result, item.metadata, item.pdf_path, config, yaml_path, undo_log_path,
+                dry_run=dry_run, output=output, batch_id=batch_id,
+            )
+            if item.from_llm and cache is not None:
+                learn_template(cache, item.extraction, item.metadata, result.company, item.pdf_path, config)
+
+    except Exception as e:
+        _report_failure(result, item.pdf_path, e, output)
+
+    if checkpoint:
+        checkpoint.record_result(item.pdf_path, result.to_dict())
+    return result
+
+
+def _process_files_sequential(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    dry_run: bool = False,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Run process_pdf for one file after another. Yields ``(index, FileResult)``."""
+    total = len(pdf_files)
+    for i, pdf_path in enumerate(pdf_files):
+        if cancel is not None and cancel.is_set():
+            return
+        filename = normalize_unicode(os.path.basename(pdf_path))
+        if show_text:
+            console.print(f"[bold dim]\\[{i + 1}/{total}][/] [bold]{filename}[/]")
+        elif show_progress:
+            # Progress to stderr so it doesn't pollute JSON stdout
+            print(f"Processing [{i + 1}/{total}] {filename}", file=sys.stderr)
+
+        yield i, process_pdf(
+            pdf_path, config, yaml_path, undo_log_path,
+            dry_run=dry_run, output=console if show_text else None, batch_id=batch_id,
+            ocr_bridge=ocr_bridge, checkpoint=checkpoint, cancel=cancel, cache=cache,
+        )
 
-        result.company = company_name
-        result.date = parsed_date.isoformat() if parsed_date else None
-        result.doc_type = metadata.document_type
 
-        rename_result = rename_invoice(
-            pdf_path, company_name, parsed_date, metadata.document_type,
-            config, undo_log_path=undo_log_path, batch_id=batch_id, dry_run=dry_run,
+def _process_buffered(
+    pdf_path: str,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    show_text: bool,
+    **process_kwargs,
+) -> tuple[FileResult, Console | None]:
+    """process_pdf on a worker thread; in text mode its steps go to a private buffer."""
+    buffer = None
+    if show_text:
+        buffer = Console(
+            file=io.StringIO(),
+            force_terminal=console.is_terminal,
+            color_system=console.color_system,
+            width=console.width,
         )
+    file_result = process_pdf(pdf_path, config, yaml_path, undo_log_path, output=buffer, **process_kwargs)
+    return file_result, buffer
 
-        if rename_result is None:
-            if output:
-                _step(output, "\u00b7", "dim", "Already named correctly")
-            result.status = "skipped"
-            return result
 
-        new_name = os.path.basename(rename_result)
-        result.status = "renamed"
-        result.new_name = new_name
-        result.new_path = os.path.abspath(rename_result).replace("\\", "/")
+def _report_completed(pdf_path: str, done: int, total: int, buffer: Console | None,
+                      show_text: bool, show_progress: bool) -> None:
+    """Print a finished file's progress line (and its buffered steps in text mode)."""
+    filename = normalize_unicode(os.path.basename(pdf_path))
+    if show_text:
+        console.print(f"[bold dim]\\[{done}/{total}][/] [bold]{filename}[/]")
+        console.file.write(buffer.file.getvalue())
+        console.file.flush()
+    elif show_progress:
+        print(f"Processing [{done}/{total}] {filename}", file=sys.stderr)
 
-        if output:
-            arrow = "~" if dry_run else "\u2192"
-            _step(output, arrow, "cyan", new_name)
-        return result
 
-    except Exception as e:
-        logging.error(f"Error processing {pdf_path}: {e}")
-        logging.debug(traceback.format_exc())
-        if output:
-            _step(output, "\u2717", "red", str(e))
-        result.error = str(e)
-        return result
+def _process_files_parallel(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    jobs: int,
+    dry_run: bool = False,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Run process_pdf for many files on a thread pool.
+
+    Extraction, OCR and LLM latency of different files overlap. Yields
+    ``(index, FileResult)`` in completion order. In text mode each worker
+    renders its steps into a private buffer that is printed as one block
+    when the file completes, so output from concurrent files never interleaves.
+    """
+    total = len(pdf_files)
+
+    def _work(pdf_path: str) -> tuple[FileResult, Console | None]:
+        return _process_buffered(
+            pdf_path, config, yaml_path, undo_log_path, show_text,
+            dry_run=dry_run, batch_id=batch_id, ocr_bridge=ocr_bridge, checkpoint=checkpoint,
+            cancel=cancel, cache=cache,
+        )
+
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        futures = {pool.submit(_work, pdf_path): idx for idx, pdf_path in enumerate(pdf_files)}
+        for done, future in enumerate(as_completed(futures), 1):
+            idx = futures[future]
+            file_result, buffer = future.result()
+            _report_completed(pdf_files[idx], done, total, buffer, show_text, show_progress)
+            yield idx, file_result
+    finally:
+        # A consumer that stops early (cancel) drops the files not yet started
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _process_files_triaged(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    jobs: int = 1,
+    dry_run: bool = False,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Process cheap files first and OCR/vision files in a separate slow lane.
+
+    Each file is triaged (page count, page 1 text layer) before it is
+    queued. Text-native files go to the fast lane with ``jobs`` workers.
+    Files expected to need OCR or vision go to the slow lane with
+    ``performance.slow_lane_workers`` workers, so a few scans cannot hold up
+    the rest of the batch. Files are queued as soon as they are triaged, and
+    results are yielded as ``(index, FileResult)`` in completion order.
+    """
+    total = len(pdf_files)
+    slow_jobs = max(1, int(config.get("performance", {}).get("slow_lane_workers", 1)))
+    fast_pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="fast-lane")
+    slow_pool = ThreadPoolExecutor(max_workers=slow_jobs, thread_name_prefix="slow-lane")
+    finished: queue_mod.Queue = queue_mod.Queue()
+    deferred = 0
+
+    def _submit(pool: ThreadPoolExecutor, idx: int) -> None:
+        future = pool.submit(
+            _process_buffered, pdf_files[idx], config, yaml_path, undo_log_path, show_text,
+            dry_run=dry_run, batch_id=batch_id, ocr_bridge=ocr_bridge, checkpoint=checkpoint,
+            cancel=cancel, cache=cache,
+        )
+        future.add_done_callback(lambda f: finished.put((idx, f)))
+
+    def _drain(block: bool) -> Iterator[tuple[int, FileResult]]:
+        nonlocal done
+        while done < submitted:
+            try:
+                idx, future = finished.get(block=block)
+            except queue_mod.Empty:
+                return
+            done += 1
+            file_result, buffer = future.result()
+            _report_completed(pdf_files[idx], done, total, buffer, show_text, show_progress)
+            yield idx, file_result
+
+    done = submitted = 0
+    try:
+        for idx, pdf_path in enumerate(pdf_files):
+            if cancel is not None and cancel.is_set():
+                break
+            triage = triage_pdf(pdf_path, config)
+            if triage.expensive:
+                deferred += 1
+                logging.info(f"Triage: {os.path.basename(pdf_path)} deferred to the slow lane "
+                             f"({triage.page_count} pages, text quality {triage.quality_score:.2f})")
+            _submit(slow_pool if triage.expensive else fast_pool, idx)
+            submitted += 1
+            yield from _drain(block=False)
+        logging.info(f"Triage: {total - deferred} files in the fast lane, {deferred} in the slow lane")
+        yield from _drain(block=True)
+    finally:
+        # A consumer that stops early (cancel) drops the files not yet started
+        fast_pool.shutdown(wait=True, cancel_futures=True)
+        slow_pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _process_files_pipeline(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    dry_run: bool = False,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Process files through the staged pipeline (see _pipeline.py).
+
+    Extraction, rendering, OCR and AI run as separate stages with their own
+    worker counts from ``config["performance"]``. Harmonizing and renaming
+    happen here, on the calling thread, as items complete. Yields
+    ``(index, FileResult)`` in completion order.
+    """
+    total = len(pdf_files)
+
+    for done, item in enumerate(run_pipeline(pdf_files, config, ocr_bridge=ocr_bridge, cancel=cancel, cache=cache), 1):
+        filename = normalize_unicode(os.path.basename(item.pdf_path))
+        if show_text:
+            console.print(f"[bold dim]\\[{done}/{total}][/] [bold]{filename}[/]")
+        elif show_progress:
+            print(f"Processing [{done}/{total}] {filename}", file=sys.stderr)
+
+        yield item.index, _finish_pipeline_item(
+            item, config, yaml_path, undo_log_path,
+            dry_run=dry_run, output=console if show_text else None, batch_id=batch_id,
+            checkpoint=checkpoint, cache=cache,
+        )
+
+
+def _process_files_batch_api(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    jobs: int = 1,
+    dry_run: bool = False,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    checkpoint: CheckpointJournal | None = None,
+    cancel: threading.Event | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Process files through the provider batch API (see _batch_api.py).
+
+    All files are extracted locally first, then the LLM requests go out as
+    one or more provider batches. Renames are applied once results are in;
+    yields ``(index, FileResult)`` in input order. Submitted batches are
+    journaled in ``checkpoint``, so ``--resume`` collects them instead of
+    submitting again.
+    """
+    total = len(pdf_files)
+
+    def _on_status(provider_batch: str, status: str, done: int, requests: int) -> None:
+        if show_text:
+            console.print(f"[dim]Batch {provider_batch}: {status} ({done}/{requests})[/]")
+        elif show_progress:
+            print(f"Batch {provider_batch}: {status} ({done}/{requests})", file=sys.stderr)
+
+    if show_text:
+        console.print(f"[dim]Extracting {total} files for batch submission...[/]")
+    with tempfile.TemporaryDirectory(prefix="autorename-batch-") as work_dir:
+        items = run_batch_api(
+            pdf_files, config, work_dir, ocr_bridge=ocr_bridge, jobs=jobs, on_status=_on_status,
+            cache=cache, checkpoint=checkpoint,
+        )
+
+    for done, item in enumerate(items, 1):
+        if cancel is not None and cancel.is_set():
+            return
+        filename = normalize_unicode(os.path.basename(item.pdf_path))
+        if show_text:
+            console.print(f"[bold dim]\\[{done}/{total}][/] [bold]{filename}[/]")
+        elif show_progress:
+            print(f"Processing [{done}/{total}] {filename}", file=sys.stderr)
+        yield item.index, _finish_pipeline_item(
+            item, config, yaml_path, undo_log_path,
+            dry_run=dry_run, output=console if show_text else None, batch_id=batch_id,
+            checkpoint=checkpoint, cache=cache,
+        )
+
+
+def _process_files_queue(
+    queue: LeaseQueue,
+    worker_id: str,
+    config: dict,
+    yaml_path: str,
+    jobs: int = 1,
+    batch_id: str = None,
+    ocr_bridge: PaddleOCRBridge | None = None,
+    show_text: bool = False,
+    show_progress: bool = False,
+    poll_interval: float = 5.0,
+    cache: ResultCache | None = None,
+) -> Iterator[tuple[int, FileResult]]:
+    """Claim files from a shared lease queue and process them until it is drained.
+
+    Up to ``jobs`` files are leased at once; a heartbeat keeps the leases
+    alive while they are processed. Once nothing is left to claim, the worker
+    keeps polling while other workers still hold leases, so it can pick up
+    files whose worker died. Renames are recorded in the queue rather than
+    a local undo log. Yields ``(queue index, FileResult)`` for this worker's files.
+    """
+    counts = queue.counts()
+    total = sum(counts.values())
+
+    def _work(task):
+        file_result, buffer = _process_buffered(
+            task.path, config, yaml_path, None, show_text, batch_id=batch_id, ocr_bridge=ocr_bridge,
+            cache=cache,
+        )
+        renamed_to = file_result.new_path if file_result.status == "renamed" else None
+        queue.complete(task, worker_id, file_result.to_dict(), new_path=renamed_to)
+        return task, file_result, buffer
+
+    with LeaseHeartbeat(queue, worker_id), ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = set()
+        while True:
+            while len(running) < jobs:
+                task = queue.claim(worker_id)
+                if task is None:
+                    break
+                running.add(pool.submit(_work, task))
+            if not running:
+                counts = queue.counts()
+                if counts["pending"] + counts["leased"] == 0:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, file_result, buffer = future.result()
+                _report_completed(task.path, queue.counts()["done"], total, buffer, show_text, show_progress)
+                yield task.index, file_result
+
+
+def _process_files(
+    pdf_files: list,
+    config: dict,
+    yaml_path: str,
+    undo_log_path: str,
+    jobs: int = 1,
+    batch_api: bool = False,
+    **mode_kwargs,
+) -> Iterator[tuple[int, FileResult]]:
+    """Pick the processing mode for a run and yield ``(index, FileResult)`` from it."""
+    if batch_api:
+        return _process_files_batch_api(pdf_files, config, yaml_path, undo_log_path, jobs=jobs, **mode_kwargs)
+    if config.get("performance", {}).get("pipeline", False):
+        if jobs > 1:
+            # --jobs sizes the stages that scale with it: text extraction and LLM requests
+            config = {**config, "performance": {**config.get("performance", {}),
+                                                "extract_workers": jobs, "ai_workers": jobs}}
+        return _process_files_pipeline(pdf_files, config, yaml_path, undo_log_path, **mode_kwargs)
+    if config.get("performance", {}).get("triage", False) and len(pdf_files) > 1:
+        return _process_files_triaged(
+            pdf_files, config, yaml_path, undo_log_path, min(jobs, len(pdf_files)), **mode_kwargs,
+        )
+    if jobs > 1 and len(pdf_files) > 1:
+        return _process_files_parallel(
+            pdf_files, config, yaml_path, undo_log_path, min(jobs, len(pdf_files)), **mode_kwargs,
+        )
+    return _process_files_sequential(pdf_files, config, yaml_path, undo_log_path, **mode_kwargs)
 
 
 # ---------------------------------------------------------------------------
 # Argument parser with subcommands
 # ---------------------------------------------------------------------------
 
-_KNOWN_SUBCOMMANDS = {"rename", "undo", "config"}
+_KNOWN_SUBCOMMANDS = {"rename", "undo", "config", "cache", "serve"}
 
 EPILOG = """\
 examples:
   autorename-pdf invoice.pdf                Rename a single PDF
   autorename-pdf *.pdf --dry-run            Preview renames without changes
   autorename-pdf ./invoices -r              Recursively process a folder
+  autorename-pdf ./invoices --jobs 4        Process 4 files concurrently
+  autorename-pdf ./archive -r --batch-api   Use the provider batch API (slow, cheaper)
+  autorename-pdf ./archive -r --queue //nas/share/q.db
+                                            Share a run with workers on other hosts
   autorename-pdf -o json *.pdf              JSON output (for scripting)
   autorename-pdf undo                       Reverse last rename
   autorename-pdf config show                Show current config (keys redacted)
   autorename-pdf config validate            Validate config file
+  autorename-pdf serve --stdio              JSON-RPC server on stdin/stdout (GUI)
+  autorename-pdf serve --http --port 8765   Local HTTP job service
+  autorename-pdf cache stats                Show what the result cache holds
 """
 
 
+def _positive_int(value: str) -> int:
+    """argparse type for options that require an integer >= 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _shard_spec(value: str) -> tuple[int, int]:
+    """argparse type for --shard: ``i/n`` with 1 <= i <= n."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n (e.g. 1/4), got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard must be between 1/{max(count, 1)} and {count}/{count}, got {value!r}")
+    return index, count
+
+
 def build_parser() -> argparse.ArgumentParser:
     """Build the argument parser with subcommands."""
     parser = argparse.ArgumentParser(
@@ -458,8 +1094,9 @@ def build_parser() -> argparse.ArgumentParser:
 
     # Global options
     parser.add_argument(
-        "--output", "-o", choices=["text", "json"], default=None,
-        help="Output format (default: auto-detect based on TTY)"
+        "--output", "-o", choices=["text", "json", "ndjson"], default=None,
+        help="Output format (default: auto-detect based on TTY); "
+             "ndjson streams one result per line (rename only)"
     )
     parser.add_argument(
         "--quiet", "-q", action="store_true",
@@ -484,7 +1121,7 @@ def build_parser() -> argparse.ArgumentParser:
     # so we add them to each subparser too for flexibility.
     _shared = argparse.ArgumentParser(add_help=False)
     _shared.add_argument(
-        "--output", "-o", choices=["text", "json"], default=argparse.SUPPRESS,
+        "--output", "-o", choices=["text", "json", "ndjson"], default=argparse.SUPPRESS,
         help=argparse.SUPPRESS,
     )
     _shared.add_argument("--quiet", "-q", action="store_true", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
@@ -533,6 +1170,47 @@ def build_parser() -> argparse.ArgumentParser:
         "--ocr", action="store_true",
         help="Enable PaddleOCR (requires installation via setup.ps1)"
     )
+    rename_parser.add_argument(
+        "--jobs", "-j", type=_positive_int, default=1,
+        help="Number of files to process concurrently (default: 1)"
+    )
+    rename_parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Use the staged pipeline with per-stage workers from the performance config"
+    )
+    rename_parser.add_argument(
+        "--triage", action="store_true",
+        help="Process text-native PDFs first; PDFs needing OCR/vision run in a separate slow lane"
+    )
+    rename_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Neither read nor write the result cache (also turns off dedup and vendor templates, "
+             "which live in it)"
+    )
+    rename_parser.add_argument(
+        "--resume", type=str, default=None, metavar="BATCH_ID",
+        help="Resume an interrupted rename run from its checkpoint (files are taken from the checkpoint)"
+    )
+    rename_parser.add_argument(
+        "--shard", type=_shard_spec, default=None, metavar="I/N",
+        help="Only process shard I of N (files split by a stable path hash, "
+             "e.g. one shard per machine)"
+    )
+    rename_parser.add_argument(
+        "--shard-group", type=str, default=None, metavar="NAME",
+        help="Name shared by all shards of one split run, for \"undo --shards\" "
+             "(default: derived from the folder names and the shard count)"
+    )
+    rename_parser.add_argument(
+        "--queue", type=str, default=None, metavar="PATH",
+        help="Share the work with other workers through a lease queue file (SQLite); "
+             "paths given are added to the queue"
+    )
+    rename_parser.add_argument(
+        "--batch-api", action="store_true",
+        help="Submit LLM requests via the provider batch API (OpenAI, Anthropic); "
+             "cheaper, but results may take hours"
+    )
 
     # --- undo subcommand ---
     undo_parser = subparsers.add_parser(
@@ -557,6 +1235,10 @@ def build_parser() -> argparse.ArgumentParser:
         "--all", action="store_true", dest="undo_all",
         help="Undo all batches (not just the last one)"
     )
+    undo_parser.add_argument(
+        "--shards", action="store_true",
+        help="Also undo the other shards of a rename --shard run"
+    )
 
     # --- config subcommand ---
     config_parser = subparsers.add_parser(
@@ -578,6 +1260,79 @@ def build_parser() -> argparse.ArgumentParser:
         help="Validate configuration and report issues",
     )
 
+    # --- cache subcommand ---
+    cache_parser = subparsers.add_parser(
+        "cache",
+        parents=[_shared],
+        help="Inspect or trim the result cache",
+        description="Manage the cache of extraction results, page OCR and LLM answers (.autorename-cache.sqlite).",
+    )
+    cache_sub = cache_parser.add_subparsers(dest="cache_action")
+
+    cache_sub.add_parser(
+        "stats",
+        parents=[_shared],
+        help="Show entries and size per namespace",
+    )
+    prune_parser = cache_sub.add_parser(
+        "prune",
+        parents=[_shared],
+        help="Drop least recently used entries beyond the size cap",
+    )
+    prune_parser.add_argument(
+        "--max-size-mb", type=_positive_int, default=None,
+        help="Trim to this size instead of cache.max_size_mb"
+    )
+    prune_parser.add_argument(
+        "--older-than", type=float, default=None, metavar="DAYS",
+        help="Also drop entries not used for DAYS days"
+    )
+    clear_parser = cache_sub.add_parser(
+        "clear",
+        parents=[_shared],
+        help="Delete cached results (keeps vendor templates and the near-duplicate index)",
+    )
+    clear_parser.add_argument(
+        "--namespace", default=None,
+        help="Only delete entries of this namespace (extraction, ocr, llm, similarity or templates)"
+    )
+    clear_parser.add_argument(
+        "--all", action="store_true", dest="clear_all",
+        help="Also delete the learned vendor templates and the near-duplicate index"
+    )
+
+    # --- serve subcommand ---
+    serve_parser = subparsers.add_parser(
+        "serve",
+        parents=[_shared],
+        help="Run as a long-lived server (JSON-RPC over stdio, or a localhost HTTP job service)",
+        description="Keep config, company names, LLM client and OCR warm between requests.",
+    )
+    serve_parser.add_argument(
+        "--stdio", action="store_true",
+        help="Speak line-delimited JSON-RPC 2.0 on stdin/stdout"
+    )
+    serve_parser.add_argument(
+        "--http", action="store_true",
+        help="Serve a job queue over HTTP on 127.0.0.1"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help=f"HTTP port (default: {DEFAULT_PORT}, 0 picks a free port)"
+    )
+    serve_parser.add_argument(
+        "--workers", type=_positive_int, default=2,
+        help="Jobs processed at the same time with --http (default: 2)"
+    )
+    serve_parser.add_argument(
+        "--warm-ocr", action="store_true",
+        help="Start PaddleOCR at launch instead of on the first page (when pdf.ocr is enabled)"
+    )
+    serve_parser.add_argument(
+        "--max-requests", type=_positive_int, default=4,
+        help="Requests handled concurrently with --stdio (default: 4)"
+    )
+
     return parser
 
 
@@ -596,7 +1351,8 @@ def _preprocess_argv(argv: list[str] | None = None) -> list[str]:
 
     # Check if any argument is a known subcommand
     # We need to skip flags and their values to find positional args
-    _FLAGS_WITH_VALUE = {"--output", "-o", "--config"}
+    _FLAGS_WITH_VALUE = {"--output", "-o", "--config", "--jobs", "-j", "--resume", "--shard", "--shard-group", "--queue", "--max-requests", "--port", "--workers",
+                         "--max-size-mb", "--older-than", "--namespace"}
     i = 0
     while i < len(argv):
         arg = argv[i]
@@ -623,7 +1379,6 @@ def _preprocess_argv(argv: list[str] | None = None) -> list[str]:
 
 def _redact_config(config: dict) -> dict:
     """Deep-copy config with sensitive values redacted."""
-    import copy
     redacted = copy.deepcopy(config)
     ai = redacted.get("ai", {})
     if ai.get("api_key"):
@@ -673,6 +1428,31 @@ def _validate_config(config: dict | None, config_path: str) -> dict:
             "message": "No model specified, will use provider default",
         })
 
+    text_backend = config.get("pdf", {}).get("text_backend", "pdfplumber")
+    if text_backend not in TEXT_BACKENDS:
+        issues.append({
+            "field": "pdf.text_backend",
+            "level": "warning",
+            "message": f"Unknown text backend '{text_backend}', using pdfplumber. Use: {', '.join(TEXT_BACKENDS)}",
+        })
+
+    page_selection = config.get("pdf", {}).get("page_selection", "first")
+    if page_selection not in PAGE_SELECTIONS:
+        issues.append({
+            "field": "pdf.page_selection",
+            "level": "warning",
+            "message": f"Unknown page selection '{page_selection}', using first. Use: {', '.join(PAGE_SELECTIONS)}",
+        })
+
+    for region in config.get("pdf", {}).get("regions") or []:
+        if parse_region(region) is None:
+            issues.append({
+                "field": "pdf.regions",
+                "level": "warning",
+                "message": f"Invalid page region {region!r}, ignored. Use {', '.join(REGION_PRESETS)} "
+                           "or [top, bottom] fractions of the page height",
+            })
+
     company_name = config.get("company", {}).get("name", "")
     if not company_name or company_name == "Your Company Name":
         issues.append({
@@ -740,6 +1520,64 @@ def _handle_config(args: argparse.Namespace, output_format: str) -> None:
         )
 
 
+def _handle_cache(args: argparse.Namespace, output_format: str) -> None:
+    """Handle `cache stats`, `cache prune` and `cache clear` subcommands."""
+    base_dir = get_base_directory(getattr(args, "config_path", None))
+    config_path = getattr(args, "config_path", None) or os.path.join(base_dir, "config.yaml")
+    config = load_yaml_config(config_path) or {}
+
+    action = getattr(args, "cache_action", None)
+    if action not in ("stats", "prune", "clear"):
+        error_exit(
+            "usage_error",
+            "Missing cache action. Use: cache stats | cache prune | cache clear",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+
+    path = cache_path(config, base_dir)
+    try:
+        cache = ResultCache(path, get_cache_settings(config)["max_size_mb"] * 1024 * 1024)
+        if action == "stats":
+            result = {**cache.stats(), "templates": template_stats(cache)}
+        elif action == "prune":
+            max_mb = getattr(args, "max_size_mb", None)
+            removed = cache.prune(
+                max_bytes=max_mb * 1024 * 1024 if max_mb else None,
+                older_than_days=getattr(args, "older_than", None),
+            )
+            result = {"removed": removed, **cache.stats()}
+        else:
+            removed = cache.clear(getattr(args, "namespace", None), learned=getattr(args, "clear_all", False))
+            result = {"removed": removed, **cache.stats()}
+    except sqlite3.Error as e:
+        error_exit(
+            "general_error",
+            f"Cannot use cache {path}: {e}",
+            exit_code=ExitCode.GENERAL_ERROR,
+            output_format=output_format,
+        )
+
+    if output_format == "json":
+        print(json.dumps(result, indent=2, ensure_ascii=True))
+    else:
+        if "removed" in result:
+            console.print(f"Removed {result['removed']} cache entries.")
+        console.print(f"[bold]{result['path']}[/bold] [dim]{result['entries']} entries, "
+                      f"{result['file_bytes'] / 1048576:.1f} of {result['max_bytes'] / 1048576:.0f} MB[/]")
+        for namespace, ns in result["namespaces"].items():
+            console.print(f"  {namespace}: {ns['entries']} entries, "
+                          f"{ns['bytes'] / 1048576:.1f} MB, {ns['hits']} hits")
+        if result.get("templates"):
+            console.print("[bold]Vendor templates[/bold]")
+        for template in result.get("templates", []):
+            rate = f"{template['hit_rate']:.0%}" if template["hit_rate"] is not None else "-"
+            console.print(f"  {template['name']}: {rate} hit rate "
+                          f"[dim]({template['hits']} read locally, {template['fallbacks']} fallbacks, "
+                          f"confirmed {template['confirmations']}x)[/]")
+    sys.exit(ExitCode.SUCCESS)
+
+
 # ---------------------------------------------------------------------------
 # Undo handler
 # ---------------------------------------------------------------------------
@@ -770,9 +1608,11 @@ def _handle_undo(args: argparse.Namespace, output_format: str) -> None:
             else:
                 for b in batches:
                     status = "[dim]undone[/]" if b["undone"] else "[green]active[/]"
+                    shard = b.get("shard")
+                    shard_str = f"  [dim]shard {shard['index']}/{shard['count']} ({shard['group']})[/]" if shard else ""
                     console.print(
                         f"  {b['batch_id']}  {b['timestamp']}  "
-                        f"{b['file_count']} file(s)  {status}"
+                        f"{b['file_count']} file(s)  {status}{shard_str}"
                     )
         sys.exit(ExitCode.SUCCESS)
 
@@ -781,7 +1621,7 @@ def _handle_undo(args: argparse.Namespace, output_format: str) -> None:
     undo_all = getattr(args, "undo_all", False)
 
     success, fail, per_file_results = undo_renames(
-        undo_log, batch_id=batch_id_arg, undo_all=undo_all
+        undo_log, batch_id=batch_id_arg, undo_all=undo_all, shards=getattr(args, "shards", False)
     )
 
     undo_files = [
@@ -813,6 +1653,217 @@ def _handle_undo(args: argparse.Namespace, output_format: str) -> None:
 # Rename handler
 # ---------------------------------------------------------------------------
 
+def _completed_from_checkpoint(
+    checkpoint: CheckpointJournal,
+    pdf_files: list,
+    config: dict,
+    undo_log_path: str,
+) -> dict[int, FileResult]:
+    """Results of files a resumed batch does not need to process again, by index.
+
+    Besides files journaled as renamed or skipped, this picks up files the
+    undo log shows as renamed when the run died before journaling the result.
+    """
+    undo_renames_done = get_batch_renames(undo_log_path, checkpoint.batch_id) if undo_log_path else {}
+    completed = {}
+    for index, pdf_path in enumerate(pdf_files):
+        recorded = checkpoint.completed_result(pdf_path)
+        if recorded:
+            completed[index] = FileResult(**recorded)
+            continue
+        new_path = undo_renames_done.get(normalize_unicode(pdf_path))
+        if new_path and not os.path.exists(pdf_path) and os.path.exists(new_path):
+            result = _new_file_result(pdf_path, config)
+            result.status = "renamed"
+            result.new_name = os.path.basename(new_path)
+            result.new_path = os.path.abspath(new_path).replace("\\", "/")
+            checkpoint.record_result(pdf_path, result.to_dict())
+            completed[index] = result
+    return completed
+
+
+def _report_batch(batch: BatchResult, output_format: str, quiet: bool = False) -> None:
+    """Print the end-of-run summary of a rename batch in the chosen output format."""
+    if output_format == "json":
+        print(batch.to_json())
+    elif output_format == "ndjson":
+        emit_ndjson("summary", batch.summary())
+    elif not quiet:
+        # Text summary — friendly message when everything was already correct
+        if batch.renamed == 0 and batch.failed == 0 and batch.skipped > 0:
+            label = "file" if batch.skipped == 1 else "files"
+            console.print(f"\n[bold]Done:[/bold] All {batch.skipped} {label} already correctly named")
+        else:
+            parts = []
+            if batch.renamed:
+                parts.append(f"[green]{batch.renamed} renamed[/]")
+            if batch.skipped:
+                parts.append(f"[yellow]{batch.skipped} skipped[/]")
+            if batch.failed:
+                parts.append(f"[red]{batch.failed} failed[/]")
+            console.print(f"\n[bold]Done:[/bold] {', '.join(parts)}")
+        for provider, stats in (batch.rate_limit or {}).items():
+            details = []
+            if "limit" in stats:
+                details.append(
+                    f"concurrency limit {stats['limit']} "
+                    f"(peak {stats['peak_limit']}/{stats['max_limit']}), "
+                    f"{stats['throttled']} of {stats['requests']} requests throttled"
+                )
+            if "paced" in stats:
+                details.append(f"{stats['paced']} requests paced ({stats['paced_seconds']}s)")
+            console.print(f"[dim]{provider}: {'; '.join(details)}[/]")
+        if batch.cache:
+            hits = ", ".join(f"{namespace} {c['hits']} hits / {c['misses']} misses"
+                             for namespace, c in batch.cache.items())
+            console.print(f"[dim]Cache: {hits}[/]")
+        for provider, usage in (batch.prompt_cache or {}).items():
+            if usage["cache_read_tokens"] or usage["cache_write_tokens"]:
+                share = usage["cache_read_tokens"] / usage["input_tokens"] if usage["input_tokens"] else 0.0
+                console.print(f"[dim]{provider} prompt cache: {usage['cache_read_tokens']:,} of "
+                              f"{usage['input_tokens']:,} input tokens read from cache ({share:.0%}), "
+                              f"{usage['cache_write_tokens']:,} written[/]")
+
+
+def _exit_for_batch(batch: BatchResult) -> None:
+    """Exit with the code matching a batch's outcome."""
+    if batch.failed > 0 and batch.failed < batch.total:
+        sys.exit(ExitCode.PARTIAL_FAILURE)
+    elif batch.failed == batch.total:
+        sys.exit(ExitCode.GENERAL_ERROR)
+    sys.exit(ExitCode.SUCCESS)
+
+
+def _apply_rename_overrides(config: dict, args: argparse.Namespace) -> None:
+    """Apply the rename options that override config values (CLI flags or RPC params)."""
+    if getattr(args, "provider", None):
+        config["ai"]["provider"] = args.provider
+    if getattr(args, "model", None):
+        config["ai"]["model"] = args.model
+    if getattr(args, "vision", False):
+        config["pdf"]["vision"] = True
+    if getattr(args, "text_only", False):
+        config["pdf"]["ocr"] = False
+        config["pdf"]["vision"] = False
+    if getattr(args, "ocr", False):
+        config["pdf"]["ocr"] = True
+    if getattr(args, "pipeline", False):
+        config.setdefault("performance", {})["pipeline"] = True
+    if getattr(args, "triage", False):
+        config.setdefault("performance", {})["triage"] = True
+    if getattr(args, "no_cache", False):
+        config.setdefault("cache", {})["enabled"] = False
+
+
+def _handle_rename_queue(
+    args: argparse.Namespace,
+    config: dict,
+    yaml_path: str,
+    output_format: str,
+) -> None:
+    """``rename --queue``: work through a lease queue shared with other workers.
+
+    Paths given on the command line are added to the queue first. Every
+    worker exits once the queue is drained and reports the merged batch.
+    The first one to get there writes all renames into the undo log next
+    to the queue file as one batch.
+    """
+    quiet = getattr(args, "quiet", False)
+    for flag, enabled in (("--resume", getattr(args, "resume", None)),
+                          ("--dry-run", getattr(args, "dry_run", False)),
+                          ("--batch-api", getattr(args, "batch_api", False)),
+                          ("--pipeline", config.get("performance", {}).get("pipeline", False))):
+        if enabled:
+            error_exit(
+                "usage_error",
+                f"--queue cannot be combined with {flag}.",
+                exit_code=ExitCode.USAGE_ERROR,
+                output_format=output_format,
+            )
+
+    queue_path = os.path.abspath(args.queue)
+    settings = get_queue_settings(config)
+    try:
+        queue = LeaseQueue(queue_path, settings["lease_seconds"], settings["max_attempts"])
+        batch_id = queue.batch_id(generate_batch_id())
+        paths = getattr(args, "paths", [])
+        if paths:
+            pdf_files = collect_pdf_files(paths, recursive=getattr(args, "recursive", False))
+            added = queue.add([os.path.abspath(p) for p in pdf_files])
+            logging.info(f"Queued {added} new of {len(pdf_files)} files in {queue_path}")
+        counts = queue.counts()
+    except sqlite3.Error as e:
+        error_exit(
+            "general_error",
+            f"Cannot open work queue {queue_path}: {e}",
+            exit_code=ExitCode.GENERAL_ERROR,
+            output_format=output_format,
+        )
+    except ValueError as e:
+        error_exit(
+            "usage_error",
+            f"Cannot queue files outside the queue's folder: {e}",
+            suggestion="Put the queue file in the folder being renamed or one of its parents.",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+    if not sum(counts.values()):
+        error_exit(
+            "no_files",
+            "The work queue is empty.",
+            suggestion="Add files with: autorename-pdf rename --queue <path> <files_or_folders...>",
+            exit_code=ExitCode.NO_FILES,
+            output_format=output_format,
+        )
+
+    worker_id = default_worker_id()
+    show_text = (output_format == "text" and not quiet)
+    show_progress = (output_format in ("json", "ndjson") and not quiet)
+    if show_text:
+        console.print(f"[bold]Queue[/bold] [dim]{queue_path} ({counts['done']} of "
+                      f"{sum(counts.values())} files done, batch {batch_id})[/]\n")
+
+    ocr_bridge = PaddleOCRBridge(config)
+    cache = open_cache(config, os.path.dirname(yaml_path))
+    processed = 0
+    try:
+        for index, file_result in _process_files_queue(
+            queue, worker_id, config, yaml_path,
+            jobs=getattr(args, "jobs", 1) or 1, batch_id=batch_id, ocr_bridge=ocr_bridge,
+            show_text=show_text, show_progress=show_progress, poll_interval=settings["poll_interval"],
+            cache=cache,
+        ):
+            processed += 1
+            if output_format == "ndjson":
+                emit_ndjson("file", {"index": index, **file_result.to_dict()})
+    finally:
+        ocr_bridge.close()
+
+    undo_log_path = os.path.join(os.path.dirname(queue_path), UNDO_LOG_NAME)
+    queue.finalize(undo_log_path)
+    files = [FileResult(**result) for result in queue.results()]
+    renamed = sum(1 for f in files if f.status == "renamed")
+    skipped = sum(1 for f in files if f.status == "skipped")
+    failed = len(files) - renamed - skipped
+    batch = BatchResult(
+        success=(failed == 0),
+        total=len(files),
+        renamed=renamed,
+        skipped=skipped,
+        failed=failed,
+        files=[] if output_format == "ndjson" else files,
+        batch_id=batch_id,
+        rate_limit=rate_limit_stats() or None,
+        cache=(cache.counts() or None) if cache else None,
+        prompt_cache=prompt_cache_stats() or None,
+    )
+    _report_batch(batch, output_format, quiet)
+    if show_text:
+        console.print(f"[dim]{processed} of {len(files)} files processed by this worker ({worker_id}). "
+                      f"Undo with: autorename-pdf undo \"{os.path.dirname(queue_path)}\"[/]")
+    _exit_for_batch(batch)
+
+
 def _handle_rename(args: argparse.Namespace, output_format: str) -> None:
     """Handle the rename subcommand (default)."""
     quiet = getattr(args, "quiet", False)
@@ -836,22 +1887,40 @@ def _handle_rename(args: argparse.Namespace, output_format: str) -> None:
             output_format=output_format,
         )
 
-    # Apply CLI overrides
-    if getattr(args, "provider", None):
-        config["ai"]["provider"] = args.provider
-    if getattr(args, "model", None):
-        config["ai"]["model"] = args.model
-    if getattr(args, "vision", False):
-        config["pdf"]["vision"] = True
-    if getattr(args, "text_only", False):
-        config["pdf"]["ocr"] = False
-        config["pdf"]["vision"] = False
-    if getattr(args, "ocr", False):
-        config["pdf"]["ocr"] = True
+    _apply_rename_overrides(config, args)
+    if getattr(args, "batch_api", False) and config["ai"]["provider"] not in BATCH_PROVIDERS:
+        error_exit(
+            "usage_error",
+            f"--batch-api is not available for provider '{config['ai']['provider']}'.",
+            suggestion=f"Use one of: {', '.join(BATCH_PROVIDERS)}",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+    shard = getattr(args, "shard", None)
+    if shard and (getattr(args, "queue", None) or getattr(args, "resume", None)):
+        error_exit(
+            "usage_error",
+            "--shard cannot be combined with --queue or --resume.",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+    if getattr(args, "queue", None):
+        _handle_rename_queue(args, config, yaml_path, output_format)
+        return
 
     # Collect PDF files
     paths = getattr(args, "paths", [])
-    if not paths:
+    resume_id = getattr(args, "resume", None)
+    if resume_id and (paths or dry_run):
+        error_exit(
+            "usage_error",
+            "--resume takes its files from the checkpoint and cannot be combined "
+            "with paths or --dry-run.",
+            suggestion=f"Usage: autorename-pdf rename --resume {resume_id}",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+    if not paths and not resume_id:
         error_exit(
             "usage_error",
             "No files or folders specified.",
@@ -860,8 +1929,35 @@ def _handle_rename(args: argparse.Namespace, output_format: str) -> None:
             output_format=output_format,
         )
 
-    recursive = getattr(args, "recursive", False)
-    pdf_files = collect_pdf_files(paths, recursive=recursive)
+    checkpoint = None
+    batch_api = getattr(args, "batch_api", False)
+    if resume_id:
+        try:
+            checkpoint = CheckpointJournal.load(base_dir, resume_id)
+        except FileNotFoundError:
+            error_exit(
+                "usage_error",
+                f"No checkpoint found for batch '{resume_id}'.",
+                suggestion="Checkpoints are removed once a batch finishes without failures.",
+                exit_code=ExitCode.USAGE_ERROR,
+                output_format=output_format,
+            )
+        pdf_files = checkpoint.files
+        # Provider batches are paid for once submitted: keep collecting them
+        if checkpoint.has_submissions() and not batch_api:
+            logging.info(f"Batch {resume_id} submitted provider batches; resuming with --batch-api")
+            batch_api = True
+    else:
+        recursive = getattr(args, "recursive", False)
+        pdf_files = collect_pdf_files(paths, recursive=recursive, shard=shard)
+    if not pdf_files and shard:
+        # An empty shard is not an error: the other shards have the files
+        if output_format == "text" and not quiet:
+            console.print(f"No PDF files in shard {shard[0]}/{shard[1]}.")
+        elif output_format != "text":
+            _report_batch(BatchResult(success=True, total=0, renamed=0, skipped=0, failed=0,
+                                      dry_run=dry_run), output_format, quiet)
+        sys.exit(ExitCode.SUCCESS)
     if not pdf_files:
         error_exit(
             "no_files",
@@ -873,43 +1969,105 @@ def _handle_rename(args: argparse.Namespace, output_format: str) -> None:
     # Determine undo log path (in the application base directory, next to config.yaml)
     undo_log_path = os.path.join(base_dir, UNDO_LOG_NAME) if not dry_run else None
 
-    # Generate batch ID for this rename operation
-    batch_id = generate_batch_id() if not dry_run else None
+    # Generate batch ID for this rename operation (a resumed run continues its batch)
+    batch_id = resume_id or (generate_batch_id() if not dry_run else None)
+
+    # Each shard is its own batch; tagging it up front lets "undo --shards"
+    # find the sibling shards even if this run is interrupted.
+    if shard and undo_log_path and batch_id:
+        tag_batch(undo_log_path, batch_id, shard={
+            "index": shard[0], "count": shard[1],
+            "group": shard_group(paths, shard[1], getattr(args, "shard_group", None)),
+        })
+
+    # Multi-file runs keep a checkpoint journal so an interrupted run can be
+    # resumed with --resume <batch_id> without redoing finished work.
+    if checkpoint is None and batch_id and len(pdf_files) > 1:
+        try:
+            checkpoint = CheckpointJournal.create(base_dir, batch_id, pdf_files)
+        except OSError as e:
+            logging.warning(f"Could not create checkpoint journal: {e}")
 
     # Process PDFs
-    file_results: list[FileResult] = []
-    renamed = 0
-    skipped = 0
-    failed = 0
+    jobs = getattr(args, "jobs", 1) or 1
 
     # For text mode, show progress via console. For JSON, use stderr for progress.
+    # NDJSON streams each result to stdout as soon as its file is done.
     show_text = (output_format == "text" and not quiet)
-    progress_con = console if show_text else None
+    show_progress = (output_format in ("json", "ndjson") and not quiet)
+    streaming = output_format == "ndjson"
 
     if show_text and dry_run:
         console.print("[bold]Dry run[/bold] [dim]no files will be renamed[/]\n")
 
+    # One PaddleOCR bridge for the whole batch: started lazily on the first
+    # page that needs OCR, so models load once instead of once per file.
+    ocr_bridge = PaddleOCRBridge(config)
+
     total = len(pdf_files)
-    for i, pdf_path in enumerate(pdf_files, 1):
-        filename = normalize_unicode(os.path.basename(pdf_path))
-        if show_text:
-            console.print(f"[bold dim]\\[{i}/{total}][/] [bold]{filename}[/]")
-        elif output_format == "json" and not quiet:
-            # Progress to stderr so it doesn't pollute JSON stdout
-            print(f"Processing [{i}/{total}] {filename}", file=sys.stderr)
 
-        file_result = process_pdf(
-            pdf_path, config, yaml_path, undo_log_path,
-            dry_run=dry_run, output=progress_con, batch_id=batch_id,
-        )
-        file_results.append(file_result)
+    # On --resume, files that already finished keep their recorded result
+    completed = _completed_from_checkpoint(checkpoint, pdf_files, config, undo_log_path) if resume_id else {}
+    pending_index = [i for i in range(total) if i not in completed]
+    pending = [pdf_files[i] for i in pending_index]
+    if resume_id and show_text:
+        console.print(f"[bold]Resuming[/bold] [dim]{batch_id}: {len(completed)} of {total} files already done[/]\n")
+
+    # Set on Ctrl-C so files still in flight stop at their next stage boundary
+    cancel = threading.Event()
+    # Extraction and LLM results of files seen before (e.g. by a dry run)
+    cache = open_cache(config, base_dir)
+    mode_kwargs = dict(
+        dry_run=dry_run, batch_id=batch_id, ocr_bridge=ocr_bridge,
+        show_text=show_text, show_progress=show_progress, checkpoint=checkpoint, cancel=cancel,
+        cache=cache,
+    )
+    fresh = _process_files(
+        pending, config, yaml_path, undo_log_path,
+        jobs=jobs, batch_api=batch_api, **mode_kwargs,
+    )
 
-        if file_result.status == "renamed":
-            renamed += 1
-        elif file_result.status == "skipped":
-            skipped += 1
+    # Results arrive in completion order. They are kept (in input order) for
+    # the json/text summary; in NDJSON mode only the counts are kept.
+    file_results: list[FileResult | None] = [] if streaming else [None] * total
+    counts = {"renamed": 0, "skipped": 0, "failed": 0}
+
+    def _collect(index: int, file_result: FileResult) -> None:
+        counts[file_result.status if file_result.status in counts else "failed"] += 1
+        if streaming:
+            emit_ndjson("file", {"index": index, **file_result.to_dict()})
         else:
-            failed += 1
+            file_results[index] = file_result
+
+    try:
+        for index, file_result in sorted(completed.items()):
+            _collect(index, file_result)
+        for local_index, file_result in fresh:
+            _collect(pending_index[local_index], file_result)
+    except KeyboardInterrupt:
+        cancel.set()
+        fresh.close()
+        if checkpoint:
+            print(f"\nInterrupted. Resume with: autorename-pdf rename --resume {batch_id}", file=sys.stderr)
+        raise
+    except BatchApiError as e:
+        # Submitted batches stay in the checkpoint; --resume collects them
+        error_exit(
+            "provider_error",
+            str(e),
+            suggestion=(f"Collect the results later with: autorename-pdf rename --resume {batch_id}"
+                        if checkpoint else None),
+            exit_code=ExitCode.PROVIDER_ERROR,
+            output_format=output_format,
+        )
+    finally:
+        ocr_bridge.close()
+
+    renamed, skipped, failed = counts["renamed"], counts["skipped"], counts["failed"]
+
+    # A clean batch needs no checkpoint; with failures it stays for --resume
+    if checkpoint and failed == 0:
+        checkpoint.discard()
 
     # When every file was skipped (already correctly named), write an empty
     # batch so that a subsequent "undo" targets this no-op batch instead of
@@ -926,29 +2084,327 @@ def _handle_rename(args: argparse.Namespace, output_format: str) -> None:
         files=file_results,
         dry_run=dry_run,
         batch_id=batch_id,
+        # Adaptive concurrency / pacing counters per provider (None when disabled)
+        rate_limit=rate_limit_stats() or None,
+        cache=(cache.counts() or None) if cache else None,
+        prompt_cache=prompt_cache_stats() or None,
     )
+    _report_batch(batch, output_format, quiet)
+    if checkpoint and failed and output_format == "text" and not quiet:
+        console.print(f"[dim]Retry failed files with: autorename-pdf rename --resume {batch_id}[/]")
+    _exit_for_batch(batch)
+
+
+# ---------------------------------------------------------------------------
+# Serve handler (long-lived process for the GUI and other local clients)
+# ---------------------------------------------------------------------------
+
+# Params accepted by the "rename" method (same meaning as the CLI flags)
+_RENAME_PARAMS = {
+    "paths", "recursive", "dry_run", "provider", "model",
+    "vision", "text_only", "ocr", "jobs", "pipeline", "triage", "no_cache",
+}
 
+
+def _rpc_error(
+    error_type: str,
+    message: str,
+    suggestion: str | None = None,
+    exit_code: int = ExitCode.GENERAL_ERROR,
+    code: int = APPLICATION_ERROR,
+) -> RpcError:
+    """The RPC counterpart of error_exit: an error carrying ErrorResult fields as ``data``."""
+    data = asdict(ErrorResult(error_type=error_type, message=message, suggestion=suggestion))
+    data["exit_code"] = exit_code
+    return RpcError(code, message, data)
+
+
+class _ServeSession:
+    """Warm state shared by every request of a ``serve`` process.
+
+    The config is loaded once and reloaded only when config.yaml changes on
+    disk; the company index, the pooled LLM client and the PaddleOCR bridge
+    stay alive between requests. PaddleOCR settings are read at startup.
+    """
+
+    def __init__(self, config_path: str | None = None):
+        self.base_dir = get_base_directory(config_path)
+        self.config_path = config_path or os.path.join(self.base_dir, "config.yaml")
+        self.yaml_path = os.path.join(self.base_dir, "harmonized-company-names.yaml")
+        self.undo_log_path = os.path.join(self.base_dir, UNDO_LOG_NAME)
+        self._config: dict | None = None
+        self._config_mtime: float | None = None
+        self._config_lock = threading.Lock()
+        self.ocr_bridge: PaddleOCRBridge | None = None
+
+    def _mtime(self) -> float | None:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def load_config(self) -> dict | None:
+        """The current config (reloaded if the file changed), or None if it cannot be loaded."""
+        mtime = self._mtime()
+        with self._config_lock:
+            if self._config is None or mtime != self._config_mtime:
+                self._config = load_yaml_config(self.config_path) if mtime is not None else None
+                self._config_mtime = mtime
+            return self._config
+
+    def config(self) -> dict:
+        """A private copy of the current config for one request. Raises RpcError if missing."""
+        config = self.load_config()
+        if not config:
+            raise _rpc_error(
+                "config_error",
+                "Could not load config.yaml. See config.yaml.example for setup.",
+                suggestion="Copy config.yaml.example to config.yaml and add your API key.",
+                exit_code=ExitCode.CONFIG_ERROR,
+            )
+        return copy.deepcopy(config)
+
+    def warm_up(self, warm_ocr: bool = False) -> None:
+        """Load config, company index and LLM client now rather than on the first request."""
+        enable_client_pool()
+        config = self.load_config()
+        if not config:
+            logging.warning(f"Config not loaded from {self.config_path}; requests will fail until it exists")
+            return
+        self.ocr_bridge = PaddleOCRBridge(config)
+        if os.path.exists(self.yaml_path):
+            load_company_names(self.yaml_path)
+        try:
+            _sync_client(config)
+        except ValueError as e:
+            logging.warning(f"LLM client not created: {e}")
+        if warm_ocr and config.get("pdf", {}).get("ocr"):
+            # Model loading takes seconds; don't hold up the first request
+            threading.Thread(target=self.ocr_bridge.warm_up, daemon=True).start()
+
+    def close(self) -> None:
+        if self.ocr_bridge is not None:
+            self.ocr_bridge.close()
+
+    # -- Methods ---------------------------------------------------------
+
+    def rename(self, params: dict, cancelled: threading.Event | None = None,
+               on_result=None) -> BatchResult:
+        """Rename ``params["paths"]``; ``on_result(index, done, total, FileResult)`` per file.
+
+        Once ``cancelled`` is set, files in flight stop at their next stage
+        boundary and files not started are reported as failed with error
+        "Cancelled"; renames already done stay in the undo log.
+        """
+        unknown = set(params) - _RENAME_PARAMS
+        if unknown:
+            raise _rpc_error(
+                "usage_error", f"Unknown rename params: {', '.join(sorted(unknown))}",
+                exit_code=ExitCode.USAGE_ERROR, code=INVALID_PARAMS,
+            )
+        paths = params.get("paths")
+        if not paths or not isinstance(paths, list):
+            raise _rpc_error("usage_error", "No files or folders specified.", exit_code=ExitCode.USAGE_ERROR)
+        try:
+            jobs = max(1, int(params.get("jobs") or 1))
+        except (TypeError, ValueError):
+            raise _rpc_error(
+                "usage_error", f"jobs must be an integer, got {params.get('jobs')!r}",
+                exit_code=ExitCode.USAGE_ERROR, code=INVALID_PARAMS,
+            )
+
+        config = self.config()
+        _apply_rename_overrides(config, argparse.Namespace(**params))
+        pdf_files = collect_pdf_files(paths, recursive=bool(params.get("recursive")))
+        if not pdf_files:
+            raise _rpc_error("no_files", "No PDF files found in the specified paths.", exit_code=ExitCode.NO_FILES)
+
+        dry_run = bool(params.get("dry_run"))
+        undo_log_path = None if dry_run else self.undo_log_path
+        batch_id = None if dry_run else generate_batch_id()
+        total = len(pdf_files)
+        results: list[FileResult | None] = [None] * total
+        cache = open_cache(config, self.base_dir)
+
+        stream = _process_files(
+            pdf_files, config, self.yaml_path, undo_log_path,
+            jobs=jobs, dry_run=dry_run, batch_id=batch_id, ocr_bridge=self.ocr_bridge,
+            cancel=cancelled, cache=cache,
+        )
+        try:
+            for done, (index, file_result) in enumerate(stream, 1):
+                results[index] = file_result
+                if on_result:
+                    on_result(index, done, total, file_result)
+                if cancelled is not None and cancelled.is_set():
+                    break
+        finally:
+            stream.close()
+
+        for index, file_result in enumerate(results):
+            if file_result is None:
+                results[index] = _new_file_result(pdf_files[index], config)
+                results[index].error = "Cancelled"
+
+        renamed = sum(1 for r in results if r.status == "renamed")
+        skipped = sum(1 for r in results if r.status == "skipped")
+        failed = total - renamed - skipped
+        if renamed == 0 and skipped > 0 and undo_log_path and batch_id:
+            write_empty_batch(undo_log_path, batch_id)
+
+        return BatchResult(
+            success=(failed == 0),
+            total=total,
+            renamed=renamed,
+            skipped=skipped,
+            failed=failed,
+            files=results,
+            dry_run=dry_run,
+            batch_id=batch_id,
+            rate_limit=rate_limit_stats() or None,
+            cache=(cache.counts() or None) if cache else None,
+            prompt_cache=prompt_cache_stats() or None,
+        )
+
+    def undo(self, params: dict) -> UndoResult:
+        directory = params.get("directory") or self.base_dir
+        undo_log = os.path.join(directory, UNDO_LOG_NAME)
+        if not os.path.exists(undo_log):
+            raise _rpc_error(
+                "no_files", f"No undo log found in {directory}",
+                suggestion="Run a rename operation first, then undo.", exit_code=ExitCode.NO_FILES,
+            )
+        batch_id = params.get("batch_id")
+        success, fail, per_file_results = undo_renames(
+            undo_log, batch_id=batch_id, undo_all=bool(params.get("all")),
+            shards=bool(params.get("shards")),
+        )
+        return UndoResult(
+            success=(fail == 0),
+            restored=success,
+            failed=fail,
+            files=[
+                UndoFileResult(
+                    old_path=fr["old_path"].replace("\\", "/"),
+                    new_path=fr["new_path"].replace("\\", "/"),
+                    status=fr["status"],
+                )
+                for fr in per_file_results
+            ],
+            batch_id=batch_id,
+        )
+
+    def undo_list(self, params: dict) -> UndoBatchListResult:
+        directory = params.get("directory") or self.base_dir
+        undo_log = os.path.join(directory, UNDO_LOG_NAME)
+        return UndoBatchListResult(batches=list_undo_batches(undo_log) if os.path.exists(undo_log) else [])
+
+    def config_show(self, params: dict) -> dict:
+        redacted = _redact_config(self.config())
+        redacted["config_path"] = os.path.abspath(self.config_path)
+        return redacted
+
+    def config_validate(self, params: dict) -> dict:
+        return _validate_config(copy.deepcopy(self.load_config()), self.config_path)
+
+
+def _serve_stdio(session: _ServeSession, max_requests: int) -> None:
+    """Answer JSON-RPC requests on stdin/stdout until shutdown or end of input."""
+    # The protocol owns stdout; anything else printed goes to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    server = JsonRpcServer(sys.stdin, protocol_out, max_workers=max_requests)
+
+    def _rename(params, ctx):
+        def _progress(index, done, total, file_result):
+            ctx.notify("progress", {"index": index, "completed": done, "total": total,
+                                    "file": file_result.to_dict()})
+        result = session.rename(params, ctx.cancelled, _progress)
+        return {**result.to_dict(), "cancelled": ctx.cancelled.is_set()}
+
+    server.register("rename", _rename)
+    server.register("undo", lambda params, ctx: session.undo(params).to_dict())
+    server.register("undo.list", lambda params, ctx: {"batches": session.undo_list(params).batches})
+    server.register("config.show", lambda params, ctx: session.config_show(params))
+    server.register("config.validate", lambda params, ctx: session.config_validate(params))
+    server.register("ping", lambda params, ctx: {"version": VERSION})
+
+    server.notify("ready", {"version": VERSION, "config_path": os.path.abspath(session.config_path)})
+    try:
+        server.serve_forever()
+    finally:
+        sys.stdout = protocol_out
+
+
+def _serve_http(session: _ServeSession, port: int, workers: int, output_format: str) -> None:
+    """Run the localhost job service until interrupted."""
+
+    def _run_job(job: Job) -> dict:
+        def _record(index, done, total, file_result):
+            job.add_result(index, file_result.to_dict(), total)
+        return session.rename(job.params, job.cancelled, _record).summary()
+
+    jobs = JobQueue(_run_job, workers=workers)
+    token = new_token()
+    try:
+        server = make_job_server(jobs, port, info={"version": VERSION}, token=token)
+    except OSError as e:
+        jobs.shutdown()
+        error_exit(
+            "usage_error",
+            f"Cannot listen on 127.0.0.1:{port}: {e}",
+            suggestion="Pick another port with --port.",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    # Local clients read the URL and token from here; the launching process gets them on stdout
+    service_file = os.path.join(session.base_dir, SERVICE_FILE_NAME)
+    try:
+        write_service_file(service_file, url, token)
+    except OSError as e:
+        logging.warning(f"Could not write {service_file}: {e}")
     if output_format == "json":
-        print(batch.to_json())
-    elif not quiet:
-        # Text summary — friendly message when everything was already correct
-        if renamed == 0 and failed == 0 and skipped > 0:
-            label = "file" if skipped == 1 else "files"
-            console.print(f"\n[bold]Done:[/bold] All {skipped} {label} already correctly named")
-        else:
-            parts = []
-            if renamed:
-                parts.append(f"[green]{renamed} renamed[/]")
-            if skipped:
-                parts.append(f"[yellow]{skipped} skipped[/]")
-            if failed:
-                parts.append(f"[red]{failed} failed[/]")
-            console.print(f"\n[bold]Done:[/bold] {', '.join(parts)}")
+        print(json.dumps({"url": url, "version": VERSION, "token": token, "service_file": service_file}), flush=True)
+    else:
+        console.print(f"Listening on [bold]{url}[/] [dim](Ctrl-C to stop; token in {service_file})[/]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.shutdown()
+        try:
+            os.remove(service_file)
+        except OSError:
+            pass
+
+
+def _handle_serve(args: argparse.Namespace, output_format: str) -> None:
+    """Handle the serve subcommand."""
+    stdio = getattr(args, "stdio", False)
+    http = getattr(args, "http", False)
+    if stdio == http:
+        error_exit(
+            "usage_error",
+            "Choose exactly one transport for serve.",
+            suggestion="Usage: autorename-pdf serve --stdio | --http [--port N]",
+            exit_code=ExitCode.USAGE_ERROR,
+            output_format=output_format,
+        )
 
-    if failed > 0 and failed < total:
-        sys.exit(ExitCode.PARTIAL_FAILURE)
-    elif failed == total:
-        sys.exit(ExitCode.GENERAL_ERROR)
+    session = _ServeSession(getattr(args, "config_path", None))
+    session.warm_up(warm_ocr=getattr(args, "warm_ocr", False))
+    try:
+        if stdio:
+            _serve_stdio(session, getattr(args, "max_requests", 4))
+        else:
+            _serve_http(session, getattr(args, "port", DEFAULT_PORT),
+                        getattr(args, "workers", 2), output_format)
+    finally:
+        session.close()
     sys.exit(ExitCode.SUCCESS)
 
 
@@ -964,6 +2420,9 @@ def main():
     setup_logging(verbose=getattr(args, "verbose", False))
 
     output_format = resolve_output_format(args)
+    # NDJSON streaming applies to rename; other subcommands print one JSON document
+    if output_format == "ndjson" and (getattr(args, "subcommand", None) != "rename" or getattr(args, "undo", False)):
+        output_format = "json"
 
     # Legacy --undo flag detection
     if getattr(args, "undo", False):
@@ -985,8 +2444,12 @@ def main():
         _handle_undo(args, output_format)
     elif subcommand == "config":
         _handle_config(args, output_format)
+    elif subcommand == "cache":
+        _handle_cache(args, output_format)
     elif subcommand == "rename":
         _handle_rename(args, output_format)
+    elif subcommand == "serve":
+        _handle_serve(args, output_format)
     else:
         # No subcommand and no paths — show help
         parser.print_help()
@@ -994,4 +2457,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Required for the pipeline's process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
@@ -13,6 +13,7 @@ export interface FileResult {
   doc_type: string | null;
   provider: string | null;
   model: string | null;
+  template: string | null;
 }
 
 export interface BatchResult {
@@ -24,6 +25,31 @@ export interface BatchResult {
   files: FileResult[];
   dry_run: boolean;
   batch_id?: string;
+  rate_limit?: Record<string, RateLimitStats> | null;
+  cache?: Record<string, CacheCounts> | null;
+  prompt_cache?: Record<string, PromptCacheUsage> | null;
+}
+
+export interface RateLimitStats {
+  limit?: number;
+  peak_limit?: number;
+  max_limit?: number;
+  requests?: number;
+  throttled?: number;
+  paced?: number;
+  paced_seconds?: number;
+}
+
+export interface CacheCounts {
+  hits: number;
+  misses: number;
+}
+
+export interface PromptCacheUsage {
+  requests: number;
+  input_tokens: number;
+  cache_read_tokens: number;
+  cache_write_tokens: number;
 }
 
 export interface ErrorResult {
@@ -0,0 +1,68 @@
+"""
+Benchmark the text extraction backends (pdf.text_backend) on the generated test PDFs.
+
+Times extract_text with pdfplumber, pdfium and auto on every fixture and
+prints the median per file plus the text quality each backend reaches.
+
+Usage:
+  python tests/generate_test_pdfs.py                  # create tests/fixtures/ first
+  python tests/benchmark_text_backends.py
+  python tests/benchmark_text_backends.py --dir /tmp/pdfs --rounds 50 --max-pages 3
+"""
+
+import os
+import sys
+import argparse
+import logging
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _pdf_utils import TEXT_BACKENDS, extract_text
+
+
+def time_backend(pdf_path, backend, rounds, max_pages):
+    """Median seconds of ``rounds`` extractions, and the quality score reached."""
+    timings = []
+    quality = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _, quality = extract_text(pdf_path, max_pages, backend=backend)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), quality
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pdfplumber vs. pdfium text extraction")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "fixtures"),
+                        help="Directory with test PDFs (default: tests/fixtures/)")
+    parser.add_argument("--rounds", type=int, default=20, help="Extractions per file and backend (default: 20)")
+    parser.add_argument("--max-pages", type=int, default=3, help="Pages read per PDF (default: 3)")
+    args = parser.parse_args()
+
+    pdfs = sorted(f for f in os.listdir(args.dir) if f.lower().endswith(".pdf")) if os.path.isdir(args.dir) else []
+    if not pdfs:
+        sys.exit(f"No PDFs in {args.dir} - run tests/generate_test_pdfs.py first")
+    logging.disable(logging.CRITICAL)
+
+    header = f"{'file':<34}" + "".join(f"{backend:>20}" for backend in TEXT_BACKENDS)
+    print(f"Median of {args.rounds} runs, ms (quality)\n\n{header}")
+    totals = dict.fromkeys(TEXT_BACKENDS, 0.0)
+    for name in pdfs:
+        row = f"{name[:33]:<34}"
+        for backend in TEXT_BACKENDS:
+            seconds, quality = time_backend(os.path.join(args.dir, name), backend, args.rounds, args.max_pages)
+            totals[backend] += seconds
+            row += f"{seconds * 1000:>13.1f} ({quality:.2f})"
+        print(row)
+
+    print(f"\n{'total':<34}" + "".join(f"{totals[b] * 1000:>13.1f}{'':7}" for b in TEXT_BACKENDS).rstrip())
+    baseline = totals["pdfplumber"]
+    for backend in TEXT_BACKENDS[1:]:
+        if totals[backend]:
+            print(f"{backend}: {baseline / totals[backend]:.1f}x faster than pdfplumber")
+
+
+if __name__ == "__main__":
+    main()
@@ -134,6 +134,24 @@ class TestGetInstructorClient:
         assert "generativelanguage.googleapis.com" in call_args.kwargs["base_url"]
 
 
+class TestClientPool:
+    @patch("_ai_processing.get_instructor_client")
+    def test_pool_reuses_client_per_endpoint(self, mock_client, sample_config):
+        import _ai_processing
+        assert _ai_processing._sync_client(sample_config) is mock_client.return_value
+        assert mock_client.call_count == 1
+        try:
+            _ai_processing.enable_client_pool()
+            _ai_processing._sync_client(sample_config)
+            _ai_processing._sync_client(sample_config)
+            assert mock_client.call_count == 2
+            sample_config["ai"]["provider"] = "ollama"
+            _ai_processing._sync_client(sample_config)
+            assert mock_client.call_count == 3
+        finally:
+            _ai_processing._CLIENT_POOL = None
+
+
 class TestExtractMetadataProviderKwargs:
     """Test that provider-specific kwargs are applied correctly."""
 
@@ -215,6 +233,11 @@ class TestBuildCombinedText:
         extraction = ExtractionResult(text="", ocr_text="", sources=["text"])
         assert _build_combined_text(extraction) == ""
 
+    def test_ocr_pages_merged_in_page_order(self):
+        extraction = ExtractionResult(text="Page 1:\nDear customer\n\nPage 2:\n#~\n\nPage 3:\nTerms",
+                                      ocr_text="Page 2:\nInvoice 42", ocr_pages=[1], sources=["text", "ocr"])
+        assert _build_combined_text(extraction) == "Page 1:\nDear customer\n\nPage 2:\nInvoice 42\n\nPage 3:\nTerms"
+
 
 class TestExtractMetadata:
     def test_no_content_returns_none(self, sample_config):
@@ -262,3 +285,110 @@ class TestExtractMetadata:
         result = extract_metadata(extraction, sample_config)
         assert result.company_name == "Mixed"
         mock_extract.assert_called_once()
+
+
+class TestExtractMetadataCache:
+    @patch("_ai_processing.extract_metadata_from_text")
+    def test_repeat_request_served_from_cache(self, mock_extract, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        mock_extract.return_value = DocumentMetadata(
+            company_name="ACME", document_date="15.03.2024", document_type="ER"
+        )
+        extraction = ExtractionResult(text="Invoice from ACME", sources=["text"])
+
+        first = extract_metadata(extraction, sample_config, cache=cache)
+        second = extract_metadata(extraction, sample_config, cache=cache)
+        assert second == first
+        mock_extract.assert_called_once()
+        assert cache.counts() == {"llm": {"hits": 1, "misses": 1}}
+
+    @patch("_ai_processing.extract_metadata_from_text")
+    def test_prompt_or_model_change_misses(self, mock_extract, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        mock_extract.return_value = DocumentMetadata(
+            company_name="ACME", document_date="15.03.2024", document_type="ER"
+        )
+        extraction = ExtractionResult(text="Invoice from ACME", sources=["text"])
+        extract_metadata(extraction, sample_config, cache=cache)
+        sample_config["prompt_extension"] = "Add the total amount."
+        extract_metadata(extraction, sample_config, cache=cache)
+        sample_config["ai"]["model"] = "another-model"
+        extract_metadata(extraction, sample_config, cache=cache)
+        assert mock_extract.call_count == 3
+
+    def test_image_payload_is_part_of_key(self, sample_config):
+        from _ai_processing import metadata_cache_key
+        white, black = Image.new("RGB", (10, 10), "white"), Image.new("RGB", (10, 10), "black")
+        assert metadata_cache_key("t", [white], sample_config) == metadata_cache_key("t", [white.copy()], sample_config)
+        assert metadata_cache_key("t", [white], sample_config) != metadata_cache_key("t", [black], sample_config)
+
+
+class TestPromptCaching:
+    def _metadata_with_usage(self, usage):
+        metadata = DocumentMetadata(company_name="ACME", document_date="15.03.2024", document_type="ER")
+        # instructor attaches the provider response to the parsed model
+        object.__setattr__(metadata, "_raw_response", MagicMock(usage=usage))
+        return metadata
+
+    def _create_kwargs(self, mock_client, sample_config, usage=None):
+        mock_completions = MagicMock()
+        mock_completions.create.return_value = self._metadata_with_usage(usage)
+        mock_client.return_value = MagicMock(chat=MagicMock(completions=mock_completions))
+        from _ai_processing import extract_metadata_from_text
+        extract_metadata_from_text("Invoice from ACME", sample_config)
+        return mock_completions.create.call_args[1]
+
+    def test_prompt_built_once(self, sample_config):
+        import copy
+        assert build_system_prompt(sample_config) is build_system_prompt(copy.deepcopy(sample_config))
+
+    @patch("_ai_processing.get_instructor_client")
+    def test_anthropic_system_block_is_cache_breakpoint(self, mock_client, sample_config, monkeypatch):
+        monkeypatch.setattr("_ai_processing._PROMPT_USAGE", {})
+        sample_config["ai"]["provider"] = "anthropic"
+        usage = MagicMock(input_tokens=40, cache_read_input_tokens=1500, cache_creation_input_tokens=0)
+        kwargs = self._create_kwargs(mock_client, sample_config, usage)
+
+        system = kwargs["messages"][0]
+        assert system["role"] == "system"
+        assert system["content"] == [{"type": "text", "text": build_system_prompt(sample_config),
+                                      "cache_control": {"type": "ephemeral"}}]
+        assert "extra_body" not in kwargs
+        from _ai_processing import prompt_cache_stats
+        assert prompt_cache_stats() == {"anthropic": {
+            "requests": 1, "input_tokens": 1540, "cache_read_tokens": 1500, "cache_write_tokens": 0}}
+
+    @patch("_ai_processing.get_instructor_client")
+    def test_openai_prompt_cache_key(self, mock_client, sample_config, monkeypatch):
+        monkeypatch.setattr("_ai_processing._PROMPT_USAGE", {})
+        usage = MagicMock(prompt_tokens=2000, prompt_tokens_details=MagicMock(cached_tokens=1024))
+        kwargs = self._create_kwargs(mock_client, sample_config, usage)
+
+        assert kwargs["messages"][0] == {"role": "system", "content": build_system_prompt(sample_config)}
+        first_key = kwargs["extra_body"]["prompt_cache_key"]
+        sample_config["prompt_extension"] = "Add the total amount."
+        assert self._create_kwargs(mock_client, sample_config)["extra_body"]["prompt_cache_key"] != first_key
+        from _ai_processing import prompt_cache_stats
+        assert prompt_cache_stats()["openai"]["cache_read_tokens"] == 1024
+
+    @patch("_ai_processing.get_instructor_client")
+    def test_no_cache_hints_for_custom_endpoint_or_when_disabled(self, mock_client, sample_config):
+        sample_config["ai"]["base_url"] = "http://localhost:8000/v1"
+        assert "extra_body" not in self._create_kwargs(mock_client, sample_config)
+        sample_config["ai"].update(provider="anthropic", prompt_caching=False)
+        assert isinstance(self._create_kwargs(mock_client, sample_config)["messages"][0]["content"], str)
+
+
+    def test_cache_kwargs_accepted_by_minimum_openai(self, sample_config):
+        """Every create() kwarg must exist in openai 1.43.0, the requirements.txt minimum."""
+        import inspect
+        import openai
+        from _ai_processing import prompt_cache_kwargs
+        # Keyword parameters of Completions.create shared by openai 1.43.0 and later releases
+        minimum_create_params = {"extra_headers", "extra_query", "extra_body", "timeout"}
+        kwargs = prompt_cache_kwargs(sample_config)
+        assert kwargs and set(kwargs) <= minimum_create_params
+        installed = inspect.signature(openai.resources.chat.completions.Completions.create).parameters
+        assert set(kwargs) <= set(installed)
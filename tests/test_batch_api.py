@@ -0,0 +1,384 @@
+"""Tests for _batch_api.py, run against a local stand-in for the provider batch endpoints."""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _ai_processing import DocumentMetadata, prompt_cache_stats
+from _batch_api import BatchApiError, build_batch_request, parse_batch_result, run_batch_api
+from _pdf_utils import ExtractionResult
+
+
+def _answer(custom_id: str) -> dict:
+    return {"company_name": f"Vendor{custom_id}", "document_date": "15.03.2024", "document_type": "ER"}
+
+
+class _BatchServer(BaseHTTPRequestHandler):
+    """Minimal OpenAI Files/Batches and Anthropic Message Batches endpoints.
+
+    Each batch reports in_progress on its first status check and ended /
+    completed afterwards; results answer every request with ``_answer``.
+    """
+
+    state: dict = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _text(self, text: str) -> None:
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _base(self) -> str:
+        return f"http://{self.headers['Host']}"
+
+    # -- OpenAI ----------------------------------------------------------
+
+    def _openai_batch(self, batch_id: str) -> dict:
+        batch = self.state["batches"][batch_id]
+        total = len(batch["requests"])
+        done = batch["checks"] > 1
+        return {
+            "id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions",
+            "input_file_id": batch["input_file_id"], "completion_window": "24h", "created_at": 0,
+            "status": "completed" if done else "in_progress",
+            "output_file_id": f"out-{batch_id}" if done else None, "error_file_id": None,
+            "request_counts": {"total": total, "completed": total if done else 0, "failed": 0},
+        }
+
+    def _openai_output(self, batch_id: str) -> str:
+        lines = []
+        for request in self.state["batches"][batch_id]["requests"]:
+            lines.append(json.dumps({
+                "id": f"req-{request['custom_id']}", "custom_id": request["custom_id"], "error": None,
+                "response": {"status_code": 200, "body": {"choices": [{"message": {
+                    "role": "assistant",
+                    "tool_calls": [{"id": "call", "type": "function", "function": {
+                        "name": "DocumentMetadata",
+                        "arguments": json.dumps(_answer(request["custom_id"])),
+                    }}],
+                }}]}},
+            }))
+        return "\n".join(lines) + "\n"
+
+    # -- Anthropic -------------------------------------------------------
+
+    def _anthropic_batch(self, batch_id: str) -> dict:
+        batch = self.state["batches"][batch_id]
+        total = len(batch["requests"])
+        done = batch["checks"] > 1
+        return {
+            "id": batch_id, "type": "message_batch", "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z", "archived_at": None, "cancel_initiated_at": None,
+            "ended_at": "2024-01-01T01:00:00Z" if done else None,
+            "processing_status": "ended" if done else "in_progress",
+            "request_counts": {"processing": 0 if done else total, "succeeded": total if done else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "results_url": f"{self._base()}/v1/messages/batches/{batch_id}/results" if done else None,
+        }
+
+    def _anthropic_results(self, batch_id: str) -> str:
+        lines = []
+        for request in self.state["batches"][batch_id]["requests"]:
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": {
+                "type": "succeeded",
+                "message": {
+                    "id": "msg", "type": "message", "role": "assistant",
+                    "model": request["params"]["model"], "stop_reason": "tool_use", "stop_sequence": None,
+                    "usage": {"input_tokens": 10, "output_tokens": 10, "cache_read_input_tokens": 1500},
+                    "content": [{"type": "tool_use", "id": "tool", "name": "DocumentMetadata",
+                                 "input": _answer(request["custom_id"])}],
+                },
+            }}))
+        return "\n".join(lines) + "\n"
+
+    # -- Routing ---------------------------------------------------------
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == "/v1/files":
+            file_id = f"file-{len(self.state['files']) + 1}"
+            # Pull the JSONL lines out of the multipart body
+            self.state["files"][file_id] = [
+                json.loads(line) for line in body.replace(b"\r\n", b"\n").split(b"\n")
+                if line.startswith(b'{"custom_id"')
+            ]
+            self._json({"id": file_id, "object": "file", "bytes": len(body), "created_at": 0,
+                        "filename": "requests.jsonl", "purpose": "batch", "status": "processed"})
+        elif self.path == "/v1/batches":
+            payload = json.loads(body)
+            batch_id = f"batch_{len(self.state['batches']) + 1}"
+            self.state["batches"][batch_id] = {
+                "input_file_id": payload["input_file_id"],
+                "requests": self.state["files"][payload["input_file_id"]], "checks": 0,
+            }
+            self._json(self._openai_batch(batch_id))
+        elif self.path == "/v1/messages/batches":
+            batch_id = f"msgbatch_{len(self.state['batches']) + 1}"
+            self.state["batches"][batch_id] = {
+                "input_file_id": None, "requests": json.loads(body)["requests"], "checks": 0,
+            }
+            self._json(self._anthropic_batch(batch_id))
+        else:
+            self._json({"error": {"message": "not found"}}, status=404)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"]:
+            self.state["batches"][parts[2]]["checks"] += 1
+            self._json(self._openai_batch(parts[2]))
+        elif parts[:2] == ["v1", "files"] and parts[-1] == "content":
+            self._text(self._openai_output(parts[2].removeprefix("out-")))
+        elif parts[:3] == ["v1", "messages", "batches"] and parts[-1] == "results":
+            self._text(self._anthropic_results(parts[3]))
+        elif parts[:3] == ["v1", "messages", "batches"]:
+            self.state["batches"][parts[3]]["checks"] += 1
+            self._json(self._anthropic_batch(parts[3]))
+        else:
+            self._json({"error": {"message": "not found"}}, status=404)
+
+
+@pytest.fixture
+def batch_server():
+    _BatchServer.state = {"files": {}, "batches": {}}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BatchServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", _BatchServer.state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def batch_config(sample_config):
+    sample_config["ai"]["batch_api"] = {"poll_interval": 0, "max_requests_per_batch": 2}
+    return sample_config
+
+
+def _fake_extract(pdf_path, config, ocr_bridge=None, cache=None):
+    if "empty" in pdf_path:
+        return ExtractionResult(text="", sources=["text"])
+    return ExtractionResult(text=f"Invoice from {pdf_path}", quality_score=0.9, sources=["text"])
+
+
+class TestBuildBatchRequest:
+    def test_openai_request_forces_tool_call(self, sample_config):
+        extraction = ExtractionResult(text="Invoice ACME", sources=["text"])
+        request = build_batch_request("7", extraction, sample_config)
+        assert request["custom_id"] == "7"
+        assert request["url"] == "/v1/chat/completions"
+        body = request["body"]
+        assert body["model"] == sample_config["ai"]["model"]
+        assert body["messages"][0]["role"] == "system"
+        assert "Invoice ACME" in body["messages"][1]["content"]
+        assert body["tool_choice"]["function"]["name"] == "DocumentMetadata"
+        assert "company_name" in body["tools"][0]["function"]["parameters"]["properties"]
+        # The batch body is raw JSON, so the cache key is a top-level field here
+        assert len(body["prompt_cache_key"]) == 32
+
+    def test_anthropic_request_uses_system_and_max_tokens(self, sample_config):
+        sample_config["ai"]["provider"] = "anthropic"
+        extraction = ExtractionResult(text="Invoice ACME", sources=["text"])
+        request = build_batch_request("1", extraction, sample_config)
+        params = request["params"]
+        assert params["max_tokens"] == 1024
+        assert params["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert params["tool_choice"] == {"type": "tool", "name": "DocumentMetadata"}
+        assert "input_schema" in params["tools"][0]
+
+
+class TestParseBatchResult:
+    def test_openai_http_error(self):
+        line = {"custom_id": "3", "response": {"status_code": 400, "body": {"error": {"message": "bad"}}}}
+        custom_id, metadata, error = parse_batch_result(line, "openai")
+        assert custom_id == "3"
+        assert metadata is None
+        assert "bad" in error
+
+    def test_openai_malformed_arguments(self):
+        line = {"custom_id": "1", "response": {"status_code": 200, "body": {"choices": [{"message": {
+            "tool_calls": [{"function": {"arguments": "{\"company_name\": 1}"}}]}}]}}}
+        _, metadata, error = parse_batch_result(line, "openai")
+        assert metadata is None
+        assert error.startswith("Malformed batch result")
+
+    def test_anthropic_errored(self):
+        line = {"custom_id": "2", "result": {"type": "errored", "error": {
+            "type": "error", "error": {"type": "invalid_request_error", "message": "too long"}}}}
+        _, metadata, error = parse_batch_result(line, "anthropic")
+        assert metadata is None
+        assert error == "Batch request errored: too long"
+
+
+class TestRunBatchApi:
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_openai_round_trip(self, mock_extract, batch_server, batch_config, tmp_path):
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        files = ["/docs/a.pdf", "/docs/empty.pdf", "/docs/b.pdf", "/docs/c.pdf"]
+
+        statuses = []
+        items = run_batch_api(files, batch_config, str(tmp_path),
+                              on_status=lambda *args: statuses.append(args[1]))
+
+        # Three requests split into chunks of two -> two provider batches
+        assert len(state["batches"]) == 2
+        assert "in_progress" in statuses and "completed" in statuses
+        assert [it.index for it in items] == [0, 1, 2, 3]
+        assert items[0].metadata == DocumentMetadata(**_answer("0"))
+        assert items[1].metadata is None and items[1].error is None
+        assert items[3].metadata.company_name == "Vendor3"
+        assert sorted(os.listdir(tmp_path)) == ["requests-001.jsonl", "requests-002.jsonl"]
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_anthropic_round_trip(self, mock_extract, batch_server, batch_config, tmp_path, monkeypatch):
+        monkeypatch.setattr("_ai_processing._PROMPT_USAGE", {})
+        url, state = batch_server
+        batch_config["ai"]["provider"] = "anthropic"
+        batch_config["ai"]["model"] = "claude-test"
+        batch_config["ai"]["base_url"] = url
+        items = run_batch_api(["/docs/a.pdf", "/docs/b.pdf"], batch_config, str(tmp_path))
+
+        assert len(state["batches"]) == 1
+        assert [it.metadata.company_name for it in items] == ["Vendor0", "Vendor1"]
+        assert prompt_cache_stats()["anthropic"] == {
+            "requests": 2, "input_tokens": 3020, "cache_read_tokens": 3000, "cache_write_tokens": 0,
+        }
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_cached_answers_not_submitted(self, mock_extract, batch_server, batch_config, tmp_path):
+        from _cache import ResultCache
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+
+        first = run_batch_api(["/docs/a.pdf"], batch_config, str(work_dir), cache=cache)
+        assert len(state["batches"]) == 1
+        second = run_batch_api(["/docs/a.pdf"], batch_config, str(work_dir), cache=cache)
+        assert len(state["batches"]) == 1
+        assert second[0].metadata == first[0].metadata
+
+    @patch("_batch_api.extract_content", side_effect=RuntimeError("broken PDF"))
+    def test_extraction_failure_not_submitted(self, mock_extract, batch_server, batch_config, tmp_path):
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        items = run_batch_api(["/docs/a.pdf"], batch_config, str(tmp_path))
+        assert items[0].error == "broken PDF"
+        assert state["batches"] == {}
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_chunks_split_by_size(self, mock_extract, batch_server, batch_config, tmp_path):
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        batch_config["ai"]["batch_api"]["max_requests_per_batch"] = 100
+        line = json.dumps(build_batch_request("0", _fake_extract("/docs/a.pdf", batch_config), batch_config))
+        # Room for one request per file, not two
+        batch_config["ai"]["batch_api"]["max_batch_mb"] = (len(line) * 1.5) / 1024 / 1024
+        items = run_batch_api(["/docs/a.pdf", "/docs/b.pdf", "/docs/c.pdf"], batch_config, str(tmp_path))
+
+        assert len(state["batches"]) == 3
+        assert [it.metadata.company_name for it in items] == ["Vendor0", "Vendor1", "Vendor2"]
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_oversized_request_not_submitted(self, mock_extract, batch_server, batch_config, tmp_path):
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        batch_config["ai"]["batch_api"]["max_batch_mb"] = 0.001
+        items = run_batch_api(["/docs/a.pdf"], batch_config, str(tmp_path))
+        assert "exceeds ai.batch_api.max_batch_mb" in items[0].error
+        assert state["batches"] == {}
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_resume_collects_submitted_batches(self, mock_extract, batch_server, batch_config, tmp_path):
+        from _checkpoint import CheckpointJournal
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        files = ["/docs/a.pdf", "/docs/b.pdf", "/docs/c.pdf"]
+        journal = CheckpointJournal.create(str(tmp_path), "run-1", files)
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+
+        # The run dies while waiting on its provider batches
+        with patch("_batch_api.wait_for_batch", side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                run_batch_api(files, batch_config, str(work_dir), checkpoint=journal)
+        assert len(state["batches"]) == 2
+        mock_extract.reset_mock()
+
+        resumed = CheckpointJournal.load(str(tmp_path), "run-1")
+        items = run_batch_api(files, batch_config, str(work_dir), checkpoint=resumed)
+        assert len(state["batches"]) == 2
+        mock_extract.assert_not_called()
+        assert [it.metadata.company_name for it in items] == ["Vendor0", "Vendor1", "Vendor2"]
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_resume_resubmits_failed_files(self, mock_extract, batch_server, batch_config, tmp_path):
+        from _checkpoint import CheckpointJournal
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        journal = CheckpointJournal.create(str(tmp_path), "run-1", ["/docs/a.pdf", "/docs/b.pdf"])
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+        run_batch_api(["/docs/a.pdf", "/docs/b.pdf"], batch_config, str(work_dir), checkpoint=journal)
+        journal.record_result("/docs/a.pdf", {"file": "/docs/a.pdf", "status": "renamed"})
+        journal.record_result("/docs/b.pdf", {"file": "/docs/b.pdf", "status": "failed"})
+
+        resumed = CheckpointJournal.load(str(tmp_path), "run-1")
+        items = run_batch_api(["/docs/b.pdf"], batch_config, str(work_dir), checkpoint=resumed)
+        assert len(state["batches"]) == 2
+        assert items[0].metadata.company_name == "Vendor0"
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_poll_timeout_keeps_batch_for_resume(self, mock_extract, batch_server, batch_config, tmp_path):
+        from _checkpoint import CheckpointJournal
+        url, state = batch_server
+        batch_config["ai"]["base_url"] = f"{url}/v1"
+        batch_config["ai"]["batch_api"]["timeout_hours"] = 0
+        journal = CheckpointJournal.create(str(tmp_path), "run-1", ["/docs/a.pdf"])
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+
+        with pytest.raises(BatchApiError, match="did not finish"):
+            run_batch_api(["/docs/a.pdf"], batch_config, str(work_dir), checkpoint=journal)
+
+        batch_config["ai"]["batch_api"]["timeout_hours"] = 24
+        resumed = CheckpointJournal.load(str(tmp_path), "run-1")
+        items = run_batch_api(["/docs/a.pdf"], batch_config, str(work_dir), checkpoint=resumed)
+        assert len(state["batches"]) == 1
+        assert items[0].metadata.company_name == "Vendor0"
+
+    @patch("_batch_api.extract_content", side_effect=_fake_extract)
+    def test_provider_error_raised_as_batch_error(self, mock_extract, batch_config, tmp_path):
+        import openai
+        with patch("_batch_api.submit_batch", side_effect=openai.OpenAIError("Connection error.")):
+            with pytest.raises(BatchApiError, match="Provider batch API error"):
+                run_batch_api(["/docs/a.pdf"], batch_config, str(tmp_path))
+
+    def test_unsupported_provider(self, sample_config, tmp_path):
+        sample_config["ai"]["provider"] = "ollama"
+        with pytest.raises(ValueError, match="not supported"):
+            run_batch_api(["/docs/a.pdf"], sample_config, str(tmp_path))
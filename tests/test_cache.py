@@ -0,0 +1,124 @@
+"""Tests for _cache.py."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _cache import LEARNED_NAMESPACES, ResultCache, file_digest, get_cache_settings, make_key, open_cache
+from _similarity import SIMILARITY_CACHE
+from _templates import TEMPLATE_CACHE
+
+
+class TestResultCache:
+    def test_put_get_and_miss(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "c.sqlite"), 1024 * 1024)
+        assert cache.get("extraction", "k1") is None
+        cache.put("extraction", "k1", {"text": "Invoice", "sources": ["text"]})
+        assert cache.get("extraction", "k1") == {"text": "Invoice", "sources": ["text"]}
+        # Namespaces are separate
+        assert cache.get("llm", "k1") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "c.sqlite")
+        ResultCache(path, 1024 * 1024).put("extraction", "k1", {"text": "x"})
+        assert ResultCache(path, 1024 * 1024).get("extraction", "k1") == {"text": "x"}
+
+    def test_evicts_least_recently_used_over_cap(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "c.sqlite"), 250)
+        for key in ("a", "b"):
+            cache.put("extraction", key, {"text": key * 90})
+            time.sleep(0.01)
+        cache.get("extraction", "a")  # "b" is now the least recently used
+        time.sleep(0.01)
+        cache.put("extraction", "c", {"text": "c" * 90})
+        assert cache.get("extraction", "b") is None
+        assert cache.get("extraction", "a") is not None
+        assert cache.get("extraction", "c") is not None
+
+    def test_stats_prune_clear(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "c.sqlite"), 1024 * 1024)
+        cache.put("extraction", "a", {"text": "a"})
+        cache.put("llm", "b", {"text": "b"})
+        cache.get("extraction", "a")
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["namespaces"]["extraction"]["hits"] == 1
+
+        assert cache.prune(older_than_days=1) == 0
+        assert cache.prune(max_bytes=0) == 2
+        cache.put("extraction", "a", {"text": "a"})
+        cache.put("llm", "b", {"text": "b"})
+        assert cache.clear("llm") == 1
+        assert list(cache.stats()["namespaces"]) == ["extraction"]
+        assert cache.clear() == 1
+        assert cache.stats()["entries"] == 0
+
+    def test_learned_namespaces_evicted_last(self, tmp_path):
+        assert {SIMILARITY_CACHE, TEMPLATE_CACHE} == set(LEARNED_NAMESPACES)
+        cache = ResultCache(str(tmp_path / "c.sqlite"), 350)
+        cache.put(TEMPLATE_CACHE, "t", {"text": "t" * 90})
+        time.sleep(0.01)
+        cache.put("extraction", "a", {"text": "a" * 90})
+        time.sleep(0.01)
+        # Over the cap: the newer extraction result goes before the older template
+        cache.put("llm", "b", {"text": "b" * 90})
+        cache.put("llm", "c", {"text": "c" * 90})
+        assert cache.get(TEMPLATE_CACHE, "t") is not None
+        assert cache.get("extraction", "a") is None
+        # ...but learned entries count against the cap like any other
+        cache.put(SIMILARITY_CACHE, "s", {"text": "s" * 300})
+        assert cache.stats()["bytes"] <= 350
+
+        cache.clear()
+        assert set(cache.stats()["namespaces"]) <= set(LEARNED_NAMESPACES)
+        cache.clear(learned=True)
+        assert cache.stats()["entries"] == 0
+
+    def test_max_entries_drops_oldest(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "c.sqlite"), 1024 * 1024)
+        for key in ("a", "b", "c"):
+            cache.put(SIMILARITY_CACHE, key, {"n": key}, max_entries=2)
+            time.sleep(0.01)
+        assert sorted(cache.keys(SIMILARITY_CACHE)) == ["b", "c"]
+
+    def test_file_stays_near_cap(self, tmp_path):
+        max_bytes = 256 * 1024
+        cache = ResultCache(str(tmp_path / "c.sqlite"), max_bytes)
+        namespaces = ["extraction", "ocr", "llm", SIMILARITY_CACHE, TEMPLATE_CACHE]
+        # Four times the cap, learned namespaces included
+        for i in range(4 * max_bytes // 8000):
+            cache.put(namespaces[i % len(namespaces)], f"k{i}", {"text": "x" * 8000})
+        assert cache.stats()["bytes"] <= max_bytes
+        cache.prune()
+        # SQLite pages and the schema add a little on top of the stored values
+        assert cache.stats()["file_bytes"] <= max_bytes + 64 * 1024
+
+
+class TestCacheHelpers:
+    def test_make_key_depends_on_every_part(self):
+        assert make_key("abc", 3, "en") == make_key("abc", 3, "en")
+        assert make_key("abc", 3, "en") != make_key("abc", 2, "en")
+
+    def test_file_digest_is_content_based(self, tmp_path):
+        a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+        a.write_bytes(b"%PDF-1.4 same")
+        b.write_bytes(b"%PDF-1.4 same")
+        assert file_digest(str(a)) == file_digest(str(b))
+
+    def test_settings_and_open(self, tmp_path):
+        assert get_cache_settings({}) == {"enabled": True, "path": "", "max_size_mb": 200}
+        assert open_cache({"cache": {"enabled": False}}, str(tmp_path)) is None
+        cache = open_cache({}, str(tmp_path))
+        assert cache.path == str(tmp_path / ".autorename-cache.sqlite")
+
+    def test_disabled_cache_warns_about_dedup_and_templates(self, tmp_path, caplog):
+        config = {"cache": {"enabled": False}, "dedup": {"enabled": True}, "templates": {"enabled": False}}
+        assert open_cache(config, str(tmp_path)) is None
+        assert "off for this run: dedup" in caplog.text
+        assert "templates" not in caplog.text
+
+    def test_unusable_location_disables_cache(self, tmp_path):
+        assert open_cache({}, str(tmp_path / "missing" / "dir")) is None
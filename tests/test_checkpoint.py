@@ -0,0 +1,96 @@
+"""Tests for _checkpoint.py."""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _ai_processing import DocumentMetadata
+from _checkpoint import CheckpointJournal, checkpoint_path, restore_extraction
+from _pdf_utils import ExtractionResult
+
+
+class TestCheckpointJournal:
+    def test_round_trip(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf", "/docs/b.pdf"])
+        extraction = ExtractionResult(text="Invoice", ocr_text="OCR", quality_score=0.7,
+                                      page_count=3, sources=["text", "ocr"], warnings=["w"])
+        journal.record_extraction("/docs/a.pdf", extraction)
+        journal.record_metadata("/docs/a.pdf", DocumentMetadata(
+            company_name="ACME", document_date="15.03.2024", document_type="ER"))
+        journal.record_result("/docs/b.pdf", {"file": "/docs/b.pdf", "status": "renamed"})
+
+        loaded = CheckpointJournal.load(str(tmp_path), "b1")
+        assert loaded.files == ["/docs/a.pdf", "/docs/b.pdf"]
+        saved = loaded.lookup("/docs/a.pdf")
+        assert saved["extracted"]["ocr_text"] == "OCR"
+        assert saved["metadata"]["company_name"] == "ACME"
+        assert loaded.completed_result("/docs/a.pdf") is None
+        assert loaded.completed_result("/docs/b.pdf")["status"] == "renamed"
+
+    def test_failed_result_is_not_completed(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf"])
+        journal.record_result("/docs/a.pdf", {"file": "/docs/a.pdf", "status": "failed"})
+        assert CheckpointJournal.load(str(tmp_path), "b1").completed_result("/docs/a.pdf") is None
+
+    def test_truncated_last_line_ignored(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf"])
+        journal.record_result("/docs/a.pdf", {"file": "/docs/a.pdf", "status": "skipped"})
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"event": "done", "file": "/docs/b.p')
+
+        loaded = CheckpointJournal.load(str(tmp_path), "b1")
+        assert loaded.completed_result("/docs/a.pdf")["status"] == "skipped"
+
+    def test_submission_round_trip(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf", "/docs/b.pdf"])
+        assert not journal.has_submissions()
+        journal.record_result("/docs/a.pdf", {"file": "/docs/a.pdf", "status": "failed"})
+        journal.record_submission("batch_1", {"0": "/docs/a.pdf", "1": "/docs/b.pdf"})
+
+        loaded = CheckpointJournal.load(str(tmp_path), "b1")
+        assert loaded.has_submissions()
+        assert loaded.submission("/docs/b.pdf") == ("batch_1", "1")
+        # The failure predates the submission, so the file is waiting on the batch
+        assert "done" not in loaded.lookup("/docs/a.pdf")
+
+    def test_later_submission_wins(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf"])
+        journal.record_submission("batch_1", {"0": "/docs/a.pdf"})
+        journal.record_result("/docs/a.pdf", {"file": "/docs/a.pdf", "status": "failed"})
+        loaded = CheckpointJournal.load(str(tmp_path), "b1")
+        assert loaded.lookup("/docs/a.pdf")["done"]["status"] == "failed"
+
+        loaded.record_submission("batch_2", {"3": "/docs/a.pdf"})
+        assert CheckpointJournal.load(str(tmp_path), "b1").submission("/docs/a.pdf") == ("batch_2", "3")
+
+    def test_load_missing_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            CheckpointJournal.load(str(tmp_path), "nope")
+
+    def test_discard(self, tmp_path):
+        journal = CheckpointJournal.create(str(tmp_path), "b1", ["/docs/a.pdf"])
+        journal.discard()
+        assert not os.path.exists(checkpoint_path(str(tmp_path), "b1"))
+        journal.discard()  # idempotent
+
+
+class TestRestoreExtraction:
+    RECORD = {"text": "Invoice", "ocr_text": "", "quality_score": 0.2, "page_count": 3,
+              "sources": ["text", "vision"], "warnings": []}
+
+    @patch("_checkpoint.render_pages_to_images", return_value=["img"])
+    def test_vision_images_rerendered(self, mock_render, sample_config):
+        extraction = restore_extraction(self.RECORD, "/docs/a.pdf", sample_config)
+        assert extraction.images == ["img"]
+        assert extraction.sources == ["text", "vision"]
+        mock_render.assert_called_once()
+
+    @patch("_checkpoint.render_pages_to_images")
+    def test_images_skipped_when_not_needed(self, mock_render, sample_config):
+        extraction = restore_extraction(self.RECORD, "/docs/a.pdf", sample_config, with_images=False)
+        assert extraction.images == []
+        mock_render.assert_not_called()
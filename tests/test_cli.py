@@ -30,6 +30,8 @@ _validate_config = _mod._validate_config
 _handle_config = _mod._handle_config
 _handle_rename = _mod._handle_rename
 _handle_undo = _mod._handle_undo
+_handle_cache = _mod._handle_cache
+_ServeSession = _mod._ServeSession
 _main = _mod.main
 get_base_directory = _mod.get_base_directory
 
@@ -137,6 +139,44 @@ class TestBuildParser:
         args = parser.parse_args(["rename", "f.pdf", "--ocr"])
         assert args.ocr is True
 
+    def test_rename_jobs_default(self):
+        parser = build_parser()
+        args = parser.parse_args(["rename", "f.pdf"])
+        assert args.jobs == 1
+
+    def test_rename_jobs_flag(self):
+        parser = build_parser()
+        args = parser.parse_args(["rename", "f.pdf", "--jobs", "4"])
+        assert args.jobs == 4
+
+    def test_rename_jobs_rejects_zero(self):
+        parser = build_parser()
+        with pytest.raises(SystemExit):
+            parser.parse_args(["rename", "f.pdf", "--jobs", "0"])
+
+    def test_rename_shard_flag(self):
+        parser = build_parser()
+        args = parser.parse_args(["rename", "f.pdf", "--shard", "2/4"])
+        assert args.shard == (2, 4)
+        assert args.shard_group is None
+
+    def test_rename_shard_group_flag(self):
+        parser = build_parser()
+        args = parser.parse_args(["rename", "f.pdf", "--shard", "2/4", "--shard-group", "march"])
+        assert args.shard_group == "march"
+
+    @pytest.mark.parametrize("value", ["0/4", "5/4", "2", "a/b", "1/0"])
+    def test_rename_shard_rejects_invalid(self, value):
+        parser = build_parser()
+        with pytest.raises(SystemExit):
+            parser.parse_args(["rename", "f.pdf", "--shard", value])
+
+    def test_rename_queue_without_paths(self):
+        parser = build_parser()
+        args = parser.parse_args(["rename", "--queue", "//nas/q.db"])
+        assert args.queue == "//nas/q.db"
+        assert args.paths == []
+
     def test_no_subcommand_gives_none(self):
         parser = build_parser()
         args = parser.parse_args([])
@@ -200,6 +240,10 @@ class TestPreprocessArgv:
         result = _preprocess_argv(["--help"])
         assert result == ["--help"]
 
+    def test_jobs_value_not_mistaken_for_path(self):
+        result = _preprocess_argv(["--jobs", "4", "file.pdf"])
+        assert result == ["--jobs", "4", "rename", "file.pdf"]
+
     def test_only_boolean_flags_passthrough(self):
         result = _preprocess_argv(["--verbose", "--quiet"])
         assert result == ["--verbose", "--quiet"]
@@ -552,6 +596,28 @@ class TestValidateConfig:
         assert len(issues) == 1
         assert issues[0]["level"] == "warning"
 
+    def test_unknown_text_backend_warning(self):
+        config = {"ai": {"provider": "openai", "api_key": "key", "model": "m"},
+                  "company": {"name": "X"}, "pdf": {"text_backend": "fitz"}}
+        result = _validate_config(config, "config.yaml")
+        issues = [i for i in result["issues"] if i["field"] == "pdf.text_backend"]
+        assert len(issues) == 1
+        assert issues[0]["level"] == "warning"
+        assert result["valid"] is True
+
+    def test_unknown_page_selection_warning(self):
+        config = {"ai": {"provider": "openai", "api_key": "key", "model": "m"},
+                  "company": {"name": "X"}, "pdf": {"page_selection": "last"}}
+        result = _validate_config(config, "config.yaml")
+        assert [i["field"] for i in result["issues"]] == ["pdf.page_selection"]
+
+    def test_invalid_region_warning(self):
+        config = {"ai": {"provider": "openai", "api_key": "key", "model": "m"},
+                  "company": {"name": "X"}, "pdf": {"regions": ["header", [0.8, 0.2]]}}
+        result = _validate_config(config, "config.yaml")
+        assert [i["field"] for i in result["issues"]] == ["pdf.regions"]
+        assert result["valid"] is True
+
     def test_default_company_name_warning(self):
         config = {"ai": {"provider": "openai", "api_key": "key", "model": "m"},
                   "company": {"name": "Your Company Name"}}
@@ -635,6 +701,55 @@ class TestHandleConfigValidate:
         assert len(parsed["issues"]) > 0
 
 
+class TestHandleCache:
+    """Test the cache stats/prune/clear subcommand."""
+
+    def _fill(self, base_dir):
+        from _cache import ResultCache
+        cache = ResultCache(str(base_dir / ".autorename-cache.sqlite"), 1024 * 1024)
+        cache.put("extraction", "a", {"text": "a"})
+        cache.put("extraction", "b", {"text": "b"})
+
+    def _run(self, tmp_path, capsys, **kwargs):
+        args = argparse.Namespace(config_path=None, subcommand="cache", **kwargs)
+        with patch("autorename_pdf.get_base_directory", return_value=str(tmp_path)), \
+             patch("autorename_pdf.load_yaml_config", return_value=None):
+            with pytest.raises(SystemExit) as exc_info:
+                _handle_cache(args, "json")
+        return exc_info.value.code, json.loads(capsys.readouterr().out)
+
+    def test_stats_json(self, tmp_path, capsys):
+        self._fill(tmp_path)
+        code, parsed = self._run(tmp_path, capsys, cache_action="stats")
+        assert code == ExitCode.SUCCESS
+        assert parsed["entries"] == 2
+        assert parsed["namespaces"]["extraction"]["entries"] == 2
+        assert parsed["templates"] == []
+
+    def test_prune_and_clear(self, tmp_path, capsys):
+        self._fill(tmp_path)
+        _, parsed = self._run(tmp_path, capsys, cache_action="prune", max_size_mb=None, older_than=None)
+        assert parsed["removed"] == 0
+        _, parsed = self._run(tmp_path, capsys, cache_action="clear", namespace=None)
+        assert parsed["removed"] == 2
+        assert parsed["entries"] == 0
+
+    def test_clear_keeps_templates_unless_all(self, tmp_path, capsys):
+        from _cache import ResultCache
+        self._fill(tmp_path)
+        ResultCache(str(tmp_path / ".autorename-cache.sqlite"), 1024 * 1024).put("templates", "t", {"x": 1})
+        _, parsed = self._run(tmp_path, capsys, cache_action="clear", namespace=None, clear_all=False)
+        assert parsed["removed"] == 2
+        assert list(parsed["namespaces"]) == ["templates"]
+        _, parsed = self._run(tmp_path, capsys, cache_action="clear", namespace=None, clear_all=True)
+        assert parsed["removed"] == 1
+
+    def test_missing_action_is_usage_error(self, tmp_path, capsys):
+        code, parsed = self._run(tmp_path, capsys, cache_action=None)
+        assert code == ExitCode.USAGE_ERROR
+        assert parsed["error_type"] == "usage_error"
+
+
 # ---------------------------------------------------------------------------
 # 7. Exit codes
 # ---------------------------------------------------------------------------
@@ -911,6 +1026,712 @@ class TestHandleRename:
         assert config_used["pdf"]["ocr"] is True
 
 
+class TestHandleRenameParallel:
+    """Test _handle_rename with --jobs > 1."""
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_results_keep_input_order(self, mock_bd, mock_load, mock_collect, mock_proc,
+                                      capsys, sample_config):
+        import time
+        paths = [f"/tmp/{n}.pdf" for n in "abcdef"]
+        mock_load.return_value = sample_config
+        mock_collect.return_value = paths
+
+        def _fake_process(pdf_path, *args, **kwargs):
+            # Earlier files finish last so completion order differs from input order
+            time.sleep(0.01 * (len(paths) - paths.index(pdf_path)))
+            status = "failed" if pdf_path.endswith("c.pdf") else "renamed"
+            return FileResult(file=pdf_path, status=status, provider="openai", model="gpt-5.4")
+
+        mock_proc.side_effect = _fake_process
+
+        args = argparse.Namespace(config_path=None, paths=["/tmp"], dry_run=True,
+                                  recursive=False, quiet=False, provider=None, model=None,
+                                  vision=False, text_only=False, ocr=False, output="json",
+                                  jobs=3)
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(args, "json")
+
+        assert exc_info.value.code == ExitCode.PARTIAL_FAILURE
+        data = json.loads(capsys.readouterr().out)
+        assert_batch_result_schema(data)
+        assert [f["file"] for f in data["files"]] == paths
+        assert data["renamed"] == 5
+        assert data["failed"] == 1
+        assert mock_proc.call_count == len(paths)
+
+
+class TestHandleRenameTriage:
+    """Test _handle_rename with --triage."""
+
+    @patch("autorename_pdf.triage_pdf")
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_scans_run_in_slow_lane(self, mock_bd, mock_load, mock_collect, mock_proc, mock_triage,
+                                    capsys, sample_config):
+        import threading
+        import time
+        from _pdf_utils import TriageResult
+        paths = ["/tmp/scan1.pdf", "/tmp/a.pdf", "/tmp/scan2.pdf", "/tmp/b.pdf", "/tmp/c.pdf"]
+        mock_load.return_value = sample_config
+        mock_collect.return_value = paths
+        mock_triage.side_effect = lambda p, config: TriageResult(page_count=1, expensive="scan" in p)
+        lanes = {}
+
+        def _fake_process(pdf_path, *args, **kwargs):
+            lanes[pdf_path] = threading.current_thread().name.split("_")[0]
+            if "scan" in pdf_path:
+                time.sleep(0.05)
+            return FileResult(file=pdf_path, status="renamed")
+
+        mock_proc.side_effect = _fake_process
+        args = argparse.Namespace(config_path=None, paths=["/tmp"], dry_run=True, recursive=False,
+                                  quiet=True, provider=None, model=None, vision=False,
+                                  text_only=False, ocr=False, output="ndjson", jobs=2, triage=True)
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(args, "ndjson")
+
+        assert exc_info.value.code == ExitCode.SUCCESS
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        files = [r["file"] for r in records if r["type"] == "file"]
+        assert sorted(files) == sorted(paths)
+        # Text-native files are not held up behind the scans
+        assert files[-1].startswith("/tmp/scan")
+        assert {p for p, lane in lanes.items() if lane == "slow-lane"} == {"/tmp/scan1.pdf", "/tmp/scan2.pdf"}
+
+    def test_triage_flag(self):
+        args = build_parser().parse_args(["rename", "f.pdf", "--triage"])
+        assert args.triage is True
+
+
+class TestHandleRenamePipeline:
+    """Test _handle_rename with --pipeline."""
+
+    @patch("autorename_pdf.run_pipeline")
+    @patch("autorename_pdf.collect_pdf_files", return_value=["/tmp/a.pdf", "/tmp/b.pdf"])
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_pipeline_results_in_input_order(self, mock_bd, mock_load, mock_collect,
+                                             mock_pipeline, capsys, sample_config):
+        from _pdf_utils import ExtractionResult
+        from _ai_processing import DocumentMetadata
+        mock_load.return_value = sample_config
+        extraction = ExtractionResult(text="Invoice ACME", quality_score=0.8, sources=["text"])
+        # Completion order b, a — the JSON output must still list a first
+        mock_pipeline.return_value = iter([
+            _mod.PipelineItem(index=1, pdf_path="/tmp/b.pdf", extraction=extraction,
+                              error="AI timeout"),
+            _mod.PipelineItem(index=0, pdf_path="/tmp/a.pdf", extraction=extraction,
+                              metadata=DocumentMetadata(company_name="ACME",
+                                                        document_date="15.03.2024",
+                                                        document_type="ER")),
+        ])
+
+        args = argparse.Namespace(config_path=None, paths=["/tmp"], dry_run=True,
+                                  recursive=False, quiet=False, provider=None, model=None,
+                                  vision=False, text_only=False, ocr=False, output="json",
+                                  pipeline=True)
+        with patch("autorename_pdf.rename_invoice", return_value="/tmp/20240315 ACME ER.pdf"), \
+             patch("autorename_pdf.harmonize_company_name", return_value="ACME"):
+            with pytest.raises(SystemExit) as exc_info:
+                _handle_rename(args, "json")
+
+        assert exc_info.value.code == ExitCode.PARTIAL_FAILURE
+        data = json.loads(capsys.readouterr().out)
+        assert_batch_result_schema(data)
+        assert [f["file"] for f in data["files"]] == ["/tmp/a.pdf", "/tmp/b.pdf"]
+        assert data["files"][0]["status"] == "renamed"
+        assert data["files"][1]["error"] == "AI timeout"
+        assert sample_config["performance"]["pipeline"] is True
+
+    @patch("autorename_pdf._process_files_pipeline", return_value=iter([]))
+    def test_jobs_size_pipeline_workers(self, mock_pipeline, sample_config):
+        sample_config["performance"] = {"pipeline": True, "ai_workers": 4, "ocr_workers": 1}
+        list(_mod._process_files(["/tmp/a.pdf"], sample_config, "names.yaml", "undo.csv", jobs=8))
+        performance = mock_pipeline.call_args[0][1]["performance"]
+        assert (performance["ai_workers"], performance["extract_workers"], performance["ocr_workers"]) == (8, 8, 1)
+        assert sample_config["performance"]["ai_workers"] == 4
+
+        list(_mod._process_files(["/tmp/a.pdf"], sample_config, "names.yaml", "undo.csv"))
+        assert mock_pipeline.call_args[0][1]["performance"]["ai_workers"] == 4
+
+
+class TestHandleRenameBatchApi:
+    """Test _handle_rename with --batch-api."""
+
+    @staticmethod
+    def _args(**overrides):
+        args = dict(config_path=None, paths=["/tmp"], dry_run=True, recursive=False,
+                    quiet=False, provider=None, model=None, vision=False, text_only=False,
+                    ocr=False, output="json", batch_api=True)
+        args.update(overrides)
+        return argparse.Namespace(**args)
+
+    @patch("autorename_pdf.run_batch_api")
+    @patch("autorename_pdf.collect_pdf_files", return_value=["/tmp/a.pdf", "/tmp/b.pdf"])
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_batch_results_applied(self, mock_bd, mock_load, mock_collect,
+                                   mock_batch, capsys, sample_config):
+        from _pdf_utils import ExtractionResult
+        from _ai_processing import DocumentMetadata
+        mock_load.return_value = sample_config
+        extraction = ExtractionResult(text="Invoice ACME", quality_score=0.8, sources=["text"])
+        mock_batch.return_value = [
+            _mod.PipelineItem(index=0, pdf_path="/tmp/a.pdf", extraction=extraction,
+                              metadata=DocumentMetadata(company_name="ACME",
+                                                        document_date="15.03.2024",
+                                                        document_type="ER")),
+            _mod.PipelineItem(index=1, pdf_path="/tmp/b.pdf", extraction=extraction,
+                              error="Batch request expired"),
+        ]
+
+        with patch("autorename_pdf.rename_invoice", return_value="/tmp/20240315 ACME ER.pdf"), \
+             patch("autorename_pdf.harmonize_company_name", return_value="ACME"):
+            with pytest.raises(SystemExit) as exc_info:
+                _handle_rename(self._args(), "json")
+
+        assert exc_info.value.code == ExitCode.PARTIAL_FAILURE
+        data = json.loads(capsys.readouterr().out)
+        assert_batch_result_schema(data)
+        assert data["files"][0]["status"] == "renamed"
+        assert data["files"][1]["error"] == "Batch request expired"
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_unsupported_provider_is_usage_error(self, mock_bd, mock_load, capsys, sample_config):
+        sample_config["ai"]["provider"] = "ollama"
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(), "json")
+
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+        data = json.loads(capsys.readouterr().out)
+        assert_error_result_schema(data)
+        assert "--batch-api" in data["message"]
+
+
+class TestHandleRenameResume:
+    """Test checkpoint journaling and rename --resume."""
+
+    @staticmethod
+    def _args(**overrides):
+        args = dict(config_path=None, paths=[], dry_run=False, recursive=False,
+                    quiet=False, provider=None, model=None, vision=False, text_only=False,
+                    ocr=False, output="json", resume=None)
+        args.update(overrides)
+        return argparse.Namespace(**args)
+
+    @staticmethod
+    def _metadata(*_args, **_kwargs):
+        from _ai_processing import DocumentMetadata
+        return DocumentMetadata(company_name="ACME", document_date="15.03.2024", document_type="ER")
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_resume_skips_completed_stages(self, mock_bd, mock_load, tmp_path, capsys, sample_config):
+        from _checkpoint import CheckpointJournal, checkpoint_path
+        from _pdf_utils import ExtractionResult
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        files = [str(tmp_path / n) for n in ("a.pdf", "b.pdf", "c.pdf")]
+        journal = CheckpointJournal.create(str(tmp_path), "b1", files)
+        journal.record_result(files[0], FileResult(file=files[0], status="renamed",
+                                                   new_name="A.pdf").to_dict())
+        journal.record_extraction(files[1], ExtractionResult(text="Invoice B", sources=["text"]))
+        journal.record_metadata(files[1], self._metadata())
+
+        extraction = ExtractionResult(text="Invoice C", quality_score=0.9, sources=["text"])
+        with patch("autorename_pdf.extract_content", return_value=extraction) as mock_extract, \
+             patch("autorename_pdf.extract_metadata", side_effect=self._metadata) as mock_ai, \
+             patch("autorename_pdf.rename_invoice", side_effect=lambda p, *a, **k: p + ".new"), \
+             patch("autorename_pdf.harmonize_company_name", return_value="ACME"):
+            with pytest.raises(SystemExit) as exc_info:
+                _handle_rename(self._args(resume="b1"), "json")
+
+        assert exc_info.value.code == ExitCode.SUCCESS
+        assert [c.args[0] for c in mock_extract.call_args_list] == [files[2]]
+        assert mock_ai.call_count == 1
+        data = json.loads(capsys.readouterr().out)
+        assert data["batch_id"] == "b1"
+        assert [f["status"] for f in data["files"]] == ["renamed"] * 3
+        assert data["files"][0]["new_name"] == "A.pdf"
+        # Batch finished cleanly, so the checkpoint is gone
+        assert not os.path.exists(checkpoint_path(str(tmp_path), "b1"))
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_resume_recovers_rename_missing_from_journal(self, mock_bd, mock_load, mock_proc,
+                                                         tmp_path, capsys, sample_config):
+        """A crash between rename and journaling is recovered from the undo log."""
+        from _checkpoint import CheckpointJournal
+        from _document_processing import _write_undo_log
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        old, new = str(tmp_path / "a.pdf"), str(tmp_path / "20240315 ACME ER.pdf")
+        (tmp_path / "20240315 ACME ER.pdf").write_bytes(b"%PDF-1.4")
+        CheckpointJournal.create(str(tmp_path), "b1", [old, str(tmp_path / "b.pdf")])
+        _write_undo_log(str(tmp_path / ".autorename-log.json"), old, new, batch_id="b1")
+        mock_proc.return_value = FileResult(file="b.pdf", status="skipped")
+
+        with pytest.raises(SystemExit):
+            _handle_rename(self._args(resume="b1"), "json")
+
+        data = json.loads(capsys.readouterr().out)
+        assert data["files"][0]["status"] == "renamed"
+        assert data["files"][0]["new_name"] == "20240315 ACME ER.pdf"
+        assert mock_proc.call_count == 1
+
+    @patch("autorename_pdf.run_batch_api")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_resume_collects_provider_batches(self, mock_bd, mock_load, mock_run,
+                                              tmp_path, capsys, sample_config):
+        """A run that submitted provider batches resumes through the batch API even without --batch-api."""
+        from _checkpoint import CheckpointJournal
+        from _pipeline import PipelineItem
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        files = [str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")]
+        journal = CheckpointJournal.create(str(tmp_path), "b1", files)
+        journal.record_submission("batch_1", {"0": files[0], "1": files[1]})
+        mock_run.return_value = [PipelineItem(index=i, pdf_path=p, error="No result returned by batch")
+                                 for i, p in enumerate(files)]
+
+        with pytest.raises(SystemExit):
+            _handle_rename(self._args(resume="b1"), "json")
+
+        assert mock_run.call_args.args[0] == files
+        assert mock_run.call_args.kwargs["checkpoint"].submission(files[1]) == ("batch_1", "1")
+
+    @patch("autorename_pdf.run_batch_api")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_batch_api_error_reported_with_resume_hint(self, mock_bd, mock_load, mock_collect, mock_run,
+                                                       tmp_path, capsys, sample_config):
+        from _batch_api import BatchApiError
+        from _checkpoint import CheckpointJournal
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        mock_collect.return_value = ["/tmp/a.pdf", "/tmp/b.pdf"]
+        mock_run.side_effect = BatchApiError("Batch batch_1 did not finish within 24.0h (status: in_progress)")
+
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(paths=["/tmp"], batch_api=True), "json")
+
+        assert exc_info.value.code == ExitCode.PROVIDER_ERROR
+        data = json.loads(capsys.readouterr().out)
+        assert_error_result_schema(data)
+        assert data["error_type"] == "provider_error"
+        batch_id = data["suggestion"].rsplit(" ", 1)[1]
+        assert CheckpointJournal.load(str(tmp_path), batch_id).files == ["/tmp/a.pdf", "/tmp/b.pdf"]
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_failed_run_keeps_checkpoint(self, mock_bd, mock_load, mock_collect, mock_proc,
+                                         tmp_path, capsys, sample_config):
+        from _checkpoint import CheckpointJournal
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        mock_collect.return_value = ["/tmp/a.pdf", "/tmp/b.pdf"]
+        mock_proc.return_value = FileResult(file="/tmp/a.pdf", status="failed")
+
+        with pytest.raises(SystemExit):
+            _handle_rename(self._args(paths=["/tmp"]), "json")
+
+        batch_id = json.loads(capsys.readouterr().out)["batch_id"]
+        assert CheckpointJournal.load(str(tmp_path), batch_id).files == ["/tmp/a.pdf", "/tmp/b.pdf"]
+        assert mock_proc.call_args.kwargs["checkpoint"] is not None
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_resume_unknown_batch(self, mock_bd, mock_load, tmp_path, capsys, sample_config):
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(resume="missing"), "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+        assert "missing" in json.loads(capsys.readouterr().out)["message"]
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_resume_with_paths_rejected(self, mock_bd, mock_load, capsys, sample_config):
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(resume="b1", paths=["/tmp"]), "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+        assert_error_result_schema(json.loads(capsys.readouterr().out))
+
+
+class TestHandleRenameNdjson:
+    """Test _handle_rename with --output ndjson."""
+
+    @staticmethod
+    def _records(out: str) -> list[dict]:
+        return [json.loads(line) for line in out.splitlines() if line.strip()]
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_one_record_per_file_then_summary(self, mock_bd, mock_load, mock_collect, mock_proc,
+                                              capsys, sample_config):
+        paths = ["/tmp/a.pdf", "/tmp/b.pdf", "/tmp/c.pdf"]
+        mock_load.return_value = sample_config
+        mock_collect.return_value = paths
+        mock_proc.side_effect = lambda p, *a, **k: FileResult(
+            file=p, status="failed" if p.endswith("b.pdf") else "renamed", provider="openai", model="m")
+
+        args = argparse.Namespace(config_path=None, paths=["/tmp"], dry_run=True, recursive=False,
+                                  quiet=False, provider=None, model=None, vision=False,
+                                  text_only=False, ocr=False, output="ndjson")
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(args, "ndjson")
+
+        assert exc_info.value.code == ExitCode.PARTIAL_FAILURE
+        records = self._records(capsys.readouterr().out)
+        assert [r["type"] for r in records] == ["file", "file", "file", "summary"]
+        assert [r["index"] for r in records[:3]] == [0, 1, 2]
+        assert records[1]["file"] == "/tmp/b.pdf"
+        assert records[1]["status"] == "failed"
+        summary = records[-1]
+        assert summary["renamed"] == 2
+        assert summary["failed"] == 1
+        assert "files" not in summary
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_parallel_records_stream_in_completion_order(self, mock_bd, mock_load, mock_collect,
+                                                         mock_proc, capsys, sample_config):
+        import time
+        paths = ["/tmp/a.pdf", "/tmp/b.pdf"]
+        mock_load.return_value = sample_config
+        mock_collect.return_value = paths
+
+        def _fake_process(pdf_path, *args, **kwargs):
+            time.sleep(0.05 if pdf_path.endswith("a.pdf") else 0)
+            return FileResult(file=pdf_path, status="renamed")
+
+        mock_proc.side_effect = _fake_process
+        args = argparse.Namespace(config_path=None, paths=["/tmp"], dry_run=True, recursive=False,
+                                  quiet=True, provider=None, model=None, vision=False,
+                                  text_only=False, ocr=False, output="ndjson", jobs=2)
+        with pytest.raises(SystemExit):
+            _handle_rename(args, "ndjson")
+
+        records = self._records(capsys.readouterr().out)
+        assert [r.get("index") for r in records] == [1, 0, None]
+
+    @patch("autorename_pdf.load_yaml_config", return_value=None)
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_error_is_single_record(self, mock_bd, mock_load, capsys):
+        args = argparse.Namespace(config_path=None, paths=["f.pdf"], dry_run=False, output="ndjson")
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(args, "ndjson")
+
+        assert exc_info.value.code == ExitCode.CONFIG_ERROR
+        records = self._records(capsys.readouterr().out)
+        assert len(records) == 1
+        assert records[0]["type"] == "error"
+        assert records[0]["error_type"] == "config_error"
+
+
+class TestHandleRenameShard:
+    """Test rename --shard."""
+
+    @staticmethod
+    def _args(**overrides):
+        args = dict(config_path=None, paths=["/scans"], dry_run=False, recursive=False,
+                    quiet=True, provider=None, model=None, vision=False, text_only=False,
+                    ocr=False, output="json", resume=None, jobs=1, queue=None, shard=(1, 2))
+        args.update(overrides)
+        return argparse.Namespace(**args)
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_batch_tagged_with_shard(self, mock_bd, mock_load, mock_collect, mock_proc,
+                                     tmp_path, capsys, sample_config):
+        from _document_processing import list_undo_batches
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        mock_collect.return_value = ["/scans/a.pdf"]
+        mock_proc.return_value = FileResult(file="/scans/a.pdf", status="skipped")
+
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(), "json")
+
+        assert exc_info.value.code == ExitCode.SUCCESS
+        assert mock_collect.call_args.kwargs["shard"] == (1, 2)
+        batches = list_undo_batches(str(tmp_path / ".autorename-log.json"))
+        assert len(batches) == 1
+        assert batches[0]["batch_id"] == json.loads(capsys.readouterr().out)["batch_id"]
+        assert batches[0]["shard"] == {"index": 1, "count": 2,
+                                       "group": _mod.shard_group(["/scans"], 2)}
+
+    @patch("autorename_pdf.collect_pdf_files", return_value=[])
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_empty_shard_succeeds(self, mock_bd, mock_load, mock_collect, capsys, sample_config):
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(), "json")
+        assert exc_info.value.code == ExitCode.SUCCESS
+        assert json.loads(capsys.readouterr().out)["total"] == 0
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_rejects_queue(self, mock_bd, mock_load, capsys, sample_config):
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(queue="/q.db"), "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+
+    def test_group_ignores_path_order_and_trailing_slash(self):
+        assert _mod.shard_group(["/a/", "/b"], 4) == _mod.shard_group(["/b", "/a"], 4)
+        assert _mod.shard_group(["/a"], 4) != _mod.shard_group(["/a"], 3)
+
+    def test_group_same_on_hosts_with_different_mounts(self):
+        assert _mod.shard_group(["\\\\nas\\scans\\archive\\"], 4) == \
+            _mod.shard_group(["/mnt/scans/archive"], 4)
+
+    def test_explicit_group_name(self):
+        assert _mod.shard_group(["/scans"], 2, "march") == "march"
+
+
+class TestHandleRenameQueue:
+    """Test rename --queue against a shared lease queue."""
+
+    @staticmethod
+    def _args(**overrides):
+        args = dict(config_path=None, paths=[], dry_run=False, recursive=False,
+                    quiet=True, provider=None, model=None, vision=False, text_only=False,
+                    ocr=False, output="json", resume=None, jobs=2, queue=None)
+        args.update(overrides)
+        return argparse.Namespace(**args)
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_drains_queue_and_writes_one_undo_batch(self, mock_bd, mock_load, mock_collect, mock_proc,
+                                                    tmp_path, capsys, sample_config):
+        from _document_processing import get_batch_renames
+        from _work_queue import LeaseQueue
+        queue_path = str(tmp_path / "queue.db")
+        files = [str(tmp_path / n) for n in ("a.pdf", "b.pdf", "c.pdf")]
+        mock_load.return_value = sample_config
+        mock_collect.return_value = files
+        mock_proc.side_effect = lambda p, *a, **k: FileResult(
+            file=p, status="renamed", new_name="N.pdf", new_path=p + ".new")
+
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(paths=[str(tmp_path)], queue=queue_path), "json")
+
+        assert exc_info.value.code == ExitCode.SUCCESS
+        # Workers never write the local undo log themselves
+        assert all(c.args[3] is None for c in mock_proc.call_args_list)
+        data = json.loads(capsys.readouterr().out)
+        assert data["renamed"] == 3
+        assert [f["file"] for f in data["files"]] == files
+        assert LeaseQueue(queue_path).counts()["done"] == 3
+        renames = get_batch_renames(str(tmp_path / ".autorename-log.json"), data["batch_id"])
+        assert renames == {f: f + ".new" for f in files}
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_joining_worker_reports_merged_batch(self, mock_bd, mock_load, mock_proc,
+                                                 tmp_path, capsys, sample_config):
+        from _work_queue import LeaseQueue
+        queue_path = str(tmp_path / "queue.db")
+        queue = LeaseQueue(queue_path)
+        queue.batch_id("shared")
+        queue.add([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")])
+        task = queue.claim("other-host:1")
+        queue.complete(task, "other-host:1", FileResult(file=task.path, status="skipped").to_dict())
+        mock_load.return_value = sample_config
+        mock_proc.side_effect = lambda p, *a, **k: FileResult(file=p, status="failed", error="boom")
+
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(queue=queue_path), "json")
+
+        assert exc_info.value.code == ExitCode.PARTIAL_FAILURE
+        assert [c.args[0] for c in mock_proc.call_args_list] == [str(tmp_path / "b.pdf")]
+        data = json.loads(capsys.readouterr().out)
+        assert data["batch_id"] == "shared"
+        assert (data["total"], data["skipped"], data["failed"]) == (2, 1, 1)
+
+    @patch("autorename_pdf.collect_pdf_files")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_rejects_files_outside_queue_folder(self, mock_bd, mock_load, mock_collect,
+                                                tmp_path, capsys, sample_config):
+        (tmp_path / "queue").mkdir()
+        mock_load.return_value = sample_config
+        mock_collect.return_value = [str(tmp_path / "a.pdf")]
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(paths=[str(tmp_path)], queue=str(tmp_path / "queue" / "q.db")), "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+        assert "outside the queue's folder" in json.loads(capsys.readouterr().out)["message"]
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_empty_queue_is_no_files(self, mock_bd, mock_load, tmp_path, capsys, sample_config):
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(queue=str(tmp_path / "queue.db")), "json")
+        assert exc_info.value.code == ExitCode.NO_FILES
+
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory", return_value="/fake")
+    def test_rejects_dry_run(self, mock_bd, mock_load, tmp_path, capsys, sample_config):
+        mock_load.return_value = sample_config
+        with pytest.raises(SystemExit) as exc_info:
+            _handle_rename(self._args(queue=str(tmp_path / "queue.db"), dry_run=True), "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+
+
+class TestServeSession:
+    """Test the warm session behind `serve`."""
+
+    @pytest.fixture
+    def session(self, tmp_path, sample_config):
+        import yaml
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text(yaml.safe_dump(sample_config))
+        with patch("autorename_pdf.get_base_directory", return_value=str(tmp_path)):
+            return _ServeSession(str(config_path))
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files", return_value=["/tmp/a.pdf", "/tmp/b.pdf"])
+    def test_rename_reports_each_file(self, mock_collect, mock_proc, session):
+        mock_proc.side_effect = lambda p, *a, **k: FileResult(file=p, status="renamed")
+        seen = []
+        result = session.rename(
+            {"paths": ["/tmp"], "dry_run": True, "model": "other-model"},
+            on_result=lambda index, done, total, fr: seen.append((index, done, total)),
+        )
+
+        assert seen == [(0, 1, 2), (1, 2, 2)]
+        assert result.renamed == 2
+        assert result.batch_id is None
+        assert_batch_result_schema(json.loads(result.to_json()))
+        assert mock_proc.call_args.args[1]["ai"]["model"] == "other-model"
+        # Overrides apply to the request's copy only
+        assert session.load_config()["ai"]["model"] != "other-model"
+
+    @patch("autorename_pdf.process_pdf")
+    @patch("autorename_pdf.collect_pdf_files", return_value=["/tmp/a.pdf", "/tmp/b.pdf", "/tmp/c.pdf"])
+    def test_cancel_stops_before_next_file(self, mock_collect, mock_proc, session):
+        import threading
+        cancelled = threading.Event()
+
+        def _fake_process(pdf_path, *args, **kwargs):
+            cancelled.set()
+            return FileResult(file=pdf_path, status="renamed")
+
+        mock_proc.side_effect = _fake_process
+        result = session.rename({"paths": ["/tmp"], "dry_run": True}, cancelled)
+
+        assert mock_proc.call_count == 1
+        assert [f.error for f in result.files] == [None, "Cancelled", "Cancelled"]
+        assert result.failed == 2
+
+    def test_rename_param_errors(self, session):
+        from _jsonrpc import APPLICATION_ERROR, INVALID_PARAMS, RpcError
+        with pytest.raises(RpcError) as exc_info:
+            session.rename({"paths": ["/tmp"], "force": True})
+        assert exc_info.value.code == INVALID_PARAMS
+        assert exc_info.value.data["error_type"] == "usage_error"
+        with pytest.raises(RpcError) as exc_info:
+            session.rename({"paths": []})
+        assert exc_info.value.code == APPLICATION_ERROR
+        assert exc_info.value.data["error_type"] == "usage_error"
+        assert exc_info.value.data["exit_code"] == ExitCode.USAGE_ERROR
+
+    def test_config_reloaded_when_file_changes(self, session, sample_config):
+        import yaml
+        assert session.load_config()["ai"]["model"] == sample_config["ai"]["model"]
+        sample_config["ai"]["model"] = "changed"
+        with open(session.config_path, "w") as f:
+            yaml.safe_dump(sample_config, f)
+        os.utime(session.config_path, (0, 0))
+        assert session.load_config()["ai"]["model"] == "changed"
+
+    def test_missing_config_is_config_error(self, tmp_path):
+        from _jsonrpc import RpcError
+        with patch("autorename_pdf.get_base_directory", return_value=str(tmp_path)):
+            session = _ServeSession(str(tmp_path / "missing.yaml"))
+        with pytest.raises(RpcError) as exc_info:
+            session.config_show({})
+        assert exc_info.value.data["error_type"] == "config_error"
+        assert session.config_validate({})["valid"] is False
+
+    def test_config_show_redacts_key(self, session):
+        shown = session.config_show({})
+        assert shown["config_path"] == os.path.abspath(session.config_path)
+        assert "..." in shown["ai"]["api_key"] or shown["ai"]["api_key"] == "***"
+
+
+class TestHandleServe:
+    @pytest.mark.parametrize("flags", [{}, {"stdio": True, "http": True}])
+    def test_requires_one_transport(self, flags, capsys):
+        args = argparse.Namespace(config_path=None, **flags)
+        with pytest.raises(SystemExit) as exc_info:
+            _mod._handle_serve(args, "json")
+        assert exc_info.value.code == ExitCode.USAGE_ERROR
+        assert_error_result_schema(json.loads(capsys.readouterr().out))
+
+    @patch("autorename_pdf._ServeSession.warm_up")
+    @patch("autorename_pdf._serve_http")
+    @patch("autorename_pdf.get_base_directory")
+    def test_http_uses_warm_session(self, mock_bd, mock_serve_http, mock_warm, tmp_path):
+        mock_bd.return_value = str(tmp_path)
+        args = argparse.Namespace(config_path=None, stdio=False, http=True, port=0, workers=3)
+        with pytest.raises(SystemExit) as exc_info:
+            _mod._handle_serve(args, "json")
+        assert exc_info.value.code == ExitCode.SUCCESS
+        session, port, workers, _ = mock_serve_http.call_args.args
+        assert isinstance(session, _ServeSession)
+        assert (port, workers) == (0, 3)
+        mock_warm.assert_called_once()
+
+    @patch("autorename_pdf.make_job_server")
+    @patch("autorename_pdf.get_base_directory")
+    def test_http_publishes_token_while_running(self, mock_bd, mock_make, tmp_path, capsys):
+        mock_bd.return_value = str(tmp_path)
+        service_file = tmp_path / _mod.SERVICE_FILE_NAME
+        published = {}
+
+        def _serve_forever():
+            published.update(json.loads(service_file.read_text(encoding="utf-8")))
+            raise KeyboardInterrupt
+
+        server = mock_make.return_value
+        server.server_address = ("127.0.0.1", 8765)
+        server.serve_forever.side_effect = _serve_forever
+        _mod._serve_http(_ServeSession(), 0, 1, "json")
+
+        token = mock_make.call_args.kwargs["token"]
+        assert token and published["token"] == token
+        assert published["url"] == "http://127.0.0.1:8765"
+        assert json.loads(capsys.readouterr().out)["token"] == token
+        assert not service_file.exists()
+
+
 class TestHandleUndo:
     """Test _handle_undo JSON output contract and exit codes."""
 
@@ -1028,6 +1849,24 @@ class TestMain:
                 _main()
         mock_handler.assert_called_once()
 
+    @patch("autorename_pdf._handle_undo")
+    @patch("autorename_pdf.setup_logging")
+    def test_ndjson_falls_back_to_json_outside_rename(self, mock_log, mock_handler):
+        mock_handler.side_effect = SystemExit(0)
+        with patch("sys.argv", ["prog", "undo", "--output", "ndjson"]):
+            with pytest.raises(SystemExit):
+                _main()
+        assert mock_handler.call_args.args[1] == "json"
+
+    @patch("autorename_pdf._handle_serve")
+    @patch("autorename_pdf.setup_logging")
+    def test_routes_serve(self, mock_log, mock_handler):
+        mock_handler.side_effect = SystemExit(0)
+        with patch("sys.argv", ["prog", "serve", "--stdio"]):
+            with pytest.raises(SystemExit):
+                _main()
+        assert mock_handler.call_args.args[0].stdio is True
+
     @patch("autorename_pdf._handle_config")
     @patch("autorename_pdf.setup_logging")
     def test_routes_config(self, mock_log, mock_handler):
@@ -1037,6 +1876,17 @@ class TestMain:
                 _main()
         mock_handler.assert_called_once()
 
+    @patch("autorename_pdf._handle_cache")
+    @patch("autorename_pdf.setup_logging")
+    def test_routes_cache(self, mock_log, mock_handler):
+        mock_handler.side_effect = SystemExit(0)
+        with patch("sys.argv", ["prog", "cache", "prune", "--older-than", "30"]):
+            with pytest.raises(SystemExit):
+                _main()
+        args = mock_handler.call_args.args[0]
+        assert args.cache_action == "prune"
+        assert args.older_than == 30.0
+
     @patch("autorename_pdf.setup_logging")
     def test_no_args_shows_help(self, mock_log, capsys):
         with patch("sys.argv", ["prog"]):
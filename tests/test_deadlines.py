@@ -0,0 +1,64 @@
+"""Tests for _deadlines.py."""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _deadlines import CancelledError, StageTimeoutError, check_cancelled, get_stage_timeouts, run_stage
+
+
+class TestRunStage:
+    def test_inline_without_limits(self):
+        assert run_stage("extract", lambda a, b=0: a + b, 1, b=2) == 3
+
+    def test_result_and_errors_pass_through(self):
+        assert run_stage("ai", lambda: "ok", timeout=5) == "ok"
+        with pytest.raises(ValueError, match="bad"):
+            run_stage("ai", lambda: (_ for _ in ()).throw(ValueError("bad")), timeout=5)
+
+    def test_timeout(self):
+        release = threading.Event()
+        start = time.monotonic()
+        with pytest.raises(StageTimeoutError) as exc_info:
+            run_stage("extract", release.wait, 5, timeout=0.1)
+        release.set()
+        assert time.monotonic() - start < 2
+        assert exc_info.value.stage == "extract"
+        assert str(exc_info.value) == "Text extraction timed out after 0.1s (timeouts.extract in config.yaml)"
+
+    def test_cancel_interrupts_waiting_stage(self):
+        release = threading.Event()
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        start = time.monotonic()
+        with pytest.raises(CancelledError):
+            run_stage("ai", release.wait, 5, cancel=cancel)
+        release.set()
+        assert time.monotonic() - start < 2
+
+    def test_already_cancelled_does_not_start(self):
+        cancel = threading.Event()
+        cancel.set()
+        called = []
+        with pytest.raises(CancelledError):
+            run_stage("render", called.append, 1, cancel=cancel)
+        assert called == []
+        with pytest.raises(CancelledError):
+            check_cancelled(cancel)
+        check_cancelled(None)
+
+
+class TestGetStageTimeouts:
+    def test_missing_section_means_no_limits(self):
+        assert get_stage_timeouts({}) == {"extract": None, "render": None, "ocr": None, "ai": None}
+
+    def test_values_and_zero(self):
+        timeouts = get_stage_timeouts({"timeouts": {"extract": 30, "ocr": 0, "ai": "bad"}})
+        assert timeouts["extract"] == 30.0
+        assert timeouts["ocr"] is None
+        assert timeouts["ai"] is None
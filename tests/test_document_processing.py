@@ -19,6 +19,7 @@ from _document_processing import (
     generate_batch_id,
     list_undo_batches,
     write_empty_batch,
+    tag_batch,
     _rename_with_retry,
 )
 
@@ -177,6 +178,32 @@ class TestRenameInvoice:
         assert len(data["batches"][0]["files"]) == 1
         assert data["batches"][0]["files"][0]["old_path"] == pdf_path
 
+    def test_concurrent_renames_to_same_name(self, tmp_path, sample_config):
+        """Parallel workers targeting one name get distinct paths and all log entries."""
+        from concurrent.futures import ThreadPoolExecutor
+        log_path = str(tmp_path / ".autorename-log.json")
+        sources = []
+        for i in range(8):
+            path = str(tmp_path / f"scan_{i}.pdf")
+            with open(path, 'w') as f:
+                f.write(f"fake pdf {i}")
+            sources.append(path)
+
+        def _rename(path):
+            return rename_invoice(
+                path, "ACME", datetime.date(2024, 3, 15), "ER",
+                sample_config, undo_log_path=log_path, batch_id="parallel-batch",
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(_rename, sources))
+
+        assert len(set(results)) == 8
+        assert all(os.path.exists(r) for r in results)
+        data = _read_undo_log(log_path)
+        assert len(data["batches"]) == 1
+        assert len(data["batches"][0]["files"]) == 8
+
     def test_custom_date_format(self, tmp_path, sample_config):
         sample_config["output"]["date_format"] = "%d-%m-%Y"
         pdf_path = str(tmp_path / "original.pdf")
@@ -504,6 +531,49 @@ class TestFilenameLength:
         assert len(filename) <= 255
 
 
+class TestConcurrentRenames:
+    """Workers in other processes share the folder and the undo log."""
+
+    def test_name_taken_after_check_is_not_overwritten(self, tmp_path, sample_config, monkeypatch):
+        pdf_path = tmp_path / "original.pdf"
+        pdf_path.write_text("mine")
+        taken = tmp_path / "20240315 ACME ER.pdf"
+        taken.write_text("other worker's file")
+        # Another process creates the name after any existence check would have passed
+        monkeypatch.setattr(os.path, "exists", lambda path: False)
+
+        result = rename_invoice(str(pdf_path), "ACME", datetime.date(2024, 3, 15), "ER", sample_config)
+
+        assert result.endswith("20240315 ACME ER_(1).pdf")
+        assert taken.read_text() == "other worker's file"
+        assert open(result).read() == "mine"
+
+    def test_failed_rename_releases_reserved_name(self, tmp_path, sample_config):
+        from unittest.mock import patch
+        pdf_path = tmp_path / "original.pdf"
+        pdf_path.write_text("pdf")
+        with patch("_document_processing._rename_with_retry", side_effect=PermissionError("locked")):
+            with pytest.raises(PermissionError):
+                rename_invoice(str(pdf_path), "ACME", datetime.date(2024, 3, 15), "ER", sample_config)
+        assert [p.name for p in tmp_path.iterdir()] == ["original.pdf"]
+
+    def test_undo_log_writes_from_processes_are_not_lost(self, tmp_path):
+        import multiprocessing
+        log_path = str(tmp_path / "undo.json")
+        processes = [multiprocessing.Process(target=_log_renames, args=(log_path, worker)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        [batch] = _read_undo_log(log_path)["batches"]
+        assert len(batch["files"]) == 4 * 25
+
+
+def _log_renames(log_path: str, worker: int) -> None:
+    for i in range(25):
+        _write_undo_log(log_path, f"/in/{worker}-{i}.pdf", f"/out/{worker}-{i}.pdf", batch_id="shared")
+
+
 class TestRenameWithRetry:
     def test_retry_on_permission_error(self, tmp_path):
         src = str(tmp_path / "src.pdf")
@@ -632,3 +702,47 @@ class TestWriteEmptyBatch:
         with open(log_path) as f:
             data = json.load(f)
         assert data["batches"][0]["undone"] is True
+
+
+class TestShardBatches:
+    """Tests for tag_batch() and undo_renames(shards=True)."""
+
+    @staticmethod
+    def _renamed_shard(tmp_path, log_path, batch_id, index, group="g1", count=2):
+        old_path = str(tmp_path / f"{batch_id}-old.pdf")
+        new_path = str(tmp_path / f"{batch_id}-new.pdf")
+        with open(new_path, "w") as f:
+            f.write("content")
+        tag_batch(log_path, batch_id, shard={"index": index, "count": count, "group": group})
+        _write_undo_log(log_path, old_path, new_path, batch_id=batch_id)
+        return old_path
+
+    def test_tag_creates_then_updates_batch(self, tmp_path):
+        log_path = str(tmp_path / ".autorename-log.json")
+        tag_batch(log_path, "b1", shard={"index": 1, "count": 2, "group": "g1"})
+        _write_undo_log(log_path, "a.pdf", "b.pdf", batch_id="b1")
+        data = _read_undo_log(log_path)
+        assert len(data["batches"]) == 1
+        assert data["batches"][0]["shard"]["group"] == "g1"
+        assert len(data["batches"][0]["files"]) == 1
+        assert list_undo_batches(log_path)[0]["shard"] == {"index": 1, "count": 2, "group": "g1"}
+
+    def test_undo_shards_reverts_the_whole_run(self, tmp_path):
+        log_path = str(tmp_path / ".autorename-log.json")
+        first = self._renamed_shard(tmp_path, log_path, "s1", 1)
+        other_run = self._renamed_shard(tmp_path, log_path, "x1", 1, group="other")
+        second = self._renamed_shard(tmp_path, log_path, "s2", 2)
+
+        success, fail, _ = undo_renames(log_path, shards=True)
+        assert (success, fail) == (2, 0)
+        assert os.path.exists(first) and os.path.exists(second)
+        assert not os.path.exists(other_run)
+
+    def test_undo_without_shards_only_reverts_one_batch(self, tmp_path):
+        log_path = str(tmp_path / ".autorename-log.json")
+        first = self._renamed_shard(tmp_path, log_path, "s1", 1)
+        second = self._renamed_shard(tmp_path, log_path, "s2", 2)
+
+        assert undo_renames(log_path)[0] == 1
+        assert os.path.exists(second)
+        assert not os.path.exists(first)
@@ -226,6 +226,141 @@ class TestFullPipelineFailures:
         assert result.status == "failed"
         assert os.path.exists(pdf_copy)
 
+    def test_ai_deadline_fails_file(self, tmp_path, sample_config, sample_pdf):
+        import threading
+        release = threading.Event()
+        sample_config["timeouts"] = {"ai": 0.1}
+        with patch("autorename_pdf.extract_metadata", side_effect=lambda *a, **k: release.wait(5)):
+            result = process_pdf(sample_pdf, sample_config, str(tmp_path / "names.yaml"),
+                                 str(tmp_path / ".autorename-log.json"))
+        release.set()
+        assert result.status == "failed"
+        assert result.error == "AI request timed out after 0.1s (timeouts.ai in config.yaml)"
+        assert os.path.exists(sample_pdf)
+
+    def test_cancel_stops_file_in_flight(self, tmp_path, sample_config, sample_pdf):
+        import threading
+        cancel = threading.Event()
+        release = threading.Event()
+
+        def _slow_ai(*args, **kwargs):
+            cancel.set()  # cancelled while the AI request is running
+            release.wait(5)
+            return _mock_metadata("ACME", "15.03.2024", "ER")
+
+        with patch("autorename_pdf.extract_metadata", side_effect=_slow_ai):
+            result = process_pdf(sample_pdf, sample_config, str(tmp_path / "names.yaml"),
+                                 str(tmp_path / ".autorename-log.json"), cancel=cancel)
+        release.set()
+        assert result.status == "failed"
+        assert result.error == "Cancelled"
+        assert os.path.exists(sample_pdf)
+
+
+class TestDryRunThenRename:
+    """A real run after a dry run reuses the cached LLM answer."""
+
+    @patch("_ai_processing.extract_metadata_from_text")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_second_run_makes_no_llm_call(self, mock_bd, mock_load, mock_llm, tmp_path,
+                                          sample_config, sample_pdf, capsys):
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        mock_llm.return_value = _mock_metadata("ACME", "15.03.2024", "ER")
+
+        for dry_run in (True, False):
+            args = argparse.Namespace(
+                config_path=None, paths=[sample_pdf], dry_run=dry_run,
+                recursive=False, quiet=True, provider=None, model=None,
+                vision=False, text_only=False, ocr=False, output="json",
+            )
+            with pytest.raises(SystemExit):
+                _handle_rename(args, "json")
+            data = json.loads(capsys.readouterr().out)
+
+        mock_llm.assert_called_once()
+        assert data["renamed"] == 1
+        assert data["cache"] == {"extraction": {"hits": 1, "misses": 0}, "llm": {"hits": 1, "misses": 0}}
+
+    @patch("_ai_processing.extract_metadata_from_text")
+    @patch("autorename_pdf.load_yaml_config")
+    @patch("autorename_pdf.get_base_directory")
+    def test_no_cache_calls_llm_again(self, mock_bd, mock_load, mock_llm, tmp_path,
+                                      sample_config, sample_pdf, capsys):
+        mock_bd.return_value = str(tmp_path)
+        mock_load.return_value = sample_config
+        mock_llm.return_value = _mock_metadata("ACME", "15.03.2024", "ER")
+
+        for no_cache in (False, True):
+            args = argparse.Namespace(
+                config_path=None, paths=[sample_pdf], dry_run=True, no_cache=no_cache,
+                recursive=False, quiet=True, provider=None, model=None,
+                vision=False, text_only=False, ocr=False, output="json",
+            )
+            with pytest.raises(SystemExit):
+                _handle_rename(args, "json")
+            data = json.loads(capsys.readouterr().out)
+
+        assert mock_llm.call_count == 2
+        assert data["cache"] is None
+
+
+class TestNearDuplicateReuse:
+    """A scan of an invoice seen before reuses its metadata (dedup enabled)."""
+
+    def test_scan_of_known_invoice_skips_ai(self, tmp_path, sample_config):
+        from _cache import ResultCache
+        from _pdf_utils import ExtractionResult
+        from test_similarity import INVOICE, SCANNED
+        sample_config["dedup"] = {"enabled": True}
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        mail, scan = tmp_path / "mail.pdf", tmp_path / "scan.pdf"
+        mail.write_bytes(b"%PDF-1.4 mail")
+        scan.write_bytes(b"%PDF-1.4 scan")
+        extractions = {
+            str(mail): ExtractionResult(text=INVOICE, quality_score=0.9, sources=["text"]),
+            str(scan): ExtractionResult(ocr_text=SCANNED, sources=["text", "ocr"]),
+        }
+
+        with patch("autorename_pdf.extract_content", side_effect=lambda path, *a, **k: extractions[path]), \
+             patch("autorename_pdf.extract_metadata",
+                   return_value=_mock_metadata("ACME", "15.03.2024", "ER")) as mock_ai:
+            first = process_pdf(str(mail), sample_config, "", None, dry_run=True, cache=cache)
+            second = process_pdf(str(scan), sample_config, "", None, dry_run=True, cache=cache)
+
+        mock_ai.assert_called_once()
+        assert second.new_name == first.new_name
+        assert any("near-duplicate mail.pdf" in w for w in second.warnings)
+        assert first.warnings == []
+
+
+class TestVendorTemplate:
+    """A supplier's third invoice is read by the template its first two taught (templates enabled)."""
+
+    def test_recurring_invoice_skips_ai(self, tmp_path, sample_config):
+        from _cache import ResultCache
+        from _pdf_utils import ExtractionResult
+        from test_templates import FEBRUARY, JANUARY, MARCH
+        sample_config["templates"] = {"enabled": True}
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        texts = {"jan.pdf": JANUARY, "feb.pdf": FEBRUARY, "mar.pdf": MARCH}
+        for name in texts:
+            (tmp_path / name).write_bytes(b"%PDF-1.4 " + name.encode())
+        answers = [_mock_metadata("ACME Corporation", "15.01.2024", "ER"),
+                   _mock_metadata("ACME Corporation", "15.02.2024", "ER")]
+
+        with patch("autorename_pdf.extract_content",
+                   side_effect=lambda path, *a, **k: ExtractionResult(
+                       text=texts[os.path.basename(path)], quality_score=0.9, sources=["text"])), \
+             patch("autorename_pdf.extract_metadata", side_effect=answers) as mock_ai:
+            results = [process_pdf(str(tmp_path / name), sample_config, "", None, dry_run=True, cache=cache)
+                       for name in texts]
+
+        assert mock_ai.call_count == 2
+        assert [r.template for r in results] == [None, None, "ACME Corporation ER"]
+        assert results[2].new_name == "20240315 ACME Corporation ER.pdf"
+
 
 class TestCollectPdfFiles:
     """Test file collection from paths."""
@@ -273,6 +408,30 @@ class TestCollectPdfFiles:
         files = collect_pdf_files([mangled])
         assert len(files) == 1
 
+    def test_shards_partition_files(self, tmp_path):
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        for i in range(20):
+            (tmp_path / f"doc{i}.pdf").write_text("fake")
+            (sub / f"doc{i}.pdf").write_text("fake")
+
+        everything = collect_pdf_files([str(tmp_path)], recursive=True)
+        shards = [collect_pdf_files([str(tmp_path)], recursive=True, shard=(i, 3)) for i in (1, 2, 3)]
+        assert sorted(sum(shards, [])) == sorted(everything)
+        assert all(shards)
+
+    def test_shard_assignment_independent_of_mount_point(self, tmp_path):
+        first, second = tmp_path / "mnt1", tmp_path / "mnt2"
+        for root in (first, second):
+            root.mkdir()
+            for i in range(10):
+                (root / f"doc{i}.pdf").write_text("fake")
+
+        def _names(root):
+            return sorted(os.path.basename(p) for p in collect_pdf_files([str(root)], shard=(2, 4)))
+
+        assert _names(first) == _names(second)
+
 
 # ---------------------------------------------------------------------------
 # Workflow simulation: full handler tests with fixture PDFs
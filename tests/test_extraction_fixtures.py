@@ -97,6 +97,25 @@ class TestMultipage:
         images = render_pages_to_images(fixture_multipage, max_pages=2)
         assert len(images) == 2
 
+    def test_first_and_last_page(self, fixture_multipage, sample_config):
+        sample_config["pdf"].update(max_pages=2, page_selection="first_last")
+        result = extract_content(fixture_multipage, sample_config)
+        assert result.pages == [0, 2]
+        assert "Page 1:" in result.text and "Page 3:" in result.text
+        assert "TOTAL" in result.text
+        assert "Page 2:" not in result.text
+
+    def test_adaptive_pages_stop_after_page_one(self, fixture_multipage, sample_config):
+        sample_config["pdf"].update(max_pages=3, adaptive_pages=True)
+        result = extract_content(fixture_multipage, sample_config)
+        assert result.pages == [0]
+        assert "Stark" in result.text
+        assert "Page 2:" not in result.text
+
+    def test_renders_selected_pages(self, fixture_multipage):
+        images = render_pages_to_images(fixture_multipage, pages=[0, 2, 7])
+        assert len(images) == 2
+
 
 class TestEdgeCases:
     """Edge cases: empty, minimal text."""
@@ -142,3 +161,44 @@ class TestEdgeCases:
         assert len(images) == 1
         assert result.quality_score >= 0.5
         assert "text" in result.sources
+
+
+class TestPageRegions:
+    """pdf.regions: vision gets the header band of a scanned invoice, about a third of the pixels."""
+
+    def test_header_crop_for_vision(self, fixture_image_invoice, sample_config):
+        sample_config["pdf"].update(vision=True, regions=["header"])
+        result = extract_content(fixture_image_invoice, sample_config)
+        [full] = render_pages_to_images(fixture_image_invoice, max_pages=1)
+        [header] = result.images
+        assert header.width == full.width
+        assert header.height < full.height * 0.4
+        assert header.getbbox() is not None
+
+
+class TestPdfiumBackend:
+    """pdf.text_backend: pdfium reads the same text as pdfplumber from the fixtures."""
+
+    @pytest.mark.parametrize("name, expected", [
+        ("text_invoice_acme.pdf", ["ACME", "15.03.2024"]),
+        ("text_rechnung_mustermann.pdf", ["Mustermann", "08.02.2025", "Rechnung"]),
+        ("text_letter_globex.pdf", ["Globex", "22.01.2025"]),
+        ("text_outgoing_invoice_wayne.pdf", ["Wayne", "Petermeir"]),
+    ])
+    def test_same_content_as_pdfplumber(self, fixture_text_invoice, name, expected):
+        path = os.path.join(os.path.dirname(fixture_text_invoice), name)
+        text, quality = extract_text(path, backend="pdfium")
+        _, plumber_quality = extract_text(path)
+        assert text.startswith("Page 1:\n")
+        assert all(value in text for value in expected)
+        assert abs(quality - plumber_quality) < 0.1
+
+    def test_page_limit(self, fixture_multipage):
+        text, _ = extract_text(fixture_multipage, max_pages=1, backend="pdfium")
+        assert "Page 1:" in text
+        assert "Page 2:" not in text
+
+    def test_auto_keeps_low_quality_scan_low(self, fixture_image_invoice):
+        _, quality = extract_text(fixture_image_invoice, backend="auto")
+        assert quality < 0.3
+
@@ -0,0 +1,218 @@
+"""Tests for _job_service.py."""
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _job_service import JobQueue, make_job_server, write_service_file
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+def _fake_runner(job):
+    """Reports one renamed FileResult per path."""
+    paths = job.params["paths"]
+    for index, path in enumerate(paths):
+        if job.cancelled.is_set():
+            break
+        job.add_result(index, {"file": path, "status": "renamed"}, len(paths))
+    return {"success": True, "total": len(paths)}
+
+
+class TestJobQueue:
+    def test_priority_order(self):
+        gate = threading.Event()
+        order = []
+
+        def _runner(job):
+            gate.wait(5)
+            order.append(job.params["name"])
+            return {}
+
+        queue = JobQueue(_runner, workers=1)
+        blocker = queue.submit({"name": "blocker"})
+        _wait_for(lambda: blocker.status == "running")
+        jobs = [queue.submit({"name": "low"}), queue.submit({"name": "high"}, priority=5),
+                queue.submit({"name": "low2"})]
+        gate.set()
+        _wait_for(lambda: all(job.status == "done" for job in jobs))
+        queue.shutdown()
+        assert order == ["blocker", "high", "low", "low2"]
+
+    def test_results_and_summary(self):
+        queue = JobQueue(_fake_runner)
+        job = queue.submit({"paths": ["/a.pdf", "/b.pdf"]})
+        _wait_for(lambda: job.status == "done")
+        queue.shutdown()
+        assert [r["index"] for r in job.results()] == [0, 1]
+        status = job.status_dict()
+        assert status["completed"] == 2
+        assert status["total"] == 2
+        assert status["summary"] == {"success": True, "total": 2}
+
+    def test_cancel_queued_job_never_runs(self):
+        gate = threading.Event()
+        ran = []
+
+        def _runner(job):
+            gate.wait(5)
+            ran.append(job.id)
+            return {}
+
+        queue = JobQueue(_runner, workers=1)
+        first = queue.submit({})
+        second = queue.submit({})
+        _wait_for(lambda: first.status == "running")
+        queue.cancel(second.id)
+        assert second.status == "cancelled"
+        gate.set()
+        _wait_for(lambda: first.status == "done")
+        queue.shutdown()
+        assert ran == [first.id]
+
+    def test_cancel_running_job(self):
+        def _runner(job):
+            assert job.cancelled.wait(5)
+            return {"stopped": True}
+
+        queue = JobQueue(_runner)
+        job = queue.submit({})
+        _wait_for(lambda: job.status == "running")
+        queue.cancel(job.id)
+        _wait_for(lambda: job.status == "cancelled")
+        queue.shutdown()
+        assert job.summary == {"stopped": True}
+
+    def test_runner_error_data_kept(self):
+        class _AppError(Exception):
+            data = {"success": False, "error_type": "no_files", "message": "none", "suggestion": None}
+
+        def _runner(job):
+            raise _AppError("none")
+
+        queue = JobQueue(_runner)
+        job = queue.submit({})
+        _wait_for(lambda: job.status == "failed")
+        queue.shutdown()
+        assert job.error["error_type"] == "no_files"
+
+    def test_submit_after_shutdown_rejected(self):
+        queue = JobQueue(_fake_runner)
+        queue.shutdown()
+        with pytest.raises(RuntimeError):
+            queue.submit({"paths": ["/a.pdf"]})
+
+
+_TOKEN = "test-token"
+
+
+@pytest.fixture
+def job_server():
+    queue = JobQueue(_fake_runner)
+    server = make_job_server(queue, port=0, info={"version": "test"}, token=_TOKEN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    queue.shutdown()
+
+
+def _call(url: str, method: str = "GET", payload: dict | None = None,
+          headers: dict | None = None) -> tuple[int, dict]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {_TOKEN}", **(headers or {})}
+    request = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class TestJobServer:
+    def test_binds_to_localhost(self, job_server):
+        assert job_server.startswith("http://127.0.0.1:")
+        status, body = _call(f"{job_server}/health")
+        assert status == 200
+        assert body == {"status": "ok", "version": "test"}
+
+    def test_submit_poll_results(self, job_server):
+        status, body = _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf", "/b.pdf"], "priority": 2})
+        assert status == 202
+        job_id = body["job_id"]
+        assert body["priority"] == 2
+
+        _wait_for(lambda: _call(f"{job_server}/jobs/{job_id}")[1]["status"] == "done")
+        status, body = _call(f"{job_server}/jobs/{job_id}/results")
+        assert status == 200
+        assert [f["file"] for f in body["files"]] == ["/a.pdf", "/b.pdf"]
+        assert body["summary"]["total"] == 2
+
+        _, listing = _call(f"{job_server}/jobs")
+        assert [j["job_id"] for j in listing["jobs"]] == [job_id]
+
+    def test_bad_requests(self, job_server):
+        assert _call(f"{job_server}/jobs", "POST", {"paths": []})[0] == 400
+        assert _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"], "priority": "high"})[0] == 400
+        status, body = _call(f"{job_server}/jobs/nope")
+        assert status == 404
+        assert body["error_type"] == "not_found"
+        assert _call(f"{job_server}/jobs/nope", "DELETE")[0] == 404
+        assert _call(f"{job_server}/other")[0] == 404
+
+    def test_cancel_endpoint(self, job_server):
+        _, body = _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"]})
+        status, body = _call(f"{job_server}/jobs/{body['job_id']}", "DELETE")
+        assert status == 200
+        assert body["status"] in ("cancelled", "running", "done")
+
+    def test_token_required(self, job_server):
+        status, body = _call(f"{job_server}/jobs", headers={"Authorization": ""})
+        assert status == 401
+        assert body["error_type"] == "unauthorized"
+        assert _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"]},
+                     headers={"Authorization": "Bearer wrong"})[0] == 401
+        # Liveness checks need no token
+        assert _call(f"{job_server}/health", headers={"Authorization": ""})[0] == 200
+
+    def test_post_requires_json_content_type(self, job_server):
+        status, body = _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"]},
+                             headers={"Content-Type": "text/plain"})
+        assert status == 415
+        assert _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"]},
+                     headers={"Content-Type": "application/json; charset=utf-8"})[0] == 202
+
+    def test_foreign_host_and_origin_rejected(self, job_server):
+        port = job_server.rsplit(":", 1)[1]
+        # DNS rebinding: a browser on evil.example resolved to 127.0.0.1
+        assert _call(f"{job_server}/jobs", headers={"Host": f"evil.example:{port}"})[0] == 403
+        assert _call(f"{job_server}/health", headers={"Host": f"evil.example:{port}"})[0] == 403
+        assert _call(f"{job_server}/jobs", "POST", {"paths": ["/a.pdf"]},
+                     headers={"Origin": "https://evil.example"})[0] == 403
+        assert _call(f"{job_server}/jobs", headers={"Host": f"localhost:{port}",
+                                                    "Origin": f"http://localhost:{port}"})[0] == 200
+
+
+def test_service_file_readable_by_owner_only(tmp_path):
+    path = str(tmp_path / ".autorename-serve.json")
+    write_service_file(path, "http://127.0.0.1:8765", "secret")
+    write_service_file(path, "http://127.0.0.1:9000", "other")
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["token"] == "other"
+    if os.name == "posix":
+        assert os.stat(path).st_mode & 0o077 == 0
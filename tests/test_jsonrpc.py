@@ -0,0 +1,147 @@
+"""Tests for _jsonrpc.py."""
+
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _jsonrpc import (
+    APPLICATION_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    JsonRpcServer,
+    RpcError,
+)
+
+
+def _request(request_id, method, params=None) -> str:
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return json.dumps(message) + "\n"
+
+
+def _messages(writer: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in writer.getvalue().splitlines()]
+
+
+def _serve(lines: list[str], register=None) -> list[dict]:
+    writer = io.StringIO()
+    server = JsonRpcServer(io.StringIO("".join(lines)), writer)
+    if register:
+        register(server)
+    server.serve_forever()
+    return _messages(writer)
+
+
+class TestDispatch:
+    def test_result_and_notification(self):
+        def _register(server):
+            def _echo(params, ctx):
+                ctx.notify("progress", {"step": 1})
+                return {"echo": params["value"]}
+            server.register("echo", _echo)
+
+        messages = _serve([_request(1, "echo", {"value": "hi"})], _register)
+        assert messages[0] == {"jsonrpc": "2.0", "method": "progress", "params": {"id": 1, "step": 1}}
+        assert messages[1] == {"jsonrpc": "2.0", "id": 1, "result": {"echo": "hi"}}
+
+    def test_protocol_errors(self):
+        messages = _serve([
+            "not json\n",
+            json.dumps({"jsonrpc": "2.0", "id": 2}) + "\n",
+            _request(3, "missing"),
+            json.dumps({"jsonrpc": "2.0", "id": 4, "method": "x", "params": [1]}) + "\n",
+        ])
+        codes = {m["id"]: m["error"]["code"] for m in messages}
+        assert codes == {None: PARSE_ERROR, 2: INVALID_REQUEST, 3: METHOD_NOT_FOUND, 4: INVALID_PARAMS}
+
+    def test_handler_errors(self):
+        def _register(server):
+            def _app_error(params, ctx):
+                raise RpcError(APPLICATION_ERROR, "no files", {"error_type": "no_files"})
+
+            def _crash(params, ctx):
+                raise RuntimeError("boom")
+
+            server.register("app", _app_error)
+            server.register("crash", _crash)
+
+        messages = {m["id"]: m for m in _serve([_request(1, "app"), _request(2, "crash")], _register)}
+        assert messages[1]["error"]["data"] == {"error_type": "no_files"}
+        assert messages[2]["error"]["message"] == "boom"
+
+    def test_notifications_get_no_response(self):
+        called = []
+
+        def _register(server):
+            server.register("log", lambda params, ctx: called.append(params))
+
+        messages = _serve([json.dumps({"jsonrpc": "2.0", "method": "log", "params": {"a": 1}}) + "\n"], _register)
+        assert called == [{"a": 1}]
+        assert messages == []
+
+    def test_shutdown_stops_reading(self):
+        called = []
+
+        def _register(server):
+            server.register("work", lambda params, ctx: called.append(1))
+
+        messages = _serve([_request(1, "shutdown"), _request(2, "work")], _register)
+        assert messages == [{"jsonrpc": "2.0", "id": 1, "result": {"shutdown": True}}]
+        assert called == []
+
+
+class TestCancel:
+    def test_cancel_running_request(self):
+        writer = io.StringIO()
+        server = JsonRpcServer(io.StringIO(), writer)
+        started = threading.Event()
+
+        def _slow(params, ctx):
+            started.set()
+            assert ctx.cancelled.wait(5)
+            return {"cancelled": True}
+
+        server.register("slow", _slow)
+        server.handle_line(_request(1, "slow"))
+        assert started.wait(5)
+        server.handle_line(_request(2, "cancel", {"id": 1}))
+        server.handle_line(_request(3, "cancel", {"id": 99}))
+        server._pool.shutdown(wait=True)
+
+        messages = {m["id"]: m for m in _messages(writer)}
+        assert messages[1]["result"] == {"cancelled": True}
+        assert messages[2]["result"] == {"cancelled": True}
+        assert messages[3]["result"] == {"cancelled": False}
+
+    def test_end_of_input_cancels_running_requests(self):
+        writer = io.StringIO()
+        seen = []
+
+        def _slow(params, ctx):
+            time.sleep(0.05)
+            seen.append(ctx.cancelled.wait(5))
+
+        server = JsonRpcServer(io.StringIO(_request(1, "slow")), writer)
+        server.register("slow", _slow)
+        server.serve_forever()
+        assert seen == [True]
+
+    def test_duplicate_running_id_rejected(self):
+        writer = io.StringIO()
+        server = JsonRpcServer(io.StringIO(), writer)
+        release = threading.Event()
+        server.register("slow", lambda params, ctx: release.wait(5))
+        server.handle_line(_request(1, "slow"))
+        server.handle_line(_request(1, "slow"))
+        release.set()
+        server._pool.shutdown(wait=True)
+        errors = [m for m in _messages(writer) if "error" in m]
+        assert errors[0]["error"]["code"] == INVALID_REQUEST
@@ -8,11 +8,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from unittest.mock import patch, MagicMock
 import json
-from _pdf_utils import extract_text, assess_text_quality, render_pages_to_images, extract_content, _should_run_step
+from _pdf_utils import extract_text, assess_text_quality, render_pages_to_images, extract_content, _should_run_step, triage_pdf
 from _pdf_utils import (
     _mojibake_marker_count, _maybe_fix_mojibake,
     _get_bridge_script_path, _get_paddleocr_python,
-    _paddleocr_available, ocr_with_paddleocr,
+    _paddleocr_available, ocr_with_paddleocr, PaddleOCRBridge,
 )
 
 
@@ -79,6 +79,84 @@ class TestExtractText:
         assert quality == 0.0
 
 
+class TestTextBackend:
+    def test_pdfium_reads_text_layer(self, sample_pdf):
+        text, quality = extract_text(sample_pdf, max_pages=3, backend="pdfium")
+        assert "Invoice" in text or "12345" in text
+        assert quality > 0.0
+
+    def test_auto_falls_back_to_pdfplumber_on_poor_text(self, sample_pdf):
+        with patch("_pdf_utils._extract_text_with_pdfium", return_value=[(0, "# ~ ! ?")]) as mock_pdfium, \
+             patch("_pdf_utils._extract_text_with_pdfplumber",
+                   return_value=[(0, "Invoice 12345 from ACME Corporation " * 20)]):
+            text, quality = extract_text(sample_pdf, backend="auto")
+        mock_pdfium.assert_called_once()
+        assert text.startswith("Page 1:\nInvoice 12345")
+        assert quality > 0.5
+
+    def test_auto_keeps_good_pdfium_text(self, sample_pdf):
+        with patch("_pdf_utils._extract_text_with_pdfplumber") as mock_plumber:
+            extract_text(sample_pdf, backend="auto", min_quality=0.1)
+        mock_plumber.assert_not_called()
+
+    def test_pdfium_error_falls_back(self, sample_pdf):
+        with patch("_pdf_utils._extract_text_with_pdfium", side_effect=RuntimeError("broken xref")):
+            text, quality = extract_text(sample_pdf, backend="pdfium")
+        assert quality > 0.0
+
+    def test_mojibake_repaired_for_pdfium_text(self, sample_pdf):
+        with patch("_pdf_utils._extract_text_with_pdfium",
+                   return_value=[(0, "Gr\u00c3\u00bc\u00c3\u0178e aus M\u00c3\u00bcnchen")]):
+            text, _ = extract_text(sample_pdf, backend="pdfium")
+        assert text == "Page 1:\nGr\u00fc\u00dfe aus M\u00fcnchen"
+
+    def test_backend_setting(self):
+        from _pdf_utils import get_text_backend
+        assert get_text_backend({}) == "pdfplumber"
+        assert get_text_backend({"pdf": {"text_backend": "auto"}}) == "auto"
+        assert get_text_backend({"pdf": {"text_backend": "fitz"}}) == "pdfplumber"
+
+
+class TestPageBudget:
+    def test_page_selection(self):
+        from _pdf_utils import PageBudget
+        assert PageBudget(3).select(10) == [0, 1, 2]
+        assert PageBudget(3, "first_last").select(10) == [0, 1, 9]
+        assert PageBudget(3, "first_last").select(3) == [0, 1, 2]
+        assert PageBudget(1, "first_last").select(10) == [0]
+        assert PageBudget(3).select(0) == []
+
+    def test_settings(self):
+        from _pdf_utils import PageBudget, get_page_budget
+        assert get_page_budget({}) == PageBudget(3, "first", None)
+        config = {"pdf": {"max_pages": 5, "page_selection": "first_last", "adaptive_pages": True}}
+        assert get_page_budget(config) == PageBudget(5, "first_last", 0.8)
+        assert get_page_budget({"pdf": {"page_selection": "middle"}}).selection == "first"
+
+    def test_adaptive_stops_after_good_page(self, sample_pdf):
+        from _pdf_utils import PageBudget, extract_pages
+        good = "Invoice 12345 from ACME Corporation dated 15.03.2024 " * 10
+        pages_read = []
+
+        def _pages(pdf_path, budget):
+            from _pdf_utils import _read_budget_pages
+            return _read_budget_pages(pdf_path, budget, 5, lambda i: pages_read.append(i) or good)
+
+        with patch("_pdf_utils._extract_text_with_pdfium", side_effect=_pages):
+            text, quality, pages, _ = extract_pages(sample_pdf, PageBudget(3, stop_quality=0.8), "pdfium")
+        assert pages == pages_read == [0]
+        assert quality >= 0.8
+        with patch("_pdf_utils._extract_text_with_pdfium", side_effect=_pages):
+            _, _, pages, _ = extract_pages(sample_pdf, PageBudget(3, "first_last"), "pdfium")
+        assert pages == [0, 1, 4]
+
+    def test_budget_is_part_of_cache_key(self, sample_pdf, sample_config):
+        from _pdf_utils import extraction_cache_key
+        before = extraction_cache_key(sample_pdf, sample_config)
+        sample_config["pdf"]["adaptive_pages"] = True
+        assert extraction_cache_key(sample_pdf, sample_config) != before
+
+
 class TestRenderPagesToImages:
     def test_render_valid_pdf(self, sample_pdf):
         images = render_pages_to_images(sample_pdf, max_pages=1)
@@ -91,6 +169,32 @@ class TestRenderPagesToImages:
         assert images == []
 
 
+class TestTriagePdf:
+    def test_text_pdf_is_cheap(self, sample_pdf, sample_config):
+        sample_config["pdf"]["ocr"] = "auto"
+        triage = triage_pdf(sample_pdf, sample_config)
+        assert triage.page_count == 1
+        assert triage.has_text_layer
+        assert not triage.expensive
+
+    def test_scan_needs_auto_ocr(self, empty_pdf, sample_config):
+        sample_config["pdf"]["ocr"] = "auto"
+        triage = triage_pdf(empty_pdf, sample_config)
+        assert not triage.has_text_layer
+        assert triage.expensive
+
+    def test_scan_without_ocr_or_vision_is_cheap(self, empty_pdf, sample_config):
+        assert not triage_pdf(empty_pdf, sample_config).expensive
+
+    def test_unreadable_file_is_cheap(self, tmp_path, sample_config):
+        broken = tmp_path / "broken.pdf"
+        broken.write_text("not a pdf")
+        sample_config["pdf"]["vision"] = True
+        triage = triage_pdf(str(broken), sample_config)
+        assert triage.page_count == 0
+        assert not triage.expensive
+
+
 class TestExtractContent:
     def test_text_only_default(self, sample_pdf, sample_config):
         """Default config (ocr=False, vision=False) returns text source only."""
@@ -123,6 +227,58 @@ class TestExtractContent:
         assert result.images == []
 
 
+class TestExtractContentCache:
+    def test_second_extraction_comes_from_cache(self, sample_pdf, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        first = extract_content(sample_pdf, sample_config, cache=cache)
+
+        with patch("_pdf_utils.extract_pages") as mock_extract:
+            second = extract_content(sample_pdf, sample_config, cache=cache)
+        mock_extract.assert_not_called()
+        assert second.text == first.text
+        assert second.quality_score == first.quality_score
+        assert second.sources == ["text"]
+
+    def test_settings_change_misses(self, sample_pdf, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        extract_content(sample_pdf, sample_config, cache=cache)
+        sample_config["pdf"]["max_pages"] = 1
+        with patch("_pdf_utils.extract_pages", return_value=("text", 0.9, [0], [0.9])) as mock_extract:
+            extract_content(sample_pdf, sample_config, cache=cache)
+        mock_extract.assert_called_once()
+
+    def test_backend_change_misses(self, sample_pdf, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        extract_content(sample_pdf, sample_config, cache=cache)
+        sample_config["pdf"]["text_backend"] = "pdfium"
+        with patch("_pdf_utils.extract_pages", return_value=("text", 0.9, [0], [0.9])) as mock_extract:
+            extract_content(sample_pdf, sample_config, cache=cache)
+        assert mock_extract.call_args[0][2] == "pdfium"
+
+    def test_cached_hit_still_renders_for_vision(self, sample_pdf, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        sample_config["pdf"]["vision"] = True
+        extract_content(sample_pdf, sample_config, cache=cache)
+        with patch("_pdf_utils.extract_pages") as mock_extract:
+            result = extract_content(sample_pdf, sample_config, cache=cache)
+        mock_extract.assert_not_called()
+        assert result.sources == ["text", "vision"]
+        assert len(result.images) > 0
+
+    def test_degraded_extraction_not_cached(self, sample_pdf, sample_config, tmp_path):
+        from _cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        sample_config["pdf"]["ocr"] = True
+        with patch("_pdf_utils._paddleocr_available", return_value=False):
+            result = extract_content(sample_pdf, sample_config, cache=cache)
+        assert result.warnings
+        assert cache.stats()["entries"] == 0
+
+
 class TestEncryptedPdfDetection:
     def test_encrypted_pdf_returns_empty(self, tmp_path):
         """Encrypted PDFs should return empty text with clear log message."""
@@ -310,9 +466,195 @@ class TestPaddleOCR:
         assert result == ""
 
 
+class TestPaddleOCRBridge:
+    """Test the persistent bridge shared across a batch."""
+
+    @staticmethod
+    def _mock_process(responses):
+        mock_process = MagicMock()
+        mock_process.stdin = MagicMock()
+        mock_process.stderr = iter([])
+        mock_process.wait.return_value = 0
+        mock_process.stdout = MagicMock()
+        mock_process.stdout.readline = MagicMock(side_effect=responses)
+        return mock_process
+
+    def test_bridge_reused_across_calls(self):
+        """Two OCR calls on one bridge spawn the subprocess only once."""
+        from PIL import Image
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"}}
+        ok = json.dumps({"status": "ok", "text": "page text"}) + "\n"
+        mock_process = self._mock_process([ok, ok, ok])
+
+        with patch("_pdf_utils._get_paddleocr_python", return_value="/some/python"), \
+             patch("_pdf_utils._get_bridge_script_path", return_value="/bridge.py"), \
+             patch("subprocess.Popen", return_value=mock_process) as mock_popen:
+            with PaddleOCRBridge(config) as bridge:
+                first = ocr_with_paddleocr([Image.new("RGB", (50, 50))], config, bridge=bridge)
+                second = ocr_with_paddleocr(
+                    [Image.new("RGB", (50, 50)), Image.new("RGB", (50, 50))], config, bridge=bridge,
+                )
+
+        assert mock_popen.call_count == 1
+        assert "page text" in first
+        assert "Page 2:" in second
+        mock_process.stdin.close.assert_called_once()
+
+    def test_bridge_not_started_without_ocr(self):
+        """A bridge that never receives a page never spawns a process."""
+        config = {"paddleocr": {"venv_path": ""}}
+        with patch("subprocess.Popen") as mock_popen:
+            PaddleOCRBridge(config).close()
+        mock_popen.assert_not_called()
+
+    def test_bridge_restarts_after_crash(self):
+        """EOF from a dead bridge triggers a restart and a retry of the page."""
+        from PIL import Image
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"}}
+        dead = self._mock_process([""])
+        alive = self._mock_process([json.dumps({"status": "ok", "text": "recovered"}) + "\n"])
+
+        with patch("_pdf_utils._get_paddleocr_python", return_value="/some/python"), \
+             patch("_pdf_utils._get_bridge_script_path", return_value="/bridge.py"), \
+             patch("subprocess.Popen", side_effect=[dead, alive]) as mock_popen:
+            with PaddleOCRBridge(config) as bridge:
+                result = ocr_with_paddleocr([Image.new("RGB", (50, 50))], config, bridge=bridge)
+
+        assert mock_popen.call_count == 2
+        assert "recovered" in result
+
+    def test_hung_bridge_killed_at_deadline(self):
+        """A bridge that never answers is killed once timeouts.ocr runs out."""
+        import threading
+        from PIL import Image
+        from _deadlines import StageTimeoutError
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"},
+                  "timeouts": {"ocr": 0.1}}
+        killed = threading.Event()
+        hung = self._mock_process(None)
+        hung.stdout.readline = MagicMock(side_effect=lambda: killed.wait(5) and "")
+        hung.kill.side_effect = killed.set
+        alive = self._mock_process([json.dumps({"status": "ok", "text": "fresh"}) + "\n"])
+
+        with patch("_pdf_utils._get_paddleocr_python", return_value="/some/python"), \
+             patch("_pdf_utils._get_bridge_script_path", return_value="/bridge.py"), \
+             patch("subprocess.Popen", side_effect=[hung, alive]):
+            with PaddleOCRBridge(config) as bridge:
+                with pytest.raises(StageTimeoutError, match="OCR timed out after 0.1s"):
+                    ocr_with_paddleocr([Image.new("RGB", (50, 50))], config, bridge=bridge)
+                # The next document gets a fresh bridge
+                assert "fresh" in ocr_with_paddleocr([Image.new("RGB", (50, 50))], config, bridge=bridge)
+
+        assert killed.is_set()
+
+
+class TestOcrPageCache:
+    """Pages recognized before are taken from the cache, not the bridge."""
+
+    def test_identical_pages_recognized_once(self, tmp_path):
+        from PIL import Image
+        from _cache import ResultCache
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"}}
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        cover, terms = Image.new("RGB", (50, 50), "white"), Image.new("RGB", (50, 50), "gray")
+        mock_process = TestPaddleOCRBridge._mock_process([
+            json.dumps({"status": "ok", "text": "Cover sheet"}) + "\n",
+            json.dumps({"status": "ok", "text": "Terms"}) + "\n",
+        ])
+
+        with patch("_pdf_utils._get_paddleocr_python", return_value="/some/python"), \
+             patch("_pdf_utils._get_bridge_script_path", return_value="/bridge.py"), \
+             patch("subprocess.Popen", return_value=mock_process):
+            with PaddleOCRBridge(config) as bridge:
+                first = ocr_with_paddleocr([cover, terms], config, bridge=bridge, cache=cache)
+                second = ocr_with_paddleocr([terms.copy(), cover.copy()], config, bridge=bridge, cache=cache)
+
+        assert mock_process.stdout.readline.call_count == 2
+        assert first == "Page 1:\nCover sheet\n\nPage 2:\nTerms"
+        assert second == "Page 1:\nTerms\n\nPage 2:\nCover sheet"
+
+    def test_all_pages_cached_never_starts_bridge(self, tmp_path):
+        from PIL import Image
+        from _cache import ResultCache
+        from _pdf_utils import OCR_CACHE, ocr_page_cache_key
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"}}
+        cache = ResultCache(str(tmp_path / "cache.sqlite"), 1024 * 1024)
+        page = Image.new("RGB", (50, 50))
+        cache.put(OCR_CACHE, ocr_page_cache_key(page, config), {"text": "cached"})
+
+        with patch("_pdf_utils._get_paddleocr_python", return_value="/some/python"), \
+             patch("subprocess.Popen") as mock_popen:
+            assert ocr_with_paddleocr([page], config, cache=cache) == "Page 1:\ncached"
+        mock_popen.assert_not_called()
+
+    def test_adaptive_ocr_stops_and_labels_pages(self):
+        from PIL import Image
+        config = {"paddleocr": {"venv_path": "", "language": "en", "device": "auto"},
+                  "pdf": {"adaptive_pages": True}}
+        bridge = MagicMock()
+        bridge.ocr_image.return_value = {"status": "ok", "text": "Invoice 12345 from ACME Corporation " * 20}
+        images = [Image.new("RGB", (50, 50)) for _ in range(3)]
+
+        text = ocr_with_paddleocr(images, config, bridge=bridge, pages=[0, 1, 9])
+        assert bridge.ocr_image.call_count == 1
+        assert text.startswith("Page 1:\n")
+
+        config["pdf"]["adaptive_pages"] = False
+        bridge.ocr_image.return_value = {"status": "ok", "text": "x"}
+        text = ocr_with_paddleocr(images, config, bridge=bridge, pages=[0, 1, 9])
+        assert "Page 10:\nx" in text
+
+    def test_ocr_settings_are_part_of_key(self):
+        from PIL import Image
+        from _pdf_utils import ocr_page_cache_key
+        page = Image.new("RGB", (50, 50))
+        en = {"paddleocr": {"language": "en", "det_limit_side_len": 736}}
+        de = {"paddleocr": {"language": "de", "det_limit_side_len": 736}}
+        wide = {"paddleocr": {"language": "en", "det_limit_side_len": 1280}}
+        assert len({ocr_page_cache_key(page, c) for c in (en, de, wide)}) == 3
+
+
 class TestExtractContentOCR:
     """Test extract_content OCR integration paths."""
 
+    def test_auto_ocr_plans_per_page(self):
+        from _pdf_utils import plan_extraction
+        config = {"pdf": {"ocr": "auto", "text_quality_threshold": 0.3}}
+        plan = plan_extraction(0.9, config, [0, 1, 2], [0.9, 0.0, 0.8])
+        assert plan.run_ocr and plan.ocr_pages == [1]
+        assert not plan_extraction(0.9, config, [0, 1], [0.9, 0.8]).run_ocr
+        # Without page scores (triage) and with ocr: true, the whole document counts
+        assert plan_extraction(0.1, config).ocr_pages is None
+        config["pdf"]["ocr"] = True
+        assert plan_extraction(0.9, config, [0, 1, 2], [0.9, 0.0, 0.8]).ocr_pages is None
+
+    def test_auto_ocr_renders_only_scanned_pages(self, sample_pdf, sample_config):
+        from PIL import Image
+        sample_config["pdf"]["ocr"] = "auto"
+        cover = "Page 1:\n" + "Dear customer, please find our invoice attached. " * 10
+        with patch("_pdf_utils.extract_pages", return_value=(cover, 0.9, [0, 1], [0.9, 0.0])), \
+             patch("_pdf_utils.render_pages_to_images", return_value=[Image.new("RGB", (50, 50))]) as mock_render, \
+             patch("_pdf_utils._paddleocr_available", return_value=True), \
+             patch("_pdf_utils.ocr_with_paddleocr", return_value="Page 2:\nInvoice 42") as mock_ocr:
+            result = extract_content(sample_pdf, sample_config)
+        assert mock_render.call_args.kwargs["pages"] == [1]
+        assert mock_ocr.call_args.kwargs["pages"] == [1]
+        assert result.ocr_pages == [1]
+        assert result.sources == ["text", "ocr"]
+
+    def test_auto_ocr_with_vision_ocrs_scanned_pages_only(self, sample_pdf, sample_config):
+        from PIL import Image
+        sample_config["pdf"].update(ocr="auto", vision=True)
+        pages = [Image.new("RGB", (50, 50), "white"), Image.new("RGB", (50, 50), "gray")]
+        with patch("_pdf_utils.extract_pages", return_value=("Page 1:\ncover", 0.2, [0, 1], [0.5, 0.0])), \
+             patch("_pdf_utils.render_pages_to_images", return_value=pages) as mock_render, \
+             patch("_pdf_utils._paddleocr_available", return_value=True), \
+             patch("_pdf_utils.ocr_with_paddleocr", return_value="Page 2:\nInvoice 42") as mock_ocr:
+            result = extract_content(sample_pdf, sample_config)
+        assert mock_render.call_args.kwargs["pages"] == [0, 1]
+        assert mock_ocr.call_args.args[0] == [pages[1]]
+        assert result.images == pages
+
     def test_ocr_enabled_available(self, sample_pdf, sample_config):
         """When OCR is enabled and available, it runs and appears in sources."""
         sample_config["pdf"]["ocr"] = True
@@ -340,7 +682,7 @@ class TestExtractContentOCR:
              patch("_pdf_utils.ocr_with_paddleocr", return_value="text"):
             mock_render.return_value = [Image.new("RGB", (100, 100))]
             extract_content(sample_pdf, sample_config)
-        mock_render.assert_called_once_with(sample_pdf, 3, scale=1.5)
+        mock_render.assert_called_once_with(sample_pdf, 3, scale=1.5, pages=[0])
 
     def test_ocr_and_vision_uses_full_scale(self, sample_pdf, sample_config):
         """OCR + vision renders at scale 2.0."""
@@ -352,7 +694,60 @@ class TestExtractContentOCR:
              patch("_pdf_utils.ocr_with_paddleocr", return_value="text"):
             mock_render.return_value = [Image.new("RGB", (100, 100))]
             extract_content(sample_pdf, sample_config)
-        mock_render.assert_called_once_with(sample_pdf, 3, scale=2.0)
+        mock_render.assert_called_once_with(sample_pdf, 3, scale=2.0, pages=[0])
+
+
+class TestPageRegions:
+    def test_region_settings(self):
+        from _pdf_utils import get_page_regions, parse_region
+        assert parse_region("header") == (0.0, 0.35)
+        assert parse_region([0.1, 0.4]) == (0.1, 0.4)
+        assert parse_region("sidebar") is None
+        assert parse_region([0.6, 0.2]) is None
+        config = {"pdf": {"regions": ["footer", [0.0, 0.2], "header", "sidebar"]}}
+        assert get_page_regions(config) == [(0.0, 0.35), (0.75, 1.0)]
+        assert get_page_regions({"pdf": {"regions": [[0.0, 0.6], [0.5, 1.0]]}}) == []
+
+    def test_crop_stacks_bands(self):
+        from PIL import Image
+        from _pdf_utils import crop_to_regions
+        page = Image.new("RGB", (100, 200), "white")
+        assert crop_to_regions(page, [(0.0, 0.35), (0.75, 1.0)]).size == (100, 120)
+        assert crop_to_regions(page, []) is page
+
+    def test_ocr_gets_cropped_pages(self, sample_pdf, sample_config):
+        sample_config["pdf"].update(ocr=True, regions=["header"])
+        with patch("_pdf_utils._paddleocr_available", return_value=True), \
+             patch("_pdf_utils.ocr_with_paddleocr", return_value="Invoice 12345 from ACME Corporation " * 20) as mock_ocr:
+            result = extract_content(sample_pdf, sample_config)
+        [image] = mock_ocr.call_args.args[0]
+        full_width, full_height = render_pages_to_images(sample_pdf, 1, scale=1.5)[0].size
+        assert image.size == (full_width, int(full_height * 0.35))
+        assert mock_ocr.call_count == 1
+        assert result.images == []
+
+    def test_unusable_crop_retries_full_pages(self, sample_pdf, sample_config):
+        sample_config["pdf"].update(ocr=True, regions=["footer"])
+        with patch("_pdf_utils._paddleocr_available", return_value=True), \
+             patch("_pdf_utils.ocr_with_paddleocr",
+                   side_effect=["", "Invoice 12345 from ACME Corporation " * 20]) as mock_ocr:
+            result = extract_content(sample_pdf, sample_config)
+        cropped, full = (call.args[0][0] for call in mock_ocr.call_args_list)
+        assert full.height > cropped.height
+        assert result.ocr_text.startswith("Invoice 12345")
+        assert not result.warnings
+
+    def test_blank_vision_crop_sends_full_pages(self, sample_pdf, sample_config):
+        sample_config["pdf"].update(vision=True, regions=[[0.95, 1.0]])
+        result = extract_content(sample_pdf, sample_config)
+        [image] = result.images
+        assert image.size == render_pages_to_images(sample_pdf, 1)[0].size
+
+    def test_regions_are_part_of_cache_key(self, sample_pdf, sample_config):
+        from _pdf_utils import extraction_cache_key
+        before = extraction_cache_key(sample_pdf, sample_config)
+        sample_config["pdf"]["regions"] = ["header"]
+        assert extraction_cache_key(sample_pdf, sample_config) != before
 
 
 class TestOCRConfigPassthrough:
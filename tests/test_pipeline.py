@@ -0,0 +1,103 @@
+"""Tests for _pipeline.py."""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _ai_processing import DocumentMetadata
+from _pipeline import run_pipeline, get_performance_settings
+
+
+def _metadata(*_args, **_kwargs):
+    return DocumentMetadata(company_name="ACME", document_date="15.03.2024", document_type="ER")
+
+
+class TestGetPerformanceSettings:
+    def test_missing_section_defaults_to_one(self):
+        perf = get_performance_settings({})
+        assert perf["extract_workers"] == 1
+        assert perf["ai_workers"] == 1
+        assert perf["queue_size"] == 1
+
+    def test_invalid_values_clamped(self):
+        perf = get_performance_settings({"performance": {"ai_workers": 0, "queue_size": "x"}})
+        assert perf["ai_workers"] == 1
+        assert perf["queue_size"] == 1
+
+    def test_values_kept(self):
+        perf = get_performance_settings({"performance": {"ai_workers": 8, "pipeline": True}})
+        assert perf["ai_workers"] == 8
+        assert perf["pipeline"] is True
+
+
+class TestRunPipeline:
+    @pytest.fixture
+    def pipeline_config(self, sample_config):
+        sample_config["performance"] = {
+            "pipeline": True, "queue_size": 1, "extract_workers": 2,
+            "render_workers": 1, "ocr_workers": 1, "ai_workers": 3,
+        }
+        return sample_config
+
+    def test_every_file_yielded_once(self, tmp_path, sample_pdf, pipeline_config):
+        import shutil
+        paths = []
+        for i in range(5):
+            path = str(tmp_path / f"doc_{i}.pdf")
+            shutil.copy(sample_pdf, path)
+            paths.append(path)
+
+        with patch("_pipeline.extract_metadata", side_effect=_metadata):
+            items = list(run_pipeline(paths, pipeline_config))
+
+        assert sorted(item.index for item in items) == list(range(5))
+        for item in items:
+            assert item.error is None
+            assert item.pdf_path == paths[item.index]
+            assert "Invoice" in item.extraction.text
+            assert item.metadata.company_name == "ACME"
+
+    def test_empty_document_skips_ai(self, empty_pdf, pipeline_config):
+        with patch("_pipeline.extract_metadata", side_effect=_metadata) as mock_ai:
+            items = list(run_pipeline([empty_pdf], pipeline_config))
+        assert items[0].metadata is None
+        mock_ai.assert_not_called()
+
+    def test_stage_error_recorded(self, sample_pdf, pipeline_config):
+        with patch("_pipeline.extract_metadata", side_effect=RuntimeError("rate limited")):
+            items = list(run_pipeline([sample_pdf], pipeline_config))
+        assert items[0].error == "rate limited"
+        assert items[0].metadata is None
+
+    def test_vision_images_released_after_ai(self, sample_pdf, pipeline_config):
+        pipeline_config["pdf"]["vision"] = True
+        with patch("_pipeline.extract_metadata", side_effect=_metadata) as mock_ai:
+            items = list(run_pipeline([sample_pdf], pipeline_config))
+        sent = mock_ai.call_args[0][0]
+        assert "vision" in sent.sources
+        assert items[0].extraction.images == []
+
+
+class TestExtractPool:
+    def test_timed_out_worker_is_killed(self):
+        import time
+        from _deadlines import StageTimeoutError
+        from _pipeline import _ExtractPool
+        pool = _ExtractPool(1)
+        try:
+            stuck = pool._pool
+            assert pool.run(abs, -1, timeout=30) == 1
+            processes = list(stuck._processes.values())
+            with pytest.raises(StageTimeoutError):
+                pool.run(time.sleep, 60, timeout=2)
+            assert pool._pool is not stuck
+            for process in processes:
+                process.join(5)
+                assert not process.is_alive()
+            assert pool.run(abs, -3, timeout=30) == 3
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,317 @@
+"""Tests for _rate_limit.py."""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import _rate_limit
+from _rate_limit import (
+    AdaptiveConcurrencyLimiter,
+    RequestPacer,
+    TokenBucket,
+    get_concurrency_limiter,
+    get_request_pacer,
+    parse_remaining,
+    parse_retry_after,
+    rate_limit_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_limiters():
+    _rate_limit._LIMITERS.clear()
+    _rate_limit._PACERS.clear()
+    yield
+    _rate_limit._LIMITERS.clear()
+    _rate_limit._PACERS.clear()
+
+
+class TestParseHeaders:
+    def test_retry_after_seconds(self):
+        assert parse_retry_after({"retry-after": "2"}) == 2.0
+
+    def test_retry_after_ms_preferred(self):
+        assert parse_retry_after({"retry-after-ms": "1500", "retry-after": "9"}) == 1.5
+
+    def test_retry_after_http_date(self):
+        wait = parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert wait == 0.0
+
+    def test_retry_after_missing_or_garbage(self):
+        assert parse_retry_after({}) is None
+        assert parse_retry_after({"retry-after": "soon"}) is None
+
+    def test_remaining_takes_minimum(self):
+        headers = {
+            "x-ratelimit-remaining-requests": "40",
+            "x-ratelimit-remaining-tokens": "3",
+            "x-ratelimit-limit-requests": "500",
+        }
+        assert parse_remaining(headers) == 3
+
+    def test_remaining_anthropic_headers(self):
+        headers = {
+            "anthropic-ratelimit-requests-remaining": "7",
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-reset": "2024-01-01T00:00:00Z",
+        }
+        assert parse_remaining(headers) == 7
+
+    def test_remaining_absent(self):
+        assert parse_remaining({"content-type": "application/json"}) is None
+
+
+class TestAdaptiveConcurrencyLimiter:
+    def test_additive_increase_on_success(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=8, initial=2)
+        for _ in range(10):
+            limiter.record_response(200, {})
+        assert limiter.limit > 2
+        assert limiter.snapshot()["peak_limit"] == limiter.limit
+
+    def test_increase_capped_at_maximum(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=3, initial=1)
+        for _ in range(100):
+            limiter.record_response(200, {})
+        assert limiter.limit == 3
+
+    def test_multiplicative_decrease_on_429(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=16, initial=8)
+        limiter.record_response(429, {})
+        assert limiter.limit == 4
+        limiter.record_response(529, {})
+        assert limiter.limit == 2
+        stats = limiter.snapshot()
+        assert stats["throttled"] == 2
+        assert stats["requests"] == 2
+
+    def test_concurrent_429s_decrease_once(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=16, initial=8)
+        barrier = threading.Barrier(8)
+
+        def _request():
+            with limiter.slot():
+                sent_at = time.monotonic()
+                barrier.wait()
+                limiter.record_response(429, {}, sent_at=sent_at)
+
+        threads = [threading.Thread(target=_request) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert limiter.limit == 4
+        assert limiter.snapshot()["throttled"] == 8
+
+        # A request sent after that decrease is a new signal
+        limiter.record_response(429, {}, sent_at=time.monotonic())
+        assert limiter.limit == 2
+
+    def test_decrease_respects_minimum(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=4, initial=1)
+        limiter.record_response(429, {})
+        assert limiter.limit == 1
+
+    def test_low_remaining_quota_holds_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=8, initial=2)
+        limiter.acquire()
+        for _ in range(10):
+            limiter.record_response(200, {"x-ratelimit-remaining-requests": "1"})
+        limiter.release()
+        assert limiter.limit == 2
+
+    def test_client_errors_do_not_change_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=8, initial=4)
+        limiter.record_response(400, {})
+        assert limiter.limit == 4
+        assert limiter.snapshot()["throttled"] == 0
+
+    def test_retry_after_pauses_new_requests(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=4, initial=4)
+        limiter.record_response(429, {"retry-after-ms": "150"})
+        start = time.monotonic()
+        with limiter.slot():
+            pass
+        assert time.monotonic() - start >= 0.1
+
+    def test_slots_cap_in_flight_threads(self):
+        limiter = AdaptiveConcurrencyLimiter(maximum=2, initial=2)
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def _work():
+            with limiter.slot():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=_work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] == 2
+
+
+class TestLimiterRegistry:
+    def test_disabled_by_default(self, sample_config):
+        assert get_concurrency_limiter(sample_config) is None
+        assert rate_limit_stats() == {}
+
+    def test_shared_per_provider(self, sample_config):
+        sample_config["ai"]["adaptive_concurrency"] = True
+        sample_config["ai"]["max_concurrent_requests"] = 6
+        limiter = get_concurrency_limiter(sample_config)
+        assert limiter is get_concurrency_limiter(sample_config)
+        assert limiter.maximum == 6
+        assert list(rate_limit_stats()) == ["openai"]
+
+    def test_changed_maximum_updates_shared_limiter(self, sample_config):
+        sample_config["ai"]["adaptive_concurrency"] = True
+        sample_config["ai"]["max_concurrent_requests"] = 8
+        limiter = get_concurrency_limiter(sample_config)
+        for _ in range(100):
+            limiter.record_response(200, {})
+        assert limiter.limit == 8
+        sample_config["ai"]["max_concurrent_requests"] = 2
+        assert get_concurrency_limiter(sample_config) is limiter
+        assert (limiter.maximum, limiter.limit) == (2, 2)
+
+
+class TestClientWiring:
+    @patch("_ai_processing.instructor")
+    @patch("_ai_processing.OpenAI")
+    def test_response_hook_feeds_limiter(self, mock_openai, mock_instructor, sample_config):
+        from _ai_processing import get_instructor_client
+        sample_config["ai"]["adaptive_concurrency"] = True
+        get_instructor_client(sample_config)
+
+        http_client = mock_openai.call_args.kwargs["http_client"]
+        on_request = http_client.event_hooks["request"][0]
+        on_response = http_client.event_hooks["response"][0]
+        first, second = MagicMock(extensions={}), MagicMock(extensions={})
+        on_request(first)
+        on_request(second)
+        assert first.extensions["autorename_sent_at"] <= second.extensions["autorename_sent_at"]
+        on_response(MagicMock(status_code=429, headers={"retry-after": "0"}, request=first))
+        on_response(MagicMock(status_code=429, headers={"retry-after": "0"}, request=second))
+        stats = rate_limit_stats()["openai"]
+        assert stats["throttled"] == 2
+        assert stats["limit"] == 2
+
+    @patch("_ai_processing.instructor")
+    @patch("_ai_processing.OpenAI")
+    def test_no_http_client_when_disabled(self, mock_openai, mock_instructor, sample_config):
+        from _ai_processing import get_instructor_client
+        get_instructor_client(sample_config)
+        assert "http_client" not in mock_openai.call_args.kwargs
+
+    @patch("_ai_processing.get_instructor_client")
+    def test_sync_call_holds_slot(self, mock_client, sample_config):
+        from _ai_processing import extract_metadata_from_text
+        sample_config["ai"]["adaptive_concurrency"] = True
+        limiter = get_concurrency_limiter(sample_config)
+        seen = []
+        mock_client.return_value.chat.completions.create.side_effect = (
+            lambda **kw: seen.append(limiter._in_flight)
+        )
+        extract_metadata_from_text("Invoice", sample_config)
+        assert seen == [1]
+        assert limiter._in_flight == 0
+
+
+class TestTokenBucket:
+    def test_within_capacity_no_wait(self):
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.reserve(10) == 0.0
+
+    def test_overdraft_returns_wait(self):
+        bucket = TokenBucket(per_minute=60)  # 1 token per second
+        bucket.reserve(60)
+        assert bucket.reserve(2) == pytest.approx(2.0, abs=0.05)
+
+    def test_queued_callers_wait_progressively_longer(self):
+        bucket = TokenBucket(per_minute=60)
+        bucket.reserve(60)
+        first = bucket.reserve(1)
+        second = bucket.reserve(1)
+        assert second > first
+
+    def test_oversized_request_clamped_to_capacity(self):
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.reserve(1000) == 0.0
+
+
+class TestRequestPacer:
+    def test_requests_per_minute(self):
+        pacer = RequestPacer(requests_per_minute=120)  # 2 per second
+        with patch("_rate_limit.time.sleep") as mock_sleep:
+            for _ in range(121):
+                pacer.wait(1)
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args.args[0] == pytest.approx(0.5, abs=0.05)
+        assert pacer.snapshot()["paced"] == 1
+
+    def test_tokens_per_minute(self):
+        pacer = RequestPacer(tokens_per_minute=6000)  # 100 per second
+        with patch("_rate_limit.time.sleep") as mock_sleep:
+            pacer.wait(6000)
+            pacer.wait(300)
+        assert mock_sleep.call_args.args[0] == pytest.approx(3.0, abs=0.05)
+
+    def test_registry_disabled_without_budget(self, sample_config):
+        assert get_request_pacer(sample_config) is None
+        sample_config["ai"]["rate_limit"] = {"requests_per_minute": 0, "tokens_per_minute": 0}
+        assert get_request_pacer(sample_config) is None
+
+    def test_registry_shared_and_reported(self, sample_config):
+        sample_config["ai"]["rate_limit"] = {"requests_per_minute": 60}
+        pacer = get_request_pacer(sample_config)
+        assert pacer is get_request_pacer(sample_config)
+        assert rate_limit_stats() == {"openai": {"paced": 0, "paced_seconds": 0.0}}
+
+    def test_registry_applies_changed_budget(self, sample_config):
+        sample_config["ai"]["rate_limit"] = {"requests_per_minute": 60}
+        pacer = get_request_pacer(sample_config)
+        sample_config["ai"]["rate_limit"] = {"requests_per_minute": 120, "tokens_per_minute": 1000}
+        assert get_request_pacer(sample_config) is pacer
+        assert (pacer.requests_per_minute, pacer.tokens_per_minute) == (120, 1000)
+        assert pacer._reserve(1000) == 0
+        assert pacer._reserve(1) > 0
+
+
+class TestPromptTokenEstimate:
+    def test_text_and_images_counted(self, sample_config):
+        from PIL import Image
+        from _ai_processing import estimate_prompt_tokens
+        text_only = estimate_prompt_tokens("x" * 4000, [], sample_config)
+        with_image = estimate_prompt_tokens("x" * 4000, [Image.new("RGB", (750, 100))], sample_config)
+        assert text_only >= 1000
+        assert with_image == text_only + 100
+
+    def test_image_cost_capped(self, sample_config):
+        from PIL import Image
+        from _ai_processing import estimate_prompt_tokens
+        base = estimate_prompt_tokens("", [], sample_config)
+        huge = estimate_prompt_tokens("", [Image.new("RGB", (4000, 4000))], sample_config)
+        assert huge - base == 1600
+
+    @patch("_ai_processing.get_instructor_client")
+    def test_sync_call_paced_with_estimate(self, mock_client, sample_config):
+        from _ai_processing import extract_metadata_from_text
+        sample_config["ai"]["rate_limit"] = {"tokens_per_minute": 100000}
+        pacer = get_request_pacer(sample_config)
+        with patch.object(pacer, "wait") as mock_wait:
+            extract_metadata_from_text("y" * 400, sample_config)
+        assert mock_wait.call_args.args[0] >= 100
+        mock_client.return_value.chat.completions.create.assert_called_once()
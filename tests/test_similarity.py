@@ -0,0 +1,109 @@
+"""Tests for _similarity.py."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _ai_processing import DocumentMetadata
+from _cache import ResultCache
+from _pdf_utils import ExtractionResult
+from _similarity import (
+    find_near_duplicate,
+    fingerprint_words,
+    get_dedup_settings,
+    jaccard,
+    normalize_words,
+    remember_document,
+)
+
+INVOICE = (
+    "ACME Corporation GmbH Invoice 2024-0315 Date 15.03.2024 Customer Test Company "
+    "Position 1 Web development services 40 hours at EUR 95.00 EUR 3800.00 "
+    "Position 2 Hosting package annual EUR 240.00 Subtotal EUR 4040.00 VAT 20 percent "
+    "EUR 808.00 Total EUR 4848.00 Payment within 14 days to IBAN AT12 3456 7890 1234 5678 "
+    "Thank you for your business"
+)
+# The same invoice as OCR text: different line breaks and two misread words
+SCANNED = INVOICE.replace(" ", "\n", 6).replace("Hosting", "Hostinq").replace("business", "busincss")
+# Next month's invoice from the same template
+NEXT_MONTH = (
+    INVOICE.replace("2024-0315", "2024-0415").replace("15.03.2024", "15.04.2024")
+    .replace("40 hours", "32 hours").replace("3800.00", "3040.00").replace("4040.00", "3280.00")
+    .replace("808.00", "656.00").replace("4848.00", "3936.00")
+)
+OTHER = (
+    "Globex Ltd Delivery note 7781 shipped 02.05.2023 to warehouse Vienna pallets 4 "
+    "items 120 cartons of paper A4 80g signed by driver on arrival checked by stock "
+    "clerk no damages reported for this delivery please keep this note for your records"
+)
+
+
+def _config(**dedup):
+    return {"dedup": {"enabled": True, **dedup}}
+
+
+def _metadata():
+    return DocumentMetadata(company_name="ACME", document_date="15.03.2024", document_type="ER")
+
+
+def _cache(tmp_path):
+    return ResultCache(str(tmp_path / "c.sqlite"), 1024 * 1024)
+
+
+class TestFingerprint:
+    def test_normalization_ignores_case_and_punctuation(self):
+        assert normalize_words("Invoice: ACME-Corp., 15.03.2024") == ["invoice", "acme", "corp", "15", "03", "2024"]
+
+    def test_copy_scores_above_template_sibling(self):
+        original = fingerprint_words(normalize_words(INVOICE)).shingles
+        assert jaccard(original, fingerprint_words(normalize_words(SCANNED)).shingles) >= 0.85
+        assert jaccard(original, fingerprint_words(normalize_words(NEXT_MONTH)).shingles) < 0.75
+        assert jaccard(original, fingerprint_words(normalize_words(OTHER)).shingles) < 0.1
+
+    def test_settings_defaults(self):
+        assert get_dedup_settings({}) == {"enabled": False, "threshold": 0.85, "min_words": 30,
+                                          "max_entries": 10000}
+
+
+class TestNearDuplicateIndex:
+    def test_reuses_metadata_of_near_duplicate(self, tmp_path):
+        cache = _cache(tmp_path)
+        remember_document(cache, ExtractionResult(text=INVOICE), _metadata(), "/mail/invoice.pdf", _config())
+
+        found = find_near_duplicate(cache, ExtractionResult(ocr_text=SCANNED), _config())
+        assert found is not None
+        metadata, warning = found
+        assert metadata == _metadata()
+        assert "invoice.pdf" in warning
+        assert cache.counts()["similarity"] == {"hits": 1, "misses": 0}
+
+    def test_template_sibling_and_unrelated_text_not_reused(self, tmp_path):
+        cache = _cache(tmp_path)
+        remember_document(cache, ExtractionResult(text=INVOICE), _metadata(), "/a.pdf", _config())
+        assert find_near_duplicate(cache, ExtractionResult(text=NEXT_MONTH), _config()) is None
+        assert find_near_duplicate(cache, ExtractionResult(text=OTHER), _config()) is None
+        assert cache.counts()["similarity"] == {"hits": 0, "misses": 2}
+
+    def test_disabled_by_default(self, tmp_path):
+        cache = _cache(tmp_path)
+        remember_document(cache, ExtractionResult(text=INVOICE), _metadata(), "/a.pdf", {})
+        assert find_near_duplicate(cache, ExtractionResult(text=INVOICE), {}) is None
+        # Nothing is indexed while dedup is off
+        assert cache.keys("similarity") == []
+
+    def test_index_keeps_most_recent_documents(self, tmp_path):
+        cache = _cache(tmp_path)
+        config = _config(max_entries=1)
+        remember_document(cache, ExtractionResult(text=OTHER), _metadata(), "/old.pdf", config)
+        time.sleep(0.01)
+        remember_document(cache, ExtractionResult(text=INVOICE), _metadata(), "/new.pdf", config)
+        assert len(cache.keys("similarity")) == 1
+        assert find_near_duplicate(cache, ExtractionResult(text=OTHER), config) is None
+        assert find_near_duplicate(cache, ExtractionResult(text=INVOICE), config) is not None
+
+    def test_short_texts_not_indexed(self, tmp_path):
+        cache = _cache(tmp_path)
+        remember_document(cache, ExtractionResult(text="Invoice ACME"), _metadata(), "/a.pdf", _config())
+        assert cache.keys("similarity") == []
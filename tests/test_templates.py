@@ -0,0 +1,150 @@
+"""Tests for _templates.py."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _ai_processing import DocumentMetadata
+from _cache import ResultCache
+from _pdf_utils import ExtractionResult
+from _templates import (
+    get_template_settings,
+    layout_fingerprint,
+    learn_template,
+    match_template,
+    template_stats,
+)
+from _similarity import jaccard, normalize_words
+
+
+def _invoice(day: str, number: str, hours: int, item: str = "Web development services") -> str:
+    """A monthly invoice of one supplier: same layout, different numbers and line items."""
+    return (
+        "ACME Corporation GmbH\nMain Street 1, 1010 Vienna\n"
+        f"Invoice {number}\nInvoice date: {day}\nDue date: 30 days net\n"
+        "Customer: Test Company, Example Road 5, 8010 Graz\n"
+        f"Pos 1 {item} {hours} hours at EUR 95.00 EUR {hours * 95}.00\n"
+        "Pos 2 Hosting package monthly EUR 20.00\n"
+        f"Subtotal EUR {hours * 95 + 20}.00\nVAT 20 percent\n"
+        "Payment to IBAN AT12 3456 7890 1234 5678\nThank you for your business"
+    )
+
+
+JANUARY = _invoice("15.01.2024", "2024-0115", 40)
+FEBRUARY = _invoice("15.02.2024", "2024-0215", 32)
+MARCH = _invoice("15.03.2024", "2024-0315", 12, item="Server maintenance")
+OTHER = (
+    "Globex Ltd\nDelivery note 7781\nShipped 02.05.2023 to warehouse Vienna\n"
+    "4 pallets, 120 cartons of paper A4 80g\nSigned by driver on arrival\n"
+    "Checked by stock clerk, no damages reported\nPlease keep this note for your records"
+)
+
+
+def _config(**templates):
+    return {"templates": {"enabled": True, **templates}}
+
+
+def _metadata(date: str, company: str = "ACME Corporation"):
+    return DocumentMetadata(company_name=company, document_date=date, document_type="ER")
+
+
+def _cache(tmp_path):
+    return ResultCache(str(tmp_path / "c.sqlite"), 1024 * 1024)
+
+
+def _learn(cache, text, date, config=None, company="ACME"):
+    learn_template(cache, ExtractionResult(text=text), _metadata(date), company, "/in/x.pdf", config or _config())
+
+
+class TestLayout:
+    def test_numbers_do_not_count_as_layout(self):
+        january = layout_fingerprint(normalize_words(JANUARY))
+        assert jaccard(january, layout_fingerprint(normalize_words(FEBRUARY))) == 1.0
+        assert jaccard(january, layout_fingerprint(normalize_words(MARCH))) >= 0.6
+        assert jaccard(january, layout_fingerprint(normalize_words(OTHER))) < 0.1
+
+    def test_settings_defaults(self):
+        assert get_template_settings({}) == {"enabled": False, "min_similarity": 0.6, "min_confirmations": 1}
+
+
+class TestMatchTemplate:
+    def test_confirmed_template_reads_next_invoice(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024")
+        _learn(cache, FEBRUARY, "15.02.2024")
+
+        matched = match_template(cache, ExtractionResult(text=MARCH), _config())
+        assert matched is not None
+        metadata, name = matched
+        assert metadata == _metadata("15.03.2024")
+        assert name == "ACME ER"
+        assert cache.counts()["templates"] == {"hits": 1, "misses": 0}
+
+    def test_unconfirmed_template_not_used(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024")
+        assert match_template(cache, ExtractionResult(text=FEBRUARY), _config()) is None
+        assert match_template(cache, ExtractionResult(text=FEBRUARY), _config(min_confirmations=0)) is not None
+
+    def test_wrong_prediction_resets_confirmations(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024")
+        _learn(cache, FEBRUARY, "15.02.2024")
+        # The AI read the due date this time: the template is relearned from scratch
+        _learn(cache, FEBRUARY.replace("30 days net", "15.03.2024"), "15.03.2024")
+        assert template_stats(cache)[0]["confirmations"] == 0
+
+    def test_missing_date_falls_back(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024")
+        _learn(cache, FEBRUARY, "15.02.2024")
+
+        moved = MARCH.replace("Invoice date: 15.03.2024", "Issued on 15.03.2024")
+        assert match_template(cache, ExtractionResult(text=moved), _config()) is None
+        assert match_template(cache, ExtractionResult(text=OTHER), _config()) is None
+        assert cache.counts()["templates"] == {"hits": 0, "misses": 2}
+        [stats] = template_stats(cache)
+        assert (stats["hits"], stats["fallbacks"], stats["hit_rate"]) == (0, 1, 0.0)
+
+    def test_date_under_column_header(self, tmp_path):
+        cache = _cache(tmp_path)
+        table = "Invoice date   Due date\n{}   {}\n" + "\n".join(JANUARY.splitlines()[5:])
+        page = "ACME Corporation GmbH\nMain Street 1, 1010 Vienna\n" + table
+        _learn(cache, page.format("15.01.2024", "14.02.2024"), "15.01.2024")
+        _learn(cache, page.format("15.02.2024", "16.03.2024"), "15.02.2024")
+
+        metadata, _ = match_template(cache, ExtractionResult(text=page.format("15.03.2024", "14.04.2024")), _config())
+        assert metadata.document_date == "15.03.2024"
+
+    def test_disabled_by_default(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024")
+        _learn(cache, FEBRUARY, "15.02.2024")
+        assert match_template(cache, ExtractionResult(text=MARCH), {}) is None
+        assert match_template(cache, ExtractionResult(text=MARCH), _config()) is not None
+
+
+class TestLearnTemplate:
+    def test_disabled_learns_nothing(self, tmp_path):
+        cache = _cache(tmp_path)
+        learn_template(cache, ExtractionResult(text=JANUARY), _metadata("15.01.2024"), "ACME", "/in/x.pdf", {})
+        _learn(cache, FEBRUARY, "15.02.2024", config=_config(enabled=False))
+        assert template_stats(cache) == []
+        assert cache.stats()["entries"] == 0
+
+    def test_not_learned_without_name_in_text(self, tmp_path):
+        cache = _cache(tmp_path)
+        learn_template(cache, ExtractionResult(text=JANUARY), _metadata("15.01.2024", company="Initech"),
+                       "Initech", "/in/x.pdf", _config())
+        assert template_stats(cache) == []
+
+    def test_harmonized_name_is_the_template(self, tmp_path):
+        cache = _cache(tmp_path)
+        _learn(cache, JANUARY, "15.01.2024", company="Acme")
+        learn_template(cache, ExtractionResult(text=FEBRUARY), _metadata("15.02.2024", company="ACME Corp"),
+                       "Acme", "/in/february.pdf", _config())
+        [stats] = template_stats(cache)
+        assert stats["name"] == "Acme ER"
+        assert stats["confirmations"] == 1
+        assert stats["file"] == "february.pdf"
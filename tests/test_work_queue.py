@@ -0,0 +1,192 @@
+"""Tests for _work_queue.py."""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _document_processing import get_batch_renames, list_undo_batches
+from _work_queue import LeaseQueue, get_queue_settings
+
+
+def _drain(queue_path: str, worker: str, out_path: str) -> None:
+    """Worker process: claim and complete tasks until none are left."""
+    queue = LeaseQueue(queue_path)
+    claimed = []
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            break
+        claimed.append(task.path)
+        queue.complete(task, worker, {"file": task.path, "status": "skipped"})
+    with open(out_path, "w") as f:
+        json.dump(claimed, f)
+
+
+class TestLeaseQueue:
+    def test_claim_in_order_then_none(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"))
+        assert queue.add([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")]) == 2
+        assert queue.add([str(tmp_path / "a.pdf"), str(tmp_path / "c.pdf")]) == 1
+        tasks = [queue.claim("w1") for _ in range(3)]
+        assert [t.path for t in tasks] == [str(tmp_path / n) for n in ("a.pdf", "b.pdf", "c.pdf")]
+        assert [t.index for t in tasks] == [0, 1, 2]
+        assert queue.claim("w1") is None
+        assert queue.counts() == {"pending": 0, "leased": 3, "done": 0}
+
+    def test_paths_stored_relative_to_queue_folder(self, tmp_path):
+        shared = tmp_path / "host-a" / "scans"
+        shared.mkdir(parents=True)
+        queue = LeaseQueue(str(shared / "q.db"))
+        queue.add([str(shared / "archive" / "a.pdf")])
+        task = queue.claim("w1")
+        queue.complete(task, "w1", {"file": task.path, "status": "renamed"},
+                       new_path=str(shared / "archive" / "x.pdf"))
+
+        # Another host mounts the same folder elsewhere
+        moved = tmp_path / "host-b"
+        (tmp_path / "host-a").rename(moved)
+        other = LeaseQueue(str(moved / "scans" / "q.db"))
+        assert other.results()[0]["file"] == str(moved / "scans" / "archive" / "a.pdf")
+        assert other.results()[0]["new_path"] == str(moved / "scans" / "archive" / "x.pdf")
+        other.batch_id("batch-1")
+        log_path = str(moved / "scans" / ".autorename-log.json")
+        assert other.finalize(log_path)
+        assert get_batch_renames(log_path, "batch-1") == {
+            str(moved / "scans" / "archive" / "a.pdf"): str(moved / "scans" / "archive" / "x.pdf")}
+
+    def test_rejects_files_outside_queue_folder(self, tmp_path):
+        (tmp_path / "queue").mkdir()
+        queue = LeaseQueue(str(tmp_path / "queue" / "q.db"))
+        with pytest.raises(ValueError, match="outside the queue's folder"):
+            queue.add([str(tmp_path / "queue" / "a.pdf"), str(tmp_path / "b.pdf")])
+        assert queue.counts() == {"pending": 0, "leased": 0, "done": 0}
+
+    def test_batch_id_first_proposal_wins(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"))
+        assert queue.batch_id("first") == "first"
+        assert LeaseQueue(str(tmp_path / "q.db")).batch_id("second") == "first"
+
+    def test_expired_lease_is_offered_again(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"), lease_seconds=0.05)
+        queue.add([str(tmp_path / "a.pdf")])
+        first = queue.claim("dead-worker")
+        assert queue.claim("w2") is None
+        time.sleep(0.1)
+        second = queue.claim("w2")
+        assert second.path == first.path
+        assert second.attempts == 2
+
+    def test_renew_keeps_lease(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"), lease_seconds=0.2)
+        queue.add([str(tmp_path / "a.pdf")])
+        queue.claim("w1")
+        time.sleep(0.1)
+        assert queue.renew("w1") == 1
+        time.sleep(0.15)
+        assert queue.claim("w2") is None
+
+    def test_gives_up_after_max_attempts(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"), lease_seconds=0.01, max_attempts=2)
+        queue.add([str(tmp_path / "a.pdf")])
+        queue.claim("w1")
+        time.sleep(0.02)
+        queue.claim("w2")
+        time.sleep(0.02)
+        assert queue.claim("w3") is None
+        assert queue.counts()["done"] == 1
+        result = queue.results()[0]
+        assert result["status"] == "failed"
+        assert "Gave up after 2" in result["error"]
+
+    def test_first_result_wins_unless_renamed(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"), lease_seconds=0.01)
+        queue.add([str(tmp_path / "a.pdf")])
+        slow = queue.claim("slow")
+        time.sleep(0.02)
+        fast = queue.claim("fast")
+        assert queue.complete(fast, "fast", {"file": str(tmp_path / "a.pdf"), "status": "failed"})
+        # The slow worker did rename the file: its result must replace the failure
+        assert queue.complete(slow, "slow", {"file": str(tmp_path / "a.pdf"), "status": "renamed"}, new_path=str(tmp_path / "x.pdf"))
+        assert not queue.complete(fast, "fast", {"file": str(tmp_path / "a.pdf"), "status": "skipped"})
+        assert queue.results() == [{"file": str(tmp_path / "a.pdf"), "status": "renamed",
+                                    "new_path": str(tmp_path / "x.pdf")}]
+
+    def test_finalize_writes_one_batch_once_drained(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"))
+        queue.batch_id("batch-1")
+        queue.add([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")])
+        log_path = str(tmp_path / ".autorename-log.json")
+        first = queue.claim("w1")
+        queue.complete(first, "w1", {"file": str(tmp_path / "a.pdf"), "status": "renamed"}, new_path=str(tmp_path / "x.pdf"))
+        assert not queue.finalize(log_path)
+
+        second = queue.claim("w1")
+        queue.complete(second, "w1", {"file": str(tmp_path / "b.pdf"), "status": "skipped"})
+        assert queue.finalize(log_path)
+        assert not queue.finalize(log_path)
+        assert [b["batch_id"] for b in list_undo_batches(log_path)] == ["batch-1"]
+        assert get_batch_renames(log_path, "batch-1") == {str(tmp_path / "a.pdf"): str(tmp_path / "x.pdf")}
+
+    def test_finalize_merges_files_added_after_a_merge(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"))
+        queue.batch_id("batch-1")
+        log_path = str(tmp_path / ".autorename-log.json")
+        queue.add([str(tmp_path / "a.pdf")])
+        queue.complete(queue.claim("w1"), "w1", {"file": str(tmp_path / "a.pdf"), "status": "renamed"}, new_path=str(tmp_path / "x.pdf"))
+        assert queue.finalize(log_path)
+
+        queue.add([str(tmp_path / "b.pdf")])
+        queue.complete(queue.claim("w1"), "w1", {"file": str(tmp_path / "b.pdf"), "status": "renamed"}, new_path=str(tmp_path / "y.pdf"))
+        assert queue.finalize(log_path)
+        assert not queue.finalize(log_path)
+        assert [b["batch_id"] for b in list_undo_batches(log_path)] == ["batch-1"]
+        assert get_batch_renames(log_path, "batch-1") == {str(tmp_path / "a.pdf"): str(tmp_path / "x.pdf"), str(tmp_path / "b.pdf"): str(tmp_path / "y.pdf")}
+
+    def test_late_rename_after_merge_is_merged(self, tmp_path):
+        queue = LeaseQueue(str(tmp_path / "q.db"), lease_seconds=0.01)
+        queue.batch_id("batch-1")
+        queue.add([str(tmp_path / "a.pdf")])
+        log_path = str(tmp_path / ".autorename-log.json")
+        slow = queue.claim("slow")
+        time.sleep(0.02)
+        queue.complete(queue.claim("fast"), "fast", {"file": str(tmp_path / "a.pdf"), "status": "failed"})
+        assert queue.finalize(log_path)
+
+        queue.complete(slow, "slow", {"file": str(tmp_path / "a.pdf"), "status": "renamed"}, new_path=str(tmp_path / "x.pdf"))
+        assert queue.finalize(log_path)
+        assert get_batch_renames(log_path, "batch-1") == {str(tmp_path / "a.pdf"): str(tmp_path / "x.pdf")}
+
+    def test_processes_share_one_queue(self, tmp_path):
+        queue_path = str(tmp_path / "q.db")
+        paths = [str(tmp_path / "scans" / f"{i:03d}.pdf") for i in range(60)]
+        LeaseQueue(queue_path).add(paths)
+
+        ctx = multiprocessing.get_context("spawn")
+        outputs = [str(tmp_path / f"w{i}.json") for i in range(3)]
+        workers = [ctx.Process(target=_drain, args=(queue_path, f"w{i}", out)) for i, out in enumerate(outputs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            assert worker.exitcode == 0
+
+        claimed = []
+        for out in outputs:
+            with open(out) as f:
+                claimed.extend(json.load(f))
+        assert sorted(claimed) == paths
+        assert LeaseQueue(queue_path).counts() == {"pending": 0, "leased": 0, "done": 60}
+
+
+class TestQueueSettings:
+    def test_defaults_and_clamping(self):
+        assert get_queue_settings({}) == {"lease_seconds": 600.0, "max_attempts": 3, "poll_interval": 5.0}
+        settings = get_queue_settings({"queue": {"lease_seconds": 0, "max_attempts": 0}})
+        assert settings["lease_seconds"] == 1.0
+        assert settings["max_attempts"] == 1